@@ -0,0 +1,167 @@
+"""
+Exporting courses in the background.
+
+An export writes the course straight into a gzipped tar archive, which is kept
+in the storage configured by settings.COURSE_EXPORT_STORAGE until the course is
+exported again. Its status, including its progress and the name the archive was
+stored under, is kept in the cache.
+"""
+import hashlib
+import logging
+import time
+
+from celery import task
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files import File
+from django.core.files.storage import get_storage_class
+from django.core.files.temp import NamedTemporaryFile
+
+from xmodule.contentstore.django import contentstore
+from xmodule.exceptions import SerializationError
+from xmodule.modulestore.django import modulestore
+from xmodule.modulestore.keys import CourseKey
+from xmodule.modulestore.xml_exporter import export_to_tarball
+
+
+log = logging.getLogger(__name__)
+
+# The states of an export.
+EXPORT_PENDING = 'pending'
+EXPORT_IN_PROGRESS = 'in_progress'
+EXPORT_SUCCEEDED = 'succeeded'
+EXPORT_FAILED = 'failed'
+
+# How long the status of an export is kept after it last changed, in seconds.
+EXPORT_STATUS_TIMEOUT = 24 * 60 * 60
+
+# How long a course's export slot is held at most, in seconds, in case the export
+# holding it never finishes. Exporting a course should take much less time than this.
+EXPORT_SLOT_TIMEOUT = 60 * 60
+
+# The progress of an export is stored at most this often, in seconds.
+EXPORT_PROGRESS_INTERVAL = 1
+
+
+def export_course_to_file(course_module, output_file, on_add=None):
+    """
+    Export the course `course_module` as a gzipped tar archive, written to `output_file`.
+
+    `on_add` is called with the path and size of each file added to the archive.
+    """
+    export_to_tarball(
+        modulestore('direct'), contentstore(), course_module.id, output_file, course_module.url_name,
+        modulestore(), on_add=on_add
+    )
+
+
+def get_export_storage():
+    """Return the storage that exported courses are kept in."""
+    config = settings.COURSE_EXPORT_STORAGE
+    return get_storage_class(config['STORAGE_CLASS'])(**config.get('STORAGE_KWARGS', {}))
+
+
+def get_export_output_name(course_module):
+    """Return the name that the export of the course `course_module` is kept under in the storage."""
+    hashed_course_id = hashlib.sha1(unicode(course_module.id).encode('utf-8'))
+    return u"{}/{}.tar.gz".format(hashed_course_id.hexdigest(), course_module.url_name)
+
+
+def get_export_status(course_key):
+    """
+    Return the status of the latest export of the course `course_key`, as a dict with its
+    `state`, and the number of `files` and `bytes` exported so far. The status of a successful
+    export also has the name of its `output` in the export storage, and the status of a failed
+    export has the `error` message, and the `location` of the module which couldn't be
+    exported, if any. Returns None if the course hasn't been exported recently.
+    """
+    return cache.get(_export_status_key(course_key))
+
+
+def start_export(course_key):
+    """
+    Start exporting the course `course_key` in the background, unless it's already being
+    exported, and return the status of its export.
+
+    Only one export of a course runs at a time: an export claims the course's export slot
+    before it starts, and releases it when it's done.
+    """
+    if not cache.add(_export_slot_key(course_key), 'true', EXPORT_SLOT_TIMEOUT):
+        return get_export_status(course_key)
+
+    _set_export_status(course_key, EXPORT_PENDING)
+    try:
+        export_course.delay(unicode(course_key))
+    except Exception:
+        cache.delete(_export_slot_key(course_key))
+        raise
+    return get_export_status(course_key)
+
+
+def clear_export_status(course_key):
+    """Forget the status of the latest export of the course `course_key`."""
+    cache.delete(_export_status_key(course_key))
+
+
+def _export_status_key(course_key):
+    """The cache key of the export status of the course `course_key`"""
+    return u"course-export-status-{}".format(course_key)
+
+
+def _export_slot_key(course_key):
+    """The cache key of the export slot of the course `course_key`"""
+    return u"course-export-slot-{}".format(course_key)
+
+
+def _set_export_status(course_key, state, files=0, num_bytes=0, **fields):
+    """Store the export status of the course `course_key`"""
+    status = dict(fields, state=state, files=files, bytes=num_bytes)
+    cache.set(_export_status_key(course_key), status, EXPORT_STATUS_TIMEOUT)
+
+
+@task()  # pylint: disable=not-callable
+def export_course(course_key_string):
+    """
+    Export the course `course_key_string` to the export storage, keeping its export status
+    up to date, and then release the course's export slot (see `start_export`).
+    """
+    course_key = CourseKey.from_string(course_key_string)
+    progress = {'files': 0, 'num_bytes': 0, 'stored': time.time()}
+
+    def on_add(path, size):  # pylint: disable=unused-argument
+        """Count the file added to the archive, and store the progress every so often."""
+        progress['files'] += 1
+        progress['num_bytes'] += size
+        if time.time() - progress['stored'] >= EXPORT_PROGRESS_INTERVAL:
+            _set_export_status(course_key, EXPORT_IN_PROGRESS, progress['files'], progress['num_bytes'])
+            progress['stored'] = time.time()
+
+    _set_export_status(course_key, EXPORT_IN_PROGRESS)
+    try:
+        course_module = modulestore().get_course(course_key)
+        storage = get_export_storage()
+        output_name = get_export_output_name(course_module)
+
+        # The archive is written to a temporary file first, as storages need its size.
+        with NamedTemporaryFile(suffix=".tar.gz") as output_file:
+            export_course_to_file(course_module, output_file, on_add)
+            output_file.seek(0)
+            if storage.exists(output_name):
+                storage.delete(output_name)
+            # The storage may store it under another name, if the old one is still there.
+            output_name = storage.save(output_name, File(output_file))
+    except SerializationError as exc:
+        log.exception(u'There was an error exporting course %s', course_key)
+        _set_export_status(
+            course_key, EXPORT_FAILED, progress['files'], progress['num_bytes'],
+            error=str(exc), location=exc.location.to_deprecated_string(),
+        )
+    except Exception as exc:  # pylint: disable=broad-except
+        log.exception(u'There was an error exporting course %s', course_key)
+        _set_export_status(course_key, EXPORT_FAILED, progress['files'], progress['num_bytes'], error=str(exc))
+    else:
+        _set_export_status(
+            course_key, EXPORT_SUCCEEDED, progress['files'], progress['num_bytes'], output=output_name
+        )
+    finally:
+        cache.delete(_export_slot_key(course_key))
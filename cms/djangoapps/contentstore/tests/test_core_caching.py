@@ -1,6 +1,18 @@
-from cache_toolbox.core import get_cached_content, set_cached_content, del_cached_content
+import os
+import shutil
+from StringIO import StringIO
+from tempfile import mkdtemp
+
+from mock import patch
+
+from cache_toolbox import app_settings
+from cache_toolbox.core import (
+    get_cached_content, set_cached_content, del_cached_content, set_cached_content_stream,
+    start_caching_content_stream
+)
+from cache_toolbox.local_cache import LocalFileCache
 from xmodule.modulestore import Location
-from xmodule.contentstore.content import StaticContent
+from xmodule.contentstore.content import StaticContent, StaticContentStream
 from django.test import TestCase
 
 
@@ -34,3 +46,136 @@ class CachingTestCase(TestCase):
                          'should not be stored in cache with unicodeLocation')
         self.assertEqual(None, get_cached_content(self.nonUnicodeLocation),
                          'should not be stored in cache with nonUnicodeLocation')
+
+
+class LocalAssetCachingTestCase(TestCase):
+    """
+    Tests for caching content which is too big for memcached on local disk
+    """
+    location = Location(u'c4x', u'mitX', u'800', u'run', u'asset', u'lecture.pdf')
+    data = 'lecture slides' * 100
+
+    def setUp(self):
+        self.cache_dir = mkdtemp()
+        self.addCleanup(shutil.rmtree, self.cache_dir)
+        patcher = patch.object(app_settings, 'CACHE_TOOLBOX_LOCAL_ASSET_DIR', self.cache_dir)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(del_cached_content, self.location)
+
+        # the contentstore holds the current version of each asset
+        self.stored = {}
+        patcher = patch('cache_toolbox.core.contentstore')
+        mock_contentstore = patcher.start()
+        self.addCleanup(patcher.stop)
+        mock_contentstore.return_value.find.side_effect = lambda location, as_stream: self.stored[location]
+
+    def _store(self, location=None, content_digest='d41d8cd9'):
+        """
+        Put a stream of self.data in the contentstore at location
+        """
+        location = location or self.location
+        content = StaticContentStream(
+            location, location.name, 'application/pdf', StringIO(self.data),
+            length=len(self.data), content_digest=content_digest
+        )
+        self.stored[location] = content
+        return content
+
+    def _cached_files(self):
+        """
+        The files in the local asset cache, other than its temporary, claim and size files
+        """
+        return [
+            name
+            for key_name in os.listdir(self.cache_dir) if not key_name.startswith('.')
+            for name in os.listdir(os.path.join(self.cache_dir, key_name)) if not name.startswith('.')
+        ]
+
+    def test_put_and_get(self):
+        stored = self._store()
+        self.assertTrue(set_cached_content_stream(self.location, 'd41d8cd9'))
+        self.assertTrue(stored._stream.closed)  # pylint: disable=protected-access
+
+        cached = get_cached_content(self.location)
+        self.assertEqual(self.data, ''.join(cached.stream_data()))
+        self.assertEqual('application/pdf', cached.content_type)
+        self.assertEqual('d41d8cd9', cached.content_digest)
+
+    def test_already_cached(self):
+        self._store()
+        self.assertTrue(set_cached_content_stream(self.location, 'd41d8cd9'))
+        self.assertFalse(set_cached_content_stream(self.location, 'd41d8cd9'))
+
+    def test_claimed(self):
+        # another process is caching it already
+        self._store()
+        local_cache = LocalFileCache(self.cache_dir, app_settings.CACHE_TOOLBOX_LOCAL_ASSET_MAX_SIZE)
+        key = unicode(self.location).encode('utf-8')
+        self.assertTrue(local_cache.claim(key, 'd41d8cd9'))
+        self.assertFalse(set_cached_content_stream(self.location, 'd41d8cd9'))
+        self.assertEqual(None, get_cached_content(self.location))
+
+        # until its claim is released
+        local_cache.release(key, 'd41d8cd9')
+        self.assertTrue(set_cached_content_stream(self.location, 'd41d8cd9'))
+
+    def test_changed_since_requested(self):
+        stored = self._store(content_digest='second')
+        self.assertFalse(set_cached_content_stream(self.location, 'first'))
+        self.assertTrue(stored._stream.closed)  # pylint: disable=protected-access
+        self.assertEqual(None, get_cached_content(self.location))
+        self.assertEqual([], self._cached_files())
+
+    def test_delete(self):
+        self._store()
+        set_cached_content_stream(self.location, 'd41d8cd9')
+        del_cached_content(self.location)
+        self.assertEqual(None, get_cached_content(self.location))
+        self.assertEqual([], self._cached_files())
+
+    def test_new_version(self):
+        self._store(content_digest='first')
+        set_cached_content_stream(self.location, 'first')
+        self._store(content_digest='second')
+        set_cached_content_stream(self.location, 'second')
+        self.assertEqual('second', get_cached_content(self.location).content_digest)
+        self.assertEqual(['second'], self._cached_files())
+
+    def test_too_big(self):
+        self._store()
+        with patch.object(app_settings, 'CACHE_TOOLBOX_LOCAL_ASSET_MAX_SIZE', len(self.data) - 1):
+            self.assertFalse(set_cached_content_stream(self.location, 'd41d8cd9'))
+        self.assertEqual(None, get_cached_content(self.location))
+
+    def test_eviction(self):
+        with patch.object(app_settings, 'CACHE_TOOLBOX_LOCAL_ASSET_MAX_SIZE', len(self.data) * 3 // 2):
+            other_location = self.location.replace(name='other.pdf')
+            self.addCleanup(del_cached_content, other_location)
+            self._store()
+            set_cached_content_stream(self.location, 'd41d8cd9')
+            self._store(other_location)
+            set_cached_content_stream(other_location, 'd41d8cd9')
+        # the least recently used asset is evicted to make room
+        self.assertEqual(None, get_cached_content(self.location))
+        self.assertNotEqual(None, get_cached_content(other_location))
+
+    def test_start_caching_in_background(self):
+        content = self._store()
+        with patch('cache_toolbox.core.threading.Thread') as mock_thread:
+            start_caching_content_stream(content)
+        mock_thread.return_value.start.assert_called_once_with()
+        # the request goes on streaming the content it has without waiting for it to be cached
+        self.assertFalse(content._stream.closed)  # pylint: disable=protected-access
+        self.assertEqual(None, get_cached_content(self.location))
+
+        __, kwargs = mock_thread.call_args
+        kwargs['target'](*kwargs['args'])
+        self.assertEqual(self.data, ''.join(get_cached_content(self.location).stream_data()))
+
+    def test_start_caching_too_big(self):
+        content = self._store()
+        with patch.object(app_settings, 'CACHE_TOOLBOX_LOCAL_ASSET_MAX_SIZE', len(self.data) - 1):
+            with patch('cache_toolbox.core.threading.Thread') as mock_thread:
+                start_caching_content_stream(content)
+        self.assertFalse(mock_thread.called)
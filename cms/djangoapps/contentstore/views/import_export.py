@@ -8,7 +8,6 @@ import re
 import shutil
 import tarfile
 from path import path
-from tempfile import mkdtemp
 
 from django.conf import settings
 from django.contrib.auth.decorators import login_required
@@ -26,7 +25,6 @@ from xmodule.exceptions import SerializationError
 from xmodule.modulestore.django import modulestore
 from xmodule.modulestore.keys import CourseKey
 from xmodule.modulestore.xml_importer import import_from_xml
-from xmodule.modulestore.xml_exporter import export_to_xml
 
 from .access import has_course_access
 
@@ -35,10 +33,14 @@ from student import auth
 from student.roles import CourseInstructorRole, CourseStaffRole, GlobalStaff
 from util.json_request import JsonResponse
 
+from contentstore.tasks import (
+    EXPORT_FAILED, EXPORT_SUCCEEDED, clear_export_status, export_course_to_file, get_export_status,
+    get_export_storage, start_export
+)
 from contentstore.utils import reverse_course_url, reverse_usage_url
 
 
-__all__ = ['import_handler', 'import_status_handler', 'export_handler']
+__all__ = ['import_handler', 'import_status_handler', 'export_handler', 'export_status_handler', 'export_output_handler']
 
 
 log = logging.getLogger(__name__)
@@ -290,7 +292,7 @@ def import_status_handler(request, course_key_string, filename=None):
 # pylint: disable=unused-argument
 @ensure_csrf_cookie
 @login_required
-@require_http_methods(("GET",))
+@require_http_methods(("GET", "POST"))
 def export_handler(request, course_key_string):
     """
     The restful handler for exporting a course.
@@ -299,12 +301,16 @@ def export_handler(request, course_key_string):
         html: return html page for import page
         application/x-tgz: return tar.gz file containing exported course
         json: not supported
+    POST
+        json: start exporting the course in the background, and return the status of the export
+            (see `export_status_handler`)
 
     Note that there are 2 ways to request the tar.gz file. The request header can specify
     application/x-tgz via HTTP_ACCEPT, or a query parameter can be used (?_accept=application/x-tgz).
 
     If the tar.gz file has been requested but the export operation fails, an HTML page will be returned
-    which describes the error.
+    which describes the error. The same page is returned by the first GET of the html page after a
+    background export fails.
     """
     course_key = CourseKey.from_string(course_key_string)
     if not has_course_access(request.user, course_key):
@@ -312,6 +318,9 @@ def export_handler(request, course_key_string):
 
     course_module = modulestore().get_course(course_key)
 
+    if request.method == 'POST':
+        return JsonResponse(_export_status_json(course_module, start_export(course_key)))
+
     # an _accept URL parameter will be preferred over HTTP_ACCEPT in the header.
     requested_format = request.REQUEST.get('_accept', request.META.get('HTTP_ACCEPT', 'text/html'))
 
@@ -319,54 +328,21 @@ def export_handler(request, course_key_string):
     if 'application/x-tgz' in requested_format:
         name = course_module.url_name
         export_file = NamedTemporaryFile(prefix=name + '.', suffix=".tar.gz")
-        root_dir = path(mkdtemp())
 
         try:
-            export_to_xml(modulestore('direct'), contentstore(), course_module.id, root_dir, name, modulestore())
-
             logging.debug('tar file being generated at {0}'.format(export_file.name))
-            with tarfile.open(name=export_file.name, mode='w:gz') as tar_file:
-                tar_file.add(root_dir / name, arcname=name)
+            export_course_to_file(course_module, export_file)
+            export_file.flush()
         except SerializationError as exc:
             log.exception('There was an error exporting course %s', course_module.id)
-            unit = None
-            failed_item = None
-            parent = None
-            try:
-                failed_item = modulestore().get_item(exc.location)
-                parent_locs = modulestore().get_parent_locations(failed_item.location)
-
-                if len(parent_locs) > 0:
-                    parent = modulestore().get_item(parent_locs[0])
-                    if parent.location.category == 'vertical':
-                        unit = parent
-            except:  # pylint: disable=bare-except
-                # if we have a nested exception, then we'll show the more generic error message
-                pass
-
-            return render_to_response('export.html', {
-                'context_course': course_module,
-                'in_err': True,
-                'raw_err_msg': str(exc),
-                'failed_module': failed_item,
-                'unit': unit,
-                'edit_unit_url': reverse_usage_url("unit_handler", parent.location) if parent else "",
-                'course_home_url': reverse_course_url("course_handler", course_key),
-                'export_url': export_url
-            })
+            return render_to_response('export.html', _export_error_context(
+                course_module, export_url, str(exc), exc.location
+            ))
         except Exception as exc:
             log.exception('There was an error exporting course %s', course_module.id)
-            return render_to_response('export.html', {
-                'context_course': course_module,
-                'in_err': True,
-                'unit': None,
-                'raw_err_msg': str(exc),
-                'course_home_url': reverse_course_url("course_handler", course_key),
-                'export_url': export_url
-            })
-        finally:
-            shutil.rmtree(root_dir / name)
+            return render_to_response('export.html', _export_error_context(course_module, export_url, str(exc)))
 
+        export_file.seek(0)
         wrapper = FileWrapper(export_file)
         response = HttpResponse(wrapper, content_type='application/x-tgz')
         response['Content-Disposition'] = 'attachment; filename=%s' % os.path.basename(export_file.name)
@@ -374,11 +350,129 @@ def export_handler(request, course_key_string):
         return response
 
     elif 'text/html' in requested_format:
-        return render_to_response('export.html', {
-            'context_course': course_module,
-            'export_url': export_url
-        })
+        status = get_export_status(course_key)
+        if status is not None and status['state'] == EXPORT_FAILED:
+            # Show why the last export failed, once.
+            clear_export_status(course_key)
+            failed_location = status.get('location')
+            if failed_location is not None:
+                failed_location = course_key.make_usage_key_from_deprecated_string(failed_location)
+            return render_to_response('export.html', _export_error_context(
+                course_module, export_url, status['error'], failed_location
+            ))
+
+        return render_to_response('export.html', _export_context(course_module, export_url))
 
     else:
         # Only HTML or x-tgz request formats are supported (no JSON).
         return HttpResponse(status=406)
+
+
+# pylint: disable=unused-argument
+@require_GET
+@ensure_csrf_cookie
+@login_required
+def export_status_handler(request, course_key_string):
+    """
+    Returns the status of the latest background export of a course, as json with:
+
+        ExportStatus: 'pending', 'in_progress', 'succeeded' or 'failed', or null if the
+            course hasn't been exported recently
+        ExportFiles: the number of files exported so far
+        ExportBytes: the number of bytes exported so far
+        ExportOutput: the url to download the exported tar.gz file from, once it succeeded
+
+    """
+    course_key = CourseKey.from_string(course_key_string)
+    if not has_course_access(request.user, course_key):
+        raise PermissionDenied()
+
+    course_module = modulestore().get_course(course_key)
+    return JsonResponse(_export_status_json(course_module, get_export_status(course_key)))
+
+
+# pylint: disable=unused-argument
+@require_GET
+@login_required
+def export_output_handler(request, course_key_string):
+    """
+    Returns the tar.gz file that the latest background export of a course wrote.
+    """
+    course_key = CourseKey.from_string(course_key_string)
+    if not has_course_access(request.user, course_key):
+        raise PermissionDenied()
+
+    status = get_export_status(course_key)
+    if status is None or status['state'] != EXPORT_SUCCEEDED:
+        return HttpResponseNotFound()
+    storage = get_export_storage()
+    output_name = status['output']
+    if not storage.exists(output_name):
+        return HttpResponseNotFound()
+
+    response = HttpResponse(FileWrapper(storage.open(output_name)), content_type='application/x-tgz')
+    response['Content-Disposition'] = 'attachment; filename=%s' % os.path.basename(output_name)
+    response['Content-Length'] = storage.size(output_name)
+    return response
+
+
+def _export_status_json(course_module, status):
+    """
+    The json for `export_status_handler` of the export status `status` of `course_module`.
+    """
+    if status is None:
+        return {'ExportStatus': None}
+
+    status_json = {
+        'ExportStatus': status['state'],
+        'ExportFiles': status['files'],
+        'ExportBytes': status['bytes'],
+    }
+    if status['state'] == EXPORT_SUCCEEDED:
+        status_json['ExportOutput'] = reverse_course_url('export_output_handler', course_module.id)
+    return status_json
+
+
+def _export_error_context(course_module, export_url, raw_err_msg, failed_location=None):
+    """
+    The context for the export page, showing that exporting `course_module` failed with the
+    error message `raw_err_msg`, at the module at `failed_location`, if any.
+    """
+    course_key = course_module.id
+    unit = None
+    failed_item = None
+    parent = None
+    if failed_location is not None:
+        try:
+            failed_item = modulestore().get_item(failed_location)
+            parent_locs = modulestore().get_parent_locations(failed_item.location)
+
+            if len(parent_locs) > 0:
+                parent = modulestore().get_item(parent_locs[0])
+                if parent.location.category == 'vertical':
+                    unit = parent
+        except:  # pylint: disable=bare-except
+            # if we have a nested exception, then we'll show the more generic error message
+            pass
+
+    return dict(
+        _export_context(course_module, export_url),
+        in_err=True,
+        raw_err_msg=raw_err_msg,
+        failed_module=failed_item,
+        unit=unit,
+        edit_unit_url=reverse_usage_url("unit_handler", parent.location) if parent else "",
+        course_home_url=reverse_course_url("course_handler", course_key),
+    )
+
+
+def _export_context(course_module, export_url):
+    """
+    The context for the export page of `course_module`.
+    """
+    return {
+        'context_course': course_module,
+        'export_url': export_url,
+        'export_start_url': reverse_course_url('export_handler', course_module.id),
+        'export_status_url': reverse_course_url('export_status_handler', course_module.id),
+    }
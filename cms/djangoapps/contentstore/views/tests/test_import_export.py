@@ -9,17 +9,22 @@ import shutil
 import tarfile
 import tempfile
 from path import path
+from StringIO import StringIO
 from pymongo import MongoClient
 from uuid import uuid4
+from mock import patch
 
 from django.test.utils import override_settings
 from django.conf import settings
+from django.core.cache import cache
+from django.core.files.storage import FileSystemStorage
 from contentstore.utils import reverse_course_url
 
 from xmodule.contentstore.django import _CONTENTSTORE
 from xmodule.modulestore.django import loc_mapper
 from xmodule.modulestore.tests.factories import ItemFactory
 
+from contentstore.tasks import clear_export_status, get_export_status, get_export_storage
 from contentstore.tests.utils import CourseTestCase
 from student import auth
 from student.roles import CourseInstructorRole, CourseStaffRole
@@ -309,6 +314,83 @@ class ExportTestCase(CourseTestCase):
 
         self._verify_export_failure(u'/unit/location:MITx+999+Robot_Super_Course+vertical+foo')
 
+    def test_export_in_background(self):
+        """
+        Export in the background, then download the export.
+        """
+        resp = self.client.post(self.url, HTTP_ACCEPT='application/json')
+        self.assertEquals(json.loads(resp.content)['ExportStatus'], 'succeeded')
+
+        resp = self.client.get(reverse_course_url('export_status_handler', self.course.id))
+        status = json.loads(resp.content)
+        self.assertEquals(status['ExportStatus'], 'succeeded')
+        self.assertGreater(status['ExportFiles'], 0)
+
+        resp = self.client.get(status['ExportOutput'])
+        self._verify_export_succeeded(resp)
+        with tarfile.open(fileobj=StringIO(resp.content), mode='r:gz') as tar_file:
+            self.assertIn(self.course.location.name + '/course.xml', tar_file.getnames())
+
+    def test_export_in_background_already_running(self):
+        """
+        Starting an export while the course is being exported doesn't start another one.
+        """
+        self.addCleanup(cache.delete, u"course-export-slot-{}".format(self.course.id))
+        self.addCleanup(clear_export_status, self.course.id)
+        with patch('contentstore.tasks.export_course.delay') as mock_delay:
+            for __ in range(2):
+                resp = self.client.post(self.url, HTTP_ACCEPT='application/json')
+                self.assertEquals(json.loads(resp.content)['ExportStatus'], 'pending')
+        self.assertEquals(mock_delay.call_count, 1)
+
+    def test_export_in_background_renamed_output(self):
+        """
+        The archive of an export is downloaded from the name it was stored under, even if
+        the storage couldn't use the usual one.
+        """
+        resp = self.client.post(self.url, HTTP_ACCEPT='application/json')
+        first_output = get_export_status(self.course.id)['output']
+        first_names = self._exported_names(json.loads(resp.content)['ExportOutput'])
+
+        # the old archive can't be removed, so the new one is stored under another name
+        ItemFactory.create(parent_location=self.course.location, category='chapter', display_name='new')
+        with patch.object(FileSystemStorage, 'delete'):
+            resp = self.client.post(self.url, HTTP_ACCEPT='application/json')
+        output = get_export_status(self.course.id)['output']
+        self.addCleanup(get_export_storage().delete, output)
+        self.assertNotEquals(output, first_output)
+
+        # the new archive is the one downloaded, with the new chapter in it
+        names = self._exported_names(json.loads(resp.content)['ExportOutput'])
+        self.assertTrue(set(names) - set(first_names))
+
+    def _exported_names(self, export_output_url):
+        """ Download the archive of a background export, and return the names of its files. """
+        resp = self.client.get(export_output_url)
+        self._verify_export_succeeded(resp)
+        with tarfile.open(fileobj=StringIO(resp.content), mode='r:gz') as tar_file:
+            return tar_file.getnames()
+
+    def test_export_in_background_failure(self):
+        """
+        Export in the background, when exporting fails.
+        """
+        vertical = ItemFactory.create(parent_location=self.course.location, category='vertical', display_name='foo')
+        ItemFactory.create(
+            parent_location=vertical.location,
+            category='aawefawef'
+        )
+
+        resp = self.client.post(self.url, HTTP_ACCEPT='application/json')
+        self.assertEquals(json.loads(resp.content)['ExportStatus'], 'failed')
+
+        # The export page shows why, once.
+        resp = self.client.get_html(self.url)
+        self.assertContains(resp, 'Unable to create xml for module')
+        self.assertContains(resp, u'/unit/location:MITx+999+Robot_Super_Course+vertical+foo')
+        resp = self.client.get_html(self.url)
+        self.assertNotContains(resp, 'Unable to create xml for module')
+
     def _verify_export_failure(self, expectedText):
         """ Export failure helper method. """
         resp = self.client.get(self.url, HTTP_ACCEPT='application/x-tgz')
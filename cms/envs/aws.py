@@ -129,9 +129,14 @@ if 'loc_cache' not in CACHES:
         'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
         'LOCATION': 'edx_location_mem_cache',
     }
+# Cache shared between processes for split modulestore course structures, behind
+# each process's own cache of them. Defaults to the default cache (memcached).
+if 'course_structure_cache' not in CACHES:
+    CACHES['course_structure_cache'] = dict(CACHES['default'], KEY_PREFIX='course_structure')
 
 SESSION_COOKIE_DOMAIN = ENV_TOKENS.get('SESSION_COOKIE_DOMAIN')
 SESSION_ENGINE = ENV_TOKENS.get('SESSION_ENGINE', SESSION_ENGINE)
+COURSE_ACCESS_ROLE_CACHE_TIMEOUT = ENV_TOKENS.get('COURSE_ACCESS_ROLE_CACHE_TIMEOUT', COURSE_ACCESS_ROLE_CACHE_TIMEOUT)
 
 # allow for environments to specify what cookie name our login subsystem should use
 # this is to fix a bug regarding simultaneous logins between edx.org and edge.edx.org which can
@@ -159,6 +164,14 @@ TIME_ZONE = ENV_TOKENS.get('TIME_ZONE', TIME_ZONE)
 # Push to LMS overrides
 GIT_REPO_EXPORT_DIR = ENV_TOKENS.get('GIT_REPO_EXPORT_DIR', '/edx/var/edxapp/export_course_repos')
 
+# Course export overrides. Exports are kept in private S3 storage by default, so
+# that the server a course team downloads one from needn't be the celery worker
+# that wrote it.
+COURSE_EXPORT_STORAGE = ENV_TOKENS.get('COURSE_EXPORT_STORAGE', {
+    'STORAGE_CLASS': DEFAULT_FILE_STORAGE,
+    'STORAGE_KWARGS': {'location': 'course-exports', 'acl': 'private'},
+})
+
 # Translation overrides
 LANGUAGES = ENV_TOKENS.get('LANGUAGES', LANGUAGES)
 LANGUAGE_CODE = ENV_TOKENS.get('LANGUAGE_CODE', LANGUAGE_CODE)
@@ -224,6 +237,8 @@ AWS_SECRET_ACCESS_KEY = AUTH_TOKENS["AWS_SECRET_ACCESS_KEY"]
 if AWS_SECRET_ACCESS_KEY == "":
     AWS_SECRET_ACCESS_KEY = None
 
+AWS_STORAGE_BUCKET_NAME = AUTH_TOKENS.get('AWS_STORAGE_BUCKET_NAME', 'edxuploads')
+
 DATABASES = AUTH_TOKENS['DATABASES']
 MODULESTORE = AUTH_TOKENS['MODULESTORE']
 CONTENTSTORE = AUTH_TOKENS['CONTENTSTORE']
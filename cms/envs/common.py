@@ -231,6 +231,10 @@ MIDDLEWARE_CLASSES = (
 # Clickjacking protection can be enabled by setting this to 'DENY'
 X_FRAME_OPTIONS = 'ALLOW'
 
+# Users' course access roles are loaded once per request. Set this to a number
+# of seconds to also keep them in the shared cache between requests.
+COURSE_ACCESS_ROLE_CACHE_TIMEOUT = None
+
 ############# XBlock Configuration ##########
 
 # Import after sys.path fixup
@@ -446,6 +450,20 @@ CELERY_QUEUES = {
 }
 
 
+############################## Course Export ##################################
+
+# Courses exported in the background are kept in this storage, for their course
+# teams to download: the name of a Django storage class, and the keyword
+# arguments to make one with. Exports are written by a celery worker and
+# downloaded through whichever server handles the request, so when those are
+# different machines this has to be storage they all share (such as S3, which
+# aws.py defaults to); a local directory only works with a single machine.
+COURSE_EXPORT_STORAGE = {
+    'STORAGE_CLASS': 'django.core.files.storage.FileSystemStorage',
+    'STORAGE_KWARGS': {'location': '/tmp/edx-s3/course-exports'},
+}
+
+
 ############################## Video ##########################################
 
 YOUTUBE = {
@@ -530,6 +548,9 @@ INSTALLED_APPS = (
 
     # Monitoring signals
     'monitoring',
+
+    # Cached overviews of courses, for the pages that list them
+    'course_overviews',
 )
 
 
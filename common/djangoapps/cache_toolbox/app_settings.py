@@ -6,3 +6,18 @@ CACHE_TOOLBOX_DEFAULT_TIMEOUT = getattr(
     'CACHE_TOOLBOX_DEFAULT_TIMEOUT',
     60 * 60 * 24 * 3,
 )
+
+# Directory on local disk for caching assets which are too big for memcached.
+# If None, they are always streamed from the contentstore.
+CACHE_TOOLBOX_LOCAL_ASSET_DIR = getattr(
+    settings,
+    'CACHE_TOOLBOX_LOCAL_ASSET_DIR',
+    None,
+)
+
+# The most bytes to keep in CACHE_TOOLBOX_LOCAL_ASSET_DIR before evicting the least recently used assets
+CACHE_TOOLBOX_LOCAL_ASSET_MAX_SIZE = getattr(
+    settings,
+    'CACHE_TOOLBOX_LOCAL_ASSET_MAX_SIZE',
+    1024 * 1024 * 1024,
+)
@@ -5,13 +5,24 @@ Core methods
 .. autofunction:: cache_toolbox.core.get_instance
 .. autofunction:: cache_toolbox.core.delete_instance
 .. autofunction:: cache_toolbox.core.instance_key
+.. autofunction:: cache_toolbox.core.set_cached_content_stream
+.. autofunction:: cache_toolbox.core.start_caching_content_stream
 
 """
 
+import logging
+import threading
+
 from django.core.cache import cache
 from django.db import DEFAULT_DB_ALIAS
 
+from xmodule.contentstore.content import StaticContent, StaticContentStream
+from xmodule.contentstore.django import contentstore
+
 from . import app_settings
+from .local_cache import LocalFileCache
+
+log = logging.getLogger(__name__)
 
 
 def get_instance(model, instance_or_pk, timeout=None, using=None):
@@ -109,18 +120,143 @@ def instance_key(model, instance_or_pk):
     )
 
 
+def _content_key(location):
+    """
+    The cache key for the content at location
+    """
+    return unicode(location).encode("utf-8")
+
+
+def _local_asset_cache():
+    """
+    The cache on local disk for content which is too big for memcached, or None if
+    CACHE_TOOLBOX_LOCAL_ASSET_DIR isn't set
+    """
+    if app_settings.CACHE_TOOLBOX_LOCAL_ASSET_DIR is None:
+        return None
+    return LocalFileCache(
+        app_settings.CACHE_TOOLBOX_LOCAL_ASSET_DIR,
+        app_settings.CACHE_TOOLBOX_LOCAL_ASSET_MAX_SIZE,
+    )
+
+
+def _is_local_content_header(content):
+    """
+    Content in the cache without any data stands for content whose data is in the local asset cache
+    """
+    return isinstance(content, StaticContent) and content.data is None
+
+
 def set_cached_content(content):
-    cache.set(unicode(content.location).encode("utf-8"), content)
+    cache.set(_content_key(content.location), content)
+
+
+def start_caching_content_stream(content):
+    """
+    Start caching a StaticContentStream which is too big for memcached on local disk
+    in the background, so that the request which found it missing from the cache can
+    go on serving it straight from the contentstore.
+    """
+    local_cache = _local_asset_cache()
+    content_digest = getattr(content, 'content_digest', None)
+    if local_cache is None or content_digest is None or content.length > local_cache.max_size:
+        return
+
+    thread = threading.Thread(
+        target=_set_cached_content_stream_logging_errors, args=(content.location, content_digest)
+    )
+    thread.daemon = True
+    thread.start()
+
+
+def _set_cached_content_stream_logging_errors(location, content_digest):
+    """
+    Call set_cached_content_stream, logging rather than raising its errors, as there
+    is nothing to raise them to in a background thread
+    """
+    try:
+        set_cached_content_stream(location, content_digest)
+    except Exception:  # pylint: disable=broad-except
+        log.exception("Unable to cache %s on local disk", location)
+
+
+def set_cached_content_stream(location, content_digest):
+    """
+    Cache the content at location, which is too big for memcached, on local disk.
+    Returns whether it was cached.
+
+    The data goes to the local asset cache, keyed by location and content digest,
+    while memcached keeps a header with everything but the data. Since the header is
+    shared by all servers, a server whose local copy is out of date won't find it.
+    Of the processes on a server which try to cache the same content at the same
+    time, only the one which claims it in the local asset cache does.
+    """
+    local_cache = _local_asset_cache()
+    if local_cache is None:
+        return False
+
+    key = _content_key(location)
+    if not local_cache.claim(key, content_digest):
+        return False
+
+    try:
+        content = contentstore().find(location, as_stream=True)
+        try:
+            if content.content_digest != content_digest or content.length > local_cache.max_size:
+                # it changed since it was requested
+                return False
+            path = local_cache.set(key, content_digest, content.stream_data())
+        finally:
+            content.close()
+    finally:
+        local_cache.release(key, content_digest)
+
+    if path is None:
+        return False
+
+    header = StaticContent(
+        content.location, content.name, content.content_type, None,
+        last_modified_at=content.last_modified_at, thumbnail_location=content.thumbnail_location,
+        import_path=content.import_path, length=content.length, locked=content.locked,
+        content_digest=content_digest
+    )
+    cache.set(key, header)
+    return True
+
+
+def _local_content(header, cached_file):
+    """
+    A StaticContentStream of the file in the local asset cache described by header
+    """
+    return StaticContentStream(
+        header.location, header.name, header.content_type, cached_file,
+        last_modified_at=header.last_modified_at, thumbnail_location=header.thumbnail_location,
+        import_path=header.import_path, length=header.length, locked=header.locked,
+        content_digest=header.content_digest
+    )
 
 
 def get_cached_content(location):
-    return cache.get(unicode(location).encode("utf-8"))
+    key = _content_key(location)
+    content = cache.get(key)
+    if content is None or not _is_local_content_header(content):
+        return content
+
+    local_cache = _local_asset_cache()
+    cached_file = local_cache.open(key, content.content_digest) if local_cache is not None else None
+    if cached_file is None:
+        return None
+    return _local_content(content, cached_file)
 
 
 def del_cached_content(location):
     # delete content for the given location, as well as for content with run=None.
     # it's possible that the content could have been cached without knowing the
     # course_key - and so without having the run.
-    cache.delete_many(
-        [unicode(loc).encode("utf-8") for loc in [location, location.replace(run=None)]]
-    )
+    keys = [_content_key(loc) for loc in [location, location.replace(run=None)]]
+    cache.delete_many(keys)
+
+    local_cache = _local_asset_cache()
+    if local_cache is not None:
+        for key in keys:
+            local_cache.delete(key)
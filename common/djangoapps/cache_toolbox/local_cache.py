@@ -0,0 +1,250 @@
+"""
+A size-bounded cache of files in a local directory, evicted least recently used first.
+
+Used by :func:`cache_toolbox.core.set_cached_content_stream` to keep assets which
+are too big for memcached on each server's disk.
+"""
+
+import errno
+import fcntl
+import hashlib
+import logging
+import os
+import tempfile
+import time
+
+log = logging.getLogger(__name__)
+
+
+class LocalFileCache(object):
+    """
+    Stores files under `directory`, keeping their total size under `max_size` bytes.
+
+    The versions of each key are kept in a directory named by a hash of the key, and
+    each is named by its version string (e.g. the md5 of its content), so a file which
+    has changed is never mistaken for its old version. Reading a file marks it as
+    recently used by touching its mtime.
+
+    The total size of the files is kept in a file of its own, and updated as files are
+    added and removed, so the whole directory is only listed when files have to be
+    evicted.
+    """
+    # The file which keeps the total size of the cached files.
+    SIZE_FILE = '.size'
+    # A claim to write a file is given up on after this many seconds, in case the
+    # process which made it died.
+    CLAIM_TIMEOUT = 10 * 60
+
+    def __init__(self, directory, max_size):
+        self.directory = directory
+        self.max_size = max_size
+
+    def _key_directory(self, key):
+        """
+        The directory which keeps the versions of key
+        """
+        return os.path.join(self.directory, hashlib.sha1(key).hexdigest())
+
+    def _path(self, key, version):
+        """
+        The path of the file for this version of key
+        """
+        return os.path.join(self._key_directory(key), version)
+
+    def _claim_path(self, key, version):
+        """
+        The path of the file which claims the writing of this version of key
+        """
+        return os.path.join(self._key_directory(key), '.claim-' + version)
+
+    def open(self, key, version):
+        """
+        Return the file for this version of key opened for reading, or None if it isn't cached
+        """
+        path = self._path(key, version)
+        try:
+            cached_file = open(path, 'rb')
+        except IOError:
+            return None
+
+        try:
+            os.utime(path, None)
+        except OSError:
+            # it was evicted after we opened it, which is fine as we already have it open
+            pass
+        return cached_file
+
+    def claim(self, key, version):
+        """
+        Claim the writing of this version of key, so that of the processes which try to
+        cache it at the same time, only one does. Returns whether it was claimed, which it
+        isn't if it's already cached, or another process claimed it first.
+
+        The claim should be released by `release` once the file is `set`, or isn't set after all.
+        """
+        if os.path.exists(self._path(key, version)):
+            return False
+
+        claim_path = self._claim_path(key, version)
+        for __ in range(2):
+            try:
+                _makedirs(self._key_directory(key))
+                os.close(os.open(claim_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+                return True
+            except OSError as error:
+                if error.errno != errno.EEXIST:
+                    log.exception("Unable to claim %s in the local file cache", key)
+                    return False
+            try:
+                if time.time() - os.stat(claim_path).st_mtime < self.CLAIM_TIMEOUT:
+                    return False
+            except OSError:
+                # released meanwhile, so try again
+                continue
+            # the process which claimed it must have died
+            self._remove(claim_path)
+        return False
+
+    def release(self, key, version):
+        """
+        Release the claim on this version of key
+        """
+        self._remove(self._claim_path(key, version))
+
+    def set(self, key, version, chunks):
+        """
+        Write the iterable of chunks to the file for this version of key, replacing any
+        other versions of it, and evict the least recently used files to make room.
+        Returns the path of the file, or None if it couldn't be written.
+        """
+        try:
+            # write to a temporary file and rename it into place so that readers
+            # in other processes never see a partially written file
+            _makedirs(self._key_directory(key))
+            file_descriptor, temp_path = tempfile.mkstemp(dir=self._key_directory(key), prefix='.tmp-')
+            try:
+                with os.fdopen(file_descriptor, 'wb') as temp_file:
+                    for chunk in chunks:
+                        temp_file.write(chunk)
+                size = os.path.getsize(temp_path)
+                path = self._path(key, version)
+                os.rename(temp_path, path)
+            except:
+                os.remove(temp_path)
+                raise
+        except (IOError, OSError):
+            log.exception("Unable to write %s to the local file cache", key)
+            return None
+
+        removed_size = self._remove_versions(key, keep=version)
+        if self._update_total_size(lambda total_size: total_size + size - removed_size) > self.max_size:
+            self.evict()
+        return path
+
+    def delete(self, key):
+        """
+        Remove all versions of key from the cache
+        """
+        removed_size = self._remove_versions(key)
+        if removed_size:
+            self._update_total_size(lambda total_size: total_size - removed_size)
+
+    def evict(self):
+        """
+        Remove the least recently used files until the total size is under max_size
+        """
+        entries = []
+        total_size = 0
+        for key_name in self._names(self.directory):
+            key_directory = os.path.join(self.directory, key_name)
+            for name in self._names(key_directory):
+                path = os.path.join(key_directory, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, path))
+                total_size += stat.st_size
+
+        entries.sort()
+        for __, size, path in entries:
+            if total_size <= self.max_size:
+                break
+            self._remove(path)
+            total_size -= size
+
+        # correct any drift, e.g. from files removed by hand
+        self._update_total_size(lambda __: total_size)
+
+    def _remove_versions(self, key, keep=None):
+        """
+        Remove the versions of key other than keep, and return their total size
+        """
+        key_directory = self._key_directory(key)
+        removed_size = 0
+        for name in self._names(key_directory):
+            if name == keep:
+                continue
+            path = os.path.join(key_directory, name)
+            try:
+                removed_size += os.stat(path).st_size
+            except OSError:
+                continue
+            self._remove(path)
+        return removed_size
+
+    def _update_total_size(self, update):
+        """
+        Replace the total size of the cached files with update(total size), and return it
+        """
+        try:
+            _makedirs(self.directory)
+            size_file = os.fdopen(os.open(os.path.join(self.directory, self.SIZE_FILE), os.O_RDWR | os.O_CREAT), 'r+')
+        except (IOError, OSError):
+            log.exception("Unable to update the size of the local file cache")
+            return 0
+
+        with size_file:
+            # the lock is released when the file is closed
+            fcntl.flock(size_file, fcntl.LOCK_EX)
+            try:
+                total_size = int(size_file.read() or 0)
+            except ValueError:
+                total_size = 0
+            total_size = max(update(total_size), 0)
+            size_file.seek(0)
+            size_file.truncate()
+            size_file.write(str(total_size))
+        return total_size
+
+    @staticmethod
+    def _names(directory):
+        """
+        The names of the files in directory, other than temporary, claim and size files
+        """
+        try:
+            return [name for name in os.listdir(directory) if not name.startswith('.')]
+        except OSError:
+            return []
+
+    @staticmethod
+    def _remove(path):
+        """
+        Remove path, which another process may have removed already
+        """
+        try:
+            os.remove(path)
+        except OSError as error:
+            if error.errno != errno.ENOENT:
+                raise
+
+
+def _makedirs(directory):
+    """
+    Create directory, which another process may have created already
+    """
+    try:
+        os.makedirs(directory)
+    except OSError as error:
+        if error.errno != errno.EEXIST:
+            raise
@@ -1,16 +1,52 @@
+import re
+from calendar import timegm
+
 from django.http import (HttpResponse, HttpResponseNotModified,
     HttpResponseForbidden)
+from django.utils.http import http_date, parse_http_date_safe, parse_etags, quote_etag
 from student.models import CourseEnrollment
 
 from xmodule.contentstore.django import contentstore
-from xmodule.contentstore.content import StaticContent, XASSET_LOCATION_TAG
+from xmodule.contentstore.content import StaticContent, StaticContentStream, XASSET_LOCATION_TAG
 from xmodule.modulestore import InvalidLocationError, InvalidKeyError
-from cache_toolbox.core import get_cached_content, set_cached_content
+from cache_toolbox.core import get_cached_content, set_cached_content, start_caching_content_stream
 from xmodule.exceptions import NotFoundError
 
 # TODO: Soon as we have a reasonable way to serialize/deserialize AssetKeys, we need
 # to change this file so instead of using course_id_partial, we're just using asset keys
 
+# a single byte range, e.g. 'bytes=0-499', 'bytes=500-' or 'bytes=-500'
+BYTE_RANGE_RE = re.compile(r'^\s*bytes\s*=\s*(\d*)\s*-\s*(\d*)\s*$', re.IGNORECASE)
+
+
+def parse_range_header(header_value, content_length):
+    """
+    Return the (first_byte, last_byte) of the single byte range requested by the Range
+    header value, clipped to content_length. Returns None if the header isn't a single
+    byte range we understand, in which case the whole content should be served.
+    Raises ValueError if the range can't be satisfied.
+    """
+    match = BYTE_RANGE_RE.match(header_value)
+    if match is None:
+        return None
+    first, last = match.groups()
+    if not first and not last:
+        return None
+
+    if not first:
+        # a suffix range: the last N bytes
+        suffix_length = int(last)
+        if suffix_length == 0:
+            raise ValueError(header_value)
+        return max(content_length - suffix_length, 0), content_length - 1
+
+    first_byte = int(first)
+    last_byte = int(last) if last else content_length - 1
+    if first_byte >= content_length or last_byte < first_byte:
+        raise ValueError(header_value)
+    return first_byte, min(last_byte, content_length - 1)
+
+
 class StaticContentServer(object):
     def process_request(self, request):
         # look to see if the request is prefixed with 'c4x' tag
@@ -41,31 +77,118 @@ class StaticContentServer(object):
                         # since we've queried as a stream, let's read in the stream into memory to set in cache
                         content = content.copy_to_in_mem()
                         set_cached_content(content)
+                    else:
+                        # too big for memcached, but it can be kept on local disk so
+                        # that it isn't streamed out of the DB on every request. This
+                        # request goes on streaming it out of the DB meanwhile, which
+                        # serves a Range request without reading the rest of it
+                        start_caching_content_stream(content)
             else:
                 # NOP here, but we may wish to add a "cache-hit" counter in the future
                 pass
 
-            # Check that user has access to content
-            if getattr(content, "locked", False):
-                if not hasattr(request, "user") or not request.user.is_authenticated():
-                    return HttpResponseForbidden('Unauthorized')
-                if not request.user.is_staff and not CourseEnrollment.is_enrolled_by_partial(
-                        request.user, loc.course_key
-                ):
-                    return HttpResponseForbidden('Unauthorized')
-
-            # convert over the DB persistent last modified timestamp to a HTTP compatible
-            # timestamp, so we can simply compare the strings
-            last_modified_at_str = content.last_modified_at.strftime("%a, %d-%b-%Y %H:%M:%S GMT")
-
-            # see if the client has cached this content, if so then compare the
-            # timestamps, if they are the same then just return a 304 (Not Modified)
-            if 'HTTP_IF_MODIFIED_SINCE' in request.META:
-                if_modified_since = request.META['HTTP_IF_MODIFIED_SINCE']
-                if if_modified_since == last_modified_at_str:
-                    return HttpResponseNotModified()
+            try:
+                response = self._content_response(request, loc, content)
+            except Exception:
+                self._close_stream(content)
+                raise
+            if response.status_code not in (200, 206):
+                # only responses with the content's data read its stream
+                self._close_stream(content)
+            return response
+
+    def _content_response(self, request, loc, content):
+        """
+        The response to request for content, whose location is loc
+        """
+        # Check that user has access to content
+        if getattr(content, "locked", False):
+            if not hasattr(request, "user") or not request.user.is_authenticated():
+                return HttpResponseForbidden('Unauthorized')
+            if not request.user.is_staff and not CourseEnrollment.is_enrolled_by_partial(
+                    request.user, loc.course_key
+            ):
+                return HttpResponseForbidden('Unauthorized')
+
+        # convert over the DB persistent last modified timestamp to a HTTP compatible
+        # timestamp. HTTP dates only have a resolution of seconds
+        last_modified_at = timegm(content.last_modified_at.utctimetuple())
+        last_modified_at_str = http_date(last_modified_at)
 
+        # the contentstore keeps the md5 of each asset, which makes a strong validator.
+        # Content cached before the digest was stored won't have it.
+        content_digest = getattr(content, 'content_digest', None)
+        etag = quote_etag(content_digest) if content_digest else None
+
+        # see if the client has cached this content, if so then return a 304 (Not Modified).
+        # An If-None-Match takes precedence over an If-Modified-Since
+        if 'HTTP_IF_NONE_MATCH' in request.META:
+            if_none_match = parse_etags(request.META['HTTP_IF_NONE_MATCH'])
+            if etag is not None and (content_digest in if_none_match or '*' in if_none_match):
+                return self._not_modified(last_modified_at_str, etag)
+        elif 'HTTP_IF_MODIFIED_SINCE' in request.META:
+            if_modified_since = parse_http_date_safe(request.META['HTTP_IF_MODIFIED_SINCE'])
+            if if_modified_since is not None and last_modified_at <= if_modified_since:
+                return self._not_modified(last_modified_at_str, etag)
+
+        byte_range = None
+        if 'HTTP_RANGE' in request.META and content.length and self._if_range_matches(
+                request, last_modified_at_str, etag
+        ):
+            try:
+                byte_range = parse_range_header(request.META['HTTP_RANGE'], content.length)
+            except ValueError:
+                response = HttpResponse()
+                response.status_code = 416
+                response['Content-Range'] = 'bytes */{}'.format(content.length)
+                return response
+
+        if byte_range is not None:
+            first_byte, last_byte = byte_range
+            response = HttpResponse(
+                content.stream_data_in_range(first_byte, last_byte), content_type=content.content_type
+            )
+            response.status_code = 206
+            response['Content-Range'] = 'bytes {}-{}/{}'.format(first_byte, last_byte, content.length)
+            response['Content-Length'] = str(last_byte - first_byte + 1)
+        else:
             response = HttpResponse(content.stream_data(), content_type=content.content_type)
-            response['Last-Modified'] = last_modified_at_str
+            if content.length is not None:
+                response['Content-Length'] = str(content.length)
 
-            return response
+        response['Accept-Ranges'] = 'bytes'
+        response['Last-Modified'] = last_modified_at_str
+        if etag is not None:
+            response['ETag'] = etag
+
+        return response
+
+    @staticmethod
+    def _close_stream(content):
+        """
+        Close the stream (e.g. the file in the local asset cache) that content is read from, if any
+        """
+        if isinstance(content, StaticContentStream):
+            content.close()
+
+    @staticmethod
+    def _if_range_matches(request, last_modified_at_str, etag):
+        """
+        A Range request with an If-Range is only served in part if the content hasn't
+        changed since the client got the rest of it
+        """
+        if_range = request.META.get('HTTP_IF_RANGE')
+        if if_range is None:
+            return True
+        return if_range in (etag, last_modified_at_str)
+
+    @staticmethod
+    def _not_modified(last_modified_at_str, etag):
+        """
+        A 304 (Not Modified) response, which repeats the validators of the content
+        """
+        response = HttpResponseNotModified()
+        response['Last-Modified'] = last_modified_at_str
+        if etag is not None:
+            response['ETag'] = etag
+        return response
@@ -3,7 +3,9 @@ Tests for StaticContentServer
 """
 import copy
 import logging
+from StringIO import StringIO
 from uuid import uuid4
+from mock import patch
 from path import path
 from pymongo import MongoClient
 
@@ -11,11 +13,12 @@ from django.contrib.auth.models import User
 from django.conf import settings
 from django.test.client import Client
 from django.test.utils import override_settings
+from django.utils.http import http_date, parse_http_date
 
 from student.models import CourseEnrollment
 
 from xmodule.contentstore.django import contentstore, _CONTENTSTORE
-from xmodule.contentstore.content import StaticContent
+from xmodule.contentstore.content import StaticContent, StaticContentStream
 from xmodule.modulestore.django import modulestore
 from xmodule.modulestore.locations import SlashSeparatedCourseKey
 from xmodule.modulestore.tests.django_utils import (studio_store_config,
@@ -131,3 +134,108 @@ class ContentStoreToyCourseTest(ModuleStoreTestCase):
         resp = self.client.get(self.url_locked)
         self.assertEqual(resp.status_code, 200) # pylint: disable=E1103
 
+
+    def test_range_request_full_file(self):
+        """
+        Test that a range request from byte 0 to the end returns the whole file as partial content.
+        """
+        resp = self.client.get(self.url_unlocked, HTTP_RANGE='bytes=0-')
+        self.assertEqual(resp.status_code, 206)  # pylint: disable=E1103
+        length = self.contentstore.find(self.unlocked_asset).length
+        self.assertEqual(resp['Content-Range'], 'bytes 0-{last}/{length}'.format(last=length - 1, length=length))
+        self.assertEqual(resp['Content-Length'], str(length))
+
+    def test_range_request_partial_file(self):
+        """
+        Test that a range request for part of the file returns just that part.
+        """
+        content = self.contentstore.find(self.unlocked_asset)
+        first_byte, last_byte = 1, content.length // 2
+        resp = self.client.get(self.url_unlocked, HTTP_RANGE='bytes={}-{}'.format(first_byte, last_byte))
+        self.assertEqual(resp.status_code, 206)  # pylint: disable=E1103
+        self.assertEqual(resp['Content-Range'], 'bytes {}-{}/{}'.format(first_byte, last_byte, content.length))
+        self.assertEqual(resp.content, content.data[first_byte:last_byte + 1])
+
+    def test_range_request_suffix(self):
+        """
+        Test that a suffix range returns the last bytes of the file.
+        """
+        content = self.contentstore.find(self.unlocked_asset)
+        resp = self.client.get(self.url_unlocked, HTTP_RANGE='bytes=-3')
+        self.assertEqual(resp.status_code, 206)  # pylint: disable=E1103
+        self.assertEqual(resp.content, content.data[-3:])
+
+    def test_range_request_unsatisfiable(self):
+        """
+        Test that a range starting past the end of the file is rejected.
+        """
+        length = self.contentstore.find(self.unlocked_asset).length
+        resp = self.client.get(self.url_unlocked, HTTP_RANGE='bytes={}-'.format(length))
+        self.assertEqual(resp.status_code, 416)  # pylint: disable=E1103
+        self.assertEqual(resp['Content-Range'], 'bytes */{}'.format(length))
+
+    def test_range_request_malformed(self):
+        """
+        Test that a range we don't understand is ignored and the whole file is returned.
+        """
+        resp = self.client.get(self.url_unlocked, HTTP_RANGE='bytes=0-1,5-6')
+        self.assertEqual(resp.status_code, 200)  # pylint: disable=E1103
+
+    def test_etag(self):
+        """
+        Test that the md5 of the asset is used as its ETag, and that a matching If-None-Match gets a 304.
+        """
+        resp = self.client.get(self.url_unlocked)
+        etag = resp['ETag']
+        self.assertEqual(etag, '"{}"'.format(self.contentstore.find(self.unlocked_asset).content_digest))
+
+        resp = self.client.get(self.url_unlocked, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(resp.status_code, 304)  # pylint: disable=E1103
+
+        resp = self.client.get(self.url_unlocked, HTTP_IF_NONE_MATCH='"not-the-md5"')
+        self.assertEqual(resp.status_code, 200)  # pylint: disable=E1103
+
+    def test_if_modified_since(self):
+        """
+        Test that If-Modified-Since is compared as a date rather than as a string.
+        """
+        resp = self.client.get(self.url_unlocked)
+        last_modified = parse_http_date(resp['Last-Modified'])
+
+        resp = self.client.get(self.url_unlocked, HTTP_IF_MODIFIED_SINCE=http_date(last_modified + 60))
+        self.assertEqual(resp.status_code, 304)  # pylint: disable=E1103
+
+        resp = self.client.get(self.url_unlocked, HTTP_IF_MODIFIED_SINCE=http_date(last_modified - 60))
+        self.assertEqual(resp.status_code, 200)  # pylint: disable=E1103
+
+    def test_not_modified_closes_stream(self):
+        """
+        Test that the stream of content which isn't sent (here, as it hasn't been modified) is closed.
+        """
+        content = self.contentstore.find(self.unlocked_asset)
+        stream = StringIO(content.data)
+        cached = StaticContentStream(
+            content.location, content.name, content.content_type, stream,
+            last_modified_at=content.last_modified_at, length=content.length,
+            content_digest=content.content_digest
+        )
+        with patch('contentserver.middleware.get_cached_content', return_value=cached):
+            resp = self.client.get(self.url_unlocked, HTTP_IF_NONE_MATCH='"{}"'.format(content.content_digest))
+        self.assertEqual(resp.status_code, 304)  # pylint: disable=E1103
+        self.assertTrue(stream.closed)
+
+    def test_large_asset_range_request_on_miss(self):
+        """
+        Test that a large asset which isn't cached is served out of the contentstore, Range
+        requests included, while it's cached on local disk in the background.
+        """
+        large_asset = self.course_key.make_asset_key('asset', 'large.bin')
+        data = ''.join(chr(i % 256) for i in range(1048576 + 100))
+        self.contentstore.save(StaticContent(large_asset, 'large.bin', 'application/octet-stream', data))
+
+        with patch('contentserver.middleware.start_caching_content_stream') as mock_start_caching:
+            resp = self.client.get(large_asset.to_deprecated_string(), HTTP_RANGE='bytes=1048576-')
+        self.assertEqual(resp.status_code, 206)  # pylint: disable=E1103
+        self.assertEqual(resp.content, data[1048576:])
+        self.assertEqual(mock_start_caching.call_count, 1)
+        self.assertEqual(mock_start_caching.call_args[0][0].location, large_asset)
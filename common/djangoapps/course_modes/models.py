@@ -56,21 +56,34 @@ class CourseMode(models.Model):
 
         If no modes have been set in the table, returns the default mode
         """
+        return cls.all_modes_for_courses([course_id])[course_id]
+
+    @classmethod
+    def all_modes_for_courses(cls, course_id_list):
+        """
+        Returns the non-expired modes for each of the given course ids, as a
+        dictionary of lists of modes keyed by course id, using one query.
+
+        Courses with no modes set in the table get the default mode.
+        """
         now = datetime.now(pytz.UTC)
-        found_course_modes = cls.objects.filter(Q(course_id=course_id) &
+        found_course_modes = cls.objects.filter(Q(course_id__in=course_id_list) &
                                                 (Q(expiration_datetime__isnull=True) |
                                                 Q(expiration_datetime__gte=now)))
-        modes = ([Mode(
-            mode.mode_slug,
-            mode.mode_display_name,
-            mode.min_price,
-            mode.suggested_prices,
-            mode.currency,
-            mode.expiration_datetime
-        ) for mode in found_course_modes])
-        if not modes:
-            modes = [cls.DEFAULT_MODE]
-        return modes
+        modes_by_course = {course_id: [] for course_id in course_id_list}
+        for mode in found_course_modes:
+            modes_by_course.setdefault(mode.course_id, []).append(Mode(
+                mode.mode_slug,
+                mode.mode_display_name,
+                mode.min_price,
+                mode.suggested_prices,
+                mode.currency,
+                mode.expiration_datetime
+            ))
+        for course_id, modes in modes_by_course.iteritems():
+            if not modes:
+                modes_by_course[course_id] = [cls.DEFAULT_MODE]
+        return modes_by_course
 
     @classmethod
     def modes_for_course_dict(cls, course_id):
@@ -113,3 +113,15 @@ class CourseModeModelTest(TestCase):
 
         modes = CourseMode.modes_for_course(SlashSeparatedCourseKey('TestOrg', 'TestCourse', 'TestRun'))
         self.assertEqual([CourseMode.DEFAULT_MODE], modes)
+
+    def test_all_modes_for_courses(self):
+        other_course_key = SlashSeparatedCourseKey('TestOrg', 'TestCourse', 'TestRun')
+        verified_mode = Mode(u'verified', u'Verified Certificate', 0, '', 'usd', None)
+        self.create_mode(verified_mode.slug, verified_mode.name)
+
+        with self.assertNumQueries(1):
+            all_modes = CourseMode.all_modes_for_courses([self.course_key, other_course_key])
+        self.assertEqual(
+            {self.course_key: [verified_mode], other_course_key: [CourseMode.DEFAULT_MODE]},
+            all_modes
+        )
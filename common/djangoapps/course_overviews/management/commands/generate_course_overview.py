@@ -0,0 +1,53 @@
+"""
+Command to (re)generate the stored overviews of courses.
+"""
+import logging
+
+from django.core.management.base import BaseCommand, CommandError
+from opaque_keys import InvalidKeyError
+
+from course_overviews.models import CourseOverview
+from xmodule.modulestore.django import modulestore
+from xmodule.modulestore.keys import CourseKey
+from xmodule.modulestore.locations import SlashSeparatedCourseKey
+
+log = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    """
+    Generate the CourseOverviews of the given courses, or of every course.
+    """
+    args = '<course_id course_id ...>'
+    help = """
+    Generates and stores the overviews of the given courses, or of every course
+    in the modulestore if none are given. Overviews are kept up to date when
+    courses are published, and the missing overviews of courses which existed
+    before overviews did are created when they're first needed, so this only
+    saves the first page loads from creating them.
+
+    Example:
+
+        $ ... generate_course_overview some/course/id
+    """
+
+    def handle(self, *args, **options):
+        if args:
+            course_keys = []
+            for course_id in args:
+                try:
+                    course_keys.append(CourseKey.from_string(course_id))
+                except InvalidKeyError:
+                    try:
+                        course_keys.append(SlashSeparatedCourseKey.from_deprecated_string(course_id))
+                    except InvalidKeyError:
+                        raise CommandError("Invalid course_id: {}".format(course_id))
+        else:
+            course_keys = [course.id for course in modulestore().get_courses()]
+
+        for course_key in course_keys:
+            overview = CourseOverview.update_from_modulestore(course_key)
+            if overview is None:
+                log.warning(u"No course %s to generate an overview of", course_key)
+            else:
+                log.info(u"Generated the overview of %s", course_key)
@@ -0,0 +1,373 @@
+"""
+Denormalized overviews of courses, for the pages which list courses (the index
+page, the course catalog and the student dashboard).
+
+Loading a course from the modulestore runs metadata inheritance and loads its
+items, which is far more than those pages need. A CourseOverview keeps just the
+course's display names, dates, image, and enrollment and visibility settings.
+The overviews of Mongo courses are stored in the database, and are refreshed
+whenever the course's settings or about pages are published. The overviews of
+courses which don't have one yet (those which existed before overviews did) are
+created the first time they're needed; the `generate_course_overview` command
+creates them ahead of time. XML courses are never published, but are always in
+memory, so their overviews are built when they're needed instead.
+"""
+from datetime import datetime
+import logging
+from math import exp
+
+import dateutil.parser
+from django.db import models, IntegrityError
+from django.dispatch import receiver
+from django.utils.translation import ugettext as _
+from pytz import UTC
+
+from static_replace import replace_static_urls
+from util.date_utils import strftime_localized
+from xmodule.contentstore.content import StaticContent
+from xmodule.course_module import CourseDescriptor, CourseFields
+from xmodule.fields import Date
+from xmodule.modulestore import XML_MODULESTORE_TYPE
+from xmodule.modulestore.django import modulestore, course_published
+from xmodule.modulestore.exceptions import ItemNotFoundError
+from xmodule.modulestore.locations import SlashSeparatedCourseKey
+from xmodule.modulestore.mongo import MongoModuleStore
+from xmodule.modulestore.xml import XMLModuleStore
+from xmodule_django.models import CourseKeyField
+
+log = logging.getLogger(__name__)
+
+# Publishing items of these categories changes the course's overview
+OVERVIEW_CATEGORIES = ('course', 'about')
+
+
+class CourseOverview(models.Model):
+    """
+    The parts of a course that are needed to list it, with the same names and
+    behavior as the CourseDescriptor attributes they come from.
+    """
+    course_id = CourseKeyField(max_length=255, primary_key=True)
+    modulestore_type = models.CharField(max_length=32)
+
+    display_name = models.TextField()
+    display_number_with_default = models.TextField()
+    display_org_with_default = models.TextField()
+    short_description = models.TextField(default='')
+    course_image_url = models.TextField()
+
+    start = models.DateTimeField(null=True)
+    end = models.DateTimeField(null=True)
+    advertised_start = models.TextField(null=True)
+    announcement = models.DateTimeField(null=True)
+    is_new = models.NullBooleanField()
+
+    enrollment_start = models.DateTimeField(null=True)
+    enrollment_end = models.DateTimeField(null=True)
+    enrollment_domain = models.TextField(null=True)
+    ispublic = models.NullBooleanField()
+    days_early_for_beta = models.FloatField(null=True)
+
+    certificates_show_before_end = models.BooleanField(default=False)
+    cert_name_short = models.TextField(default='')
+    cert_name_long = models.TextField(default='')
+    end_of_course_survey_url = models.TextField(null=True)
+
+    modified = models.DateTimeField(auto_now=True)
+
+    @classmethod
+    def get_from_id(cls, course_id):
+        """
+        Returns the overview of the course `course_id`, or None if there's no
+        such course. The overview is created if it doesn't exist yet.
+        """
+        if modulestore().get_modulestore_type(course_id) == XML_MODULESTORE_TYPE:
+            course = modulestore().get_course(course_id)
+            if not isinstance(course, CourseDescriptor):
+                return None
+            return cls._create_from_course(course)
+
+        try:
+            return cls.objects.get(course_id=course_id)
+        except cls.DoesNotExist:
+            return cls.update_from_modulestore(course_id)
+
+    @classmethod
+    def get_all_courses(cls):
+        """
+        Returns the overviews of all of the courses, creating those which don't
+        exist yet.
+        """
+        overviews = list(cls.objects.all())
+        existing_ids = set(overview.course_id for overview in overviews)
+        for course_id in _mongo_course_ids():
+            if course_id not in existing_ids:
+                overview = cls.update_from_modulestore(course_id)
+                if overview is not None:
+                    overviews.append(overview)
+        for course in _xml_courses():
+            overviews.append(cls._create_from_course(course))
+        return overviews
+
+    @classmethod
+    def update_from_modulestore(cls, course_id):
+        """
+        Reloads the overview of the course `course_id` from the modulestore,
+        saving it, or deleting it if the course no longer exists. Returns the
+        overview, or None.
+        """
+        course = modulestore().get_course(course_id)
+        if not isinstance(course, CourseDescriptor):
+            cls.objects.filter(course_id=course_id).delete()
+            return None
+
+        overview = cls._create_from_course(course)
+        if overview.modulestore_type != XML_MODULESTORE_TYPE:
+            try:
+                overview.save()
+            except IntegrityError:
+                # Another process saved it first, which is just as good.
+                log.info(u"Course overview for %s was created concurrently", course_id)
+        return overview
+
+    @classmethod
+    def _create_from_course(cls, course):
+        """
+        Returns a new, unsaved overview of the CourseDescriptor `course`.
+        """
+        modulestore_type = modulestore().get_modulestore_type(course.id)
+        is_new = course.is_new
+        if isinstance(is_new, basestring):
+            is_new = is_new.lower() in ['true', 'yes', 'y']
+
+        return cls(
+            course_id=course.id,
+            modulestore_type=modulestore_type,
+            display_name=course.display_name_with_default,
+            display_number_with_default=course.display_number_with_default,
+            display_org_with_default=course.display_org_with_default,
+            short_description=_short_description(course),
+            course_image_url=_course_image_url(course, modulestore_type),
+            start=course.start,
+            end=course.end,
+            advertised_start=course.advertised_start,
+            announcement=course.announcement,
+            is_new=is_new,
+            enrollment_start=course.enrollment_start,
+            enrollment_end=course.enrollment_end,
+            enrollment_domain=course.enrollment_domain,
+            ispublic=getattr(course, 'ispublic', None),
+            days_early_for_beta=course.days_early_for_beta,
+            certificates_show_before_end=course.certificates_show_before_end,
+            cert_name_short=course.cert_name_short,
+            cert_name_long=course.cert_name_long,
+            end_of_course_survey_url=course.end_of_course_survey_url,
+        )
+
+    @property
+    def id(self):  # pylint: disable=invalid-name
+        """Return the course_id for this course"""
+        return self.course_id
+
+    @property
+    def location(self):
+        """The location of the course's course block"""
+        return self.course_id.make_usage_key('course', self.course_id.run)
+
+    @property
+    def number(self):
+        return self.course_id.course
+
+    @property
+    def org(self):
+        return self.course_id.org
+
+    @property
+    def display_name_with_default(self):
+        return self.display_name
+
+    def has_started(self):
+        return datetime.now(UTC) > self.start
+
+    def has_ended(self):
+        """
+        Returns True if the current time is after the specified course end date.
+        Returns False if there is no end date specified.
+        """
+        if self.end is None:
+            return False
+
+        return datetime.now(UTC) > self.end
+
+    def may_certify(self):
+        """
+        Return True if it is acceptable to show the student a certificate download link
+        """
+        return self.certificates_show_before_end or self.has_ended()
+
+    @property
+    def start_date_is_still_default(self):
+        """
+        Checks if the start date set for the course is still default, i.e. .start has not been modified,
+        and .advertised_start has not been set.
+        """
+        return self.advertised_start is None and self.start == CourseFields.start.default
+
+    @property
+    def start_date_text(self):
+        """
+        Returns the desired text corresponding the course's start date.  Prefers .advertised_start,
+        then falls back to .start
+        """
+        if self.advertised_start is not None:
+            try:
+                result = Date().from_json(self.advertised_start)
+            except ValueError:
+                result = None
+            if result is None:
+                return self.advertised_start.title()
+            return strftime_localized(result, "SHORT_DATE")
+        elif self.start_date_is_still_default:
+            # Translators: TBD stands for 'To Be Determined' and is used when a course
+            # does not yet have an announced start date.
+            return _('TBD')
+        else:
+            return strftime_localized(self.start, "SHORT_DATE")
+
+    @property
+    def end_date_text(self):
+        """
+        Returns the end date for the course formatted as a string, or an empty
+        string if the course has no end date.
+        """
+        if self.end is None:
+            return ''
+        return strftime_localized(self.end, "SHORT_DATE")
+
+    @property
+    def is_newish(self):
+        """
+        Returns if the course has been flagged as new. If there is no flag,
+        return a heuristic value considering the announcement and the start
+        dates.
+        """
+        if self.is_new is not None:
+            return self.is_new
+
+        announcement, start, now = self._sorting_dates()
+        if announcement and (now - announcement).days < 30:
+            # The course has been announced for less that month
+            return True
+        # Otherwise, it's new if it hasn't started yet
+        return (now - start).days < 1
+
+    @property
+    def sorting_score(self):
+        """
+        Returns a number that can be used to sort the courses according to how
+        "new" they are, as CourseDescriptor.sorting_score does. The lower the
+        number the "newer" the course.
+        """
+        announcement, start, now = self._sorting_dates()
+        scale = 300.0  # about a year
+        if announcement:
+            days = (now - announcement).days
+            return -exp(-days / scale)
+        days = (now - start).days
+        return exp(days / scale)
+
+    def _sorting_dates(self):
+        """
+        The announcement date, (advertised) start date and current time, for
+        is_newish and sorting_score.
+        """
+        try:
+            start = dateutil.parser.parse(self.advertised_start)
+            if start.tzinfo is None:
+                start = start.replace(tzinfo=UTC)
+        except (ValueError, AttributeError):
+            start = self.start
+
+        return self.announcement, start, datetime.now(UTC)
+
+    def __unicode__(self):
+        return u"CourseOverview of {}".format(self.course_id.to_deprecated_string())
+
+
+def _modulestores():
+    """
+    The modulestores behind modulestore(), if it's a mixed modulestore.
+    """
+    store = modulestore()
+    return getattr(store, 'modulestores', {}).values() or [store]
+
+
+def _xml_courses():
+    """
+    The courses in the XML modulestores, which are all in memory.
+    """
+    for xml_store in _modulestores():
+        if isinstance(xml_store, XMLModuleStore):
+            for course in xml_store.get_courses():
+                if isinstance(course, CourseDescriptor):
+                    yield course
+
+
+def _mongo_course_ids():
+    """
+    The ids of the courses in the Mongo modulestores, without loading the courses.
+    """
+    course_ids = set()
+    for mongo_store in _modulestores():
+        if isinstance(mongo_store, MongoModuleStore):
+            for record in mongo_store.collection.find({'_id.category': 'course'}, {'_id': True}):
+                org, course, run = record['_id']['org'], record['_id']['course'], record['_id']['name']
+                # MongoModuleStore.get_courses skips these too.
+                if (org, course) != ('edx', 'templates'):
+                    course_ids.add(SlashSeparatedCourseKey(org, course, run))
+    return course_ids
+
+
+def _course_image_url(course, modulestore_type):
+    """
+    The url of the course's image, as courseware.courses.course_image_url finds it.
+    """
+    if course.static_asset_path or modulestore_type == XML_MODULESTORE_TYPE:
+        url = '/static/' + (course.static_asset_path or getattr(course, 'data_dir', ''))
+        if course.course_image != course.fields['course_image'].default:
+            url += '/' + course.course_image
+        else:
+            url += '/images/course_image.jpg'
+        return url
+    return StaticContent.compute_location(course.id, course.course_image).to_deprecated_string()
+
+
+def _short_description(course):
+    """
+    The html of the course's short description about page, or '' if it has none.
+    """
+    location = course.location.replace(category='about', name='short_description')
+    try:
+        about = modulestore().get_item(location)
+    except ItemNotFoundError:
+        return ''
+    return replace_static_urls(
+        about.data,
+        getattr(course, 'data_dir', None),
+        course_id=course.id,
+        static_asset_path=course.static_asset_path
+    )
+
+
+@receiver(course_published)
+def _refresh_course_overview(sender, course_key, usage_key=None, **kwargs):  # pylint: disable=unused-argument
+    """
+    Refresh the overview of a course when its settings or about pages are
+    published, or it is created or deleted.
+    """
+    if usage_key is not None and usage_key.category not in OVERVIEW_CATEGORIES:
+        return
+    try:
+        CourseOverview.update_from_modulestore(course_key)
+    except Exception:  # pylint: disable=broad-except
+        # Publishing mustn't fail because of the overview, which can be regenerated.
+        log.exception(u"Couldn't refresh the course overview for %s", course_key)
@@ -0,0 +1,74 @@
+"""
+Tests for CourseOverviews.
+"""
+from datetime import datetime, timedelta
+
+from django.test.utils import override_settings
+from pytz import UTC
+
+from courseware.tests.tests import TEST_DATA_MONGO_MODULESTORE
+from course_overviews.models import CourseOverview
+from xmodule.modulestore.django import editable_modulestore
+from xmodule.modulestore.locations import SlashSeparatedCourseKey
+from xmodule.modulestore.tests.django_utils import ModuleStoreTestCase
+from xmodule.modulestore.tests.factories import CourseFactory, ItemFactory
+
+
+@override_settings(MODULESTORE=TEST_DATA_MONGO_MODULESTORE)
+class CourseOverviewTest(ModuleStoreTestCase):
+    """
+    Test that CourseOverviews match their courses, and follow their changes.
+    """
+    def setUp(self):
+        self.store = editable_modulestore('direct')
+        self.course = CourseFactory.create(
+            display_name="Overview Course",
+            start=datetime(2014, 1, 1, tzinfo=UTC),
+            end=datetime.now(UTC) + timedelta(days=30),
+            advertised_start="Spring 2014",
+            cert_name_short="Statement",
+        )
+
+    def test_matches_course(self):
+        overview = CourseOverview.objects.get(course_id=self.course.id)
+        for attribute in [
+                'id', 'location', 'number', 'org', 'display_name_with_default',
+                'display_number_with_default', 'display_org_with_default', 'start', 'end',
+                'start_date_text', 'end_date_text', 'start_date_is_still_default',
+                'is_newish', 'sorting_score', 'cert_name_short', 'days_early_for_beta',
+        ]:
+            self.assertEqual(getattr(overview, attribute), getattr(self.course, attribute), attribute)
+        for method in ['has_started', 'has_ended', 'may_certify']:
+            self.assertEqual(getattr(overview, method)(), getattr(self.course, method)(), method)
+
+    def test_refreshed_when_published(self):
+        self.course.display_name = "Renamed Course"
+        self.store.update_item(self.course)
+        self.assertEqual(CourseOverview.get_from_id(self.course.id).display_name_with_default, "Renamed Course")
+
+        ItemFactory.create(
+            parent_location=self.course.location,
+            category='about',
+            display_name='short_description',
+            data='A short description',
+        )
+        self.assertEqual(CourseOverview.get_from_id(self.course.id).short_description, "A short description")
+
+    def test_created_when_missing(self):
+        CourseOverview.objects.all().delete()
+        self.assertEqual(CourseOverview.get_from_id(self.course.id).display_name_with_default, "Overview Course")
+        self.assertTrue(CourseOverview.objects.filter(course_id=self.course.id).exists())
+        self.assertEqual([overview.id for overview in CourseOverview.get_all_courses()], [self.course.id])
+
+    def test_listed_when_missing(self):
+        CourseOverview.objects.all().delete()
+        self.assertEqual([overview.id for overview in CourseOverview.get_all_courses()], [self.course.id])
+        self.assertTrue(CourseOverview.objects.filter(course_id=self.course.id).exists())
+
+    def test_deleted_with_course(self):
+        self.store.delete_course(self.course.id)
+        self.assertFalse(CourseOverview.objects.filter(course_id=self.course.id).exists())
+        self.assertIsNone(CourseOverview.get_from_id(self.course.id))
+
+    def test_nonexistent_course(self):
+        self.assertIsNone(CourseOverview.get_from_id(SlashSeparatedCourseKey("Non", "Existent", "Course")))
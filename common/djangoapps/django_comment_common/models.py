@@ -2,13 +2,14 @@ import logging
 
 from django.db import models
 from django.contrib.auth.models import User
+from django.core.cache import cache
 
 from django.dispatch import receiver
 from django.db.models.signals import post_save
 from django.utils.translation import ugettext_noop
 from student.models import CourseEnrollment
 
-from xmodule.modulestore.django import modulestore
+from xmodule.modulestore.django import modulestore, course_published
 from xmodule.modulestore.exceptions import ItemNotFoundError
 from xmodule_django.models import CourseKeyField, NoneToEmptyManager
 
@@ -40,6 +41,23 @@ def assign_default_role_on_enrollment(sender, instance, **kwargs):
     assign_default_role(instance.course_id, instance.user)
 
 
+def discussion_category_map_cache_key(course_id):
+    """
+    The cache key of the course's discussion category map, which
+    django_comment_client.utils.get_discussion_category_map caches.
+    """
+    return u"django_comment.discussion_category_map.{}".format(course_id)
+
+
+@receiver(course_published)
+def clear_discussion_category_map(sender, course_key, **kwargs):  # pylint: disable=unused-argument
+    """
+    Forget the course's discussion category map when any of its content is
+    published, as discussions inherit their start dates from their sections.
+    """
+    cache.delete(discussion_category_map_cache_key(course_key))
+
+
 def assign_default_role(course_id, user):
     """
     Assign forum default role 'Student' to user
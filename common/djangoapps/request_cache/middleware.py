@@ -3,18 +3,58 @@ import threading
 _request_cache_threadlocal = threading.local()
 _request_cache_threadlocal.data = {}
 
+
+def get_cache(name):
+    """
+    Return the dict called `name` in the current request's cache.
+
+    Outside of a request (in celery tasks and management commands, say)
+    nothing is ever cleared from the request cache, so this returns a new,
+    empty dict each time instead.
+    """
+    if not getattr(_request_cache_threadlocal, 'in_request', False):
+        return {}
+    return _request_cache_threadlocal.data.setdefault(name, {})
+
+
+def run_after_commit(func, *args):
+    """
+    Call func(*args) once the current request's transaction has been committed, or
+    straight away outside of a request, where each write is committed as it's made.
+
+    RequestCache is the outermost middleware, so its process_response runs after the
+    TransactionMiddleware has committed. The calls are dropped if the request raises,
+    as its transaction is rolled back.
+    """
+    if not getattr(_request_cache_threadlocal, 'in_request', False):
+        func(*args)
+        return
+    _request_cache_threadlocal.data.setdefault('after_commit', []).append((func, args))
+
+
 class RequestCache(object):
     @classmethod
     def get_request_cache(cls):
         return _request_cache_threadlocal
-            
+
     def clear_request_cache(self):
         _request_cache_threadlocal.data = {}
 
     def process_request(self, request):
         self.clear_request_cache()
+        _request_cache_threadlocal.in_request = True
         return None
 
     def process_response(self, request, response):
+        after_commit = _request_cache_threadlocal.data.get('after_commit', [])
         self.clear_request_cache()
-        return response
\ No newline at end of file
+        _request_cache_threadlocal.in_request = False
+        for func, args in after_commit:
+            func(*args)
+        return response
+
+    def process_exception(self, request, exception):
+        # Response middleware isn't always run after an exception.
+        self.clear_request_cache()
+        _request_cache_threadlocal.in_request = False
+        return None
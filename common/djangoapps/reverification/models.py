@@ -47,9 +47,27 @@ class MidcourseReverificationWindow(ValidateOnSaveMixin, models.Model):
     def get_window(cls, course_id, date):
         """
         Returns the window that is open for a particular course for a particular date.
-        If no such window is open, or if more than one window is open, returns None.
+        If no such window is open, returns None. If more than one window is open, which
+        clean() prevents, raises MultipleObjectsReturned.
         """
         try:
             return cls.objects.get(course_id=course_id, start_date__lte=date, end_date__gte=date)
         except cls.DoesNotExist:
             return None
+
+    @classmethod
+    def get_windows(cls, course_ids, date):
+        """
+        Returns a dictionary with the window open for each of the given courses
+        on a particular date, keyed by course id, using one query. Courses with
+        no open window are left out. Raises MultipleObjectsReturned if a course
+        has more than one, as get_window does.
+        """
+        windows = {}
+        for window in cls.objects.filter(course_id__in=course_ids, start_date__lte=date, end_date__gte=date):
+            if window.course_id in windows:
+                raise cls.MultipleObjectsReturned(
+                    u"More than one reverification window is open for {} on {}".format(window.course_id, date)
+                )
+            windows[window.course_id] = window
+        return windows
@@ -71,3 +71,31 @@ class TestMidcourseReverificationWindow(TestCase):
                 end_date=datetime.now(pytz.utc) + timedelta(days=4)
             )
             window_invalid.save()
+
+    def test_get_windows(self):
+        other_course_id = CourseFactory.create().id
+        closed_course_id = CourseFactory.create().id
+        window_valid = MidcourseReverificationWindowFactory(course_id=self.course_id)
+        other_window_valid = MidcourseReverificationWindowFactory(course_id=other_course_id)
+        MidcourseReverificationWindowFactory(
+            course_id=closed_course_id,
+            start_date=datetime.now(pytz.utc) - timedelta(days=10),
+            end_date=datetime.now(pytz.utc) - timedelta(days=5)
+        )
+
+        windows = MidcourseReverificationWindow.get_windows(
+            [self.course_id, other_course_id, closed_course_id], datetime.now(pytz.utc)
+        )
+        self.assertEquals({self.course_id: window_valid, other_course_id: other_window_valid}, windows)
+
+    def test_get_windows_overlapping(self):
+        window = MidcourseReverificationWindowFactory(course_id=self.course_id)
+        # overlapping windows which got past clean(), e.g. saved concurrently
+        MidcourseReverificationWindow.objects.bulk_create([
+            MidcourseReverificationWindow(
+                course_id=self.course_id, start_date=window.start_date, end_date=window.end_date
+            )
+        ])
+
+        with self.assertRaises(MidcourseReverificationWindow.MultipleObjectsReturned):
+            MidcourseReverificationWindow.get_windows([self.course_id], datetime.now(pytz.utc))
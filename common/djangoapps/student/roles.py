@@ -4,11 +4,93 @@ adding users, removing users, and listing members
 """
 
 from abc import ABCMeta, abstractmethod
+from uuid import uuid4
 
+from django.conf import settings
 from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from request_cache.middleware import get_cache, run_after_commit
 from student.models import CourseAccessRole
 
 
+def _roles_version_key(user_id):
+    """
+    The shared cache key of the version of the user's cached roles, which
+    changes whenever the user's roles do.
+    """
+    return u"student.course_access_roles_version.{}".format(user_id)
+
+
+def _load_user_roles(user):
+    """
+    Load the user's (role, org, course_id)s, from the shared cache if
+    COURSE_ACCESS_ROLE_CACHE_TIMEOUT is set.
+    """
+    timeout = getattr(settings, 'COURSE_ACCESS_ROLE_CACHE_TIMEOUT', None)
+    cache_key = None
+    if timeout:
+        version_key = _roles_version_key(user.id)
+        # Another process may be starting the version too, so use whichever wins.
+        cache.add(version_key, uuid4().hex, timeout)
+        version = cache.get(version_key)
+        if version is not None:
+            cache_key = u"student.course_access_roles.{}.{}".format(user.id, version)
+            roles = cache.get(cache_key)
+            if roles is not None:
+                return roles
+
+    roles = frozenset(
+        (role.role, role.org, role.course_id)
+        for role in CourseAccessRole.objects.filter(user=user)
+    )
+    if cache_key is not None:
+        cache.set(cache_key, roles, timeout)
+    return roles
+
+
+def get_user_roles(user):
+    """
+    Return the set of (role, org, course_id)s which the user has. They're
+    loaded once per user per request.
+    """
+    # pylint: disable=protected-access
+    if not hasattr(user, '_roles'):
+        roles_by_user = get_cache('course_access_roles')
+        if user.id not in roles_by_user:
+            roles_by_user[user.id] = _load_user_roles(user)
+        user._roles = roles_by_user[user.id]
+    return user._roles
+
+
+@receiver(post_save, sender=CourseAccessRole)
+@receiver(post_delete, sender=CourseAccessRole)
+def _forget_user_roles(sender, instance, **kwargs):  # pylint: disable=unused-argument
+    """
+    Forget the cached roles of a user whose roles change.
+
+    The version of the user's roles in the shared cache is changed straight away,
+    and again once the change has been committed: until then, another request can
+    still read the old roles from the database, and cache them under the first
+    new version.
+    """
+    get_cache('course_access_roles').pop(instance.user_id, None)
+    timeout = getattr(settings, 'COURSE_ACCESS_ROLE_CACHE_TIMEOUT', None)
+    if timeout:
+        _change_roles_version(instance.user_id, timeout)
+        run_after_commit(_change_roles_version, instance.user_id, timeout)
+
+
+def _change_roles_version(user_id, timeout):
+    """
+    Change the version of the user's roles in the shared cache, so that the
+    roles cached under the old version are no longer used.
+    """
+    cache.set(_roles_version_key(user_id), uuid4().hex, timeout)
+
+
 class AccessRole(object):
     """
     Object representing a role with particular access to a resource
@@ -91,14 +173,7 @@ class RoleBase(AccessRole):
         if not (user.is_authenticated() and user.is_active):
             return False
 
-        # pylint: disable=protected-access
-        if not hasattr(user, '_roles'):
-            user._roles = set(
-                CourseAccessRole.objects.filter(user=user).all()
-            )
-
-        role = CourseAccessRole(user=user, role=self._role_name, course_id=self.course_key, org=self.org)
-        return role in user._roles
+        return (self._role_name, self.org, self.course_key) in get_user_roles(user)
 
     def add_users(self, *users):
         """
@@ -226,14 +301,7 @@ class UserBasedRole(object):
         if not (self.user.is_authenticated() and self.user.is_active):
             return False
 
-        # pylint: disable=protected-access
-        if not hasattr(self.user, '_roles'):
-            self.user._roles = list(
-                CourseAccessRole.objects.filter(user=self.user).all()
-            )
-
-        role = CourseAccessRole(user=self.user, role=self.role, course_id=course_key, org=course_key.org)
-        return role in self.user._roles
+        return (self.role, course_key.org, course_key) in get_user_roles(self.user)
 
     def add_course(self, *course_keys):
         """
@@ -2,13 +2,17 @@
 Tests of student.roles
 """
 
+from django.contrib.auth.models import User
+from django.core.cache import cache
 from django.test import TestCase
+from django.test.utils import override_settings
 
 from courseware.tests.factories import UserFactory, StaffFactory, InstructorFactory
+from request_cache.middleware import RequestCache
 from student.tests.factories import AnonymousUserFactory
 
 from student.roles import GlobalStaff, CourseRole, CourseStaffRole, OrgStaffRole, OrgInstructorRole, \
-    CourseInstructorRole
+    CourseInstructorRole, _roles_version_key
 from xmodule.modulestore.locations import SlashSeparatedCourseKey
 
 
@@ -152,3 +156,77 @@ class RolesTestCase(TestCase):
         role.add_users(self.student)
         role.remove_users(self.student)
         self.assertFalse(role.has_user(self.student))
+
+
+class RoleCacheTestCase(TestCase):
+    """
+    Tests of the caching of users' roles
+    """
+    def setUp(self):
+        self.course_key = SlashSeparatedCourseKey('edX', 'toy', '2012_Fall')
+        self.course_staff = StaffFactory(course_key=self.course_key)
+        self.student = UserFactory()
+        self.start_request()
+        self.addCleanup(RequestCache().process_response, None, None)
+        self.addCleanup(cache.clear)
+
+    def start_request(self):
+        """
+        Finish handling the current request, and start handling a new one, with a
+        new request cache.
+        """
+        RequestCache().process_response(None, None)
+        RequestCache().process_request(None)
+
+    def fresh_user(self, user):
+        """
+        A new instance of `user`, without its own cache of roles.
+        """
+        return User.objects.get(id=user.id)
+
+    def test_roles_loaded_once_per_request(self):
+        first, second = self.fresh_user(self.course_staff), self.fresh_user(self.course_staff)
+        with self.assertNumQueries(1):
+            self.assertTrue(CourseStaffRole(self.course_key).has_user(first))
+            self.assertTrue(CourseStaffRole(self.course_key).has_user(second))
+            self.assertFalse(CourseInstructorRole(self.course_key).has_user(second))
+
+    def test_role_changes_seen_in_request(self):
+        self.assertFalse(CourseStaffRole(self.course_key).has_user(self.fresh_user(self.student)))
+        CourseStaffRole(self.course_key).add_users(self.student)
+        self.assertTrue(CourseStaffRole(self.course_key).has_user(self.fresh_user(self.student)))
+        CourseStaffRole(self.course_key).remove_users(self.student)
+        self.assertFalse(CourseStaffRole(self.course_key).has_user(self.fresh_user(self.student)))
+
+    def test_roles_not_shared_between_requests_by_default(self):
+        CourseStaffRole(self.course_key).has_user(self.fresh_user(self.course_staff))
+        self.start_request()
+        user = self.fresh_user(self.course_staff)
+        with self.assertNumQueries(1):
+            self.assertTrue(CourseStaffRole(self.course_key).has_user(user))
+
+    @override_settings(COURSE_ACCESS_ROLE_CACHE_TIMEOUT=60)
+    def test_shared_cache(self):
+        CourseStaffRole(self.course_key).has_user(self.fresh_user(self.student))
+        self.start_request()
+        user = self.fresh_user(self.student)
+        with self.assertNumQueries(0):
+            self.assertFalse(CourseStaffRole(self.course_key).has_user(user))
+
+        # Changing the user's roles changes the version of their cached roles.
+        CourseStaffRole(self.course_key).add_users(self.student)
+        self.start_request()
+        self.assertTrue(CourseStaffRole(self.course_key).has_user(self.fresh_user(self.student)))
+
+    @override_settings(COURSE_ACCESS_ROLE_CACHE_TIMEOUT=60)
+    def test_shared_cache_version_changed_after_commit(self):
+        CourseStaffRole(self.course_key).add_users(self.student)
+
+        # Until the change is committed, another request can read the old roles from the
+        # database, and cache them under the version the change set.
+        version = cache.get(_roles_version_key(self.student.id))
+        cache.set(u"student.course_access_roles.{}.{}".format(self.student.id, version), frozenset(), 60)
+
+        # so the version is changed again once the request making the change is finished.
+        self.start_request()
+        self.assertTrue(CourseStaffRole(self.course_key).has_user(self.fresh_user(self.student)))
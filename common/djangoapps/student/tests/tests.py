@@ -29,6 +29,9 @@ from student.models import anonymous_id_for_user, user_by_anonymous_id, CourseEn
 from student.views import (process_survey_link, _cert_info,
                            change_enrollment, complete_course_mode_info)
 from student.tests.factories import UserFactory, CourseModeFactory
+from certificates.models import (
+    CertificateStatuses, GeneratedCertificate, certificate_status_for_student, certificate_statuses_for_student
+)
 
 import shoppingcart
 
@@ -231,6 +234,24 @@ class DashboardTest(TestCase):
         verified_mode.save()
         self.assertFalse(enrollment.refundable())
 
+    def test_certificate_statuses_for_student(self):
+        other_course_id = SlashSeparatedCourseKey("edX", "Test101", "2013")
+        GeneratedCertificate.objects.create(
+            user=self.user,
+            course_id=self.course.id,
+            status=CertificateStatuses.downloadable,
+            grade='0.98',
+            download_url='http://www.example.com/cert.pdf',
+            mode='verified',
+        )
+
+        with self.assertNumQueries(1):
+            statuses = certificate_statuses_for_student(self.user, [self.course.id, other_course_id])
+        self.assertEqual(statuses[self.course.id], certificate_status_for_student(self.user, self.course.id))
+        self.assertEqual(statuses[self.course.id]['download_url'], 'http://www.example.com/cert.pdf')
+        self.assertEqual(statuses[other_course_id], certificate_status_for_student(self.user, other_course_id))
+        self.assertEqual(statuses[other_course_id]['status'], CertificateStatuses.unavailable)
+
 
 
 class EnrollInCourseTest(TestCase):
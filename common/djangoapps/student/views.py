@@ -37,6 +37,7 @@ from edxmako.shortcuts import render_to_response, render_to_string
 from mako.exceptions import TopLevelLookupException
 
 from course_modes.models import CourseMode
+from course_overviews.models import CourseOverview
 from student.models import (
     Registration, UserProfile, PendingNameChange,
     PendingEmailChange, CourseEnrollment, unique_id_for_user,
@@ -46,7 +47,9 @@ from student.models import (
 from student.forms import PasswordResetFormNoActive
 
 from verify_student.models import SoftwareSecurePhotoVerification, MidcourseReverificationWindow
-from certificates.models import CertificateStatuses, certificate_status_for_student
+from certificates.models import (
+    CertificateStatuses, certificate_status_for_student, certificate_statuses_for_student
+)
 from dark_lang.models import DarkLangConfig
 
 from xmodule.course_module import CourseDescriptor
@@ -159,7 +162,7 @@ def process_survey_link(survey_link, user):
     return survey_link.format(UNIQUE_ID=unique_id_for_user(user))
 
 
-def cert_info(user, course):
+def cert_info(user, course, cert_status=None):
     """
     Get the certificate info needed to render the dashboard section for the given
     student and course.  Returns a dictionary with keys:
@@ -171,14 +174,19 @@ def cert_info(user, course):
     'show_survey_button': bool
     'survey_url': url, only if show_survey_button is True
     'grade': if status is not 'processing'
+
+    The student's `cert_status` (as returned by certificate_status_for_student)
+    is looked up if it isn't given.
     """
     if not course.may_certify():
         return {}
 
-    return _cert_info(user, course, certificate_status_for_student(user, course.id))
+    if cert_status is None:
+        cert_status = certificate_status_for_student(user, course.id)
+    return _cert_info(user, course, cert_status)
 
 
-def reverification_info(course_enrollment_pairs, user, statuses):
+def reverification_info(course_enrollment_pairs, user, statuses, windows=None):
     """
     Returns reverification-related information for *all* of user's enrollments whose
     reverification status is in status_list
@@ -188,15 +196,25 @@ def reverification_info(course_enrollment_pairs, user, statuses):
         user (User): the user whose information we want
         statuses (list): a list of reverification statuses we want information for
             example: ["must_reverify", "denied"]
+        windows (dict): the open MidcourseReverificationWindow of each course, keyed
+            by course id; looked up for all of the courses at once if not given
 
     Returns:
         dictionary of lists: dictionary with one key per status, e.g.
             dict["must_reverify"] = []
             dict["must_reverify"] = [some information]
     """
+    if windows is None:
+        windows = MidcourseReverificationWindow.get_windows(
+            [course.id for course, _enrollment in course_enrollment_pairs], datetime.datetime.now(UTC)
+        )
+
     reverifications = defaultdict(list)
     for (course, enrollment) in course_enrollment_pairs:
-        info = single_course_reverification_info(user, course, enrollment)
+        window = windows.get(course.id)
+        if window is None:
+            continue
+        info = single_course_reverification_info(user, course, enrollment, window=window)
         if info:
             reverifications[info.status].append(info)
 
@@ -207,7 +225,7 @@ def reverification_info(course_enrollment_pairs, user, statuses):
     return reverifications
 
 
-def single_course_reverification_info(user, course, enrollment):  # pylint: disable=invalid-name
+def single_course_reverification_info(user, course, enrollment, window=None):  # pylint: disable=invalid-name
     """Returns midcourse reverification-related information for user with enrollment in course.
 
     If a course has an open re-verification window, and that user has a verified enrollment in
@@ -217,12 +235,15 @@ def single_course_reverification_info(user, course, enrollment):  # pylint: disa
         user (User): the user we want to get information for
         course (Course): the course in which the student is enrolled
         enrollment (CourseEnrollment): the object representing the type of enrollment user has in course
+        window (MidcourseReverificationWindow): the window open for course, if it has been
+            looked up already
 
     Returns:
         ReverifyInfo: (course_id, course_name, course_number, date, status)
         OR, None: None if there is no re-verification info for this enrollment
     """
-    window = MidcourseReverificationWindow.get_window(course.id, datetime.datetime.now(UTC))
+    if window is None:
+        window = MidcourseReverificationWindow.get_window(course.id, datetime.datetime.now(UTC))
 
     # If there's no window OR the user is not verified, we don't get reverification info
     if (not window) or (enrollment.mode != "verified"):
@@ -237,11 +258,11 @@ def single_course_reverification_info(user, course, enrollment):  # pylint: disa
 
 def get_course_enrollment_pairs(user, course_org_filter, org_filter_out_set):
     """
-    Get the relevant set of (Course, CourseEnrollment) pairs to be displayed on
+    Get the relevant set of (CourseOverview, CourseEnrollment) pairs to be displayed on
     a student's dashboard.
     """
     for enrollment in CourseEnrollment.enrollments_for_user(user):
-        course = course_from_id(enrollment.course_id)
+        course = CourseOverview.get_from_id(enrollment.course_id)
         if course:
 
             # if we are in a Microsite, then filter out anything that is not
@@ -396,7 +417,7 @@ def register_user(request, extra_context=None):
     return render_to_response('register.html', context)
 
 
-def complete_course_mode_info(course_id, enrollment):
+def complete_course_mode_info(course_id, enrollment, modes=None):
     """
     We would like to compute some more information from the given course modes
     and the user's current enrollment
@@ -404,8 +425,12 @@ def complete_course_mode_info(course_id, enrollment):
     Returns the given information:
         - whether to show the course upsell information
         - numbers of days until they can't upsell anymore
+
+    `modes` is the dictionary of the course's modes keyed by slug, as returned
+    by CourseMode.modes_for_course_dict, which is looked up if it isn't given.
     """
-    modes = CourseMode.modes_for_course_dict(course_id)
+    if modes is None:
+        modes = CourseMode.modes_for_course_dict(course_id)
     mode_info = {'show_upsell': False, 'days_for_upsell': None}
     # we want to know if the user is already verified and if verified is an
     # option
@@ -458,17 +483,34 @@ def dashboard(request):
     show_courseware_links_for = frozenset(course.id for course, _enrollment in course_enrollment_pairs
                                           if has_access(request.user, 'load', course))
 
-    course_modes = {course.id: complete_course_mode_info(course.id, enrollment) for course, enrollment in course_enrollment_pairs}
-    cert_statuses = {course.id: cert_info(request.user, course) for course, _enrollment in course_enrollment_pairs}
+    # Look up the data needed for each course with one query for all of the
+    # courses, rather than one query per course.
+    course_ids = [course.id for course, _enrollment in course_enrollment_pairs]
+    modes_by_course = {
+        course_id: {mode.slug: mode for mode in modes}
+        for course_id, modes in CourseMode.all_modes_for_courses(course_ids).iteritems()
+    }
+    cert_statuses_by_course = certificate_statuses_for_student(user, course_ids)
+
+    course_modes = {
+        course.id: complete_course_mode_info(course.id, enrollment, modes=modes_by_course[course.id])
+        for course, enrollment in course_enrollment_pairs
+    }
+    cert_statuses = {
+        course.id: cert_info(request.user, course, cert_statuses_by_course[course.id])
+        for course, _enrollment in course_enrollment_pairs
+    }
 
     # only show email settings for Mongo course and when bulk email is turned on
-    show_email_settings_for = frozenset(
-        course.id for course, _enrollment in course_enrollment_pairs if (
-            settings.FEATURES['ENABLE_INSTRUCTOR_EMAIL'] and
-            modulestore().get_modulestore_type(course.id) != XML_MODULESTORE_TYPE and
-            CourseAuthorization.instructor_email_enabled(course.id)
+    show_email_settings_for = frozenset()
+    if settings.FEATURES['ENABLE_INSTRUCTOR_EMAIL']:
+        email_enabled_course_ids = CourseAuthorization.instructor_email_enabled_for_courses(course_ids)
+        show_email_settings_for = frozenset(
+            course.id for course, _enrollment in course_enrollment_pairs if (
+                course.id in email_enabled_course_ids and
+                course.modulestore_type != XML_MODULESTORE_TYPE
+            )
         )
-    )
 
     # Verification Attempts
     # Used to generate the "you must reverify for course x" banner
@@ -478,8 +520,9 @@ def dashboard(request):
     statuses = ["approved", "denied", "pending", "must_reverify"]
     reverifications = reverification_info(course_enrollment_pairs, user, statuses)
 
-    show_refund_option_for = frozenset(course.id for course, _enrollment in course_enrollment_pairs
-                                       if _enrollment.refundable())
+    # Refunds are offered in courses with a verified mode (see CourseEnrollment.refundable)
+    show_refund_option_for = frozenset(course_id for course_id in course_ids
+                                       if 'verified' in modes_by_course[course_id])
 
     # get info w.r.t ExternalAuthMap
     external_auth_map = None
@@ -0,0 +1,162 @@
+"""
+Event tracker backend that hands events to another backend from a background
+thread, in batches, so that requests don't wait for them to be stored.
+
+Events are put on a bounded queue, which a thread in each process drains,
+sending the events to the wrapped backend as they arrive, up to `batch_size`
+at a time. When the queue is full, the `overflow` policy applies: 'drop'
+drops the event straight away, and 'block' waits up to `block_timeout` seconds
+for room (slowing the request down rather than losing the event) before
+dropping it.
+
+For example::
+
+  TRACKING_BACKENDS = {
+      'mongo': {
+          'ENGINE': 'track.backends.asynchronous.AsyncBackend',
+          'OPTIONS': {
+              'backend': {
+                  'ENGINE': 'track.backends.mongodb.MongoBackend',
+                  'OPTIONS': {'database': 'track'},
+              },
+              'max_queue_size': 10000,
+              'batch_size': 100,
+              'overflow': 'drop',
+          }
+      }
+  }
+
+The numbers of events queued, dropped, flushed (sent to the backend) and
+failed (which the backend raised an exception for) are counted in `counters`
+and in datadog.
+
+"""
+
+from __future__ import absolute_import
+
+import atexit
+import logging
+import os
+import Queue
+import threading
+import time
+
+from dogapi import dog_stats_api
+
+from track.backends import BaseBackend
+
+
+log = logging.getLogger(__name__)
+
+DROP = 'drop'
+BLOCK = 'block'
+
+# How long to wait for queued events to be sent when the process exits.
+EXIT_FLUSH_TIMEOUT = 5
+
+
+class AsyncBackend(BaseBackend):
+    """Event tracker backend that sends events to another one asynchronously"""
+
+    def __init__(self, backend, max_queue_size=10000, batch_size=100,
+                 overflow=DROP, block_timeout=0.1, **kwargs):
+        """
+        :Parameters:
+
+          - `backend`: the `ENGINE` and `OPTIONS` of the backend to send
+            events to, as in TRACKING_BACKENDS
+          - `max_queue_size`: how many events can wait to be sent
+          - `batch_size`: the most events to send to the backend at once
+          - `overflow`: what to do with events when the queue is full,
+            'drop' or 'block'
+          - `block_timeout`: how many seconds the 'block' policy waits
+
+        """
+        super(AsyncBackend, self).__init__(**kwargs)
+
+        if overflow not in (DROP, BLOCK):
+            raise ValueError('Invalid overflow policy %s' % overflow)
+
+        # Imported here, as the tracker imports the backends it configures.
+        from track.tracker import _instantiate_backend_from_name
+        self.backend = _instantiate_backend_from_name(backend['ENGINE'], backend.get('OPTIONS', {}))
+
+        self.max_queue_size = max_queue_size
+        self.batch_size = batch_size
+        self.overflow = overflow
+        self.block_timeout = block_timeout
+
+        self.counters = {'queued': 0, 'dropped': 0, 'flushed': 0, 'failed': 0}
+        self._lock = threading.Lock()
+        self._queue = None
+        self._pid = None
+
+    def send(self, event):
+        """Queue the event to be sent to the backend"""
+        event_queue = self._get_queue()
+        try:
+            if self.overflow == BLOCK:
+                event_queue.put(event, timeout=self.block_timeout)
+            else:
+                event_queue.put_nowait(event)
+        except Queue.Full:
+            self._count('dropped', 1)
+        else:
+            self._count('queued', 1)
+
+    def flush(self, timeout=None):
+        """
+        Wait until the queued events have been sent, or for `timeout`
+        seconds. Returns whether they were all sent.
+        """
+        event_queue = self._get_queue()
+        deadline = None if timeout is None else time.time() + timeout
+        with event_queue.all_tasks_done:
+            while event_queue.unfinished_tasks:
+                remaining = None if deadline is None else deadline - time.time()
+                if remaining is not None and remaining <= 0:
+                    return False
+                event_queue.all_tasks_done.wait(remaining)
+        return True
+
+    def _get_queue(self):
+        """
+        The queue of events of this process, whose thread is started the
+        first time it is needed (so that forked processes get their own).
+        """
+        with self._lock:
+            if self._pid != os.getpid():
+                self._pid = os.getpid()
+                self._queue = Queue.Queue(self.max_queue_size)
+                thread = threading.Thread(target=self._run, args=(self._queue,), name='track-async')
+                thread.daemon = True
+                thread.start()
+                atexit.register(self.flush, EXIT_FLUSH_TIMEOUT)
+            return self._queue
+
+    def _run(self, event_queue):
+        """Send the queued events to the backend, forever"""
+        while True:
+            batch = [event_queue.get()]
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(event_queue.get_nowait())
+                except Queue.Empty:
+                    break
+
+            try:
+                self.backend.send_batch(batch)
+            except Exception:  # pylint: disable=broad-except
+                log.exception('Error sending events to the tracking backend')
+                self._count('failed', len(batch))
+            else:
+                self._count('flushed', len(batch))
+
+            for __ in batch:
+                event_queue.task_done()
+
+    def _count(self, name, number):
+        """Add `number` to the counter `name`"""
+        with self._lock:
+            self.counters[name] += number
+        dog_stats_api.increment('track.async.{0}'.format(name), number)
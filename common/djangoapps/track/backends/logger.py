@@ -3,7 +3,6 @@
 from __future__ import absolute_import
 
 import logging
-import json
 
 from django.conf import settings
 
@@ -31,9 +30,10 @@ class LoggerBackend(BaseBackend):
         super(LoggerBackend, self).__init__(**kwargs)
 
         self.event_logger = logging.getLogger(name)
+        self.encoder = DateTimeJSONEncoder()
 
     def send(self, event):
-        event_str = json.dumps(event, cls=DateTimeJSONEncoder)
+        event_str = self.encoder.encode(event)
 
         # TODO: remove trucation of the serialized event, either at a
         # higher level during the emittion of the event, or by
@@ -95,3 +95,11 @@ class MongoBackend(BaseBackend):
             # during the next event.
             msg = 'Error inserting to MongoDB event tracker backend'
             log.exception(msg)
+
+    def send_batch(self, events):
+        """
+        Insert the events in to the Mongo collection at once. Unlike `send`,
+        errors are raised, so that the caller (e.g. the AsyncBackend) can
+        count the events as lost.
+        """
+        self.collection.insert(events, manipulate=False, continue_on_error=True)
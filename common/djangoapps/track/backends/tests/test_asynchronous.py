@@ -0,0 +1,99 @@
+from __future__ import absolute_import
+
+import threading
+
+from django.test import TestCase
+
+from track.backends import BaseBackend
+from track.backends.asynchronous import AsyncBackend
+
+
+class RecordingBackend(BaseBackend):
+    """Records the batches of events it's sent, once it's allowed to."""
+
+    def __init__(self, fail=False, **kwargs):
+        super(RecordingBackend, self).__init__(**kwargs)
+        self.fail = fail
+        self.batches = []
+        self.sending = threading.Event()
+        self.allowed = threading.Event()
+        self.allowed.set()
+
+    def send(self, event):
+        self.send_batch([event])
+
+    def send_batch(self, events):
+        self.sending.set()
+        self.allowed.wait()
+        if self.fail:
+            raise Exception("Couldn't send events")
+        self.batches.append(events)
+
+
+RECORDING_BACKEND = {'ENGINE': 'track.backends.tests.test_asynchronous.RecordingBackend'}
+
+
+class TestAsyncBackend(TestCase):
+    def make_backend(self, **kwargs):
+        backend = AsyncBackend(RECORDING_BACKEND, **kwargs)
+        self.addCleanup(backend.backend.allowed.set)
+        return backend
+
+    def send_and_hold(self, backend, event):
+        """Send `event`, and keep the backend busy with it until it's allowed to finish."""
+        backend.backend.allowed.clear()
+        backend.send(event)
+        self.assertTrue(backend.backend.sending.wait(5))
+
+    def test_events_sent_in_order(self):
+        backend = self.make_backend()
+        events = [{'test': number} for number in range(10)]
+        for event in events:
+            backend.send(event)
+
+        self.assertTrue(backend.flush(5))
+        self.assertEqual(sum(backend.backend.batches, []), events)
+        self.assertEqual(backend.counters, {'queued': 10, 'dropped': 0, 'flushed': 10, 'failed': 0})
+
+    def test_batches(self):
+        backend = self.make_backend(batch_size=3)
+        self.send_and_hold(backend, 0)
+        for number in range(1, 8):
+            backend.send(number)
+        backend.backend.allowed.set()
+
+        self.assertTrue(backend.flush(5))
+        self.assertEqual(backend.backend.batches, [[0], [1, 2, 3], [4, 5, 6], [7]])
+
+    def test_drop_when_full(self):
+        backend = self.make_backend(max_queue_size=2)
+        self.send_and_hold(backend, 0)
+        for number in range(1, 5):
+            backend.send(number)
+        backend.backend.allowed.set()
+
+        self.assertTrue(backend.flush(5))
+        self.assertEqual(backend.backend.batches, [[0], [1, 2]])
+        self.assertEqual(backend.counters, {'queued': 3, 'dropped': 2, 'flushed': 3, 'failed': 0})
+
+    def test_block_when_full(self):
+        backend = self.make_backend(max_queue_size=1, overflow='block', block_timeout=5)
+        self.send_and_hold(backend, 0)
+        threading.Timer(0.2, backend.backend.allowed.set).start()
+        for number in range(1, 4):
+            backend.send(number)
+
+        self.assertTrue(backend.flush(5))
+        self.assertEqual(sum(backend.backend.batches, []), [0, 1, 2, 3])
+        self.assertEqual(backend.counters['dropped'], 0)
+
+    def test_failures_counted(self):
+        backend = AsyncBackend(dict(RECORDING_BACKEND, OPTIONS={'fail': True}))
+        backend.send({'test': 1})
+        self.assertTrue(backend.flush(5))
+        self.assertEqual(backend.counters['failed'], 1)
+        self.assertEqual(backend.counters['flushed'], 0)
+
+    def test_invalid_overflow(self):
+        with self.assertRaises(ValueError):
+            AsyncBackend(RECORDING_BACKEND, overflow='explode')
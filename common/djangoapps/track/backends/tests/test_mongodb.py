@@ -3,6 +3,7 @@ from __future__ import absolute_import
 from uuid import uuid4
 
 from mock import patch
+from pymongo.errors import PyMongoError
 
 from django.test import TestCase
 
@@ -38,3 +39,19 @@ class TestMongoBackend(TestCase):
 
         self.assertEqual(events[0], first_argument(calls[0]))
         self.assertEqual(events[1], first_argument(calls[1]))
+
+    def test_mongo_backend_batch(self):
+        events = [{'test': 1}, {'test': 2}]
+
+        self.backend.send_batch(events)
+
+        # The events are inserted at once
+        self.backend.collection.insert.assert_called_once_with(
+            events, manipulate=False, continue_on_error=True
+        )
+
+    def test_mongo_backend_batch_error(self):
+        # Errors are left for the caller to count the lost events
+        self.backend.collection.insert.side_effect = PyMongoError
+        with self.assertRaises(PyMongoError):
+            self.backend.send_batch([{'test': 1}])
@@ -133,28 +133,27 @@ def replace_static_urls(data_dir, block, view, frag, context, course_id=None, st
 
 def grade_histogram(module_id):
     '''
-    Print out a histogram of grades on a given problem in staff member debug info.
+    Return a histogram of the grades on a given problem, as a sorted list of
+    (grade, number of students), for staff member debug info.
 
-    Warning: If a student has just looked at an xmodule and not attempted
-    it, their grade is None. Since there will always be at least one such student
-    this function almost always returns [].
+    Students who have looked at the problem without being graded on it aren't
+    counted.  The counts of all the problems in the course are loaded at once,
+    and kept for the rest of the request.
     '''
-    from django.db import connection
-    cursor = connection.cursor()
-
-    q = """SELECT courseware_studentmodule.grade,
-                  COUNT(courseware_studentmodule.student_id)
-    FROM courseware_studentmodule
-    WHERE courseware_studentmodule.module_id=%s
-    GROUP BY courseware_studentmodule.grade"""
-    # Passing module_id this way prevents sql-injection.
-    cursor.execute(q, [module_id.to_deprecated_string()])
-
-    grades = list(cursor.fetchall())
-    grades.sort(key=lambda x: x[0])  # Add ORDER BY to sql query?
-    if len(grades) >= 1 and grades[0][0] is None:
-        return []
-    return grades
+    # Imported here, as this module is also used by Studio.
+    from courseware.models import ProblemGradeCount
+    from request_cache.middleware import get_cache
+
+    histograms = get_cache('grade_histograms')
+    course_key = module_id.course_key
+    if course_key not in histograms:
+        histograms[course_key] = ProblemGradeCount.get_course_histograms(course_key)
+
+    __, grade_counts = histograms[course_key].get(module_id, (None, []))
+    counts = {}
+    for grade, __, count in grade_counts:
+        counts[grade] = counts.get(grade, 0) + count
+    return sorted(counts.items())
 
 
 def add_staff_markup(user, block, view, frag, context):  # pylint: disable=unused-argument
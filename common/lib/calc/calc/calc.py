@@ -1,12 +1,18 @@
 """
 Parser and evaluator for FormulaResponse and NumericalResponse
 
-Uses pyparsing to parse. Main function as of now is evaluator().
+Uses pyparsing to parse. Main function as of now is evaluator(), with
+batch_evaluator() to evaluate an expression for many sets of variables.
+
+The grammar is built once, and parsed expressions are kept in a bounded cache,
+since the same expressions are evaluated again and again.
 """
 
+from collections import OrderedDict
 import math
 import operator
 import numbers
+import threading
 import numpy
 import scipy.constants
 import functions
@@ -61,6 +67,16 @@ DEFAULT_VARIABLES = {
     'q': scipy.constants.e  # Fund. Charge: 1.602176565e-19 (Coulombs)
 }
 
+# The default functions which work elementwise on arrays, so that they can be
+# used by batch_evaluator. `fact` and `arccot` only work on single numbers.
+VECTORIZED_FUNCTIONS = frozenset(
+    func for func in DEFAULT_FUNCTIONS.itervalues()
+    if func not in (math.factorial, functions.arccot)
+)
+
+# The most parsed expressions to keep in the parse cache.
+PARSE_CACHE_SIZE = 1024
+
 # We eliminated the following extreme suffixes:
 #   P (1e15), E (1e18), Z (1e21), Y (1e24),
 #   f (1e-15), a (1e-18), z (1e-21), y (1e-24)
@@ -80,6 +96,13 @@ class UndefinedVariable(Exception):
     pass
 
 
+class NotVectorizable(Exception):
+    """
+    Indicate that an expression can't be evaluated for many samples at once.
+    """
+    pass
+
+
 def lower_dict(input_dict):
     """
     Convert all keys in a dictionary to lowercase; keep their original values.
@@ -93,7 +116,15 @@ def lower_dict(input_dict):
 
 # The following few functions define evaluation actions, which are run on lists
 # of results from each parse component. They convert the strings and (previously
-# calculated) numbers into the number that component represents.
+# calculated) numbers into the number that component represents. In a batch
+# evaluation, the numbers may be arrays with a value for each sample.
+
+def is_value(token):
+    """
+    Return whether the token is a (previously calculated) number, or array of them.
+    """
+    return isinstance(token, (numbers.Number, numpy.ndarray))
+
 
 def super_float(text):
     """
@@ -122,7 +153,7 @@ def eval_atom(parse_result):
     In the case of parenthesis, ignore them.
     """
     # Find first number in the list
-    result = next(k for k in parse_result if isinstance(k, numbers.Number))
+    result = next(k for k in parse_result if is_value(k))
     return result
 
 
@@ -136,7 +167,7 @@ def eval_power(parse_result):
     # `reduce` will go from left to right; reverse the list.
     parse_result = reversed(
         [k for k in parse_result
-         if isinstance(k, numbers.Number)]  # Ignore the '^' marks.
+         if is_value(k)]  # Ignore the '^' marks.
     )
     # Having reversed it, raise `b` to the power of `a`.
     power = reduce(lambda a, b: b ** a, parse_result)
@@ -151,14 +182,18 @@ def eval_parallel(parse_result):
       out = 1 / (1/in1 + 1/in2 + ...)
     e.g. [ 1, 2 ] -> 2/3
 
-    Return NaN if there is a zero among the inputs.
+    Return NaN if there is a zero among the inputs. In a batch, only some
+    samples might have a zero input, which isn't handled elementwise; raise
+    NotVectorizable so that the samples are evaluated one at a time.
     """
     if len(parse_result) == 1:
         return parse_result[0]
-    if 0 in parse_result:
+    values = [e for e in parse_result if is_value(e)]
+    if any(numpy.any(numpy.equal(value, 0)) for value in values):
+        if any(isinstance(value, numpy.ndarray) for value in values):
+            raise NotVectorizable("parallel of a zero")
         return float('nan')
-    reciprocals = [1. / e for e in parse_result
-                   if isinstance(e, numbers.Number)]
+    reciprocals = [1. / e for e in values]
     return 1. / sum(reciprocals)
 
 
@@ -173,12 +208,12 @@ def eval_sum(parse_result):
     total = 0.0
     current_op = operator.add
     for token in parse_result:
-        if token == '+':
+        if not isinstance(token, basestring):
+            total = current_op(total, token)
+        elif token == '+':
             current_op = operator.add
         elif token == '-':
             current_op = operator.sub
-        else:
-            total = current_op(total, token)
     return total
 
 
@@ -191,12 +226,12 @@ def eval_product(parse_result):
     prod = 1.0
     current_op = operator.mul
     for token in parse_result:
-        if token == '*':
+        if not isinstance(token, basestring):
+            prod = current_op(prod, token)
+        elif token == '*':
             current_op = operator.mul
         elif token == '/':
             current_op = operator.truediv
-        else:
-            prod = current_op(prod, token)
     return prod
 
 
@@ -238,16 +273,93 @@ def evaluator(variables, functions, math_expr, case_sensitive=False):
     # ...and check them
     math_interpreter.check_variables(all_variables, all_functions)
 
+    return evaluate_tree(math_interpreter, all_variables, all_functions)
+
+
+def batch_evaluator(variables_list, functions, math_expr, case_sensitive=False):
+    """
+    Evaluate an expression for each dictionary of variables in `variables_list`,
+    and return the list of results.
+
+    This gives the same results (and errors) as calling `evaluator` for each of
+    the dictionaries, but parses the expression once and, where it can, also
+    evaluates it once, with each variable's values for all of the samples in a
+    NumPy array. Expressions which can't be evaluated that way, e.g. those using
+    a function which doesn't work on arrays, or which give an error for some
+    sample, are evaluated for one sample at a time instead.
+    """
+    if not variables_list:
+        return []
+
+    # No need to go further.
+    if math_expr.strip() == "":
+        return [float('nan')] * len(variables_list)
+
+    # Parse the tree.
+    math_interpreter = ParseAugmenter(math_expr, case_sensitive)
+    math_interpreter.parse_algebra()
+
+    # Get our variables together.
+    all_variables, all_functions = add_defaults(variables_list[0], functions, case_sensitive)
+    sample_variables = [add_defaults(variables, {}, case_sensitive)[0] for variables in variables_list]
+
+    if all(variables.viewkeys() == all_variables.viewkeys() for variables in sample_variables):
+        # ...and check them, once for all of the samples
+        math_interpreter.check_variables(all_variables, all_functions)
+
+        sample_names = variables_list[0].keys()
+        if not case_sensitive:
+            sample_names = [name.lower() for name in sample_names]
+        for name in sample_names:
+            all_variables[name] = numpy.array([variables[name] for variables in sample_variables])
+
+        try:
+            # Raise numpy's floating point errors, which a sample evaluated on its
+            # own may turn into an exception of its own or an inf/nan result.
+            with numpy.errstate(divide='raise', over='raise', invalid='raise'):
+                result = evaluate_tree(math_interpreter, all_variables, all_functions, vectorized=True)
+        except Exception:  # pylint: disable=broad-except
+            pass
+        else:
+            if numpy.shape(result) == ():
+                return [result] * len(variables_list)
+            elif numpy.shape(result) == (len(variables_list),):
+                return list(result)
+
+    results = []
+    for variables in sample_variables:
+        math_interpreter.check_variables(variables, all_functions)
+        results.append(evaluate_tree(math_interpreter, variables, all_functions))
+    return results
+
+
+def evaluate_tree(math_interpreter, all_variables, all_functions, vectorized=False):
+    """
+    Evaluate the parsed tree of `math_interpreter`, whose variables and functions
+    have been checked.
+
+    If `vectorized`, variables may be arrays of values. Functions which don't
+    work on arrays raise NotVectorizable rather than being called with one.
+    """
     # Create a recursion to evaluate the tree.
-    if case_sensitive:
+    if math_interpreter.case_sensitive:
         casify = lambda x: x
     else:
         casify = lambda x: x.lower()  # Lowercase for case insens.
 
+    def eval_function(parse_result):
+        """
+        Call the function named by the first item on the second.
+        """
+        func = all_functions[casify(parse_result[0])]
+        if vectorized and isinstance(parse_result[1], numpy.ndarray) and func not in VECTORIZED_FUNCTIONS:
+            raise NotVectorizable(parse_result[0])
+        return func(parse_result[1])
+
     evaluate_actions = {
         'number': eval_number,
         'variable': lambda x: all_variables[casify(x[0])],
-        'function': lambda x: all_functions[casify(x[0])](x[1]),
+        'function': eval_function,
         'atom': eval_atom,
         'power': eval_power,
         'parallel': eval_parallel,
@@ -258,6 +370,108 @@ def evaluator(variables, functions, math_expr, case_sensitive=False):
     return math_interpreter.reduce_tree(evaluate_actions)
 
 
+def build_grammar():
+    """
+    Build the pyparsing grammar for algebraic expressions.
+
+    The parse tree has groups and result names which reflect parenthesis and
+    order of operations. All operators are left in the tree, and no strings of
+    numbers are parsed into their float versions.
+    """
+    # 0.33 or 7 or .34 or 16.
+    number_part = Word(nums)
+    inner_number = (number_part + Optional("." + Optional(number_part))) | ("." + number_part)
+    # pyparsing allows spaces between tokens--`Combine` prevents that.
+    inner_number = Combine(inner_number)
+
+    # SI suffixes and percent.
+    number_suffix = MatchFirst(Literal(k) for k in SUFFIXES.keys())
+
+    # 0.33k or 17
+    plus_minus = Literal('+') | Literal('-')
+    number = Group(
+        Optional(plus_minus) +
+        inner_number +
+        Optional(CaselessLiteral("E") + Optional(plus_minus) + number_part) +
+        Optional(number_suffix)
+    )
+    number = number("number")
+
+    # Predefine recursive variables.
+    expr = Forward()
+
+    # Handle variables passed in. They must start with letters/underscores
+    # and may contain numbers afterward.
+    inner_varname = Word(alphas + "_", alphanums + "_")
+    varname = Group(inner_varname)("variable")
+
+    # Same thing for functions.
+    function = Group(inner_varname + Suppress("(") + expr + Suppress(")"))("function")
+
+    atom = number | function | varname | "(" + expr + ")"
+    atom = Group(atom)("atom")
+
+    # Do the following in the correct order to preserve order of operation.
+    pow_term = atom + ZeroOrMore("^" + atom)
+    pow_term = Group(pow_term)("power")
+
+    par_term = pow_term + ZeroOrMore('||' + pow_term)  # 5k || 4k
+    par_term = Group(par_term)("parallel")
+
+    prod_term = par_term + ZeroOrMore((Literal('*') | Literal('/')) + par_term)  # 7 * 5 / 4
+    prod_term = Group(prod_term)("product")
+
+    sum_term = Optional(plus_minus) + prod_term + ZeroOrMore(plus_minus + prod_term)  # -5 + 4 - 3
+    sum_term = Group(sum_term)("sum")
+
+    # Finish the recursion.
+    expr << sum_term  # pylint: disable=W0104
+    return expr + stringEnd
+
+
+class ParseCache(object):
+    """
+    A thread-safe cache of parsed expressions, which keeps the `max_size` most
+    recently used ones.
+    """
+    def __init__(self, max_size):
+        self.max_size = max_size
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """
+        Return the value for `key`, or None if it isn't cached.
+        """
+        with self._lock:
+            value = self._entries.pop(key, None)
+            if value is not None:
+                self._entries[key] = value
+            return value
+
+    def set(self, key, value):
+        """
+        Cache `value` for `key`, discarding the least recently used value if
+        the cache is full.
+        """
+        with self._lock:
+            self._entries.pop(key, None)
+            self._entries[key] = value
+            if len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        """
+        Remove everything from the cache.
+        """
+        with self._lock:
+            self._entries.clear()
+
+
+ALGEBRA_GRAMMAR = build_grammar()
+PARSE_CACHE = ParseCache(PARSE_CACHE_SIZE)
+
+
 class ParseAugmenter(object):
     """
     Holds the data for a particular parse.
@@ -278,23 +492,6 @@ class ParseAugmenter(object):
         self.variables_used = set()
         self.functions_used = set()
 
-        def vpa(tokens):
-            """
-            When a variable is recognized, store it in `variables_used`.
-            """
-            varname = tokens[0][0]
-            self.variables_used.add(varname)
-
-        def fpa(tokens):
-            """
-            When a function is recognized, store it in `functions_used`.
-            """
-            varname = tokens[0][0]
-            self.functions_used.add(varname)
-
-        self.variable_parse_action = vpa
-        self.function_parse_action = fpa
-
     def parse_algebra(self):
         """
         Parse an algebraic expression into a tree.
@@ -302,62 +499,46 @@ class ParseAugmenter(object):
         Store a `pyparsing.ParseResult` in `self.tree` with proper groupings to
         reflect parenthesis and order of operations. Leave all operators in the
         tree and do not parse any strings of numbers into their float versions.
+        Also store the names of the variables and functions which are used.
+
+        The results are cached by expression, so the tree may be shared with
+        other ParseAugmenters, and mustn't be changed.
 
         Adding the groups and result names makes the `repr()` of the result
         really gross. For debugging, use something like
           print OBJ.tree.asXML()
         """
-        # 0.33 or 7 or .34 or 16.
-        number_part = Word(nums)
-        inner_number = (number_part + Optional("." + Optional(number_part))) | ("." + number_part)
-        # pyparsing allows spaces between tokens--`Combine` prevents that.
-        inner_number = Combine(inner_number)
-
-        # SI suffixes and percent.
-        number_suffix = MatchFirst(Literal(k) for k in SUFFIXES.keys())
-
-        # 0.33k or 17
-        plus_minus = Literal('+') | Literal('-')
-        number = Group(
-            Optional(plus_minus) +
-            inner_number +
-            Optional(CaselessLiteral("E") + Optional(plus_minus) + number_part) +
-            Optional(number_suffix)
-        )
-        number = number("number")
-
-        # Predefine recursive variables.
-        expr = Forward()
-
-        # Handle variables passed in. They must start with letters/underscores
-        # and may contain numbers afterward.
-        inner_varname = Word(alphas + "_", alphanums + "_")
-        varname = Group(inner_varname)("variable")
-        varname.setParseAction(self.variable_parse_action)
-
-        # Same thing for functions.
-        function = Group(inner_varname + Suppress("(") + expr + Suppress(")"))("function")
-        function.setParseAction(self.function_parse_action)
-
-        atom = number | function | varname | "(" + expr + ")"
-        atom = Group(atom)("atom")
-
-        # Do the following in the correct order to preserve order of operation.
-        pow_term = atom + ZeroOrMore("^" + atom)
-        pow_term = Group(pow_term)("power")
-
-        par_term = pow_term + ZeroOrMore('||' + pow_term)  # 5k || 4k
-        par_term = Group(par_term)("parallel")
-
-        prod_term = par_term + ZeroOrMore((Literal('*') | Literal('/')) + par_term)  # 7 * 5 / 4
-        prod_term = Group(prod_term)("product")
-
-        sum_term = Optional(plus_minus) + prod_term + ZeroOrMore(plus_minus + prod_term)  # -5 + 4 - 3
-        sum_term = Group(sum_term)("sum")
-
-        # Finish the recursion.
-        expr << sum_term  # pylint: disable=W0104
-        self.tree = (expr + stringEnd).parseString(self.math_expr)[0]
+        cache_key = (self.math_expr, self.case_sensitive)
+        parsed = PARSE_CACHE.get(cache_key)
+        if parsed is None:
+            tree = ALGEBRA_GRAMMAR.parseString(self.math_expr)[0]
+            parsed = (tree,) + self.find_names(tree)
+            PARSE_CACHE.set(cache_key, parsed)
+
+        self.tree, variables_used, functions_used = parsed
+        self.variables_used = set(variables_used)
+        self.functions_used = set(functions_used)
+
+    @staticmethod
+    def find_names(tree):
+        """
+        Return frozensets of the names of the variables and of the functions
+        used in a parsed tree.
+        """
+        variables_used = set()
+        functions_used = set()
+        nodes = [tree]
+        while nodes:
+            node = nodes.pop()
+            if not isinstance(node, ParseResults):
+                continue
+            node_name = node.getName()
+            if node_name == 'variable':
+                variables_used.add(node[0])
+            elif node_name == 'function':
+                functions_used.add(node[0])
+            nodes.extend(node)
+        return frozenset(variables_used), frozenset(functions_used)
 
     def reduce_tree(self, handle_actions, terminal_converter=None):
         """
@@ -558,3 +558,71 @@ class EvaluatorTest(unittest.TestCase):
             calc.evaluator({'r1': 5}, {}, "r1+r2")
         with self.assertRaisesRegexp(calc.UndefinedVariable, 'r1 r3'):
             calc.evaluator(variables, {}, "r1*r3", case_sensitive=True)
+
+    def test_parse_cache(self):
+        """
+        Parsing an expression again should reuse the cached tree
+        """
+        calc.PARSE_CACHE.clear()
+        first = calc.ParseAugmenter("x^2 + sin(y)")
+        first.parse_algebra()
+        second = calc.ParseAugmenter("x^2 + sin(y)")
+        second.parse_algebra()
+
+        self.assertIs(first.tree, second.tree)
+        self.assertEqual(second.variables_used, set(['x', 'y']))
+        self.assertEqual(second.functions_used, set(['sin']))
+
+        # the cache is keyed by case sensitivity too
+        case_sensitive = calc.ParseAugmenter("x^2 + sin(y)", case_sensitive=True)
+        case_sensitive.parse_algebra()
+        self.assertIsNot(first.tree, case_sensitive.tree)
+
+
+class BatchEvaluatorTest(unittest.TestCase):
+    """
+    Run tests for calc.batch_evaluator, which should always agree with
+    calling calc.evaluator for each set of variables
+    """
+    samples = [{'x': 0.5, 'y': 2.0}, {'x': 1.5, 'y': -3.0}, {'x': 4.0, 'y': 0.25}]
+
+    def assert_matches_evaluator(self, math_expr, samples=None, functions=None):
+        """
+        Assert that the batch of results is the same as evaluating each sample
+        """
+        samples = samples or self.samples
+        functions = functions or {}
+        expected = [calc.evaluator(variables, functions, math_expr) for variables in samples]
+        actual = calc.batch_evaluator(samples, functions, math_expr)
+        self.assertEqual(len(actual), len(expected))
+        for actual_value, expected_value in zip(actual, expected):
+            if numpy.isnan(expected_value):
+                self.assertTrue(numpy.isnan(actual_value))
+            else:
+                self.assertAlmostEqual(actual_value, expected_value)
+
+    def test_vectorized(self):
+        self.assert_matches_evaluator("x^2 + 3*y - sin(x)/2")
+        self.assert_matches_evaluator("-x + sqrt(x) * 2^y")
+        self.assert_matches_evaluator("x || y")
+        self.assert_matches_evaluator("sec(x) + arcsinh(y) + 2k")
+
+    def test_constant(self):
+        self.assert_matches_evaluator("pi + 2")
+        self.assert_matches_evaluator("")
+
+    def test_not_vectorizable(self):
+        # functions which don't work on arrays
+        self.assert_matches_evaluator("arccot(x) + fact(3)")
+        self.assert_matches_evaluator("f(x) * y", functions={'f': lambda x: max(x, 1)})
+        # a zero parallel input for only some of the samples
+        self.assert_matches_evaluator("(x - 1.5) || y")
+
+    def test_errors(self):
+        with self.assertRaises(ZeroDivisionError):
+            calc.batch_evaluator(self.samples, {}, "1 / (x - 1.5)")
+        with self.assertRaisesRegexp(calc.UndefinedVariable, 'z'):
+            calc.batch_evaluator(self.samples, {}, "x + z")
+
+    def test_no_samples(self):
+        self.assertEqual(calc.batch_evaluator([], {}, "x + z"), [])
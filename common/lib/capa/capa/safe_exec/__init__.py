@@ -1,3 +1,5 @@
 """Capa's specialized use of codejail.safe_exec."""
 
-from .safe_exec import safe_exec, update_hash
+from .safe_exec import safe_exec, update_hash, configure_worker_pool
+from .result_cache import SafeExecResultCache
+from .worker_pool import WorkerPool
@@ -0,0 +1,90 @@
+"""
+A two-tier cache for safe_exec results.
+
+Running code in the sandbox is expensive, and randomized problems run the same
+code with the same seed over and over, so the results are cached. The shared
+tier (e.g. memcached) is consulted only when a result isn't in the in-process
+tier, which keeps the most recently used results in each process.
+"""
+
+from collections import OrderedDict
+import json
+import threading
+
+from dogapi import dog_stats_api
+
+
+class SafeExecResultCache(object):
+    """
+    An object with .get(key) and .set(key, value) methods, as safe_exec expects
+    of its `cache`, which keeps results in-process in front of `shared_cache`.
+
+    `shared_cache` is another object with .get and .set methods, or None to only
+    cache in-process. The in-process tier keeps at most `max_entries` results,
+    discarding the least recently used, and only keeps results whose JSON
+    serialization is at most `max_entry_size` characters. Results are kept
+    serialized, so callers can't change the cached copy.
+    """
+    def __init__(self, shared_cache=None, max_entries=1000, max_entry_size=64 * 1024):
+        self.shared_cache = shared_cache
+        self.max_entries = max_entries
+        self.max_entry_size = max_entry_size
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """
+        Return the cached value for `key`, or None if neither tier has it.
+        """
+        with self._lock:
+            serialized = self._entries.pop(key, None)
+            if serialized is not None:
+                self._entries[key] = serialized
+
+        if serialized is not None:
+            dog_stats_api.increment('capa.safe_exec.cache.tier', tags=['tier:local'])
+            return json.loads(serialized)
+
+        if self.shared_cache is None:
+            return None
+
+        value = self.shared_cache.get(key)
+        if value is not None:
+            dog_stats_api.increment('capa.safe_exec.cache.tier', tags=['tier:shared'])
+            self._set_local(key, value)
+        return value
+
+    def set(self, key, value):
+        """
+        Cache `value`, which must be JSON-serializable, for `key` in both tiers.
+        """
+        self._set_local(key, value)
+        if self.shared_cache is not None:
+            self.shared_cache.set(key, value)
+
+    def clear(self):
+        """
+        Remove everything from the in-process tier.
+        """
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        with self._lock:
+            return len(self._entries)
+
+    def _set_local(self, key, value):
+        """
+        Keep `value` for `key` in the in-process tier, if it isn't too big.
+        """
+        if self.max_entries <= 0:
+            return
+        serialized = json.dumps(value)
+        if len(serialized) > self.max_entry_size:
+            return
+
+        with self._lock:
+            self._entries.pop(key, None)
+            self._entries[key] = serialized
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
@@ -7,6 +7,7 @@ from . import lazymod
 from dogapi import dog_stats_api
 
 import hashlib
+import json
 
 # Establish the Python environment for Capa.
 # Capa assumes float-friendly division always.
@@ -47,6 +48,19 @@ for name, modname in ASSUMED_IMPORTS:
 LAZY_IMPORTS = "".join(LAZY_IMPORTS)
 
 
+# The WorkerPool to run code in, if one has been configured.
+WORKER_POOL = None
+
+
+def configure_worker_pool(worker_pool):
+    """
+    Run sandboxed code in the processes of `worker_pool`, a `WorkerPool`, rather
+    than in a new process each time. None goes back to a new process each time.
+    """
+    global WORKER_POOL  # pylint: disable=global-statement
+    WORKER_POOL = worker_pool
+
+
 def update_hash(hasher, obj):
     """
     Update a `hashlib` hasher with a nested object.
@@ -70,6 +84,20 @@ def update_hash(hasher, obj):
         hasher.update(repr(obj))
 
 
+def cache_key(code, globals_dict, random_seed):
+    """
+    Return the key to cache the result of running `code` with the JSON-safe
+    `globals_dict` and `random_seed` under.
+
+    The globals are serialized canonically, with sorted keys, which is much
+    cheaper than walking them with `update_hash`.
+    """
+    md5er = hashlib.md5()
+    md5er.update(repr(code))
+    md5er.update(json.dumps(globals_dict, sort_keys=True, separators=(',', ':')))
+    return "safe_exec.%r.%s" % (random_seed, md5er.hexdigest())
+
+
 @dog_stats_api.timed('capa.safe_exec.time')
 def safe_exec(code, globals_dict, random_seed=None, python_path=None, cache=None, slug=None, unsafely=False):
     """
@@ -85,7 +113,8 @@ def safe_exec(code, globals_dict, random_seed=None, python_path=None, cache=None
 
     `cache` is an object with .get(key) and .set(key, value) methods.  It will be used
     to cache the execution, taking into account the code, the values of the globals,
-    and the random seed.
+    and the random seed.  A `SafeExecResultCache` keeps results in-process in front
+    of a shared cache.
 
     `slug` is an arbitrary string, a description that's meaningful to the
     caller, that will be used in log messages.
@@ -95,13 +124,11 @@ def safe_exec(code, globals_dict, random_seed=None, python_path=None, cache=None
     """
     # Check the cache for a previous result.
     if cache:
-        safe_globals = json_safe(globals_dict)
-        md5er = hashlib.md5()
-        md5er.update(repr(code))
-        update_hash(md5er, safe_globals)
-        key = "safe_exec.%r.%s" % (random_seed, md5er.hexdigest())
-        cached = cache.get(key)
+        with dog_stats_api.timer('capa.safe_exec.cache.lookup_time'):
+            key = cache_key(code, json_safe(globals_dict), random_seed)
+            cached = cache.get(key)
         if cached is not None:
+            dog_stats_api.increment('capa.safe_exec.cache', tags=['result:hit'])
             # We have a cached result.  The result is a pair: the exception
             # message, if any, else None; and the resulting globals dictionary.
             emsg, cleaned_results = cached
@@ -109,22 +136,27 @@ def safe_exec(code, globals_dict, random_seed=None, python_path=None, cache=None
             if emsg:
                 raise SafeExecException(emsg)
             return
+        dog_stats_api.increment('capa.safe_exec.cache', tags=['result:miss'])
 
     # Create the complete code we'll run.
     code_prolog = CODE_PROLOG % random_seed
 
-    # Decide which code executor to use.
+    # Decide which code executor to use.  The worker pool can't add to the
+    # Python path of its warm processes, so code which needs that gets a new one.
     if unsafely:
         exec_fn = codejail_not_safe_exec
+    elif WORKER_POOL is not None and not python_path:
+        exec_fn = WORKER_POOL.safe_exec
     else:
         exec_fn = codejail_safe_exec
 
     # Run the code!  Results are side effects in globals_dict.
     try:
-        exec_fn(
-            code_prolog + LAZY_IMPORTS + code, globals_dict,
-            python_path=python_path, slug=slug,
-        )
+        with dog_stats_api.timer('capa.safe_exec.exec_time'):
+            exec_fn(
+                code_prolog + LAZY_IMPORTS + code, globals_dict,
+                python_path=python_path, slug=slug,
+            )
     except SafeExecException as e:
         emsg = e.message
     else:
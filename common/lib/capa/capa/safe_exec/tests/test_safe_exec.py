@@ -9,7 +9,8 @@ import unittest
 
 from nose.plugins.skip import SkipTest
 
-from capa.safe_exec import safe_exec, update_hash
+from capa.safe_exec import safe_exec, update_hash, SafeExecResultCache
+from capa.safe_exec.safe_exec import cache_key
 from codejail.safe_exec import SafeExecException
 from codejail.jail_code import is_configured
 
@@ -177,6 +178,65 @@ class TestSafeExecCaching(unittest.TestCase):
                 self.fail("Tried executing code with non-ASCII unicode: {0}".format(code))
 
 
+class TestSafeExecResultCache(unittest.TestCase):
+    """Test the two tiers of SafeExecResultCache."""
+
+    def test_local_tier_in_front_of_shared(self):
+        shared = {}
+        result_cache = SafeExecResultCache(DictCache(shared))
+        g = {}
+        safe_exec("a = int(math.pi)", g, cache=result_cache)
+        self.assertEqual(g['a'], 3)
+        self.assertEqual(shared.values()[0], (None, {'a': 3}))
+
+        # Changing the shared tier has no effect while the result is held in-process.
+        shared[shared.keys()[0]] = (None, {'a': 17})
+        g = {}
+        safe_exec("a = int(math.pi)", g, cache=result_cache)
+        self.assertEqual(g['a'], 3)
+
+        # Another process would get the result from the shared tier, and keep it.
+        other_cache = SafeExecResultCache(DictCache(shared))
+        self.assertEqual(other_cache.get(shared.keys()[0]), (None, {'a': 17}))
+        self.assertEqual(len(other_cache), 1)
+
+    def test_cached_values_are_copies(self):
+        result_cache = SafeExecResultCache()
+        result_cache.set('key', [None, {'a': [1, 2]}])
+        result_cache.get('key')[1]['a'].append(3)
+        self.assertEqual(result_cache.get('key'), [None, {'a': [1, 2]}])
+
+    def test_size_limits(self):
+        result_cache = SafeExecResultCache(max_entries=2, max_entry_size=100)
+        result_cache.set('one', [None, {'a': 1}])
+        result_cache.set('two', [None, {'a': 2}])
+        result_cache.get('one')
+        result_cache.set('three', [None, {'a': 3}])
+        # the least recently used result was discarded
+        self.assertIsNone(result_cache.get('two'))
+        self.assertIsNotNone(result_cache.get('one'))
+        self.assertIsNotNone(result_cache.get('three'))
+
+        # results that are too big are only kept in the shared tier
+        result_cache.set('big', [None, {'a': 'x' * 100}])
+        self.assertIsNone(result_cache.get('big'))
+        self.assertEqual(len(result_cache), 2)
+
+    def test_cache_key_is_canonical(self):
+        d1 = {k: 1 for k in "abcdefghijklmnopqrstuvwxyz"}
+        d2 = dict(d1)
+        for i in xrange(10000):
+            d2[i] = 1
+        for i in xrange(10000):
+            del d2[i]
+        self.assertNotEqual(d1.keys(), d2.keys())
+
+        self.assertEqual(cache_key("a = 1", {'d': d1}, 17), cache_key("a = 1", {'d': d2}, 17))
+        self.assertNotEqual(cache_key("a = 1", {'d': d1}, 17), cache_key("a = 1", {'d': d1}, 18))
+        self.assertNotEqual(cache_key("a = 1", {'d': d1}, 17), cache_key("a = 2", {'d': d1}, 17))
+        self.assertNotEqual(cache_key("a = 1", {'a': [1, 2]}, 17), cache_key("a = 1", {'a': [2, 1]}, 17))
+
+
 class TestUpdateHash(unittest.TestCase):
     """Test the safe_exec.update_hash function to be sure it canonicalizes properly."""
 
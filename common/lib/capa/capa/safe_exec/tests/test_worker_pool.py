@@ -0,0 +1,140 @@
+"""Test the safe_exec worker pool, using its local, unsandboxed workers."""
+
+import os
+import unittest
+
+from codejail.safe_exec import SafeExecException
+
+from capa.safe_exec import safe_exec, configure_worker_pool, WorkerPool
+
+
+class TestWorkerPool(unittest.TestCase):
+    def setUp(self):
+        self.pool = WorkerPool(size=1, max_executions=3, timeout=5, preload_modules=["math"])
+        self.addCleanup(self.pool.close)
+
+    def test_set_values(self):
+        g = {'a': 17}
+        self.pool.safe_exec("b = a + 1\nc = [b, 'x']", g)
+        self.assertEqual(g['b'], 18)
+        self.assertEqual(g['c'], [18, 'x'])
+
+    def test_exception(self):
+        g = {}
+        with self.assertRaises(SafeExecException) as cm:
+            self.pool.safe_exec("1/0", g)
+        self.assertIn("ZeroDivisionError", cm.exception.message)
+
+        # The worker is still usable.
+        self.pool.safe_exec("a = 1", g)
+        self.assertEqual(g['a'], 1)
+
+    def test_printing_doesnt_confuse_the_worker(self):
+        g = {}
+        self.pool.safe_exec("import sys, os\nprint 'hello'\nos.write(1, 'there')\na = 1", g)
+        self.assertEqual(g['a'], 1)
+
+    def test_workers_are_reused_then_replaced(self):
+        worker_pids = []
+        for __ in range(4):
+            g = {}
+            self.pool.safe_exec("import os\nworker_pid = os.getppid()", g)
+            worker_pids.append(g['worker_pid'])
+        # One worker ran the first three executions, then a new one took over.
+        self.assertEqual(len(set(worker_pids[:3])), 1)
+        self.assertNotEqual(worker_pids[2], worker_pids[3])
+
+    def test_each_execution_has_its_own_process(self):
+        pids = set()
+        for __ in range(3):
+            g = {}
+            self.pool.safe_exec("import os\npid = os.getpid()", g)
+            pids.add(g['pid'])
+        self.assertEqual(len(pids), 3)
+
+    def test_nothing_leaks_between_executions(self):
+        g = {}
+        self.pool.safe_exec(
+            "import sys, math, __builtin__\n"
+            "sys.modules['random'] = 'replaced'\n"
+            "math.pi = 3\n"
+            "__builtin__.patched = True\n",
+            g
+        )
+        self.pool.safe_exec(
+            "import random, math, __builtin__\n"
+            "replaced = isinstance(random, str)\n"
+            "pi = math.pi\n"
+            "patched = hasattr(__builtin__, 'patched')\n",
+            g
+        )
+        self.assertFalse(g['replaced'])
+        self.assertNotEqual(g['pi'], 3)
+        self.assertFalse(g['patched'])
+
+    def test_no_access_to_the_workers_pipes(self):
+        g = {}
+        self.pool.safe_exec("import sys\nnext_request = sys.stdin.read()", g)
+        self.assertEqual(g['next_request'], '')
+
+        # The worker is still usable.
+        self.pool.safe_exec("a = 1", g)
+        self.assertEqual(g['a'], 1)
+
+    def test_memory_limit(self):
+        pool = WorkerPool(size=1, preload_modules=[], limits={'VMEM': 256 * 1024 * 1024})
+        self.addCleanup(pool.close)
+        g = {}
+        with self.assertRaises(SafeExecException) as cm:
+            pool.safe_exec("a = 'x' * (512 * 1024 * 1024)", g)
+        self.assertIn("MemoryError", cm.exception.message)
+
+    def test_cpu_limit(self):
+        pool = WorkerPool(size=1, timeout=10, preload_modules=[], limits={'CPU': 1})
+        self.addCleanup(pool.close)
+        g = {}
+        with self.assertRaises(SafeExecException) as cm:
+            pool.safe_exec("while True: pass", g)
+        self.assertIn("killed by signal", cm.exception.message)
+
+    @unittest.skipIf(os.getuid() == 0, "root isn't limited in how many processes it has")
+    def test_no_subprocesses(self):
+        g = {}
+        with self.assertRaises(SafeExecException):
+            self.pool.safe_exec("import os\nos.fork()", g)
+
+    def test_timeout(self):
+        pool = WorkerPool(size=1, timeout=0.5, preload_modules=[])
+        self.addCleanup(pool.close)
+        g = {}
+        with self.assertRaises(SafeExecException):
+            pool.safe_exec("while True: pass", g)
+
+        # The stuck execution was killed, and the worker is still usable.
+        pool.safe_exec("a = 1", g)
+        self.assertEqual(g['a'], 1)
+
+    def test_python_path_not_supported(self):
+        with self.assertRaises(ValueError):
+            self.pool.safe_exec("a = 1", {}, python_path=["/tmp"])
+
+
+class TestSafeExecWithWorkerPool(unittest.TestCase):
+    def setUp(self):
+        pool = WorkerPool(size=1)
+        self.addCleanup(pool.close)
+        configure_worker_pool(pool)
+        self.addCleanup(configure_worker_pool, None)
+
+    def test_random_seed_is_used(self):
+        g = {}
+        safe_exec("rnums = [random.randint(1, 999) for _ in xrange(100)]", g, random_seed=17)
+        first = g['rnums']
+        safe_exec("rnums = [random.randint(1, 999) for _ in xrange(100)]", g, random_seed=17)
+        self.assertEqual(g['rnums'], first)
+
+    def test_assumed_imports(self):
+        g = {}
+        safe_exec("a = int(math.pi)\nb = 1/2", g)
+        self.assertEqual(g['a'], 3)
+        self.assertEqual(g['b'], 0.5)
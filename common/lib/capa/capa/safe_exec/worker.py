@@ -0,0 +1,195 @@
+"""
+The program run by each process of a `WorkerPool`.
+
+This isn't imported: its source is run by the sandboxed Python, which may not
+have capa installed, so it only uses the standard library.
+
+The worker imports the modules named in its first argument, then reads
+requests from stdin and writes responses to stdout until stdin is closed.
+Each message is a line with the length of a JSON document, then the document.
+A request is `{"code": ..., "globals": {...}, "timeout": ...}`. The response is
+`{"globals": {...}, "error": ...}`, with the JSON-able globals the code left,
+and the traceback of any exception it raised.
+
+The worker is a fork server: it never runs code itself. Each request is run in
+a new child process, forked from the worker with the modules already imported,
+which applies the limits in the worker's second argument (the `CPU`, `VMEM` and
+`FSIZE` limits codejail applies, and no subprocesses), runs the code, sends its
+response back to the worker, and exits. Nothing the code does outlives it, and
+a child still running after the request's `timeout` seconds is killed.
+"""
+import errno
+import json
+import os
+import resource
+import select
+import signal
+import sys
+import time
+import traceback
+
+OK_TYPES = (type(None), int, long, float, str, unicode, list, tuple, dict)
+BAD_KEYS = ("__builtins__",)
+
+
+def jsonable(value):
+    """Return whether `value` can be sent back as JSON."""
+    if not isinstance(value, OK_TYPES):
+        return False
+    try:
+        json.dumps(value)
+    except Exception:  # pylint: disable=broad-except
+        return False
+    return True
+
+
+def read_message(stream):
+    """Read a message from `stream`, returning None at the end of it."""
+    header = stream.readline()
+    if not header:
+        return None
+    return json.loads(stream.read(int(header)))
+
+
+def write_message(stream, message):
+    """Write a message to `stream`."""
+    data = json.dumps(message)
+    stream.write("%d\n" % len(data))
+    stream.write(data)
+    stream.flush()
+
+
+def set_process_limits(limits):
+    """Limit this process the way codejail limits its sandboxed processes."""
+    # No subprocesses.
+    resource.setrlimit(resource.RLIMIT_NPROC, (0, 0))
+    # CPU seconds, not wall clock time.  The soft limit sends SIGXCPU, which
+    # kills the process.
+    cpu = limits.get("CPU")
+    if cpu:
+        resource.setrlimit(resource.RLIMIT_CPU, (cpu, cpu + 1))
+    # Total process virtual memory.
+    vmem = limits.get("VMEM")
+    if vmem:
+        resource.setrlimit(resource.RLIMIT_AS, (vmem, vmem))
+    # Size of written files.  Can be zero (nothing can be written).
+    fsize = limits.get("FSIZE", 0)
+    resource.setrlimit(resource.RLIMIT_FSIZE, (fsize, fsize))
+
+
+def run(request):
+    """Run the code in a request, returning the response."""
+    globals_dict = request["globals"]
+    error = None
+
+    try:
+        exec compile(request["code"], "jailed_code", "exec", 0, True) in globals_dict  # pylint: disable=exec-used
+    except Exception:  # pylint: disable=broad-except
+        error = traceback.format_exc()
+
+    return {
+        "globals": dict(
+            (key, value) for key, value in globals_dict.iteritems()
+            if key not in BAD_KEYS and jsonable(value)
+        ),
+        "error": error,
+    }
+
+
+def run_in_child(request, limits, worker_fds):
+    """
+    Run the code in a request in a new child process, returning the response.
+    `worker_fds` are the worker's own file descriptors, which the child closes.
+    """
+    read_fd, write_fd = os.pipe()
+    pid = os.fork()
+    if pid == 0:
+        # The child.  It must never return into the worker's loop.
+        try:
+            os.close(read_fd)
+            for fd in worker_fds:
+                os.close(fd)
+            set_process_limits(limits)
+            response = run(request)
+            with os.fdopen(write_fd, "wb") as output:
+                write_message(output, response)
+        finally:
+            os._exit(0)  # pylint: disable=protected-access
+
+    os.close(write_fd)
+    data, timed_out = read_until_closed(read_fd, time.time() + request["timeout"])
+    os.close(read_fd)
+    if timed_out:
+        try:
+            os.kill(pid, signal.SIGKILL)
+        except OSError:
+            pass
+    __, status = os.waitpid(pid, 0)
+
+    if timed_out:
+        return {"globals": {}, "error": "Timed out"}
+    try:
+        header, data = data.split("\n", 1)
+        return json.loads(data[:int(header)])
+    except ValueError:
+        return {"globals": {}, "error": describe_status(status)}
+
+
+def read_until_closed(fd, deadline):
+    """
+    Read from `fd` until it is closed, or until the time.time() `deadline`.
+    Returns what was read, and whether the deadline passed.
+    """
+    chunks = []
+    while True:
+        remaining = deadline - time.time()
+        if remaining <= 0:
+            return "".join(chunks), True
+        try:
+            readable, __, __ = select.select([fd], [], [], remaining)
+        except select.error as error:
+            if error.args[0] == errno.EINTR:
+                continue
+            raise
+        if readable:
+            chunk = os.read(fd, 65536)
+            if not chunk:
+                return "".join(chunks), False
+            chunks.append(chunk)
+
+
+def describe_status(status):
+    """Describe how a child that didn't respond ended, from its wait `status`."""
+    if os.WIFSIGNALED(status):
+        return "Execution was killed by signal %d" % os.WTERMSIG(status)
+    return "Execution exited with status %d" % os.WEXITSTATUS(status)
+
+
+def main():
+    """Import the preloaded modules, then serve requests."""
+    # Keep the pipes to ourselves, so that nothing the code prints can be
+    # mistaken for a response.
+    requests = os.fdopen(os.dup(0), "rb")
+    responses = os.fdopen(os.dup(1), "wb")
+    devnull = os.open(os.devnull, os.O_RDWR)
+    os.dup2(devnull, 0)
+    os.dup2(devnull, 1)
+    os.close(devnull)
+
+    limits = json.loads(sys.argv[2])
+    for module_name in json.loads(sys.argv[1]):
+        try:
+            __import__(module_name)
+        except ImportError:
+            pass
+
+    write_message(responses, {"ready": True})
+    while True:
+        request = read_message(requests)
+        if request is None:
+            break
+        write_message(responses, run_in_child(request, limits, [requests.fileno(), responses.fileno()]))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,318 @@
+"""
+A pool of warm, sandboxed Python processes to run safe_exec's code in.
+
+codejail starts a new sandboxed Python for every execution, which then has to
+import numpy and friends again. The processes in a `WorkerPool` are started
+ahead of time with those modules imported, and are sent executions over a pipe
+(see `worker.py` for the protocol). Each execution still runs in a fresh
+process, limited like codejail's: the worker forks a child for it, which exits
+once it has run, so nothing one execution does can affect the next.
+"""
+
+import errno
+import json
+import logging
+import os
+import select
+import shutil
+import signal
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+from codejail.safe_exec import json_safe, SafeExecException
+
+from . import worker
+
+log = logging.getLogger(__name__)
+
+# The worker's source is run with `python -c`, so read it now.
+worker_py_file = worker.__file__
+if worker_py_file.endswith("c"):
+    worker_py_file = worker_py_file[:-1]
+
+WORKER_PY = open(worker_py_file).read()
+
+# The modules which are expensive to import, and worth importing ahead of time.
+PRELOAD_MODULES = ["math", "random", "numpy", "scipy", "scipy.constants"]
+
+# How long a new worker may take to start and import its modules, in seconds.
+STARTUP_TIMEOUT = 30
+
+# How much longer than an execution's timeout to wait for its worker, which
+# kills the execution itself when it runs out of time.
+RESPONSE_GRACE = 5
+
+# The limits applied to each execution, as codejail's LIMITS.
+DEFAULT_LIMITS = {
+    # CPU seconds.
+    "CPU": 1,
+    # Total process virtual memory, in bytes, or 0 for no limit.
+    "VMEM": 0,
+    # Size of files that can be written, in bytes.
+    "FSIZE": 0,
+}
+
+
+class WorkerError(Exception):
+    """
+    Raised when a worker process fails to respond, after which it can't be used.
+    """
+    pass
+
+
+class WorkerProcess(object):
+    """
+    One of the processes of a `WorkerPool`.
+    """
+    def __init__(self, command):
+        self.directory = tempfile.mkdtemp(prefix="safe_exec_worker-")
+        # The sandbox user has to be able to work in the directory.
+        os.chmod(self.directory, 0777)
+        self.process = subprocess.Popen(
+            command,
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            cwd=self.directory,
+            close_fds=True,
+        )
+        self.ready = False
+        self.executions = 0
+        self._buffer = ""
+
+    def request(self, message, timeout):
+        """
+        Send `message` to the worker and return its response, waiting at most
+        `timeout` seconds for it (plus the time the worker takes to start).
+        """
+        if not self.ready:
+            self._read_message(time.time() + STARTUP_TIMEOUT)
+            self.ready = True
+
+        data = json.dumps(message)
+        try:
+            self.process.stdin.write("%d\n" % len(data))
+            self.process.stdin.write(data)
+            self.process.stdin.flush()
+        except IOError as error:
+            raise WorkerError("Couldn't send request: {}".format(error))
+
+        response = self._read_message(time.time() + timeout)
+        self.executions += 1
+        return response
+
+    def _read_message(self, deadline):
+        """
+        Read a message from the worker, or raise WorkerError if there isn't one
+        by the time.time() `deadline`.
+        """
+        stdout = self.process.stdout.fileno()
+        length = None
+        while True:
+            if length is None and "\n" in self._buffer:
+                header, self._buffer = self._buffer.split("\n", 1)
+                length = int(header)
+            if length is not None and len(self._buffer) >= length:
+                data, self._buffer = self._buffer[:length], self._buffer[length:]
+                return json.loads(data)
+
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                raise WorkerError("Timed out")
+            try:
+                readable, __, __ = select.select([stdout], [], [], remaining)
+            except select.error as error:
+                if error.args[0] == errno.EINTR:
+                    continue
+                raise
+            if readable:
+                chunk = os.read(stdout, 65536)
+                if not chunk:
+                    raise WorkerError("Worker exited with status {}".format(self.process.wait()))
+                self._buffer += chunk
+
+    def is_alive(self):
+        """
+        Return whether the worker process is still running.
+        """
+        return self.process.poll() is None
+
+    def close(self):
+        """
+        Ask the worker to exit, by closing its input.
+        """
+        try:
+            self.process.stdin.close()
+        except IOError:
+            pass
+        self._remove_directory()
+
+    def kill(self):
+        """
+        Stop the worker, even if it is busy.
+        """
+        for sig in (signal.SIGTERM, signal.SIGKILL):
+            if not self.is_alive():
+                break
+            try:
+                os.kill(self.process.pid, sig)
+            except OSError:
+                break
+            time.sleep(0.01)
+        self.close()
+
+    def _remove_directory(self):
+        """
+        Remove the worker's working directory, if it can be.
+        """
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+
+class WorkerPool(object):
+    """
+    Runs code for safe_exec in `size` warm worker processes.
+
+    The workers run `python_bin` as `user` with sudo, like codejail does, so the
+    same sandbox applies. Without a `python_bin`, the workers run this Python,
+    unsandboxed: that is only for tests and local development.
+
+    Each execution runs in its own process, forked from a worker, with the
+    `limits` codejail applies (see `DEFAULT_LIMITS`). `max_memory` bytes is the
+    memory limit when `limits` has no `VMEM`; it has to leave room for the
+    preloaded modules. An execution which takes more than `timeout` seconds is
+    killed. A worker is replaced after `max_executions` executions.
+    """
+    def __init__(self, python_bin=None, user=None, size=2, max_executions=100, max_memory=None,
+                 timeout=10, limits=None, preload_modules=None):
+        self.python_bin = python_bin or sys.executable
+        self.user = user if python_bin else None
+        self.size = size
+        self.max_executions = max_executions
+        self.timeout = timeout
+        self.limits = dict(DEFAULT_LIMITS, **(limits or {}))
+        if max_memory and not self.limits["VMEM"]:
+            self.limits["VMEM"] = max_memory
+        self.preload_modules = PRELOAD_MODULES if preload_modules is None else preload_modules
+
+        self._condition = threading.Condition()
+        self._idle = []
+        self._num_workers = 0
+        self._pid = None
+
+    def command(self):
+        """
+        The command which starts a worker process.
+        """
+        command = [
+            self.python_bin, "-E", "-B", "-c", WORKER_PY,
+            json.dumps(self.preload_modules), json.dumps(self.limits),
+        ]
+        if self.user:
+            command = ["sudo", "-u", self.user] + command
+        return command
+
+    def safe_exec(self, code, globals_dict, python_path=None, slug=None):
+        """
+        Run `code` with `globals_dict` in one of the workers, updating
+        `globals_dict` with the results, like codejail's safe_exec.
+
+        Extra `python_path` directories aren't supported, as they would have to
+        be copied into the worker's sandbox for the one execution.
+        """
+        if python_path:
+            raise ValueError("WorkerPool.safe_exec doesn't support python_path")
+
+        if slug:
+            log.debug("Executing %s in a worker", slug)
+
+        request = {
+            "code": code,
+            "globals": json_safe(globals_dict),
+            "timeout": self.timeout,
+        }
+
+        worker_process = self._acquire()
+        try:
+            response = worker_process.request(request, self.timeout + RESPONSE_GRACE)
+        except (WorkerError, ValueError) as error:
+            log.warning("Worker failed running %s: %s", slug, error)
+            worker_process.kill()
+            self._replace(worker_process)
+            raise SafeExecException("Couldn't execute jailed code: {}".format(error))
+        self._release(worker_process)
+
+        if response["error"]:
+            raise SafeExecException("Couldn't execute jailed code: {}".format(response["error"]))
+        globals_dict.update(response["globals"])
+
+    def close(self):
+        """
+        Ask all of the idle workers to exit.
+        """
+        with self._condition:
+            for worker_process in self._idle:
+                worker_process.close()
+            self._num_workers -= len(self._idle)
+            self._idle = []
+
+    def _start_worker(self):
+        """
+        Start a worker process, counting it in the pool. The caller must hold
+        the condition's lock.
+        """
+        self._num_workers += 1
+        try:
+            return WorkerProcess(self.command())
+        except (OSError, IOError):
+            self._num_workers -= 1
+            raise
+
+    def _acquire(self):
+        """
+        Take an idle worker from the pool, waiting for one if they're all busy.
+        """
+        with self._condition:
+            if self._pid != os.getpid():
+                # The workers are started in each process that uses them, so
+                # that forked processes don't share their pipes.
+                self._pid = os.getpid()
+                self._idle = []
+                self._num_workers = 0
+                for __ in range(self.size):
+                    self._idle.append(self._start_worker())
+
+            while True:
+                if self._idle:
+                    return self._idle.pop()
+                if self._num_workers < self.size:
+                    return self._start_worker()
+                self._condition.wait()
+
+    def _release(self, worker_process):
+        """
+        Return a worker to the pool, replacing it if it has done enough.
+        """
+        worn_out = worker_process.executions >= self.max_executions
+        if worn_out or not worker_process.is_alive():
+            worker_process.close()
+            self._replace(worker_process)
+            return
+
+        with self._condition:
+            self._idle.append(worker_process)
+            self._condition.notify()
+
+    def _replace(self, worker_process):
+        """
+        Start a new worker in place of one which has stopped. Starting it is
+        quick; it imports its modules while it waits for its first request.
+        """
+        with self._condition:
+            self._num_workers -= 1
+            try:
+                self._idle.append(self._start_worker())
+            except (OSError, IOError):
+                log.exception("Couldn't start a safe_exec worker")
+            self._condition.notify()
@@ -88,7 +88,8 @@ class MongoContentStore(ContentStore):
                     location, fp.displayname, fp.content_type, fp, last_modified_at=fp.uploadDate,
                     thumbnail_location=thumbnail_location,
                     import_path=getattr(fp, 'import_path', None),
-                    length=fp.length, locked=getattr(fp, 'locked', False)
+                    length=fp.length, locked=getattr(fp, 'locked', False),
+                    content_digest=getattr(fp, 'md5', None)
                 )
             else:
                 with self.fs.get(content_id) as fp:
@@ -99,7 +100,8 @@ class MongoContentStore(ContentStore):
                         location, fp.displayname, fp.content_type, fp.read(), last_modified_at=fp.uploadDate,
                         thumbnail_location=thumbnail_location,
                         import_path=getattr(fp, 'import_path', None),
-                        length=fp.length, locked=getattr(fp, 'locked', False)
+                        length=fp.length, locked=getattr(fp, 'locked', False),
+                        content_digest=getattr(fp, 'md5', None)
                     )
         except NoFile:
             if throw_on_not_found:
@@ -149,18 +151,54 @@ class MongoContentStore(ContentStore):
             assets_policy_file: the filename for the policy file which should be in the same
                 directory as the other policy files.
         """
+        if not os.path.exists(output_directory):
+            os.makedirs(output_directory)
+
+        policy = self.export_all_for_course_to_fs(course_key, OSFS(output_directory))
+
+        with open(assets_policy_file, 'w') as f:
+            json.dump(policy, f)
+
+    def export_all_for_course_to_fs(self, course_key, output_fs):
+        """
+        Export all of this course's assets to a filesystem, and return all of the assets'
+        attributes, for the policy file.
+
+        Args:
+            course_key (CourseKey): the :class:`CourseKey` identifying the course
+            output_fs: the pyfilesystem object (or anything with its `makedir` and `open`
+                methods) to put all the asset files in. If it has a `write_stream(path, chunks,
+                size)` method, like a `TarExportFS`, the assets are written with that.
+        """
         policy = {}
         assets, __ = self.get_all_content_for_course(course_key)
 
         for asset in assets:
             asset_location = AssetLocation._from_deprecated_son(asset['_id'], course_key.run)  # pylint: disable=protected-access
-            self.export(asset_location, output_directory)
+            # Assets are streamed out of GridFS, so that only a chunk of each is in memory at a time.
+            content = self.find(asset_location, as_stream=True)
+            try:
+                asset_path = content.name
+                if content.import_path is not None:
+                    asset_dir = os.path.dirname(content.import_path)
+                    if asset_dir:
+                        output_fs.makedir(asset_dir, recursive=True, allow_recreate=True)
+                        asset_path = asset_dir + '/' + content.name
+
+                if hasattr(output_fs, 'write_stream'):
+                    output_fs.write_stream(asset_path, content.stream_data(), content.length)
+                else:
+                    with output_fs.open(asset_path, 'wb') as asset_file:
+                        for chunk in content.stream_data():
+                            asset_file.write(chunk)
+            finally:
+                content.close()
+
             for attr, value in asset.iteritems():
                 if attr not in ['_id', 'md5', 'uploadDate', 'length', 'chunkSize']:
                     policy.setdefault(asset_location.name, {})[attr] = value
 
-        with open(assets_policy_file, 'w') as f:
-            json.dump(policy, f)
+        return policy
 
     def get_all_content_thumbnails_for_course(self, course_key):
         return self._get_all_content_for_course(course_key, get_thumbnails=True)[0]
@@ -367,13 +367,27 @@ class ModuleStoreWriteBase(ModuleStoreReadBase, ModuleStoreWrite):
     '''
     Implement interface functionality that can be shared.
     '''
-    def __init__(self, **kwargs):
+    def __init__(self, course_published_callback=None, **kwargs):
+        """
+        course_published_callback: a function which is called with a course key and a usage key
+            whenever that item in that course is published, or with a usage key of None when the
+            whole course is created or deleted
+        """
         super(ModuleStoreWriteBase, self).__init__(**kwargs)
+        self.course_published_callback = course_published_callback
         # TODO: Don't have a runtime just to generate the appropriate mixin classes (cpennington)
         # This is only used by partition_fields_by_scope, which is only needed because
         # the split mongo store is used for item creation as well as item persistence
         self.mixologist = Mixologist(self.xblock_mixins)
 
+    def _course_published(self, course_key, usage_key=None):
+        """
+        Tell the course_published_callback, if there is one, that the published version
+        of `usage_key` in the course `course_key` has changed.
+        """
+        if self.course_published_callback is not None:
+            self.course_published_callback(course_key, usage_key)
+
     def partition_fields_by_scope(self, category, fields):
         """
         Return dictionary of {scope: {field1: val, ..}..} for the fields of this potential xblock
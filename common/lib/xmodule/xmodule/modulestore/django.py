@@ -10,6 +10,7 @@ import re
 
 from django.conf import settings
 from django.core.cache import get_cache, InvalidCacheBackendError
+from django.dispatch import Signal
 import django.utils
 
 from xmodule.modulestore.loc_mapper_store import LocMapperStore
@@ -27,6 +28,10 @@ _MODULESTORES = {}
 
 FUNCTION_KEYS = ['render_template']
 
+# Sent with the `course_key` of a course whose published version has changed, and the
+# `usage_key` of the item which changed (None when the whole course was created or deleted)
+course_published = Signal(providing_args=['course_key', 'usage_key'])
+
 
 def load_function(path):
     """
@@ -39,6 +44,13 @@ def load_function(path):
     return getattr(import_module(module_path), name)
 
 
+def _send_course_published(course_key, usage_key):
+    """
+    Send the course_published signal; modulestores call this when they publish.
+    """
+    course_published.send(sender=None, course_key=course_key, usage_key=usage_key)
+
+
 def create_modulestore_instance(engine, doc_store_config, options, i18n_service=None):
     """
     This will return a new instance of a modulestore given an engine and options
@@ -62,8 +74,17 @@ def create_modulestore_instance(engine, doc_store_config, options, i18n_service=
     except InvalidCacheBackendError:
         metadata_inheritance_cache = get_cache('default')
 
+    # split modulestore structures are cached in each process, and also shared between
+    # processes if a cache is configured for them
+    try:
+        course_structure_cache = get_cache('course_structure_cache')
+    except InvalidCacheBackendError:
+        course_structure_cache = None
+
     return class_(
         metadata_inheritance_cache_subsystem=metadata_inheritance_cache,
+        course_structure_cache_subsystem=course_structure_cache,
+        course_published_callback=_send_course_published,
         request_cache=request_cache,
         xblock_mixins=getattr(settings, 'XBLOCK_MIXINS', ()),
         xblock_select=getattr(settings, 'XBLOCK_SELECT_FUNCTION', None),
@@ -13,12 +13,16 @@ structure:
 """
 
 import pymongo
+import random
 import sys
 import logging
-import copy
 import re
+import zlib
+import cPickle as pickle
+from datetime import datetime
 
 from bson.son import SON
+from pytz import UTC
 from fs.osfs import OSFS
 from path import path
 
@@ -31,12 +35,13 @@ from xblock.runtime import KvsFieldData
 from xblock.exceptions import InvalidScopeError
 from xblock.fields import Scope, ScopeIds, Reference, ReferenceList, ReferenceValueDict
 
-from xmodule.modulestore import ModuleStoreWriteBase, Location, MONGO_MODULESTORE_TYPE
+from xmodule.modulestore import ModuleStoreWriteBase, Location, MONGO_MODULESTORE_TYPE, InvalidKeyError
 from xmodule.modulestore.exceptions import ItemNotFoundError, InvalidLocationError
 from xmodule.modulestore.inheritance import own_metadata, InheritanceMixin, inherit_metadata, InheritanceKeyValueStore
 from xmodule.tabs import StaticTab, CourseTabList
 from xblock.core import XBlock
-from xmodule.modulestore.locations import SlashSeparatedCourseKey
+from xmodule.modulestore.locations import SlashSeparatedCourseKey, URL_RE
+from xmodule.util.lru_cache import LRUCache
 
 log = logging.getLogger(__name__)
 
@@ -263,6 +268,148 @@ def location_to_query(location, wildcard=True, tag='i4x'):
     return query
 
 
+# The most records to ask for in one $in query when prefetching the descendents of items
+CHILDREN_QUERY_BATCH_SIZE = 500
+
+# A process-level cache of the definition data of records (which is the bulk of most
+# records), pickled, and keyed by their _id and the time they were last edited.
+# It is bounded by the total size of the pickles. Every write stamps the record with
+# when it was edited, so a record without a stamp hasn't changed since it was last
+# written by older code, and is keyed by its _id and publication date alone.
+DEFINITION_DATA_CACHE = LRUCache(64 * 1024 * 1024, sizeof=len)
+
+
+def _definition_data_cache_key(record):
+    """
+    The key of record's definition data in DEFINITION_DATA_CACHE
+    """
+    return (
+        tuple(record['_id'].items()),
+        record.get('edit_info', {}).get('edited_on'),
+        record.get('metadata', {}).get('published_date'),
+    )
+
+
+def _child_url_to_son(child_url):
+    """
+    The _id of the record of the child with the deprecated location url child_url.
+    This is the same as make_usage_key_from_deprecated_string(child_url).to_deprecated_son(),
+    without building a Location for each child.
+    """
+    match = URL_RE.match(child_url)
+    if match is None:
+        raise InvalidKeyError(Location, child_url)
+    groups = match.groupdict()
+    return SON([
+        ('tag', 'i4x'),
+        ('org', groups['org']),
+        ('course', groups['course']),
+        ('category', groups['category']),
+        ('name', groups['name']),
+        ('revision', groups['revision']),
+    ])
+
+
+# Bump this whenever the packed format of the metadata inheritance tree changes, so that
+# trees cached by older code are recomputed rather than misread
+METADATA_INHERITANCE_TREE_VERSION = 1
+
+
+def _metadata_inheritance_stamp_key(course_id):
+    """
+    The key in the caching subsystem of the edit stamp of course_id's metadata inheritance tree
+    """
+    return u'metadata_inheritance_stamp.{}'.format(course_id)
+
+
+def _metadata_inheritance_url_prefix(course_id):
+    """
+    The part of the location urls in course_id's metadata inheritance tree that they all share
+    """
+    return u'{}://{}/{}/'.format(Location.DEPRECATED_TAG, course_id.org, course_id.course)
+
+
+def _metadata_frame_key(value):
+    """
+    A hashable form of the metadata `value`, which is the same for equal values (of the
+    same types, so that e.g. True and 1 aren't mistaken for each other)
+    """
+    if isinstance(value, dict):
+        return (dict, tuple(sorted((key, _metadata_frame_key(item)) for key, item in value.iteritems())))
+    if isinstance(value, (list, tuple)):
+        return (type(value), tuple(_metadata_frame_key(item) for item in value))
+    return (type(value), value)
+
+
+def pack_metadata_inheritance_tree(course_id, tree):
+    """
+    Return a compact, versioned representation of a metadata inheritance tree
+    ({location url: inherited metadata}) for storing in the caching subsystem.
+
+    Equal metadata dicts are stored once as frames, and each location refers to
+    its frame by index. Location urls are stored as
+    a category index plus a name relative to the course. The whole thing is
+    pickled and compressed, as many frames repeat the same field values.
+    """
+    prefix = _metadata_inheritance_url_prefix(course_id)
+    frames = []
+    frame_indexes = {}
+    frame_indexes_by_id = {}
+    categories = []
+    category_indexes = {}
+    entries = []
+    for url, metadata in tree.iteritems():
+        # The tree mostly shares one dict among the locations which inherit the same
+        # metadata, so each dict's content is only looked at once.
+        frame_index = frame_indexes_by_id.get(id(metadata))
+        if frame_index is None:
+            try:
+                frame_key = _metadata_frame_key(metadata)
+                frame_index = frame_indexes.get(frame_key)
+            except TypeError:
+                # a value which can't be hashed, so the dict gets a frame of its own
+                frame_key = None
+            if frame_index is None:
+                frame_index = len(frames)
+                frames.append(metadata)
+                if frame_key is not None:
+                    frame_indexes[frame_key] = frame_index
+            frame_indexes_by_id[id(metadata)] = frame_index
+
+        if url.startswith(prefix) and url.count('/', len(prefix)) == 1:
+            category, name = url[len(prefix):].split('/')
+            category_index = category_indexes.get(category)
+            if category_index is None:
+                category_index = category_indexes[category] = len(categories)
+                categories.append(category)
+            entries.append((category_index, name, frame_index))
+        else:
+            entries.append((None, url, frame_index))
+
+    payload = pickle.dumps((categories, frames, entries), pickle.HIGHEST_PROTOCOL)
+    return (METADATA_INHERITANCE_TREE_VERSION, zlib.compress(payload))
+
+
+def unpack_metadata_inheritance_tree(course_id, packed):
+    """
+    Return the metadata inheritance tree stored by `pack_metadata_inheritance_tree`,
+    or None if packed isn't in the current format.
+    """
+    if not isinstance(packed, tuple) or len(packed) != 2 or packed[0] != METADATA_INHERITANCE_TREE_VERSION:
+        return None
+
+    categories, frames, entries = pickle.loads(zlib.decompress(packed[1]))
+    prefix = _metadata_inheritance_url_prefix(course_id)
+    category_prefixes = [u'{}{}/'.format(prefix, category) for category in categories]
+    tree = {}
+    for category_index, name, frame_index in entries:
+        if category_index is None:
+            tree[name] = frames[frame_index]
+        else:
+            tree[category_prefixes[category_index] + name] = frames[frame_index]
+    return tree
+
+
 class MongoModuleStore(ModuleStoreWriteBase):
     """
     A Mongodb backed ModuleStore
@@ -323,36 +470,38 @@ class MongoModuleStore(ModuleStoreWriteBase):
 
         self.ignore_write_events_on_courses = set()
 
-    def _compute_metadata_inheritance_tree(self, course_id):
-        '''
-        TODO (cdodge) This method can be deleted when the 'split module store' work has been completed
-        '''
-        # get all collections in the course, this query should not return any leaf nodes
-        # note this is a bit ugly as when we add new categories of containers, we have to add it here
-
-        block_types_with_children = set(
+    @staticmethod
+    def _block_types_with_children():
+        """
+        Return the set of block types that can have children, and so can pass
+        metadata down to their descendents.
+        """
+        return set(
             name for name, class_ in XBlock.load_classes() if getattr(class_, 'has_children', False)
         )
-        query = SON([
-            ('_id.tag', 'i4x'),
-            ('_id.org', course_id.org),
-            ('_id.course', course_id.course),
-            ('_id.category', {'$in': list(block_types_with_children)})
-        ])
-        # we just want the Location, children, and inheritable metadata
+
+    @staticmethod
+    def _inheritance_record_filter():
+        """
+        The fields of a container's record that are needed to compute inherited
+        metadata: the Location, the children, and the inheritable metadata.
+        """
         record_filter = {'_id': 1, 'definition.children': 1}
 
         # just get the inheritable metadata since that is all we need for the computation
         # this minimizes both data pushed over the wire
         for field_name in InheritanceMixin.fields:
             record_filter['metadata.{0}'.format(field_name)] = 1
+        return record_filter
 
-        # call out to the DB
-        resultset = self.collection.find(query, record_filter)
-
+    @staticmethod
+    def _add_inheritance_records(course_id, resultset, results_by_url):
+        """
+        Add the container records in resultset to results_by_url, keyed by
+        location url, and return the url of the course root if it was found.
+        """
         # it's ok to keep these as urls b/c the overall cache is indexed by course_key and this
         # is a dictionary relative to that course
-        results_by_url = {}
         root = None
 
         # now go through the results and order them by the location url
@@ -371,67 +520,143 @@ class MongoModuleStore(ModuleStoreWriteBase):
             if location.category == 'course':
                 root = location_url
 
-        # now traverse the tree and compute down the inherited metadata
-        metadata_to_inherit = {}
+        return root
 
-        def _compute_inherited_metadata(url):
-            """
-            Helper method for computing inherited metadata for a specific location url
-            """
-            my_metadata = results_by_url[url].get('metadata', {})
+    @staticmethod
+    def _inherit_metadata(results_by_url, url, inherited, metadata_to_inherit):
+        """
+        Fill in metadata_to_inherit for all of the descendents of the container at url,
+        given the metadata that container has after inheritance.
+
+        Nothing in the tree is ever modified in place, so a container that adds
+        no metadata of its own shares its parent's dict instead of copying it.
+        """
+        stack = [(url, inherited)]
+        while stack:
+            url, inherited = stack.pop()
 
-            # go through all the children and recurse, but only if we have
-            # in the result set. Remember results will not contain leaf nodes
+            # go through all the children, but only descend into the ones we
+            # have in the result set. Remember results will not contain leaf nodes
             for child in results_by_url[url].get('definition', {}).get('children', []):
                 if child in results_by_url:
-                    new_child_metadata = copy.deepcopy(my_metadata)
-                    new_child_metadata.update(results_by_url[child].get('metadata', {}))
-                    results_by_url[child]['metadata'] = new_child_metadata
-                    metadata_to_inherit[child] = new_child_metadata
-                    _compute_inherited_metadata(child)
+                    child_metadata = results_by_url[child].get('metadata', {})
+                    if child_metadata:
+                        child_inherited = dict(inherited)
+                        child_inherited.update(child_metadata)
+                    else:
+                        child_inherited = inherited
+                    metadata_to_inherit[child] = child_inherited
+                    stack.append((child, child_inherited))
                 else:
                     # this is likely a leaf node, so let's record what metadata we need to inherit
-                    metadata_to_inherit[child] = my_metadata
+                    metadata_to_inherit[child] = inherited
+
+    def _compute_metadata_inheritance_tree(self, course_id):
+        '''
+        TODO (cdodge) This method can be deleted when the 'split module store' work has been completed
+        '''
+        # get all collections in the course, this query should not return any leaf nodes
+        # note this is a bit ugly as when we add new categories of containers, we have to add it here
+        query = SON([
+            ('_id.tag', 'i4x'),
+            ('_id.org', course_id.org),
+            ('_id.course', course_id.course),
+            ('_id.category', {'$in': list(self._block_types_with_children())})
+        ])
+
+        # call out to the DB
+        resultset = self.collection.find(query, self._inheritance_record_filter())
+
+        results_by_url = {}
+        root = self._add_inheritance_records(course_id, resultset, results_by_url)
 
+        # now traverse the tree and compute down the inherited metadata
+        metadata_to_inherit = {}
         if root is not None:
-            _compute_inherited_metadata(root)
+            self._inherit_metadata(results_by_url, root, results_by_url[root].get('metadata', {}), metadata_to_inherit)
 
         return metadata_to_inherit
 
+    def _metadata_inheritance_stamp(self, course_id):
+        """
+        Return the edit stamp of course_id's metadata inheritance tree, giving it one if it
+        has none, or None if the caching subsystem can't keep it.
+
+        The stamp is a counter which every write to the tree increments, and the cached tree
+        is only used while it was cached under the current stamp.
+        """
+        stamp_key = _metadata_inheritance_stamp_key(course_id)
+        stamp = self.metadata_inheritance_cache_subsystem.get(stamp_key)
+        if stamp is None:
+            # start at random, so that trees cached under an evicted stamp don't match the new one
+            self.metadata_inheritance_cache_subsystem.add(stamp_key, random.randint(0, 2 ** 31))
+            stamp = self.metadata_inheritance_cache_subsystem.get(stamp_key)
+        return stamp
+
+    def _increment_metadata_inheritance_stamp(self, course_id):
+        """
+        Increment the edit stamp of course_id's metadata inheritance tree, so that the tree
+        cached under the old stamp (or being computed under it) is no longer used, and return
+        the new stamp, or None if the stamp is gone.
+        """
+        try:
+            return self.metadata_inheritance_cache_subsystem.incr(_metadata_inheritance_stamp_key(course_id))
+        except ValueError:
+            # the stamp was evicted, so whichever stamp it gets next, no cached tree has it
+            return None
+
+    def _load_metadata_inheritance_tree(self, course_id, stamp):
+        """
+        Return the tree cached in the caching subsystem under stamp, or None if there isn't one.
+        """
+        cached = self.metadata_inheritance_cache_subsystem.get(course_id)
+        if not isinstance(cached, tuple) or len(cached) != 2 or cached[0] != stamp:
+            return None
+        return unpack_metadata_inheritance_tree(course_id, cached[1])
+
+    def _cache_metadata_inheritance_tree(self, course_id, stamp, tree):
+        """
+        Write tree to the caching subsystem (e.g. memcached) under stamp, if available, and
+        to the request cache.
+        """
+        if self.metadata_inheritance_cache_subsystem is not None and stamp is not None:
+            self.metadata_inheritance_cache_subsystem.set(
+                course_id, (stamp, pack_metadata_inheritance_tree(course_id, tree))
+            )
+
+        if self.request_cache is not None:
+            # we can't assume the 'metadata_inheritance' part of the request cache dict has been
+            # defined
+            self.request_cache.data.setdefault('metadata_inheritance', {})[course_id] = tree
+
     def _get_cached_metadata_inheritance_tree(self, course_id, force_refresh=False):
         '''
         TODO (cdodge) This method can be deleted when the 'split module store' work has been completed
         '''
-        tree = {}
-
+        # see if we are first in the request cache (if present)
         if not force_refresh:
-            # see if we are first in the request cache (if present)
             if self.request_cache is not None and course_id in self.request_cache.data.get('metadata_inheritance', {}):
                 return self.request_cache.data['metadata_inheritance'][course_id]
 
-            # then look in any caching subsystem (e.g. memcached)
-            if self.metadata_inheritance_cache_subsystem is not None:
-                tree = self.metadata_inheritance_cache_subsystem.get(course_id, {})
-            else:
-                logging.warning('Running MongoModuleStore without a metadata_inheritance_cache_subsystem. This is OK in localdev and testing environment. Not OK in production.')
-
-        if not tree:
+        tree = None
+        stamp = None
+        if self.metadata_inheritance_cache_subsystem is not None:
+            # The stamp is read before the tree is computed, so that a tree which is written
+            # while it's being computed is cached with a stamp which is already out of date.
+            stamp = self._metadata_inheritance_stamp(course_id)
+            if not force_refresh:
+                # then look in the caching subsystem (e.g. memcached)
+                tree = self._load_metadata_inheritance_tree(course_id, stamp)
+        elif not force_refresh:
+            logging.warning('Running MongoModuleStore without a metadata_inheritance_cache_subsystem. This is OK in localdev and testing environment. Not OK in production.')
+
+        if tree is None:
             # if not in subsystem, or we are on force refresh, then we have to compute
             tree = self._compute_metadata_inheritance_tree(course_id)
-
-            # now write out computed tree to caching subsystem (e.g. memcached), if available
-            if self.metadata_inheritance_cache_subsystem is not None:
-                self.metadata_inheritance_cache_subsystem.set(course_id, tree)
-
-        # now populate a request_cache, if available. NOTE, we are outside of the
-        # scope of the above if: statement so that after a memcache hit, it'll get
-        # put into the request_cache
-        if self.request_cache is not None:
-            # we can't assume the 'metadatat_inheritance' part of the request cache dict has been
-            # defined
-            if 'metadata_inheritance' not in self.request_cache.data:
-                self.request_cache.data['metadata_inheritance'] = {}
-            self.request_cache.data['metadata_inheritance'][course_id] = tree
+            self._cache_metadata_inheritance_tree(course_id, stamp, tree)
+        elif self.request_cache is not None:
+            # after a hit in the caching subsystem, put it into the request_cache
+            self.request_cache.data.setdefault('metadata_inheritance', {})[course_id] = tree
 
         return tree
 
@@ -444,10 +669,119 @@ class MongoModuleStore(ModuleStoreWriteBase):
         a runtime may mean that some objects report old values for inherited data.
         """
         if course_id not in self.ignore_write_events_on_courses:
+            if self.metadata_inheritance_cache_subsystem is not None:
+                self._increment_metadata_inheritance_stamp(course_id)
             cached_metadata = self._get_cached_metadata_inheritance_tree(course_id, force_refresh=True)
             if runtime:
                 runtime.cached_metadata = cached_metadata
 
+    def _parent_inherited_metadata(self, location, tree):
+        """
+        Return the metadata that the parent of the container at location has after
+        inheritance, or None if it has no parent in the course tree.
+        """
+        for parent in self.get_parent_locations(location):
+            parent_url = parent.replace(revision=None).to_deprecated_string()
+            if parent.category == 'course':
+                root = self.collection.find_one({'_id': parent.to_deprecated_son()}, self._inheritance_record_filter())
+                if root is not None:
+                    return root.get('metadata', {})
+            elif parent_url in tree:
+                return tree[parent_url]
+        return None
+
+    def update_cached_metadata_inheritance_tree(self, location, runtime=None):
+        """
+        Update the cached metadata inheritance tree after the item at location was
+        written, recomputing only the entries for its descendents.
+
+        Leaves pass nothing down, so changing one doesn't affect the tree at all.
+        For a container, only the containers below it are fetched, one query per
+        level, rather than every container in the course.
+
+        Other processes may be updating the tree at the same time, so the updated tree is only
+        cached if the tree's edit stamp shows that nothing else was written to it since it was
+        read (see `_metadata_inheritance_stamp`). Otherwise, the next read recomputes the tree.
+
+        If given a runtime, it replaces the cached_metadata in that runtime.
+        """
+        course_id = location.course_key
+        if course_id in self.ignore_write_events_on_courses:
+            return
+
+        block_types_with_children = self._block_types_with_children()
+        if location.category not in block_types_with_children:
+            return
+
+        # parent container pointers don't differentiate between draft and non-draft
+        location = location.replace(revision=None)
+        url = location.to_deprecated_string()
+        if self.metadata_inheritance_cache_subsystem is None:
+            stamp = None
+            tree = self._get_cached_metadata_inheritance_tree(course_id)
+        else:
+            # not the request cache's tree, which may be older than the one in the caching subsystem
+            stamp = self._metadata_inheritance_stamp(course_id)
+            tree = self._load_metadata_inheritance_tree(course_id, stamp)
+            if tree is None:
+                # nothing cached to update, so compute the whole tree, which includes this write
+                self.refresh_cached_metadata_inheritance_tree(course_id, runtime)
+                return
+
+        if location.category == 'course':
+            parent_inherited = {}
+        else:
+            parent_inherited = self._parent_inherited_metadata(location, tree)
+            if parent_inherited is None:
+                # not attached to the course yet; the parent will update the tree when it is
+                return
+
+        # fetch the containers in the subtree, one level at a time
+        results_by_url = {}
+        names = [location.name]
+        while names:
+            query = SON([
+                ('_id.tag', 'i4x'),
+                ('_id.org', course_id.org),
+                ('_id.course', course_id.course),
+                ('_id.category', {'$in': list(block_types_with_children)}),
+                ('_id.name', {'$in': names}),
+            ])
+            fetched_before = set(results_by_url)
+            self._add_inheritance_records(
+                course_id, self.collection.find(query, self._inheritance_record_filter()), results_by_url
+            )
+            names = list(set(
+                course_id.make_usage_key_from_deprecated_string(child).name
+                for fetched_url in set(results_by_url) - fetched_before
+                for child in results_by_url[fetched_url].get('definition', {}).get('children', [])
+                if child not in results_by_url
+            ))
+
+        if url not in results_by_url:
+            # the container itself is gone, so nothing else can inherit through it
+            return
+
+        own_metadata = results_by_url[url].get('metadata', {})
+        if own_metadata:
+            inherited = dict(parent_inherited)
+            inherited.update(own_metadata)
+        else:
+            inherited = parent_inherited
+        if location.category != 'course':
+            tree[url] = inherited
+        self._inherit_metadata(results_by_url, url, inherited, tree)
+
+        if stamp is not None:
+            new_stamp = self._increment_metadata_inheritance_stamp(course_id)
+            if new_stamp != stamp + 1:
+                # the tree was also written by someone else, so this one may be missing their change
+                new_stamp = None
+            stamp = new_stamp
+        self._cache_metadata_inheritance_tree(course_id, stamp, tree)
+        if runtime:
+            runtime.cached_metadata = tree
+
     def _clean_item_data(self, item):
         """
         Renames the '_id' field in item to 'location'
@@ -455,17 +789,54 @@ class MongoModuleStore(ModuleStoreWriteBase):
         item['location'] = item['_id']
         del item['_id']
 
+    def _find_with_definition_data(self, query, **kwargs):
+        """
+        Return the records matching query. Everything but the definition data is fetched
+        first, then the definition data of the records which don't already have it in
+        DEFINITION_DATA_CACHE, since they were last edited, is fetched separately.
+        """
+        records = list(self.collection.find(query, {'definition.data': 0}, **kwargs))
+
+        missing = {}
+        for record in records:
+            cached = DEFINITION_DATA_CACHE.get(_definition_data_cache_key(record))
+            if cached is None:
+                missing[tuple(record['_id'].items())] = record
+            else:
+                record.setdefault('definition', {}).update(pickle.loads(cached))
+
+        if missing:
+            query = {'_id': {'$in': [record['_id'] for record in missing.itervalues()]}}
+            for fetched in self.collection.find(query, {'definition.data': 1}):
+                record = missing.get(tuple(fetched['_id'].items()))
+                if record is None:
+                    continue
+                definition = fetched.get('definition', {})
+                DEFINITION_DATA_CACHE.set(
+                    _definition_data_cache_key(record), pickle.dumps(definition, pickle.HIGHEST_PROTOCOL)
+                )
+                record.setdefault('definition', {}).update(definition)
+
+        return records
+
+    def _query_by_ids(self, ids):
+        """
+        Return the records with the given _ids, in batches of at most CHILDREN_QUERY_BATCH_SIZE
+        so that no single query or result set gets too large
+        """
+        records = []
+        for start in xrange(0, len(ids), CHILDREN_QUERY_BATCH_SIZE):
+            records.extend(
+                self._find_with_definition_data({'_id': {'$in': ids[start:start + CHILDREN_QUERY_BATCH_SIZE]}})
+            )
+        return records
+
     def _query_children_for_cache_children(self, course_key, items):
         """
         Generate a pymongo in query for finding the items and return the payloads
         """
         # first get non-draft in a round-trip
-        query = {
-            '_id': {'$in': [
-                course_key.make_usage_key_from_deprecated_string(item).to_deprecated_son() for item in items
-            ]}
-        }
-        return list(self.collection.find(query))
+        return self._query_by_ids([_child_url_to_son(item) for item in items])
 
     def _cache_children(self, course_key, items, depth=0):
         """
@@ -703,12 +1074,12 @@ class MongoModuleStore(ModuleStoreWriteBase):
             query['definition.children'] = kwargs.pop('children')
 
         query.update(kwargs)
-        items = self.collection.find(
+        items = self._find_with_definition_data(
             query,
             sort=[('_id.revision', pymongo.ASCENDING)],
         )
 
-        modules = self._load_items(course_id, list(items))
+        modules = self._load_items(course_id, items)
         return modules
 
     def create_course(self, org, offering, user_id=None, fields=None, **kwargs):
@@ -760,6 +1131,7 @@ class MongoModuleStore(ModuleStoreWriteBase):
             definition_data=overview_template.get('data')
         )
 
+        self._course_published(course_id)
         return course
 
     def delete_course(self, course_key, user_id=None):
@@ -770,6 +1142,7 @@ class MongoModuleStore(ModuleStoreWriteBase):
         """
         course_query = self._course_key_to_son(course_key)
         self.collection.remove(course_query, multi=True)
+        self._course_published(course_key)
 
     def create_xmodule(self, location, definition_data=None, metadata=None, system=None, fields={}):
         """
@@ -872,6 +1245,11 @@ class MongoModuleStore(ModuleStoreWriteBase):
         if the location doesn't exist
         """
 
+        # record when the item was edited, which is what tells DEFINITION_DATA_CACHE
+        # that what it has for this item is out of date
+        update = dict(update)
+        update['edit_info.edited_on'] = datetime.now(UTC)
+
         # See http://www.mongodb.org/display/DOCS/Updating for
         # atomic update syntax
         result = self.collection.update(
@@ -915,9 +1293,11 @@ class MongoModuleStore(ModuleStoreWriteBase):
                     static_tab['name'] = xblock.display_name
                     self.update_item(course, user_id)
 
-            # recompute (and update) the metadata inheritance tree which is cached
-            self.refresh_cached_metadata_inheritance_tree(xblock.scope_ids.usage_id.course_key, xblock.runtime)
-            # fire signal that we've written to DB
+            # update the part of the metadata inheritance tree (which is cached) below this item
+            self.update_cached_metadata_inheritance_tree(xblock.scope_ids.usage_id, xblock.runtime)
+            # fire signal that we've written to DB, unless it was only a draft
+            if xblock.scope_ids.usage_id.revision is None:
+                self._course_published(xblock.scope_ids.usage_id.course_key, xblock.scope_ids.usage_id)
         except ItemNotFoundError:
             if not allow_not_found:
                 raise
@@ -965,8 +1345,14 @@ class MongoModuleStore(ModuleStoreWriteBase):
         # Must include this to avoid the django debug toolbar (which defines the deprecated "safe=False")
         # from overriding our default value set in the init method.
         self.collection.remove({'_id': location.to_deprecated_son()}, safe=self.collection.safe)
-        # recompute (and update) the metadata inheritance tree which is cached
-        self.refresh_cached_metadata_inheritance_tree(location.course_key)
+        # update the metadata inheritance tree (which is cached) below the parents of a deleted container,
+        # since another revision of it may still be there. Deleting a leaf doesn't change the tree.
+        if location.category in self._block_types_with_children():
+            for parent in self.get_parent_locations(location.replace(revision=None)):
+                self.update_cached_metadata_inheritance_tree(parent)
+        # fire signal that we've removed published content
+        if location.revision is None:
+            self._course_published(location.course_key, location)
 
     def get_parent_locations(self, location):
         '''Find all locations that are the parents of this location in this
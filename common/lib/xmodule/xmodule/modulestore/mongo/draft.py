@@ -151,7 +151,7 @@ class DraftModuleStore(MongoModuleStore):
         except pymongo.errors.DuplicateKeyError:
             raise DuplicateItemError(original['_id'])
 
-        self.refresh_cached_metadata_inheritance_tree(draft_location.course_key)
+        self.update_cached_metadata_inheritance_tree(draft_location)
 
         return wrap_draft(self._load_items(source_location.course_key, [original])[0])
 
@@ -228,12 +228,9 @@ class DraftModuleStore(MongoModuleStore):
             to_process_dict[Location._from_deprecated_son(non_draft["_id"], course_key.run)] = non_draft
 
         # now query all draft content in another round-trip
-        query = {
-            '_id': {'$in': [
-                as_draft(course_key.make_usage_key_from_deprecated_string(item)).to_deprecated_son() for item in items
-            ]}
-        }
-        to_process_drafts = list(self.collection.find(query))
+        to_process_drafts = self._query_by_ids([
+            as_draft(course_key.make_usage_key_from_deprecated_string(item)).to_deprecated_son() for item in items
+        ])
 
         # now we have to go through all drafts and replace the non-draft
         # with the draft. This is because the semantics of the DraftStore is to
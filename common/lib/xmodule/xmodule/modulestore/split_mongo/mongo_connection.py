@@ -2,18 +2,47 @@
 Segregation of pymongo functions from the data modeling mechanisms for split modulestore.
 """
 import re
+import time
+import cPickle as pickle
+from uuid import uuid4
+
 import pymongo
 from bson import son
 
+from xmodule.util.lru_cache import LRUCache
+
+# Process-level caches of structures and definitions, pickled, and keyed by their _id.
+# The caches are bounded by the total size of the pickles. Callers modify what they get
+# back, so each get unpickles a fresh copy.
+#
+# A definition never changes once it's written, so DEFINITION_CACHE never goes out of
+# date. A structure version is almost never changed either, so STRUCTURE_CACHE is used
+# without checking with the cache subsystem. The exception is update_structure, which
+# rewrites a version in place (when a course's head version is continued, or its children
+# cleaned): the process doing so drops its own copy, and other processes drop theirs once
+# it's STRUCTURE_CACHE_MAX_AGE seconds old. Structures shared through the cache subsystem
+# are kept with the edit stamp they were read at, and only used while that is still the
+# version's stamp, so that a process which reads one after it's been rewritten gets the
+# new one.
+STRUCTURE_CACHE = LRUCache(128 * 1024 * 1024, sizeof=lambda entry: len(entry[1]))
+STRUCTURE_CACHE_MAX_AGE = 60
+DEFINITION_CACHE = LRUCache(64 * 1024 * 1024, sizeof=len)
+
+
 class MongoConnection(object):
     """
     Segregation of pymongo functions from the data modeling mechanisms for split modulestore.
     """
     def __init__(
-        self, db, collection, host, port=27017, tz_aware=True, user=None, password=None, **kwargs
+        self, db, collection, host, port=27017, tz_aware=True, user=None, password=None,
+        cache_subsystem=None, **kwargs
     ):
         """
         Create & open the connection, authenticate, and provide pointers to the collections
+
+        :param cache_subsystem: an optional cache (e.g. memcached) shared between processes, which is
+            checked for structures and definitions which aren't in this process's cache, and which
+            keeps the edit stamps of structures
         """
         self.database = pymongo.database.Database(
             pymongo.MongoClient(
@@ -40,12 +69,77 @@ class MongoConnection(object):
         self.course_index.write_concern = {'w': 1}
         self.structures.write_concern = {'w': 1}
         self.definitions.write_concern = {'w': 1}
+        self.cache_subsystem = cache_subsystem
+
+    def _get_cached(self, local_cache, kind, key):
+        """
+        Return a fresh copy of the document of kind with _id key from local_cache or the cache
+        subsystem, or None if neither has it
+        """
+        pickled = local_cache.get(key)
+        if pickled is None and self.cache_subsystem is not None:
+            pickled = self.cache_subsystem.get(self._cache_subsystem_key(kind, key))
+            if pickled is not None:
+                local_cache.set(key, pickled)
+        if pickled is None:
+            return None
+        return pickle.loads(pickled)
+
+    def _set_cached(self, local_cache, kind, document):
+        """
+        Cache document of kind in local_cache and the cache subsystem
+        """
+        pickled = pickle.dumps(document, pickle.HIGHEST_PROTOCOL)
+        local_cache.set(document['_id'], pickled)
+        if self.cache_subsystem is not None:
+            self.cache_subsystem.set(self._cache_subsystem_key(kind, document['_id']), pickled)
+
+    @staticmethod
+    def _cache_subsystem_key(kind, key):
+        """
+        The key of the document of kind (structure, structure_stamp or definition) with _id key in
+        the cache subsystem
+        """
+        return 'split_mongo.{}.{}'.format(kind, key)
+
+    def _structure_stamp(self, key):
+        """
+        Return the edit stamp of the structure with _id key, giving it one if it has none, or
+        None if the cache subsystem can't keep it
+        """
+        stamp_key = self._cache_subsystem_key('structure_stamp', key)
+        stamp = self.cache_subsystem.get(stamp_key)
+        if stamp is None:
+            self.cache_subsystem.add(stamp_key, uuid4().hex)
+            stamp = self.cache_subsystem.get(stamp_key)
+        return stamp
 
     def get_structure(self, key):
         """
         Get the structure from the persistence mechanism whose id is the given key
         """
-        return self.structures.find_one({'_id': key})
+        entry = STRUCTURE_CACHE.get(key)
+        if entry is not None and time.time() - entry[0] < STRUCTURE_CACHE_MAX_AGE:
+            return pickle.loads(entry[1])
+
+        stamp = None
+        if self.cache_subsystem is not None:
+            # The stamp is read before the structure, so that a structure rewritten after
+            # it was read is cached with a stamp which is already out of date.
+            stamp = self._structure_stamp(key)
+            if stamp is not None:
+                shared_entry = self.cache_subsystem.get(self._cache_subsystem_key('structure', key))
+                if shared_entry is not None and shared_entry[0] == stamp:
+                    STRUCTURE_CACHE.set(key, (time.time(), shared_entry[1]))
+                    return pickle.loads(shared_entry[1])
+
+        structure = self.structures.find_one({'_id': key})
+        if structure is not None:
+            pickled = pickle.dumps(structure, pickle.HIGHEST_PROTOCOL)
+            STRUCTURE_CACHE.set(key, (time.time(), pickled))
+            if stamp is not None:
+                self.cache_subsystem.set(self._cache_subsystem_key('structure', key), (stamp, pickled))
+        return structure
 
     def find_matching_structures(self, query):
         """
@@ -65,6 +159,10 @@ class MongoConnection(object):
         Update the db record for structure
         """
         self.structures.update({'_id': structure['_id']}, structure)
+        # The copy shared through the cache subsystem is out of date once its stamp changes.
+        STRUCTURE_CACHE.delete(structure['_id'])
+        if self.cache_subsystem is not None:
+            self.cache_subsystem.set(self._cache_subsystem_key('structure_stamp', structure['_id']), uuid4().hex)
 
     def get_course_index(self, key, ignore_case=False):
         """
@@ -110,7 +208,31 @@ class MongoConnection(object):
         """
         Get the definition from the persistence mechanism whose id is the given key
         """
-        return self.definitions.find_one({'_id': key})
+        definition = self._get_cached(DEFINITION_CACHE, 'definition', key)
+        if definition is None:
+            definition = self.definitions.find_one({'_id': key})
+            if definition is not None:
+                self._set_cached(DEFINITION_CACHE, 'definition', definition)
+        return definition
+
+    def get_definitions(self, keys):
+        """
+        Get the definitions whose ids are in keys, in one query for those which aren't cached
+        """
+        definitions = []
+        missing = []
+        for key in keys:
+            definition = self._get_cached(DEFINITION_CACHE, 'definition', key)
+            if definition is None:
+                missing.append(key)
+            else:
+                definitions.append(definition)
+
+        if missing:
+            for definition in self.definitions.find({'_id': {'$in': missing}}):
+                self._set_cached(DEFINITION_CACHE, 'definition', definition)
+                definitions.append(definition)
+        return definitions
 
     def find_matching_definitions(self, query):
         """
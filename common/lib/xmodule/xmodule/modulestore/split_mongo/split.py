@@ -106,15 +106,18 @@ class SplitMongoModuleStore(ModuleStoreWriteBase):
                  error_tracker=null_error_tracker,
                  loc_mapper=None,
                  i18n_service=None,
+                 course_structure_cache_subsystem=None,
                  **kwargs):
         """
         :param doc_store_config: must have a host, db, and collection entries. Other common entries: port, tz_aware.
+        :param course_structure_cache_subsystem: an optional cache (e.g. memcached) shared between processes for
+            structures and definitions, behind the per process cache
         """
 
         super(SplitMongoModuleStore, self).__init__(**kwargs)
         self.loc_mapper = loc_mapper
 
-        self.db_connection = MongoConnection(**doc_store_config)
+        self.db_connection = MongoConnection(cache_subsystem=course_structure_cache_subsystem, **doc_store_config)
         self.db = self.db_connection.database
 
         # Code review question: How should I expire entries?
@@ -155,9 +158,9 @@ class SplitMongoModuleStore(ModuleStoreWriteBase):
                 block['definition'] = DefinitionLazyLoader(self, block['category'], block['definition'])
         else:
             # Load all descendants by id
-            descendent_definitions = self.db_connection.find_matching_definitions({
-                '_id': {'$in': [block['definition']
-                                for block in new_module_data.itervalues()]}})
+            descendent_definitions = self.db_connection.get_definitions(
+                [block['definition'] for block in new_module_data.itervalues()]
+            )
             # turn into a map
             definitions = {definition['_id']: definition
                            for definition in descendent_definitions}
@@ -401,6 +401,12 @@ class TrivialCache(object):
         """
         return self.cache.get(key, default)
 
+    def add(self, key, entry):
+        """
+        mock add
+        """
+        self.cache.setdefault(key, entry)
+
     def set_many(self, entries):
         """
         mock set_many
@@ -419,3 +425,18 @@ class TrivialCache(object):
         """
         for entry in entries:
             del self.cache[entry]
+
+    def delete(self, key):
+        """
+        mock delete
+        """
+        self.cache.pop(key, None)
+
+    def incr(self, key, delta=1):
+        """
+        mock incr
+        """
+        if key not in self.cache:
+            raise ValueError("Key '{}' not found".format(key))
+        self.cache[key] += delta
+        return self.cache[key]
@@ -7,10 +7,14 @@ from path import path
 import pymongo
 import logging
 import shutil
-from tempfile import mkdtemp
+import tarfile
+import zlib
+import cPickle as pickle
+from tempfile import mkdtemp, TemporaryFile
 from uuid import uuid4
 import unittest
 import bson.son
+from mock import Mock, patch
 from xblock.core import XBlock
 
 from xblock.fields import Scope, Reference, ReferenceList, ReferenceValueDict
@@ -21,13 +25,17 @@ from xblock.plugin import Plugin
 from xmodule.tests import DATA_DIR
 from xmodule.modulestore import Location, MONGO_MODULESTORE_TYPE
 from xmodule.modulestore.mongo import MongoModuleStore, MongoKeyValueStore
+from xmodule.modulestore.mongo.base import (
+    pack_metadata_inheritance_tree, unpack_metadata_inheritance_tree, DEFINITION_DATA_CACHE
+)
 from xmodule.modulestore.draft import DraftModuleStore
 from xmodule.modulestore.locations import SlashSeparatedCourseKey, AssetLocation
-from xmodule.modulestore.xml_exporter import export_to_xml
+from xmodule.modulestore.xml_exporter import export_to_xml, export_to_tarball
 from xmodule.modulestore.xml_importer import import_from_xml, perform_xlint
 from xmodule.contentstore.mongo import MongoContentStore
 
 from xmodule.modulestore.tests.test_modulestore import check_path_to_location
+from xmodule.modulestore.tests.test_location_mapper import TrivialCache
 from nose.tools import assert_in
 from xmodule.exceptions import NotFoundError
 from git.test.lib.asserts import assert_not_none
@@ -396,6 +404,155 @@ class TestMongoModuleStore(unittest.TestCase):
         check_xblock_fields()
         check_mongo_fields()
 
+    def test_update_cached_metadata_inheritance_tree(self):
+        """
+        Updating the inheritance tree below a container should give the same
+        tree as recomputing it for the whole course.
+        """
+        course_key = SlashSeparatedCourseKey('edX', 'simple', '2012_Fall')
+        full_tree = self.store._compute_metadata_inheritance_tree(course_key)
+        chapter_location = course_key.make_usage_key('chapter', 'chapter_2')
+        sequential_url = course_key.make_usage_key('sequential', 'test_sequence').to_deprecated_string()
+        html_url = course_key.make_usage_key('html', 'test_html').to_deprecated_string()
+        assert_in(sequential_url, full_tree)
+        assert_in(html_url, full_tree)
+
+        # start from a cached tree which is out of date below the chapter
+        stale_tree = dict(full_tree)
+        stale_tree[sequential_url] = {'graceperiod': 'stale'}
+        del stale_tree[html_url]
+        self.store.request_cache = Mock(data={'metadata_inheritance': {course_key: stale_tree}})
+        try:
+            self.store.update_cached_metadata_inheritance_tree(chapter_location)
+            assert_equals(
+                self.store.request_cache.data['metadata_inheritance'][course_key],
+                full_tree
+            )
+        finally:
+            self.store.request_cache = None
+
+    def test_update_shared_metadata_inheritance_tree(self):
+        """
+        An updated tree should only replace the one in the caching subsystem if
+        nothing else was written to the tree since it was read.
+        """
+        course_key = SlashSeparatedCourseKey('edX', 'simple', '2012_Fall')
+        chapter_location = course_key.make_usage_key('chapter', 'chapter_2')
+        self.store.metadata_inheritance_cache_subsystem = TrivialCache()
+        try:
+            full_tree = self.store._get_cached_metadata_inheritance_tree(course_key)
+            stamp = self.store._metadata_inheritance_stamp(course_key)
+            assert_equals(self.store._load_metadata_inheritance_tree(course_key, stamp), full_tree)
+
+            self.store.update_cached_metadata_inheritance_tree(chapter_location)
+            stamp = self.store._metadata_inheritance_stamp(course_key)
+            assert_equals(self.store._load_metadata_inheritance_tree(course_key, stamp), full_tree)
+
+            # another process writes to the tree while this one is updating it
+            increment_stamp = self.store._increment_metadata_inheritance_stamp
+
+            def increment_stamp_twice(course_id):
+                """Increment the stamp for the other process, and then for this one."""
+                increment_stamp(course_id)
+                return increment_stamp(course_id)
+
+            with patch.object(self.store, '_increment_metadata_inheritance_stamp', increment_stamp_twice):
+                self.store.update_cached_metadata_inheritance_tree(chapter_location)
+            stamp = self.store._metadata_inheritance_stamp(course_key)
+            assert_equals(self.store._load_metadata_inheritance_tree(course_key, stamp), None)
+
+            # so the next read recomputes the tree
+            assert_equals(self.store._get_cached_metadata_inheritance_tree(course_key), full_tree)
+            assert_equals(self.store._load_metadata_inheritance_tree(course_key, stamp), full_tree)
+        finally:
+            self.store.metadata_inheritance_cache_subsystem = None
+
+    def test_pack_metadata_inheritance_tree(self):
+        """
+        The packed tree should unpack to an equal tree which still shares its metadata dicts.
+        """
+        course_key = SlashSeparatedCourseKey('edX', 'simple', '2012_Fall')
+        tree = self.store._compute_metadata_inheritance_tree(course_key)
+        unpacked = unpack_metadata_inheritance_tree(course_key, pack_metadata_inheritance_tree(course_key, tree))
+        assert_equals(unpacked, tree)
+
+        # leaves share the metadata of their parent
+        vertical_url = course_key.make_usage_key('vertical', 'test_vertical').to_deprecated_string()
+        html_url = course_key.make_usage_key('html', 'test_html').to_deprecated_string()
+        assert_true(unpacked[html_url] is unpacked[vertical_url])
+
+        # trees cached in an older format are treated as missing
+        assert_equals(unpack_metadata_inheritance_tree(course_key, tree), None)
+        assert_equals(unpack_metadata_inheritance_tree(course_key, None), None)
+
+    def test_pack_metadata_inheritance_tree_equal_frames(self):
+        """
+        Equal but distinct metadata dicts should be packed as one frame, unlike dicts
+        whose values only compare equal across types.
+        """
+        course_key = SlashSeparatedCourseKey('edX', 'simple', '2012_Fall')
+        urls = [
+            course_key.make_usage_key('html', name).to_deprecated_string()
+            for name in ('first', 'second', 'third')
+        ]
+        tree = {
+            urls[0]: {'graded': True, 'xqa_key': None, 'days_early_for_beta': [1, {'a': 2}]},
+            urls[1]: {'days_early_for_beta': [1, {'a': 2}], 'xqa_key': None, 'graded': True},
+            urls[2]: {'graded': 1, 'xqa_key': None, 'days_early_for_beta': [1, {'a': 2}]},
+        }
+        packed = pack_metadata_inheritance_tree(course_key, tree)
+        __, frames, __ = pickle.loads(zlib.decompress(packed[1]))
+        assert_equals(len(frames), 2)
+
+        unpacked = unpack_metadata_inheritance_tree(course_key, packed)
+        assert_equals(unpacked, tree)
+        assert_true(unpacked[urls[0]] is unpacked[urls[1]])
+        assert_equals(type(unpacked[urls[2]]['graded']), int)
+
+    def test_definition_data_cache(self):
+        """
+        Loading a course a second time should take the definition data from the
+        process-level cache, and give the same content.
+        """
+        course_key = SlashSeparatedCourseKey('edX', 'toy', '2012_Fall')
+        DEFINITION_DATA_CACHE.clear()
+        htmls = self.store.get_items(course_key, category='html')
+        assert_greater(len(DEFINITION_DATA_CACHE), 0)
+
+        with patch.object(DEFINITION_DATA_CACHE, 'set') as mock_set:
+            cached_htmls = self.store.get_items(course_key, category='html')
+            assert_false(mock_set.called)
+        assert_equals(
+            sorted((html.location, html.data) for html in htmls),
+            sorted((html.location, html.data) for html in cached_htmls)
+        )
+
+    def test_definition_data_cache_unstamped_records(self):
+        """
+        Records which haven't been edited since edits were stamped should still have
+        their definition data cached, rather than fetched in a second query every time.
+        """
+        course_key = SlashSeparatedCourseKey('edX', 'toy', '2012_Fall')
+        query = {'_id.org': 'edX', '_id.course': 'toy', '_id.category': 'html'}
+        unstamped = list(self.store.collection.find(query, {'edit_info': 1}))
+        self.store.collection.update(query, {'$unset': {'edit_info': True}}, multi=True)
+        self.addCleanup(self._restore_edit_info, unstamped)
+        DEFINITION_DATA_CACHE.clear()
+        self.store.get_items(course_key, category='html')
+        assert_greater(len(DEFINITION_DATA_CACHE), 0)
+
+        with patch.object(DEFINITION_DATA_CACHE, 'set') as mock_set:
+            self.store.get_items(course_key, category='html')
+            assert_false(mock_set.called)
+
+    def _restore_edit_info(self, records):
+        """
+        Put back the edit_info of records, as they were before a test removed it
+        """
+        for record in records:
+            if 'edit_info' in record:
+                self.store.collection.update({'_id': record['_id']}, {'$set': {'edit_info': record['edit_info']}})
+
     def test_export_course_image(self):
         """
         Test to make sure that we have a course image in the contentstore,
@@ -431,6 +588,44 @@ class TestMongoModuleStore(unittest.TestCase):
         finally:
             shutil.rmtree(root_dir)
 
+    def test_export_to_tarball(self):
+        """
+        Make sure that exporting straight to a tar.gz file writes the same files as exporting to a directory
+        """
+        course_key = SlashSeparatedCourseKey('edX', 'toy', '2012_Fall')
+        root_dir = path(mkdtemp())
+        try:
+            export_to_xml(self.store, self.content_store, course_key, root_dir, 'test_export')
+            exported_paths = set(
+                root_dir.relpathto(exported_path) for exported_path in (root_dir / 'test_export').walk()
+            )
+            exported_paths.add('test_export')
+        finally:
+            shutil.rmtree(root_dir)
+
+        added = []
+        with TemporaryFile() as output_file:
+            with patch.object(self.content_store, 'find', wraps=self.content_store.find) as find:
+                export_to_tarball(
+                    self.store, self.content_store, course_key, output_file, 'test_export',
+                    on_add=lambda file_path, size: added.append(file_path)
+                )
+            # assets are streamed into the archive rather than read into memory whole
+            assert_true(find.called)
+            for __, kwargs in find.call_args_list:
+                assert_true(kwargs.get('as_stream'))
+
+            output_file.seek(0)
+            with tarfile.open(fileobj=output_file, mode='r:gz') as tar_file:
+                assert_equals(set(tar_file.getnames()), exported_paths)
+                assert_equals(
+                    added, [member.name for member in tar_file.getmembers() if member.isfile()]
+                )
+                assert_in('<course', tar_file.extractfile('test_export/course.xml').read())
+
+                asset = self.content_store.find(course_key.make_asset_key('asset', 'sample_static.txt'))
+                assert_equals(tar_file.extractfile('test_export/static/sample_static.txt').read(), asset.data)
+
     def test_course_without_image(self):
         """
         Make sure we elegantly passover our code when there isn't a static
@@ -9,6 +9,8 @@ from path import path
 import re
 import random
 
+from mock import patch
+
 from xblock.fields import Scope
 from xmodule.course_module import CourseDescriptor
 from xmodule.modulestore.exceptions import (InsufficientSpecificationError, ItemNotFoundError, VersionConflictError,
@@ -18,7 +20,9 @@ from xmodule.modulestore.inheritance import InheritanceMixin
 from xmodule.x_module import XModuleMixin
 from xmodule.fields import Date, Timedelta
 from xmodule.modulestore.split_mongo.split import SplitMongoModuleStore
+from xmodule.modulestore.split_mongo.mongo_connection import STRUCTURE_CACHE, STRUCTURE_CACHE_MAX_AGE
 from xmodule.modulestore.tests.test_modulestore import check_has_course_method
+from xmodule.modulestore.tests.test_location_mapper import TrivialCache
 
 
 class SplitModuleTest(unittest.TestCase):
@@ -36,7 +40,8 @@ class SplitModuleTest(unittest.TestCase):
     modulestore_options = {
         'default_class': 'xmodule.raw_module.RawDescriptor',
         'fs_root': '',
-        'xblock_mixins': (InheritanceMixin, XModuleMixin)
+        'xblock_mixins': (InheritanceMixin, XModuleMixin),
+        'course_structure_cache_subsystem': TrivialCache(),
     }
 
     MODULESTORE = {
@@ -632,6 +637,65 @@ class SplitModuleCourseTests(SplitModuleTest):
         self.assertIn('chapter1', block_map)
         self.assertIn('problem3_2', block_map)
 
+    def test_structure_cache(self):
+        """
+        Test that structures are only fetched from the db once per process, and that
+        changing a fetched structure doesn't change the cached one.
+        """
+        locator = CourseLocator(org='testx', offering='GreekHero', branch='draft')
+        version_guid = modulestore().get_course(locator).location.version_guid
+        db_connection = modulestore().db_connection
+        STRUCTURE_CACHE.clear()
+        db_connection.cache_subsystem.cache.clear()
+
+        with patch.object(db_connection.structures, 'find_one', wraps=db_connection.structures.find_one) as find_one:
+            structure = db_connection.get_structure(version_guid)
+            structure['blocks'].clear()
+            # the process's copy is used without a round trip to the cache subsystem
+            with patch.object(db_connection.cache_subsystem, 'get') as cache_subsystem_get:
+                cached_structure = db_connection.get_structure(version_guid)
+            self.assertFalse(cache_subsystem_get.called)
+            self.assertEqual(find_one.call_count, 1)
+        self.assertEqual(cached_structure['_id'], version_guid)
+        self.assertNotEqual(cached_structure['blocks'], {})
+
+    def test_structure_cache_without_cache_subsystem(self):
+        """
+        Test that structures are cached in the process without a cache subsystem too.
+        """
+        locator = CourseLocator(org='testx', offering='GreekHero', branch='draft')
+        version_guid = modulestore().get_course(locator).location.version_guid
+        db_connection = modulestore().db_connection
+        STRUCTURE_CACHE.clear()
+
+        with patch.object(db_connection, 'cache_subsystem', None):
+            with patch.object(db_connection.structures, 'find_one', wraps=db_connection.structures.find_one) as find_one:
+                db_connection.get_structure(version_guid)
+                db_connection.get_structure(version_guid)
+                self.assertEqual(find_one.call_count, 1)
+
+    def test_structure_cache_rewritten_version(self):
+        """
+        Test that a structure version rewritten in place is no longer served from the cache
+        of the process which rewrote it, nor from other processes' once their copy is
+        STRUCTURE_CACHE_MAX_AGE old.
+        """
+        locator = CourseLocator(org='testx', offering='GreekHero', branch='draft')
+        version_guid = modulestore().get_course(locator).location.version_guid
+        db_connection = modulestore().db_connection
+        structure = db_connection.get_structure(version_guid)
+        cached_at, stale_pickle = STRUCTURE_CACHE.get(version_guid)
+
+        structure['blocks'].clear()
+        db_connection.update_structure(structure)
+        self.assertEqual(db_connection.get_structure(version_guid)['blocks'], {})
+
+        # As if another process still had the structure from before it was rewritten.
+        STRUCTURE_CACHE.set(version_guid, (cached_at, stale_pickle))
+        self.assertNotEqual(db_connection.get_structure(version_guid)['blocks'], {})
+        STRUCTURE_CACHE.set(version_guid, (cached_at - STRUCTURE_CACHE_MAX_AGE, stale_pickle))
+        self.assertEqual(db_connection.get_structure(version_guid)['blocks'], {})
+
     def test_course_successors(self):
         """
         get_course_successors(course_locator, version_history_depth=1)
@@ -15,7 +15,11 @@ import json
 import datetime
 import os
 from path import path
+import posixpath
 import shutil
+from StringIO import StringIO
+import tarfile
+import time
 
 DRAFT_DIR = "drafts"
 PUBLISHED_DIR = "published"
@@ -59,11 +63,34 @@ def export_to_xml(modulestore, contentstore, course_key, root_dir, course_dir, d
     `draft_modulestore`: An optional `DraftModuleStore` that contains draft content, which will be exported
         alongside the public content in the course.
     """
+    fsm = OSFS(root_dir)
+    export_to_fs(modulestore, contentstore, course_key, fsm.makeopendir(course_dir), draft_modulestore)
+
 
+def export_to_tarball(modulestore, contentstore, course_key, output_file, course_dir, draft_modulestore=None,
+                      on_add=None):
+    """
+    Export the course like `export_to_xml`, but straight into a gzipped tar archive written to
+    `output_file`, rather than to a directory on disk.
+
+    `output_file`: The file-like object to write the archive to. It is only written to in order, so it
+        can be a stream.
+    `course_dir`: The name of the directory in the archive to write the course content to
+    `on_add`: An optional function, called with the path and size of each file as it's added to the archive
+    """
+    with tarfile.open(fileobj=output_file, mode='w|gz') as tar_file:
+        tar_fs = TarExportFS(tar_file, on_add=on_add)
+        export_to_fs(modulestore, contentstore, course_key, tar_fs.makeopendir(course_dir), draft_modulestore)
+
+
+def export_to_fs(modulestore, contentstore, course_key, export_fs, draft_modulestore=None):
+    """
+    Export the course like `export_to_xml`, to `export_fs`, the pyfilesystem object (or `TarExportFS`)
+    of the directory to write the course content to.
+    """
     course = modulestore.get_course(course_key)
 
-    fsm = OSFS(root_dir)
-    export_fs = course.runtime.export_fs = fsm.makeopendir(course_dir)
+    course.runtime.export_fs = export_fs
 
     root = lxml.etree.Element('unknown')
     course.add_xml_to_node(root)
@@ -74,11 +101,9 @@ def export_to_xml(modulestore, contentstore, course_key, root_dir, course_dir, d
     # export the static assets
     policies_dir = export_fs.makeopendir('policies')
     if contentstore:
-        contentstore.export_all_for_course(
-            course_key,
-            root_dir + '/' + course_dir + '/static/',
-            root_dir + '/' + course_dir + '/policies/assets.json',
-        )
+        assets_policy = contentstore.export_all_for_course_to_fs(course_key, export_fs.makeopendir('static'))
+        with policies_dir.open('assets.json', 'w') as assets_policy_file:
+            json.dump(assets_policy, assets_policy_file)
 
         # If we are using the default course image, export it to the
         # legacy location to support backwards compatibility.
@@ -93,10 +118,8 @@ def export_to_xml(modulestore, contentstore, course_key, root_dir, course_dir, d
             except NotFoundError:
                 pass
             else:
-                output_dir = root_dir + '/' + course_dir + '/static/images/'
-                if not os.path.isdir(output_dir):
-                    os.makedirs(output_dir)
-                with OSFS(output_dir).open('course_image.jpg', 'wb') as course_image_file:
+                export_fs.makedir('static/images', recursive=True, allow_recreate=True)
+                with export_fs.open('static/images/course_image.jpg', 'wb') as course_image_file:
                     course_image_file.write(course_image.data)
 
     # export the static tabs
@@ -143,6 +166,132 @@ def export_to_xml(modulestore, contentstore, course_key, root_dir, course_dir, d
                     draft_vertical.add_xml_to_node(node)
 
 
+class TarExportFS(object):
+    """
+    A write-only stand-in for the pyfilesystem object of a directory, which adds the files
+    written to it to a tar archive as soon as they're closed, instead of writing them to disk.
+
+    It has the parts of the pyfilesystem interface that exporting courses uses: `open` (for
+    writing), `makedir`, `makeopendir` and `exists`. Files written through `open` are held
+    in memory until they're closed, which suits the XML and JSON files of a course; big
+    files, like assets, should be added with `write_stream` instead.
+    """
+    def __init__(self, tar_file, root='', on_add=None, paths=None):
+        """
+        `tar_file`: The `TarFile` to add the files to
+        `root`: The path of this directory in the archive
+        `on_add`: An optional function, called with the path and size of each file added
+        """
+        self.tar_file = tar_file
+        self.root = root
+        self.on_add = on_add
+        # The paths of everything in the archive, shared by all of its directories.
+        self.paths = paths if paths is not None else set()
+
+    def _path(self, path):
+        """The path in the archive of `path` in this directory"""
+        return posixpath.normpath(posixpath.join(self.root, path.lstrip('/')))
+
+    def exists(self, path):
+        return self._path(path) in self.paths
+
+    def open(self, path, mode='r', **kwargs):  # pylint: disable=unused-argument
+        if 'w' not in mode:
+            raise ValueError("Files of an export can only be written")
+        return _TarExportFile(self, path)
+
+    def makedir(self, path, recursive=False, allow_recreate=False):  # pylint: disable=unused-argument
+        # Directories are always made recursively, and remade without complaint.
+        self._add_directory(self._path(path))
+
+    def makeopendir(self, path, recursive=False):  # pylint: disable=unused-argument
+        self.makedir(path)
+        return TarExportFS(self.tar_file, self._path(path), self.on_add, self.paths)
+
+    def add_file(self, path, data):
+        """Add a file at `path` in this directory, containing the string `data`, to the archive"""
+        self.write_stream(path, [data], len(data))
+
+    def write_stream(self, path, chunks, size):
+        """
+        Add a file at `path` in this directory to the archive, containing the iterable of
+        string `chunks`, which are `size` bytes long in all. The chunks are copied to the
+        archive as they're read, rather than held in memory.
+        """
+        file_path = self._path(path)
+        self._add_directory(posixpath.dirname(file_path))
+        file_info = tarfile.TarInfo(file_path)
+        file_info.size = size
+        file_info.mode = 0644
+        file_info.mtime = time.time()
+        self.tar_file.addfile(file_info, _ChunksFile(chunks))
+        self.paths.add(file_path)
+        if self.on_add is not None:
+            self.on_add(file_path, file_info.size)
+
+    def _add_directory(self, dir_path):
+        """Add the directory at `dir_path` in the archive, and its parents, unless they're there already"""
+        if dir_path in ('', '.') or dir_path in self.paths:
+            return
+        self._add_directory(posixpath.dirname(dir_path))
+        dir_info = tarfile.TarInfo(dir_path)
+        dir_info.type = tarfile.DIRTYPE
+        dir_info.mode = 0755
+        dir_info.mtime = time.time()
+        self.tar_file.addfile(dir_info)
+        self.paths.add(dir_path)
+
+
+class _ChunksFile(object):
+    """
+    A readable file of an iterable of string chunks, for `TarFile.addfile` to copy from.
+    """
+    def __init__(self, chunks):
+        self.chunks = iter(chunks)
+        self.pending = ''
+
+    def read(self, size=-1):
+        while size < 0 or len(self.pending) < size:
+            chunk = next(self.chunks, None)
+            if chunk is None:
+                break
+            self.pending += chunk
+        if size < 0:
+            size = len(self.pending)
+        data, self.pending = self.pending[:size], self.pending[size:]
+        return data
+
+
+class _TarExportFile(object):
+    """
+    A file being written to a `TarExportFS`, which is added to its archive when it's closed.
+    """
+    def __init__(self, export_fs, path):
+        self.export_fs = export_fs
+        self.path = path
+        self.buffer = StringIO()
+
+    def write(self, data):
+        self.buffer.write(data)
+
+    def writelines(self, lines):
+        self.buffer.writelines(lines)
+
+    def flush(self):
+        pass
+
+    def close(self):
+        if self.buffer is not None:
+            self.export_fs.add_file(self.path, self.buffer.getvalue())
+            self.buffer = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
 def _export_field_content(xblock_item, item_dir):
     """
     Export all fields related to 'xblock_item' other than 'metadata' and 'data' to json file in provided directory
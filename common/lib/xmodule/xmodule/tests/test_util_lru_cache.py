@@ -0,0 +1,61 @@
+"""
+Tests for xmodule.util.lru_cache
+"""
+import unittest
+
+from xmodule.util.lru_cache import LRUCache
+
+
+class LRUCacheTest(unittest.TestCase):
+    """
+    Tests for LRUCache
+    """
+    def test_get_and_set(self):
+        cache = LRUCache(2)
+        cache.set('a', 1)
+        self.assertEqual(cache.get('a'), 1)
+        self.assertEqual(cache.get('b'), None)
+        self.assertEqual(cache.get('b', 'default'), 'default')
+
+    def test_evicts_least_recently_used(self):
+        cache = LRUCache(2)
+        cache.set('a', 1)
+        cache.set('b', 2)
+        # reading 'a' makes 'b' the least recently used
+        cache.get('a')
+        cache.set('c', 3)
+        self.assertIn('a', cache)
+        self.assertNotIn('b', cache)
+        self.assertIn('c', cache)
+        self.assertEqual(len(cache), 2)
+
+    def test_sizeof(self):
+        cache = LRUCache(10, sizeof=len)
+        cache.set('a', 'x' * 6)
+        cache.set('b', 'x' * 4)
+        self.assertEqual(len(cache), 2)
+        cache.set('c', 'x')
+        self.assertNotIn('a', cache)
+
+        # a value bigger than the whole cache isn't kept, and doesn't evict anything
+        cache.set('d', 'x' * 11)
+        self.assertNotIn('d', cache)
+        self.assertIn('b', cache)
+
+    def test_replace(self):
+        cache = LRUCache(10, sizeof=len)
+        cache.set('a', 'x' * 6)
+        cache.set('a', 'x' * 8)
+        cache.set('b', 'x' * 2)
+        self.assertEqual(cache.get('a'), 'x' * 8)
+        self.assertIn('b', cache)
+
+    def test_delete_and_clear(self):
+        cache = LRUCache(2)
+        cache.set('a', 1)
+        cache.set('b', 2)
+        cache.delete('a')
+        cache.delete('missing')
+        self.assertNotIn('a', cache)
+        cache.clear()
+        self.assertEqual(len(cache), 0)
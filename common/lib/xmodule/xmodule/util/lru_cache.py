@@ -0,0 +1,79 @@
+"""
+A size-bounded, thread-safe, least recently used cache for process-level caching.
+"""
+from collections import OrderedDict
+import threading
+
+
+class LRUCache(object):
+    """
+    A dict-like cache which holds values up to a total size of max_size, evicting
+    the least recently used ones to make room.
+
+    The size of each value is given by sizeof, which defaults to counting each
+    value as 1, making max_size the most values to keep.
+    """
+    def __init__(self, max_size, sizeof=None):
+        self.max_size = max_size
+        self._sizeof = sizeof or (lambda value: 1)
+        self._entries = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        """
+        Return the value for key, marking it as most recently used, or default if it isn't cached
+        """
+        with self._lock:
+            try:
+                value, size = self._entries.pop(key)
+            except KeyError:
+                return default
+            self._entries[key] = (value, size)
+            return value
+
+    def set(self, key, value):
+        """
+        Cache value for key, unless it is bigger than the whole cache
+        """
+        size = self._sizeof(value)
+        with self._lock:
+            self._remove(key)
+            if size > self.max_size:
+                return
+            self._entries[key] = (value, size)
+            self._size += size
+            while self._size > self.max_size:
+                __, (__, evicted_size) = self._entries.popitem(last=False)
+                self._size -= evicted_size
+
+    def delete(self, key):
+        """
+        Remove key from the cache, if it's there
+        """
+        with self._lock:
+            self._remove(key)
+
+    def clear(self):
+        """
+        Remove everything from the cache
+        """
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
+
+    def __contains__(self, key):
+        with self._lock:
+            return key in self._entries
+
+    def __len__(self):
+        with self._lock:
+            return len(self._entries)
+
+    def _remove(self, key):
+        """
+        Remove key from the cache. The caller must hold the lock.
+        """
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._size -= entry[1]
@@ -1,18 +1,14 @@
-from xmodule.modulestore.django import modulestore
-from xmodule.course_module import CourseDescriptor
 from django.conf import settings
 
+from course_overviews.models import CourseOverview
 from microsite_configuration import microsite
 
 
 def get_visible_courses():
     """
-    Return the set of CourseDescriptors that should be visible in this branded instance
+    Return the set of CourseOverviews of the courses that should be visible in this branded instance
     """
-    _courses = modulestore().get_courses()
-
-    courses = [c for c in _courses
-               if isinstance(c, CourseDescriptor)]
+    courses = CourseOverview.get_all_courses()
     courses = sorted(courses, key=lambda course: course.number)
 
     subdomain = microsite.get_value('subdomain', 'default')
@@ -166,9 +166,10 @@ class CourseEmailTemplate(models.Model):
             raise
 
     @staticmethod
-    def _render(format_string, message_body, context):
+    def _fill(format_string, message_body, context):
         """
-        Create a text message using a template, message body and context.
+        Create a text message using a template, message body and context,
+        without wrapping its lines.
 
         Convert message body (`message_body`) into an email message
         using the provided template.  The template is a format string,
@@ -181,10 +182,6 @@ class CourseEmailTemplate(models.Model):
         Instead, for now, we insert the message body *after* the substitutions
         have been performed, so that anything in the message body that might
         interfere will be innocently returned as-is.
-
-        Output is returned as a unicode string.  It is not encoded as utf-8.
-        Such encoding is left to the email code, which will use the value
-        of settings.DEFAULT_CHARSET to encode the message.
         """
         # If we wanted to support substitution, we'd call:
         # format_string = format_string.replace(COURSE_EMAIL_MESSAGE_BODY_TAG, message_body)
@@ -193,10 +190,21 @@ class CourseEmailTemplate(models.Model):
         # "formatted", so we need to do the same to the tag being
         # searched for.
         message_body_tag = COURSE_EMAIL_MESSAGE_BODY_TAG.format()
-        result = result.replace(message_body_tag, message_body, 1)
+        return result.replace(message_body_tag, message_body, 1)
 
-        # finally, return the result, after wrapping long lines and without converting to an encoded byte array.
-        return wrap_message(result)
+    @staticmethod
+    def _render(format_string, message_body, context):
+        """
+        Create a text message using a template, message body and context.
+
+        See `_fill`.
+
+        Output is returned as a unicode string.  It is not encoded as utf-8.
+        Such encoding is left to the email code, which will use the value
+        of settings.DEFAULT_CHARSET to encode the message.
+        """
+        # return the result, after wrapping long lines and without converting to an encoded byte array.
+        return wrap_message(CourseEmailTemplate._fill(format_string, message_body, context))
 
     def render_plaintext(self, plaintext, context):
         """
@@ -216,6 +224,90 @@ class CourseEmailTemplate(models.Model):
         """
         return CourseEmailTemplate._render(self.html_template, htmltext, context)
 
+    def compile_plaintext(self, plaintext, context):
+        """
+        Create a CompiledEmailTemplate, which renders plain text messages
+        like `render_plaintext`, with the values in `context` for all of
+        its recipients.
+        """
+        return CompiledEmailTemplate(self.plain_template, plaintext, context)
+
+    def compile_htmltext(self, htmltext, context):
+        """
+        Create a CompiledEmailTemplate, which renders HTML text messages
+        like `render_htmltext`, with the values in `context` for all of
+        its recipients.
+        """
+        return CompiledEmailTemplate(self.html_template, htmltext, context)
+
+
+class CompiledEmailTemplate(object):
+    """
+    A course email template, filled in with a message body and the context
+    which is the same for all of the message's recipients.
+
+    The message is kept as lines which are ready to send, and lines with slots
+    for the values in RECIPIENT_CONTEXT_KEYS, so rendering it for a recipient
+    only has to fill in (and wrap) the lines with slots.  Rendering gives the
+    same result as CourseEmailTemplate._render does.
+    """
+
+    # The context keys whose values are different for each recipient.
+    RECIPIENT_CONTEXT_KEYS = ('name', 'email')
+
+    def __init__(self, format_string, message_body, context):
+        self.format_string = format_string
+        self.message_body = message_body
+        self.context = context
+
+        # Slots are marked with characters that can't appear in the template's output otherwise.
+        self.slots = {key: u'\x00{}\x00'.format(key) for key in self.RECIPIENT_CONTEXT_KEYS}
+        filled = CourseEmailTemplate._fill(format_string, message_body, dict(context, **self.slots))
+
+        # A list of (text, has_slots), where consecutive lines without slots are wrapped and joined.
+        self.segments = []
+        static_lines = []
+        for line in filled.split('\n'):
+            if any(slot in line for slot in self.slots.itervalues()):
+                if static_lines:
+                    self.segments.append((wrap_message(u'\n'.join(static_lines)), False))
+                    static_lines = []
+                self.segments.append((line, True))
+            else:
+                static_lines.append(line)
+        if static_lines:
+            self.segments.append((wrap_message(u'\n'.join(static_lines)), False))
+
+        # Format specs in the template (like "{name:>20}") would have been applied to the slots
+        # rather than the values, so check a sample, and render in full if it doesn't match.
+        sample_context = {'name': u'Sample Name', 'email': u'sample@example.com'}
+        if self.render(sample_context) != self._render_uncompiled(sample_context):
+            log.warning("Course email template can't be compiled; rendering each message in full")
+            self.segments = None
+
+    def _render_uncompiled(self, recipient_context):
+        """Render the message for a recipient with CourseEmailTemplate._render"""
+        return CourseEmailTemplate._render(self.format_string, self.message_body, dict(self.context, **recipient_context))
+
+    def render(self, recipient_context):
+        """
+        Render the message for the recipient whose values for RECIPIENT_CONTEXT_KEYS
+        are in `recipient_context`.
+        """
+        values = {key: u'{}'.format(recipient_context[key]) for key in self.RECIPIENT_CONTEXT_KEYS}
+        # Values with line breaks would change how lines are wrapped.
+        if self.segments is None or any(u'\n' in value for value in values.itervalues()):
+            return self._render_uncompiled(recipient_context)
+
+        rendered = []
+        for text, has_slots in self.segments:
+            if has_slots:
+                for key, slot in self.slots.iteritems():
+                    text = text.replace(slot, values[key])
+                text = wrap_message(text)
+            rendered.append(text)
+        return u'\n'.join(rendered)
+
 
 class CourseAuthorization(models.Model):
     """
@@ -245,6 +337,17 @@ class CourseAuthorization(models.Model):
         except cls.DoesNotExist:
             return False
 
+    @classmethod
+    def instructor_email_enabled_for_courses(cls, course_ids):
+        """
+        Returns the set of the given course ids for which email is enabled,
+        using one query.
+        """
+        if not settings.FEATURES['REQUIRE_COURSE_EMAIL_AUTH']:
+            return set(course_ids)
+
+        return set(record.course_id for record in cls.objects.filter(course_id__in=course_ids, email_enabled=True))
+
     def __unicode__(self):
         not_en = "Not "
         if self.email_enabled:
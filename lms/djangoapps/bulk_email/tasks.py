@@ -5,7 +5,9 @@ to a course.
 import re
 import random
 import json
-from time import sleep
+import sys
+import threading
+from time import sleep, time
 
 from dogapi import dog_stats_api
 from smtplib import SMTPServerDisconnected, SMTPDataError, SMTPConnectError, SMTPException
@@ -433,28 +435,25 @@ def _send_course_email(entry_id, email_id, to_list, global_email_context, subtas
     from_addr = _get_source_address(course_email.course_id, course_title)
 
     course_email_template = CourseEmailTemplate.get_template()
+    connections = []
     try:
-        connection = get_connection()
-        connection.open()
-
-        # Define context values to use in all course emails:
-        email_context = {'name': '', 'email': ''}
-        email_context.update(global_email_context)
-
-        while to_list:
-            # Update context with user-specific values from the user at the end of the list.
-            # At the end of processing this user, they will be popped off of the to_list.
-            # That way, the to_list will always contain the recipients remaining to be emailed.
-            # This is convenient for retries, which will need to send to those who haven't
-            # yet been emailed, but not send to those who have already been sent to.
-            current_recipient = to_list[-1]
-            email = current_recipient['email']
-            email_context['email'] = email
-            email_context['name'] = current_recipient['profile__name']
-
-            # Construct message content using templates and context:
-            plaintext_msg = course_email_template.render_plaintext(course_email.text_message, email_context)
-            html_msg = course_email_template.render_htmltext(course_email.html_message, email_context)
+        # Compile the templates with the context values to use in all course emails:
+        plaintext_template = course_email_template.compile_plaintext(course_email.text_message, global_email_context)
+        html_template = course_email_template.compile_htmltext(course_email.html_message, global_email_context)
+
+        def send_email(connection, recipient):
+            """
+            Sends the email to `recipient` over `connection`.
+
+            Returns the subtask status counter to increment: 'succeeded' or 'failed'.
+            Errors that should stop the sending of the rest of the emails are raised.
+            """
+            email = recipient['email']
+
+            # Construct message content using templates and user-specific values:
+            recipient_context = {'email': email, 'name': recipient['profile__name']}
+            plaintext_msg = plaintext_template.render(recipient_context)
+            html_msg = html_template.render(recipient_context)
 
             # Create email:
             email_msg = EmailMultiAlternatives(
@@ -466,14 +465,6 @@ def _send_course_email(entry_id, email_id, to_list, global_email_context, subtas
             )
             email_msg.attach_alternative(html_msg, 'text/html')
 
-            # Throttle if we have gotten the rate limiter.  This is not very high-tech,
-            # but if a task has been retried for rate-limiting reasons, then we sleep
-            # for a period of time between all emails within this task.  Choice of
-            # the value depends on the number of workers that might be sending email in
-            # parallel, and what the SES throttle rate is.
-            if subtask_status.retried_nomax > 0:
-                sleep(settings.BULK_EMAIL_RETRY_DELAY_BETWEEN_SENDS)
-
             try:
                 log.debug('Email with id %s to be sent to %s', email_id, email)
 
@@ -489,13 +480,13 @@ def _send_course_email(entry_id, email_id, to_list, global_email_context, subtas
                     # This will fall through and not retry the message.
                     log.warning('Task %s: email with id %s not delivered to %s due to error %s', task_id, email_id, email, exc.smtp_error)
                     dog_stats_api.increment('course_email.error', tags=[_statsd_tag(course_title)])
-                    subtask_status.increment(failed=1)
+                    return 'failed'
 
             except SINGLE_EMAIL_FAILURE_ERRORS as exc:
                 # This will fall through and not retry the message.
                 log.warning('Task %s: email with id %s not delivered to %s due to error %s', task_id, email_id, email, exc)
                 dog_stats_api.increment('course_email.error', tags=[_statsd_tag(course_title)])
-                subtask_status.increment(failed=1)
+                return 'failed'
 
             else:
                 dog_stats_api.increment('course_email.sent', tags=[_statsd_tag(course_title)])
@@ -503,12 +494,15 @@ def _send_course_email(entry_id, email_id, to_list, global_email_context, subtas
                     log.info('Email with id %s sent to %s', email_id, email)
                 else:
                     log.debug('Email with id %s sent to %s', email_id, email)
-                subtask_status.increment(succeeded=1)
+                return 'succeeded'
+
+        num_connections = max(1, min(settings.BULK_EMAIL_CONNECTIONS_PER_TASK, len(to_list)))
+        for __ in range(num_connections):
+            connection = get_connection()
+            connections.append(connection)
+            connection.open()
 
-            # Pop the user that was emailed off the end of the list only once they have
-            # successfully been processed.  (That way, if there were a failure that
-            # needed to be retried, the user is still on the list.)
-            to_list.pop()
+        _send_emails(connections, to_list, send_email, subtask_status, _get_send_interval(num_connections, subtask_status))
 
     except INFINITE_RETRY_ERRORS as exc:
         dog_stats_api.increment('course_email.infinite_retry', tags=[_statsd_tag(course_title)])
@@ -564,7 +558,92 @@ def _send_course_email(entry_id, email_id, to_list, global_email_context, subtas
         return subtask_status, None
     finally:
         # Clean up at the end.
-        connection.close()
+        for connection in connections:
+            connection.close()
+
+
+def _get_send_interval(num_connections, subtask_status):
+    """
+    Returns the least number of seconds between the sending of emails over each
+    of a subtask's `num_connections` connections.
+
+    This is the interval for BULK_EMAIL_MAX_SEND_RATE_PER_CONNECTION, if it's set.
+    If a task has been retried for rate-limiting reasons, then this is also at least
+    enough to send one email per BULK_EMAIL_RETRY_DELAY_BETWEEN_SENDS seconds over all
+    of the connections.  Choice of the latter value depends on the number of workers
+    that might be sending email in parallel, and what the SES throttle rate is.
+    """
+    send_interval = 0
+    if settings.BULK_EMAIL_MAX_SEND_RATE_PER_CONNECTION:
+        send_interval = 1.0 / settings.BULK_EMAIL_MAX_SEND_RATE_PER_CONNECTION
+    if subtask_status.retried_nomax > 0:
+        send_interval = max(send_interval, settings.BULK_EMAIL_RETRY_DELAY_BETWEEN_SENDS * num_connections)
+    return send_interval
+
+
+def _send_emails(connections, to_list, send_email, subtask_status, send_interval):
+    """
+    Sends emails to the recipients in `to_list`, over all of `connections` at once.
+
+    Each email is sent by calling `send_email(connection, recipient)`, which returns the counter
+    of `subtask_status` to increment.  The emails sent over each connection are at least
+    `send_interval` seconds apart.
+
+    Recipients are sent to from the end of the list, and are removed from `to_list` once they
+    have been processed.  That way, the to_list will always contain the recipients remaining to be
+    emailed.  This is convenient for retries, which will need to send to those who haven't
+    yet been emailed, but not send to those who have already been sent to.
+
+    The first error raised by `send_email` stops the sending (once the emails being sent over the
+    other connections have been), and is raised here.
+    """
+    recipients = list(to_list)
+    # Indexes of recipients that have been processed, and the first error raised.
+    processed = set()
+    errors = []
+    lock = threading.Lock()
+    next_indexes = iter(xrange(len(recipients) - 1, -1, -1))
+
+    def send_over(connection):
+        """Send emails over `connection` until all are sent or there's an error"""
+        last_send = None
+        while True:
+            with lock:
+                index = next(next_indexes, None)
+                if index is None or errors:
+                    return
+
+            if last_send is not None and send_interval > 0:
+                delay = last_send + send_interval - time()
+                if delay > 0:
+                    sleep(delay)
+            last_send = time()
+
+            try:
+                counter = send_email(connection, recipients[index])
+            except Exception:  # pylint: disable=broad-except
+                with lock:
+                    errors.append(sys.exc_info())
+                return
+            with lock:
+                subtask_status.increment(**{counter: 1})
+                processed.add(index)
+
+    try:
+        if len(connections) == 1:
+            send_over(connections[0])
+        else:
+            threads = [threading.Thread(target=send_over, args=(connection,)) for connection in connections]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+    finally:
+        to_list[:] = [recipient for index, recipient in enumerate(recipients) if index not in processed]
+
+    if errors:
+        exc_type, exc_value, exc_traceback = errors[0]
+        raise exc_type, exc_value, exc_traceback
 
 
 def _get_current_task():
@@ -312,7 +312,7 @@ class TestEmailErrors(ModuleStoreTestCase):
         bogus_email_id = 1001
         to_list = ['test@test.com']
         global_email_context = {'course_title': 'dummy course'}
-        with patch('instructor_task.subtasks.InstructorTask.save') as mock_task_save:
+        with patch('instructor_task.subtasks.InstructorSubtask.save') as mock_task_save:
             mock_task_save.side_effect = DatabaseError
             with self.assertRaises(DatabaseError):
                 send_course_email(entry_id, bogus_email_id, to_list, global_email_context, subtask_status.to_dict())
@@ -104,6 +104,24 @@ class CourseEmailTemplateTest(TestCase):
         context = self._get_sample_plain_context()
         template.render_plaintext("My new plain text.", context)
 
+    def test_compiled_render_matches(self):
+        template = CourseEmailTemplate.get_template()
+        context = self._get_sample_html_context()
+        del context['email']
+        message = u"My new text, for {email}, with a long line: " + u"words " * 300
+        compiled_plaintext = template.compile_plaintext(message, context)
+        compiled_htmltext = template.compile_htmltext(message, context)
+        for name, email in [(u'Robot', u'robot@test.com'), (u'R\xf6b\xf6t ' * 200, u'robot2@test.com')]:
+            recipient_context = dict(context, name=name, email=email)
+            self.assertEquals(
+                compiled_plaintext.render({'name': name, 'email': email}),
+                template.render_plaintext(message, recipient_context)
+            )
+            self.assertEquals(
+                compiled_htmltext.render({'name': name, 'email': email}),
+                template.render_htmltext(message, recipient_context)
+            )
+
 
 class CourseAuthorizationTest(TestCase):
     """Test the CourseAuthorization model."""
@@ -146,3 +164,21 @@ class CourseAuthorizationTest(TestCase):
 
         # Now, course should STILL be authorized!
         self.assertTrue(CourseAuthorization.instructor_email_enabled(course_id))
+
+    @patch.dict(settings.FEATURES, {'REQUIRE_COURSE_EMAIL_AUTH': True})
+    def test_enabled_for_courses(self):
+        enabled_id = SlashSeparatedCourseKey('abc', '123', 'doremi')
+        disabled_id = SlashSeparatedCourseKey('abc', '123', 'fasola')
+        missing_id = SlashSeparatedCourseKey('abc', '123', 'tido')
+        CourseAuthorization(course_id=enabled_id, email_enabled=True).save()
+        CourseAuthorization(course_id=disabled_id, email_enabled=False).save()
+
+        with self.assertNumQueries(1):
+            enabled = CourseAuthorization.instructor_email_enabled_for_courses([enabled_id, disabled_id, missing_id])
+        self.assertEquals(enabled, {enabled_id})
+
+        with patch.dict(settings.FEATURES, {'REQUIRE_COURSE_EMAIL_AUTH': False}):
+            self.assertEquals(
+                CourseAuthorization.instructor_email_enabled_for_courses([enabled_id, disabled_id]),
+                {enabled_id, disabled_id}
+            )
@@ -27,12 +27,14 @@ from celery.states import SUCCESS, FAILURE
 
 from django.conf import settings
 from django.core.management import call_command
+from django.test.utils import override_settings
 
 from bulk_email.models import CourseEmail, Optout, SEND_TO_ALL
+from bulk_email.tasks import _send_emails
 
 from instructor_task.tasks import send_bulk_course_email
 from instructor_task.subtasks import update_subtask_status, SubtaskStatus
-from instructor_task.models import InstructorTask
+from instructor_task.models import InstructorTask, InstructorSubtask
 from instructor_task.tests.test_base import InstructorTaskCourseTestCase
 from instructor_task.tests.factories import InstructorTaskFactory
 from xmodule.modulestore.locations import SlashSeparatedCourseKey
@@ -61,11 +63,8 @@ def my_update_subtask_status(entry_id, current_task_id, new_subtask_status):
     This should not be an issue in production, where status is updated before
     a task is retried, and is then updated afterwards if the retry fails.
     """
-    entry = InstructorTask.objects.get(pk=entry_id)
-    subtask_dict = json.loads(entry.subtasks)
-    subtask_status_info = subtask_dict['status']
-    current_subtask_status = SubtaskStatus.from_dict(subtask_status_info[current_task_id])
-    current_retry_count = current_subtask_status.get_retry_count()
+    subtask = InstructorSubtask.objects.get(instructor_task__id=entry_id, task_id=current_task_id)
+    current_retry_count = subtask.retried_nomax + subtask.retried_withmax
     new_retry_count = new_subtask_status.get_retry_count()
     if current_retry_count <= new_retry_count:
         update_subtask_status(entry_id, current_task_id, new_subtask_status)
@@ -141,27 +140,22 @@ class TestBulkEmailInstructorTask(InstructorTaskCourseTestCase):
         return [self.create_student('robot%d' % i) for i in xrange(num_students)]
 
     def _assert_single_subtask_status(self, entry, succeeded, failed=0, skipped=0, retried_nomax=0, retried_withmax=0):
-        """Compare counts with 'subtasks' entry in InstructorTask table."""
+        """Compare counts with 'subtasks' entry in InstructorTask table, and its InstructorSubtask."""
         subtask_info = json.loads(entry.subtasks)
         # verify subtask-level counts:
         self.assertEquals(subtask_info.get('total'), 1)
-        self.assertEquals(subtask_info.get('succeeded'), 1 if succeeded > 0 else 0)
-        self.assertEquals(subtask_info.get('failed'), 0 if succeeded > 0 else 1)
         # verify individual subtask status:
-        subtask_status_info = subtask_info.get('status')
-        task_id_list = subtask_status_info.keys()
-        self.assertEquals(len(task_id_list), 1)
-        task_id = task_id_list[0]
-        subtask_status = subtask_status_info.get(task_id)
-        print("Testing subtask status: {}".format(subtask_status))
-        self.assertEquals(subtask_status.get('task_id'), task_id)
-        self.assertEquals(subtask_status.get('attempted'), succeeded + failed)
-        self.assertEquals(subtask_status.get('succeeded'), succeeded)
-        self.assertEquals(subtask_status.get('skipped'), skipped)
-        self.assertEquals(subtask_status.get('failed'), failed)
-        self.assertEquals(subtask_status.get('retried_nomax'), retried_nomax)
-        self.assertEquals(subtask_status.get('retried_withmax'), retried_withmax)
-        self.assertEquals(subtask_status.get('state'), SUCCESS if succeeded > 0 else FAILURE)
+        subtasks = InstructorSubtask.objects.filter(instructor_task=entry)
+        self.assertEquals(len(subtasks), 1)
+        subtask = subtasks[0]
+        print("Testing subtask status: {}".format(subtask))
+        self.assertEquals(subtask.attempted, succeeded + failed)
+        self.assertEquals(subtask.succeeded, succeeded)
+        self.assertEquals(subtask.skipped, skipped)
+        self.assertEquals(subtask.failed, failed)
+        self.assertEquals(subtask.retried_nomax, retried_nomax)
+        self.assertEquals(subtask.retried_withmax, retried_withmax)
+        self.assertEquals(subtask.state, SUCCESS if succeeded > 0 else FAILURE)
 
     def _test_run_with_task(self, task_class, action_name, total, succeeded, failed=0, skipped=0, retried_nomax=0, retried_withmax=0):
         """Run a task and check the number of emails processed."""
@@ -195,6 +189,36 @@ class TestBulkEmailInstructorTask(InstructorTaskCourseTestCase):
             get_conn.return_value.send_messages.side_effect = cycle([None])
             self._test_run_with_task(send_bulk_course_email, 'emailed', num_emails, num_emails)
 
+    @override_settings(BULK_EMAIL_CONNECTIONS_PER_TASK=3)
+    def test_successful_over_several_connections(self):
+        # Select number of emails to fit into a single subtask.
+        num_emails = settings.BULK_EMAIL_EMAILS_PER_TASK
+        # We also send email to the instructor:
+        self._create_students(num_emails - 1)
+        with patch('bulk_email.tasks.get_connection', autospec=True) as get_conn:
+            get_conn.return_value.send_messages.side_effect = cycle([None])
+            self._test_run_with_task(send_bulk_course_email, 'emailed', num_emails, num_emails)
+            self.assertEquals(get_conn.call_count, 3)
+            self.assertEquals(get_conn.return_value.send_messages.call_count, num_emails)
+            self.assertEquals(get_conn.return_value.close.call_count, 3)
+
+    def test_sending_stops_at_error(self):
+        # Errors stop the sending over all connections, leaving the recipients
+        # that weren't sent to on the list, for a retry.
+        to_list = [{'email': 'robot{}@test.com'.format(index)} for index in range(50)]
+        subtask_status = SubtaskStatus.create('subtask-id')
+
+        def send_email(_connection, recipient):
+            """Fail to send to one recipient"""
+            if recipient['email'] == 'robot20@test.com':
+                raise SMTPServerDisconnected(425, "Disconnecting")
+            return 'succeeded'
+
+        with self.assertRaises(SMTPServerDisconnected):
+            _send_emails([Mock(), Mock(), Mock()], to_list, send_email, subtask_status, 0)
+        self.assertIn({'email': 'robot20@test.com'}, to_list)
+        self.assertEquals(subtask_status.succeeded + len(to_list), 50)
+
     def test_successful_twice(self):
         # Select number of emails to fit into a single subtask.
         num_emails = settings.BULK_EMAIL_EMAILS_PER_TASK
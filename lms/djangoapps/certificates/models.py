@@ -135,14 +135,39 @@ def certificate_status_for_student(student, course_id):
     try:
         generated_certificate = GeneratedCertificate.objects.get(
             user=student, course_id=course_id)
-        d = {'status': generated_certificate.status,
-             'mode': generated_certificate.mode}
-        if generated_certificate.grade:
-            d['grade'] = generated_certificate.grade
-        if generated_certificate.status == CertificateStatuses.downloadable:
-            d['download_url'] = generated_certificate.download_url
-
-        return d
+        return _certificate_status(generated_certificate)
     except GeneratedCertificate.DoesNotExist:
         pass
+    return _unavailable_certificate_status()
+
+
+def certificate_statuses_for_student(student, course_ids):
+    """
+    Returns a dictionary, keyed by course id, of the certificate status
+    dictionaries (as returned by certificate_status_for_student) of the student
+    in each of the given courses, using one query.
+    """
+    statuses = {course_id: _unavailable_certificate_status() for course_id in course_ids}
+    for generated_certificate in GeneratedCertificate.objects.filter(user=student, course_id__in=course_ids):
+        statuses[generated_certificate.course_id] = _certificate_status(generated_certificate)
+    return statuses
+
+
+def _certificate_status(generated_certificate):
+    """
+    The certificate status dictionary for a GeneratedCertificate.
+    """
+    d = {'status': generated_certificate.status,
+         'mode': generated_certificate.mode}
+    if generated_certificate.grade:
+        d['grade'] = generated_certificate.grade
+    if generated_certificate.status == CertificateStatuses.downloadable:
+        d['download_url'] = generated_certificate.download_url
+    return d
+
+
+def _unavailable_certificate_status():
+    """
+    The certificate status dictionary for a student with no certificate.
+    """
     return {'status': CertificateStatuses.unavailable, 'mode': GeneratedCertificate.MODES.honor}
@@ -5,7 +5,6 @@ from util.json_request import JsonResponse
 import json
 
 from courseware import models
-from django.db.models import Count
 from django.utils.translation import ugettext as _
 
 from xmodule.modulestore.django import modulestore
@@ -31,36 +30,22 @@ def get_problem_grade_distribution(course_id):
         attempting the problem
     """
 
-    # Aggregate query on studentmodule table for grade data for all problems in course
-    db_query = models.StudentModule.objects.filter(
-        course_id__exact=course_id,
-        grade__isnull=False,
-        module_type__exact="problem",
-    ).values('module_state_key', 'grade', 'max_grade').annotate(count_grade=Count('grade'))
-
     prob_grade_distrib = {}
     total_student_count = {}
 
-    # Loop through resultset building data for each problem
-    for row in db_query:
-        curr_problem = course_id.make_usage_key_from_deprecated_string(row['module_state_key'])
-
-        # Build set of grade distributions for each problem that has student responses
-        if curr_problem in prob_grade_distrib:
-            prob_grade_distrib[curr_problem]['grade_distrib'].append((row['grade'], row['count_grade']))
+    # Loop through the precomputed grade counts of the problems in the course
+    histograms = models.ProblemGradeCount.get_course_histograms(course_id)
+    for curr_problem, (module_type, grade_counts) in histograms.iteritems():
+        if module_type != "problem":
+            continue
 
-            if (prob_grade_distrib[curr_problem]['max_grade'] != row['max_grade']) and \
-                    (prob_grade_distrib[curr_problem]['max_grade'] < row['max_grade']):
-                prob_grade_distrib[curr_problem]['max_grade'] = row['max_grade']
-
-        else:
-            prob_grade_distrib[curr_problem] = {
-                'max_grade': row['max_grade'],
-                'grade_distrib': [(row['grade'], row['count_grade'])]
-            }
+        prob_grade_distrib[curr_problem] = {
+            'max_grade': max(max_grade for __, max_grade, __ in grade_counts),
+            'grade_distrib': [(grade, count) for grade, __, count in grade_counts],
+        }
 
         # Build set of total students attempting each problem
-        total_student_count[curr_problem] = total_student_count.get(curr_problem, 0) + row['count_grade']
+        total_student_count[curr_problem] = sum(count for __, __, count in grade_counts)
 
     return prob_grade_distrib, total_student_count
 
@@ -74,17 +59,8 @@ def get_sequential_open_distrib(course_id):
     Outputs a dict mapping the 'module_id' to the number of students that have opened that subsection/sequential.
     """
 
-    # Aggregate query on studentmodule table for "opening a subsection" data
-    db_query = models.StudentModule.objects.filter(
-        course_id__exact=course_id,
-        module_type__exact="sequential",
-    ).values('module_state_key').annotate(count_sequential=Count('module_state_key'))
-
-    # Build set of "opened" data for each subsection that has "opened" data
-    sequential_open_distrib = {}
-    for row in db_query:
-        row_loc = course_id.make_usage_key_from_deprecated_string(row['module_state_key'])
-        sequential_open_distrib[row_loc] = row['count_sequential']
+    # Precomputed counts of the students who have a studentmodule for each subsection
+    sequential_open_distrib = models.ModuleOpenCount.get_course_counts(course_id, "sequential")
 
     return sequential_open_distrib
 
@@ -97,41 +73,26 @@ def get_problem_set_grade_distrib(course_id, problem_set):
 
     `problem_set` an array of UsageKeys representing problem module_id's.
 
-    Requests from the database the a count of each grade for each problem in the `problem_set`.
+    Reads the precomputed count of each grade for each problem in the `problem_set`.
 
     Returns a dict, where the key is the problem 'module_id' and the value is a dict with two parts:
       'max_grade' - the maximum grade possible for the course
       'grade_distrib' - array of tuples (`grade`,`count`) ordered by `grade`
     """
 
-    # Aggregate query on studentmodule table for grade data for set of problems in course
-    db_query = models.StudentModule.objects.filter(
-        course_id__exact=course_id,
-        grade__isnull=False,
-        module_type__exact="problem",
-        module_state_key__in=problem_set,
-    ).values(
-        'module_state_key',
-        'grade',
-        'max_grade',
-    ).annotate(count_grade=Count('grade')).order_by('module_state_key', 'grade')
-
     prob_grade_distrib = {}
 
-    # Loop through resultset building data for each problem
-    for row in db_query:
-        row_loc = course_id.make_usage_key_from_deprecated_string(row['module_state_key'])
-        if row_loc not in prob_grade_distrib:
-            prob_grade_distrib[row_loc] = {
-                'max_grade': 0,
-                'grade_distrib': [],
-            }
-
-        curr_grade_distrib = prob_grade_distrib[row_loc]
-        curr_grade_distrib['grade_distrib'].append((row['grade'], row['count_grade']))
+    # Loop through the precomputed grade counts of the problems in the course, picking those in the set
+    histograms = models.ProblemGradeCount.get_course_histograms(course_id)
+    for row_loc in problem_set:
+        module_type, grade_counts = histograms.get(row_loc, (None, []))
+        if module_type != "problem":
+            continue
 
-        if curr_grade_distrib['max_grade'] < row['max_grade']:
-            curr_grade_distrib['max_grade'] = row['max_grade']
+        prob_grade_distrib[row_loc] = {
+            'max_grade': max([0] + [max_grade for __, max_grade, __ in grade_counts]),
+            'grade_distrib': [(grade, count) for grade, __, count in grade_counts],
+        }
 
     return prob_grade_distrib
 
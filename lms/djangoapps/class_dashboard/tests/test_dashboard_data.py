@@ -8,9 +8,11 @@ from mock import patch
 from django.test.utils import override_settings
 from django.core.urlresolvers import reverse
 from django.test.client import RequestFactory
+from django.utils import timezone
 from xmodule.modulestore.tests.factories import CourseFactory, ItemFactory
 from xmodule.modulestore.tests.django_utils import ModuleStoreTestCase
 from courseware.tests.tests import TEST_DATA_MONGO_MODULESTORE
+from courseware.models import GradeHistogramRefresh, ModuleOpenCountRefresh, StudentModule
 from courseware.tests.factories import StudentModuleFactory
 from student.tests.factories import UserFactory, CourseEnrollmentFactory, AdminFactory
 from capa.tests.response_xml_factory import StringResponseXMLFactory
@@ -92,6 +94,9 @@ class TestGetProblemGradeDistribution(ModuleStoreTestCase):
                     module_state_key=self.item.location,
                 )
 
+        # as the refresh_course_aggregates command does
+        GradeHistogramRefresh.refresh_if_needed(self.course.id)
+
     def test_get_problem_grade_distribution(self):
 
         prob_grade_distrib, total_student_count = get_problem_grade_distribution(self.course.id)
@@ -105,8 +110,15 @@ class TestGetProblemGradeDistribution(ModuleStoreTestCase):
 
     def test_get_sequential_open_distibution(self):
 
+        # as the refresh_course_aggregates command does, once the StudentModules
+        # are old enough for their transactions to have been committed
+        created = timezone.now() - 2 * ModuleOpenCountRefresh.COUNT_LAG
+        StudentModule.objects.filter(course_id=self.course.id).update(created=created)
+        ModuleOpenCountRefresh.refresh(self.course.id)
+
         sequential_open_distrib = get_sequential_open_distrib(self.course.id)
 
+        self.assertEquals(USER_COUNT - 1, len(sequential_open_distrib))
         for problem in sequential_open_distrib:
             num_students = sequential_open_distrib[problem]
             self.assertEquals(USER_COUNT, num_students)
@@ -6,6 +6,8 @@ from datetime import datetime, timedelta
 
 from django.conf import settings
 from django.contrib.auth.models import AnonymousUser
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
 
 from xmodule.course_module import CourseDescriptor
 from xmodule.error_module import ErrorDescriptor
@@ -14,7 +16,9 @@ from xmodule.x_module import XModule
 
 from xblock.core import XBlock
 
-from student.models import CourseEnrollmentAllowed
+from course_overviews.models import CourseOverview
+from request_cache.middleware import get_cache
+from student.models import CourseAccessRole, CourseEnrollmentAllowed
 from external_auth.models import ExternalAuthMap
 from courseware.masquerade import is_masquerading_as_student
 from django.utils.timezone import UTC
@@ -26,6 +30,10 @@ from student.roles import (
 from xmodule.modulestore.keys import CourseKey
 DEBUG_ACCESS = False
 
+# The results of checking these actions are remembered for the rest of the
+# request. (The others depend on enrollments, which requests change.)
+MEMOIZED_ACTIONS = ('load', 'staff', 'instructor')
+
 log = logging.getLogger(__name__)
 
 
@@ -67,11 +75,59 @@ def has_access(user, action, obj, course_key=None):
     if not user:
         user = AnonymousUser()
 
+    memo_key = _memo_key(user, action, obj, course_key)
+    if memo_key is None:
+        return _has_access(user, action, obj, course_key)
+
+    memo = get_cache('has_access')
+    if memo_key not in memo:
+        memo[memo_key] = _has_access(user, action, obj, course_key)
+    return memo[memo_key]
+
+
+def _memo_key(user, action, obj, course_key):
+    """
+    The key to remember whether `user` may do `action` on `obj` by, or None if
+    it shouldn't be remembered.
+    """
+    if action not in MEMOIZED_ACTIONS or isinstance(obj, XModule):
+        # XModules delegate to their descriptors, which are remembered.
+        return None
+    if isinstance(obj, CourseOverview):
+        obj_key = obj.id
+    elif isinstance(obj, XBlock):
+        obj_key = obj.location
+    elif isinstance(obj, (CourseKey, Location, basestring)):
+        obj_key = obj
+    else:
+        return None
+    user_key = (user.id, user.is_staff, user.is_active, is_masquerading_as_student(user))
+    return (user_key, action, type(obj), obj_key, course_key)
+
+
+@receiver(post_save, sender=CourseAccessRole)
+@receiver(post_delete, sender=CourseAccessRole)
+def _forget_access(sender, **kwargs):  # pylint: disable=unused-argument
+    """
+    Forget the remembered access checks when anyone's roles change.
+    """
+    get_cache('has_access').clear()
+
+
+def _has_access(user, action, obj, course_key):
+    """
+    Check whether a user has the access to do action on obj, as has_access does,
+    without remembering the answer.
+    """
     # delegate the work to type-specific functions.
     # (start with more specific types, then get more general)
     if isinstance(obj, CourseDescriptor):
         return _has_access_course_desc(user, action, obj)
 
+    # CourseOverviews have the attributes that the access checks of courses use
+    if isinstance(obj, CourseOverview):
+        return _has_access_course_desc(user, action, obj)
+
     if isinstance(obj, ErrorDescriptor):
         return _has_access_error_desc(user, action, obj, course_key)
 
@@ -253,8 +309,8 @@ def _has_access_descriptor(user, action, descriptor, course_key=None):
             debug("Allow: DISABLE_START_DATES")
             return True
 
-        # Check start date
-        if 'detached' not in descriptor._class_tags and descriptor.start is not None:
+        # Check start date (CourseOverviews aren't XBlocks, so have no class tags)
+        if 'detached' not in getattr(descriptor, '_class_tags', ()) and descriptor.start is not None:
             now = datetime.now(UTC())
             effective_start = _adjust_start_date_for_beta_testers(
                 user,
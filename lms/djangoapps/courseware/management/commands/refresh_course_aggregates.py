@@ -0,0 +1,53 @@
+"""
+Command to bring the grade histograms and module open counts of courses up to
+date, so that loading the class dashboard and staff debug info doesn't have to.
+Pages only read the stored counts, so for a course that this hasn't been run
+for, staff debug info shows no grade histograms, and the class dashboard (the
+Metrics tab of the instructor dashboard) shows no grade distributions and no
+students as having opened any subsection.
+
+Nothing schedules this, so it has to be run periodically from cron, e.g. hourly
+as `refresh_course_aggregates --hours 2`.  Without course ids, it does so for
+every course with StudentModules changed in the last `--hours` hours.
+"""
+from datetime import timedelta
+from optparse import make_option
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from courseware.models import GradeHistogramRefresh, ModuleOpenCountRefresh, StudentModule
+from xmodule.modulestore.locations import SlashSeparatedCourseKey
+
+
+class Command(BaseCommand):
+    """
+    Refresh the grade histograms and module open counts of courses.
+    """
+    args = "[<course_id> ...]"
+    help = "Refresh the grade histograms and module open counts of courses."
+    option_list = BaseCommand.option_list + (
+        make_option('--hours',
+                    type='int',
+                    default=24,
+                    help='Refresh the courses with StudentModules changed in this many hours'),
+    )
+
+    def handle(self, *args, **options):
+        if args:
+            course_ids = [SlashSeparatedCourseKey.from_deprecated_string(arg) for arg in args]
+        else:
+            since = timezone.now() - timedelta(hours=options['hours'])
+            student_modules = StudentModule.objects.filter(modified__gt=since)
+            if "read_replica" in settings.DATABASES:
+                student_modules = student_modules.using("read_replica")
+            course_ids = set(
+                SlashSeparatedCourseKey.from_deprecated_string(course_id)
+                for course_id in student_modules.values_list('course_id', flat=True).distinct()
+            )
+
+        for course_id in course_ids:
+            GradeHistogramRefresh.refresh_if_needed(course_id)
+            ModuleOpenCountRefresh.refresh(course_id)
+            self.stdout.write(u"Refreshed {}\n".format(course_id.to_deprecated_string()))
@@ -3,10 +3,14 @@ Classes to provide the LMS runtime data storage to XBlocks
 """
 
 import json
-from collections import defaultdict
+import sys
+from collections import defaultdict, OrderedDict
+from contextlib import contextmanager
 from itertools import chain
 from .models import (
+    PersistentCourseGrade,
     StudentModule,
+    StudentModuleHistory,
     XModuleUserStateSummaryField,
     XModuleStudentPrefsField,
     XModuleStudentInfoField
@@ -16,6 +20,9 @@ from xmodule.modulestore.locations import SlashSeparatedCourseKey, Location
 
 from django.db import DatabaseError
 from django.contrib.auth.models import User
+from django.utils import timezone
+
+from request_cache.middleware import RequestCache, run_after_commit
 
 from xblock.runtime import KeyValueStore
 from xblock.exceptions import KeyValueMultiSaveError, InvalidScopeError
@@ -39,10 +46,42 @@ def chunks(items, chunk_size):
     return (items[i:i + chunk_size] for i in xrange(0, len(items), chunk_size))
 
 
+def get_descriptor_descendents(descriptor, depth=None, descriptor_filter=lambda descriptor: True):
+    """
+    Return a list of all child descriptors down to the specified depth
+    that match the descriptor filter. Includes `descriptor`
+
+    descriptor: The parent to search inside
+    depth: The number of levels to descend, or None for infinite depth
+    descriptor_filter(descriptor): A function that returns True
+        if descriptor should be included in the results
+    """
+    if descriptor_filter(descriptor):
+        descriptors = [descriptor]
+    else:
+        descriptors = []
+
+    if depth is None or depth > 0:
+        new_depth = depth - 1 if depth is not None else depth
+
+        for child in descriptor.get_children() + descriptor.get_required_module_descriptors():
+            descriptors.extend(get_descriptor_descendents(child, new_depth, descriptor_filter))
+
+    return descriptors
+
+
 class FieldDataCache(object):
     """
     A cache of django model objects needed to supply the data
     for a module and its decendants
+
+    More descriptors can be added to an existing cache with
+    `add_descriptors_to_cache`, which only queries for the data of
+    descriptors that haven't been fetched yet.
+
+    Inside `deferred_writes`, objects passed to `save` are only written when
+    the block exits, so that an object saved several times is written once
+    and StudentModuleHistory entries are inserted together.
     """
     def __init__(self, descriptors, course_id, user, select_for_update=False):
         '''
@@ -58,17 +97,74 @@ class FieldDataCache(object):
         select_for_update: True if rows should be locked until end of transaction
         '''
         self.cache = {}
-        self.descriptors = descriptors
+        self.descriptors = []
         self.select_for_update = select_for_update
 
         assert isinstance(course_id, SlashSeparatedCourseKey)
         self.course_id = course_id
         self.user = user
 
-        if user.is_authenticated():
-            for scope, fields in self._fields_to_cache().items():
-                for field_object in self._retrieve_fields(scope, fields):
-                    self.cache[self._cache_key_from_field_object(scope, field_object)] = field_object
+        # What has already been fetched from the database, so that adding
+        # more descriptors only queries for what is missing
+        self._fetched_usage_ids = set()
+        self._fetched_block_types = set()
+        self._fetched_user_info_fields = set()
+
+        # Objects waiting to be written by `deferred_writes`, keyed by id(),
+        # or None if writes aren't being deferred
+        self._dirty_objects = None
+        # Calls waiting for those objects to be written (see `call_after_writes`)
+        self._after_writes = []
+
+        self.add_descriptors_to_cache(descriptors)
+
+    def add_descriptors_to_cache(self, descriptors):
+        """
+        Add `descriptors` to this cache, fetching the data for all of the ones
+        that haven't been fetched before with one (chunked) query per scope.
+
+        Objects that are already in the cache are kept as they are.
+        """
+        new_descriptors = [
+            descriptor for descriptor in descriptors
+            if descriptor.scope_ids.usage_id not in self._fetched_usage_ids
+        ]
+        if not new_descriptors:
+            return
+
+        if self.user.is_authenticated():
+            for scope, fields in self._fields_to_cache(new_descriptors).items():
+                for field_object in self._retrieve_fields(scope, fields, new_descriptors):
+                    self.cache.setdefault(self._cache_key_from_field_object(scope, field_object), field_object)
+
+            self._fetched_block_types.update(descriptor.scope_ids.block_type for descriptor in new_descriptors)
+
+        self._fetched_usage_ids.update(descriptor.scope_ids.usage_id for descriptor in new_descriptors)
+        self.descriptors.extend(new_descriptors)
+
+    def add_descriptor_descendents(self, descriptor, depth=None, descriptor_filter=lambda descriptor: True):
+        """
+        Add `descriptor` and its descendents to this cache. The arguments are
+        the same as for `cache_for_descriptor_descendents`.
+        """
+        self.add_descriptors_to_cache(get_descriptor_descendents(descriptor, depth, descriptor_filter))
+
+    @classmethod
+    def for_request(cls, course_id, user):
+        """
+        Return the FieldDataCache for `user` in `course_id` that is shared by
+        everything that runs during the current request, creating an empty one
+        the first time. Callers should add the descriptors they need with
+        `add_descriptors_to_cache` or `add_descriptor_descendents`.
+
+        The shared caches are dropped by the RequestCache middleware at the
+        end of the request, so this shouldn't be used outside of one.
+        """
+        caches = RequestCache.get_request_cache().data.setdefault('field_data_caches', {})
+        key = (course_id, user.id)
+        if key not in caches:
+            caches[key] = cls([], course_id, user)
+        return caches[key]
 
     @classmethod
     def cache_for_descriptor_descendents(cls, course_id, user, descriptor, depth=None,
@@ -84,31 +180,7 @@ class FieldDataCache(object):
             should be cached
         select_for_update: Flag indicating whether the rows should be locked until end of transaction
         """
-
-        def get_child_descriptors(descriptor, depth, descriptor_filter):
-            """
-            Return a list of all child descriptors down to the specified depth
-            that match the descriptor filter. Includes `descriptor`
-
-            descriptor: The parent to search inside
-            depth: The number of levels to descend, or None for infinite depth
-            descriptor_filter(descriptor): A function that returns True
-                if descriptor should be included in the results
-            """
-            if descriptor_filter(descriptor):
-                descriptors = [descriptor]
-            else:
-                descriptors = []
-
-            if depth is None or depth > 0:
-                new_depth = depth - 1 if depth is not None else depth
-
-                for child in descriptor.get_children() + descriptor.get_required_module_descriptors():
-                    descriptors.extend(get_child_descriptors(child, new_depth, descriptor_filter))
-
-            return descriptors
-
-        descriptors = get_child_descriptors(descriptor, depth, descriptor_filter)
+        descriptors = get_descriptor_descendents(descriptor, depth, descriptor_filter)
 
         return FieldDataCache(descriptors, course_id, user, select_for_update)
 
@@ -137,15 +209,16 @@ class FieldDataCache(object):
         )
         return res
 
-    def _retrieve_fields(self, scope, fields):
+    def _retrieve_fields(self, scope, fields, descriptors):
         """
         Queries the database for all of the fields in the specified scope
+        for `descriptors`
         """
         if scope == Scope.user_state:
             return self._chunked_query(
                 StudentModule,
                 'module_state_key__in',
-                (descriptor.scope_ids.usage_id for descriptor in self.descriptors),
+                (descriptor.scope_ids.usage_id for descriptor in descriptors),
                 course_id=self.course_id,
                 student=self.user.pk,
             )
@@ -153,32 +226,42 @@ class FieldDataCache(object):
             return self._chunked_query(
                 XModuleUserStateSummaryField,
                 'usage_id__in',
-                (descriptor.scope_ids.usage_id for descriptor in self.descriptors),
+                (descriptor.scope_ids.usage_id for descriptor in descriptors),
                 field_name__in=set(field.name for field in fields),
             )
         elif scope == Scope.preferences:
+            block_types = set(
+                descriptor.scope_ids.block_type for descriptor in descriptors
+            ) - self._fetched_block_types
+            if not block_types:
+                return []
             return self._chunked_query(
                 XModuleStudentPrefsField,
                 'module_type__in',
-                set(descriptor.scope_ids.block_type for descriptor in self.descriptors),
+                block_types,
                 student=self.user.pk,
                 field_name__in=set(field.name for field in fields),
             )
         elif scope == Scope.user_info:
+            field_names = set(field.name for field in fields) - self._fetched_user_info_fields
+            if not field_names:
+                return []
+            self._fetched_user_info_fields.update(field_names)
             return self._query(
                 XModuleStudentInfoField,
                 student=self.user.pk,
-                field_name__in=set(field.name for field in fields),
+                field_name__in=field_names,
             )
         else:
             return []
 
-    def _fields_to_cache(self):
+    def _fields_to_cache(self, descriptors):
         """
         Returns a map of scopes to fields in that scope that should be cached
+        for `descriptors`
         """
         scope_map = defaultdict(set)
-        for descriptor in self.descriptors:
+        for descriptor in descriptors:
             for field in descriptor.fields.values():
                 scope_map[field.scope].add(field)
         return scope_map
@@ -210,6 +293,107 @@ class FieldDataCache(object):
         elif scope == Scope.user_info:
             return (scope, field_object.field_name)
 
+    def save(self, field_object):
+        """
+        Save `field_object`, or if writes are being deferred, remember it so
+        that it is saved when `deferred_writes` exits.
+        """
+        if self._dirty_objects is not None:
+            self._dirty_objects[id(field_object)] = field_object
+        else:
+            field_object.save()
+
+    def forget(self, field_object):
+        """
+        Stop tracking a pending write of `field_object`, e.g. because it was deleted.
+        """
+        if self._dirty_objects is not None:
+            self._dirty_objects.pop(id(field_object), None)
+
+    def call_after_writes(self, func, *args):
+        """
+        Call func(*args) once the objects passed to `save` so far have been written:
+        straight away, unless writes are being deferred, in which case when
+        `deferred_writes` has written them.
+        """
+        if self._dirty_objects is not None:
+            self._after_writes.append((func, args))
+        else:
+            func(*args)
+
+    @contextmanager
+    def deferred_writes(self):
+        """
+        Defer the writes made through `save` until the end of the block, and
+        then write every changed object once. Nested uses are folded into the
+        outermost one.
+
+        If the block raises, what it saved is still written, as it would have
+        been without deferring, but it's the block's exception that is raised:
+        an error writing is only logged.
+        """
+        if self._dirty_objects is not None:
+            yield
+            return
+
+        self._dirty_objects = OrderedDict()
+        try:
+            yield
+        except:
+            exc_info = sys.exc_info()
+            try:
+                self._write_dirty_objects()
+            except Exception:  # pylint: disable=broad-except
+                log.exception("Unable to write the state saved before an error in %s", self.course_id)
+            raise exc_info[0], exc_info[1], exc_info[2]
+        self._write_dirty_objects()
+
+    def _write_dirty_objects(self):
+        """
+        Stop deferring writes, write the objects saved meanwhile, and make the calls
+        waiting for them to be written.
+        """
+        dirty_objects = self._dirty_objects.values()
+        after_writes = self._after_writes
+        self._dirty_objects = None
+        self._after_writes = []
+        self._write(dirty_objects)
+        for func, args in after_writes:
+            func(*args)
+
+    def _write(self, field_objects):
+        """
+        Write `field_objects` to the database. StudentModules are written with
+        plain UPDATEs, which don't send post_save, so their history entries are
+        inserted with a single bulk INSERT afterwards, and the stored course grades
+        of the students whose scores may have changed are marked stale here.
+        """
+        history_entries = []
+        scored_students = set()
+        modified = timezone.now()
+        for field_object in field_objects:
+            if isinstance(field_object, StudentModule) and field_object.pk is not None:
+                field_object.modified = modified
+                StudentModule.objects.filter(pk=field_object.pk).update(
+                    state=field_object.state,
+                    grade=field_object.grade,
+                    max_grade=field_object.max_grade,
+                    done=field_object.done,
+                    modified=modified,
+                )
+                history_entry = StudentModuleHistory.entry_for(field_object)
+                if history_entry is not None:
+                    history_entries.append(history_entry)
+                if field_object.grade is not None or field_object.max_grade is not None:
+                    scored_students.add((field_object.student_id, field_object.course_id))
+            else:
+                field_object.save()
+
+        if history_entries:
+            StudentModuleHistory.objects.bulk_create(history_entries)
+        for student_id, course_id in scored_students:
+            run_after_commit(PersistentCourseGrade.invalidate, student_id, course_id)
+
     def find(self, key):
         '''
         Look for a model data object using an DjangoKeyValueStore.Key object
@@ -353,7 +537,7 @@ class DjangoKeyValueStore(KeyValueStore):
         for field_object in field_objects:
             try:
                 # Save the field object that we made above
-                field_object.save()
+                self._field_data_cache.save(field_object)
                 # If save is successful on this scope, add the saved fields to
                 # the list of successful saves
                 saved_fields.extend([field.field_name for field in field_objects[field_object]])
@@ -373,8 +557,9 @@ class DjangoKeyValueStore(KeyValueStore):
             state = json.loads(field_object.state)
             del state[key.field_name]
             field_object.state = json.dumps(state)
-            field_object.save()
+            self._field_data_cache.save(field_object)
         else:
+            self._field_data_cache.forget(field_object)
             field_object.delete()
 
     def has(self, key):
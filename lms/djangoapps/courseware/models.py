@@ -12,14 +12,23 @@ file and check it in at the same time as your model changes. To do that,
 ASSUMPTIONS: modules have unique IDs, even across different module_types
 
 """
+from datetime import timedelta
+import logging
+
 from django.contrib.auth.models import User
 from django.conf import settings
-from django.db import models
-from django.db.models.signals import post_save
+from django.core.cache import cache
+from django.db import models, transaction, IntegrityError
+from django.db.models import Count, F, Max
+from django.db.models.signals import post_save, post_delete
 from django.dispatch import receiver
+from django.utils import timezone
 
+from request_cache.middleware import run_after_commit
 from xmodule_django.models import CourseKeyField, LocationKeyField
 
+log = logging.getLogger(__name__)
+
 
 class StudentModule(models.Model):
     """
@@ -112,6 +121,22 @@ class StudentModuleHistory(models.Model):
     grade = models.FloatField(null=True, blank=True)
     max_grade = models.FloatField(null=True, blank=True)
 
+    @classmethod
+    def entry_for(cls, student_module):
+        """
+        Return an unsaved StudentModuleHistory entry recording the current
+        state of `student_module`, or None if its module_type is not one
+        that we save.
+        """
+        if student_module.module_type not in cls.HISTORY_SAVING_TYPES:
+            return None
+        return cls(student_module=student_module,
+                   version=None,
+                   created=student_module.modified,
+                   state=student_module.state,
+                   grade=student_module.grade,
+                   max_grade=student_module.max_grade)
+
     @receiver(post_save, sender=StudentModule)
     def save_history(sender, instance, **kwargs):  # pylint: disable=no-self-argument, unused-argument
         """
@@ -119,13 +144,8 @@ class StudentModuleHistory(models.Model):
         StudentModuleHistory entry if the module_type is one that
         we save.
         """
-        if instance.module_type in StudentModuleHistory.HISTORY_SAVING_TYPES:
-            history_entry = StudentModuleHistory(student_module=instance,
-                                                 version=None,
-                                                 created=instance.modified,
-                                                 state=instance.state,
-                                                 grade=instance.grade,
-                                                 max_grade=instance.max_grade)
+        history_entry = StudentModuleHistory.entry_for(instance)
+        if history_entry is not None:
             history_entry.save()
 
 
@@ -259,3 +279,478 @@ class OfflineComputedGradeLog(models.Model):
 
     def __unicode__(self):
         return "[OCGLog] %s: %s" % (self.course_id.to_deprecated_string(), self.created)  # pylint: disable=no-member
+
+
+class PersistentSubsectionGrade(models.Model):
+    """
+    Stored grade totals for one graded subsection (sequential) for one student.
+
+    A row is considered fresh as long as it was computed after the last
+    modification of every StudentModule inside the subsection, and the
+    subsection's gradable content (as summarized by `content_hash`) has not
+    changed. Stale rows are recomputed and overwritten the next time the
+    student is graded.
+    """
+    class Meta:
+        unique_together = (('user', 'course_id', 'usage_key'),)
+
+    user = models.ForeignKey(User, db_index=True)
+    course_id = CourseKeyField(max_length=255, db_index=True)
+    usage_key = LocationKeyField(max_length=255, db_index=True)
+
+    # Hash of the locations, weights and graded flags of the scored
+    # descriptors in the subsection at the time the grade was computed.
+    content_hash = models.CharField(max_length=40)
+
+    earned = models.FloatField()
+    possible = models.FloatField()
+
+    # The per-problem Score tuples, stored as JSON
+    raw_scores = models.TextField(null=True, blank=True)
+
+    # When the StudentModule rows this grade was computed from were read. This is
+    # set explicitly rather than with auto_now so that state written while the
+    # grade was being computed still makes the row stale.
+    computed = models.DateTimeField(db_index=True)
+
+    def __unicode__(self):
+        return u"[PersistentSubsectionGrade] {}: {} {} = {}/{}".format(
+            self.user_id, self.course_id, self.usage_key, self.earned, self.possible
+        )
+
+
+class PersistentCourseGrade(models.Model):
+    """
+    Stored course gradeset for a given user and course.
+
+    The gradeset is marked stale whenever a scored StudentModule of the student
+    in the course is saved or deleted, so it can be returned as-is (without touching the
+    course tree or the StudentModule table) for as long as it stays fresh.
+    """
+    class Meta:
+        unique_together = (('user', 'course_id'),)
+
+    user = models.ForeignKey(User, db_index=True)
+    course_id = CourseKeyField(max_length=255, db_index=True)
+
+    # Hash of the grading policy and graded content the gradeset was computed for
+    content_hash = models.CharField(max_length=40)
+
+    # Hash of the submissions API scores the gradeset was computed with
+    submissions_hash = models.CharField(max_length=40)
+
+    is_stale = models.BooleanField(default=False, db_index=True)
+
+    gradeset = models.TextField(null=True, blank=True)  # grades, stored as JSON
+
+    modified = models.DateTimeField(auto_now=True, db_index=True)
+
+    @classmethod
+    def invalidate(cls, user_id, course_id):
+        """
+        Mark the stored course gradeset for this user and course as stale.
+        This is a single UPDATE, so it is cheap enough to run on every grade event.
+        """
+        cls.objects.filter(user__id=user_id, course_id=course_id).update(is_stale=True)
+
+    def __unicode__(self):
+        return u"[PersistentCourseGrade] {}: {} (stale={})".format(self.user_id, self.course_id, self.is_stale)
+
+
+class ProblemGradeCount(models.Model):
+    """
+    The number of StudentModules of a module with a given grade and max_grade,
+    for grade histograms (in staff debug info and the class dashboard).
+
+    The counts of a course are computed from the StudentModule table all at once,
+    and then kept up to date as grades are set (see `record_grade_change`).  The
+    refresh_course_aggregates command computes them again once they're older than
+    settings.GRADE_HISTOGRAM_REFRESH_INTERVAL, which corrects any drift from grades
+    changed in other ways.  Reading them never computes them, so a course has no
+    histograms, and its grade changes aren't recorded, until the command has first
+    been run for it (see `GradeHistogramRefresh`).
+    """
+    class Meta:
+        unique_together = (('course_id', 'module_state_key', 'grade', 'max_grade'),)
+
+    course_id = CourseKeyField(max_length=255, db_index=True)
+    module_state_key = LocationKeyField(max_length=255)
+    module_type = models.CharField(max_length=32)
+    grade = models.FloatField()
+    max_grade = models.FloatField(null=True)
+    count = models.IntegerField(default=0)
+
+    @classmethod
+    def get_course_histograms(cls, course_id):
+        """
+        Returns the grade counts of the modules of the course `course_id`, as a dict
+        mapping the location of each module to its module_type and a list of
+        (grade, max_grade, count), in order of grade.  This is empty until the
+        counts of the course have first been computed.
+        """
+        histograms = {}
+        if not GradeHistogramRefresh.objects.filter(course_id=course_id).exists():
+            return histograms
+        for grade_count in cls.objects.filter(course_id=course_id, count__gt=0).order_by('grade', 'max_grade'):
+            location = grade_count.module_state_key.map_into_course(course_id)
+            __, grade_counts = histograms.setdefault(location, (grade_count.module_type, []))
+            grade_counts.append((grade_count.grade, grade_count.max_grade, grade_count.count))
+        return histograms
+
+    @classmethod
+    def record_grade_change(cls, student_module, old_grade, old_max_grade):
+        """
+        Moves `student_module` from the count of its `old_grade` and `old_max_grade`
+        to the count of its current grade and max_grade.
+
+        The counts are changed once the grade change has been committed, each in a
+        short transaction of its own, so that the lock on a count (which every
+        student setting the same grade needs) isn't held for the rest of the request.
+        """
+        if (old_grade, old_max_grade) == (student_module.grade, student_module.max_grade):
+            return
+        run_after_commit(
+            cls._move_count, student_module, old_grade, old_max_grade, student_module.grade, student_module.max_grade
+        )
+
+    @classmethod
+    def _move_count(cls, student_module, old_grade, old_max_grade, grade, max_grade):
+        """
+        Moves `student_module` from the count of `old_grade` and `old_max_grade` to the
+        count of `grade` and `max_grade`, if the counts of its course have been computed.
+        Until then there are no counts to keep up to date: starting them from zero would
+        make histograms of only the grades changed since, which look complete but aren't.
+        """
+        if not GradeHistogramRefresh.objects.filter(course_id=student_module.course_id).exists():
+            return
+        if old_grade is not None:
+            cls._add_to_count(student_module, old_grade, old_max_grade, -1)
+        if grade is not None:
+            cls._add_to_count(student_module, grade, max_grade, 1)
+
+    @classmethod
+    def _add_to_count(cls, student_module, grade, max_grade, number):
+        """Adds `number` to the count of `student_module`'s module's `grade` and `max_grade`"""
+        grade_counts = cls.objects.filter(
+            course_id=student_module.course_id,
+            module_state_key=student_module.module_state_key,
+            grade=grade,
+            max_grade=max_grade,
+        )
+        if grade_counts.update(count=F('count') + number) or number < 0:
+            return
+        try:
+            cls.objects.create(
+                course_id=student_module.course_id,
+                module_state_key=student_module.module_state_key,
+                module_type=student_module.module_type,
+                grade=grade,
+                max_grade=max_grade,
+                count=number,
+            )
+        except IntegrityError:
+            # Another process created it first.
+            grade_counts.update(count=F('count') + number)
+
+    def __unicode__(self):
+        return u"[ProblemGradeCount] {} {}: {}/{} x {}".format(
+            self.course_id, self.module_state_key, self.grade, self.max_grade, self.count
+        )
+
+
+class GradeHistogramRefresh(models.Model):
+    """
+    When the ProblemGradeCounts of a course were last computed from the StudentModule table.
+    """
+    course_id = CourseKeyField(max_length=255, unique=True)
+    refreshed = models.DateTimeField()
+
+    # ProblemGradeCounts are created this many at a time.
+    CREATE_BATCH_SIZE = 100
+
+    @classmethod
+    def refresh_if_needed(cls, course_id):
+        """
+        Computes the ProblemGradeCounts of the course `course_id` from the StudentModule
+        table, if they haven't been computed within settings.GRADE_HISTOGRAM_REFRESH_INTERVAL.
+        Meant for the refresh_course_aggregates command, not for requests.
+        """
+        oldest_fresh = timezone.now() - timedelta(seconds=settings.GRADE_HISTOGRAM_REFRESH_INTERVAL)
+        if cls.objects.filter(course_id=course_id, refreshed__gte=oldest_fresh).exists():
+            return
+
+        _compute_once(u"grade-histogram-refresh-{}".format(course_id), cls._refresh, course_id)
+
+    @classmethod
+    @transaction.commit_on_success
+    def _refresh(cls, course_id):
+        """
+        Replaces the ProblemGradeCounts of the course `course_id` with ones computed from
+        the StudentModule table.
+
+        The counts are locked before the grades are counted, so that grades being changed
+        meanwhile are recorded after the counts are replaced, rather than lost with the old
+        counts.  For the same reason, the grades are counted from the primary database, as
+        the read replica may not have caught up with the grade changes already recorded.
+        """
+        refreshed = timezone.now()
+        list(ProblemGradeCount.objects.select_for_update().filter(course_id=course_id).values_list('id', flat=True))
+        rows = StudentModule.objects.filter(course_id=course_id, grade__isnull=False).values(
+            'module_state_key', 'module_type', 'grade', 'max_grade'
+        ).annotate(count=Count('id'))
+
+        grade_counts = [
+            ProblemGradeCount(
+                course_id=course_id,
+                module_state_key=row['module_state_key'],
+                module_type=row['module_type'],
+                grade=row['grade'],
+                max_grade=row['max_grade'],
+                count=row['count'],
+            )
+            for row in rows
+        ]
+
+        ProblemGradeCount.objects.filter(course_id=course_id).delete()
+        for index in xrange(0, len(grade_counts), cls.CREATE_BATCH_SIZE):
+            ProblemGradeCount.objects.bulk_create(grade_counts[index:index + cls.CREATE_BATCH_SIZE])
+        cls.objects.filter(course_id=course_id).delete()
+        cls.objects.create(course_id=course_id, refreshed=refreshed)
+
+    def __unicode__(self):
+        return u"[GradeHistogramRefresh] {}: {}".format(self.course_id, self.refreshed)
+
+
+class ModuleOpenCount(models.Model):
+    """
+    The number of students who have opened a module (that is, who have a
+    StudentModule for it), for the class dashboard.
+
+    The counts of a course are computed from the StudentModule table all at once,
+    and then brought up to date with the StudentModules created since whenever
+    they're read.  The refresh_course_aggregates command computes them again once
+    they're older than settings.MODULE_OPEN_COUNT_RECOMPUTE_INTERVAL (see
+    `ModuleOpenCountRefresh`).  Reading them never computes them, so a course's
+    counts are empty until the command has first been run for it.
+    """
+    class Meta:
+        unique_together = (('course_id', 'module_state_key', 'module_type'),)
+
+    course_id = CourseKeyField(max_length=255, db_index=True)
+    module_state_key = LocationKeyField(max_length=255)
+    module_type = models.CharField(max_length=32)
+    count = models.IntegerField(default=0)
+
+    @classmethod
+    def get_course_counts(cls, course_id, module_type):
+        """
+        Returns the open counts of the modules of type `module_type` in the course
+        `course_id`, as a dict mapping the location of each module to its count.
+        """
+        ModuleOpenCountRefresh.count_created(course_id)
+
+        return dict(
+            (open_count.module_state_key.map_into_course(course_id), open_count.count)
+            for open_count in cls.objects.filter(course_id=course_id, module_type=module_type, count__gt=0)
+        )
+
+    @classmethod
+    def _add_counts(cls, course_id, rows):
+        """
+        Adds the `count` of each of `rows`, which are dicts with the module_state_key,
+        module_type and count of modules of the course `course_id`, to their open counts.
+        """
+        for row in rows:
+            open_counts = cls.objects.filter(
+                course_id=course_id, module_state_key=row['module_state_key'], module_type=row['module_type']
+            )
+            if not open_counts.update(count=F('count') + row['count']):
+                cls.objects.create(
+                    course_id=course_id,
+                    module_state_key=row['module_state_key'],
+                    module_type=row['module_type'],
+                    count=row['count'],
+                )
+
+    def __unicode__(self):
+        return u"[ModuleOpenCount] {} {}: {}".format(self.course_id, self.module_state_key, self.count)
+
+
+class ModuleOpenCountRefresh(models.Model):
+    """
+    Up to when the ModuleOpenCounts of a course count the StudentModules created,
+    and when they were last computed from the whole StudentModule table.
+    """
+    course_id = CourseKeyField(max_length=255, unique=True)
+    counted_until = models.DateTimeField()
+    recomputed = models.DateTimeField()
+
+    # StudentModules created since the counts were last brought up to date are
+    # counted once they're this old, by when the transactions that created them
+    # should have been committed.
+    COUNT_LAG = timedelta(minutes=1)
+    # ModuleOpenCounts are created this many at a time.
+    CREATE_BATCH_SIZE = 100
+
+    @classmethod
+    def count_created(cls, course_id):
+        """
+        Brings the ModuleOpenCounts of the course `course_id` up to date, by adding
+        the StudentModules created since they last were, if they've been computed.
+        """
+        count_until = timezone.now() - cls.COUNT_LAG
+        try:
+            refresh = cls.objects.get(course_id=course_id)
+        except cls.DoesNotExist:
+            return
+        if refresh.counted_until < count_until:
+            cls._count_created(course_id, refresh.counted_until, count_until)
+
+    @classmethod
+    def refresh(cls, course_id):
+        """
+        Brings the ModuleOpenCounts of the course `course_id` up to date, by computing
+        them from the StudentModule table if that hasn't been done within
+        settings.MODULE_OPEN_COUNT_RECOMPUTE_INTERVAL, or else by adding the
+        StudentModules created since they last were.  Meant for the
+        refresh_course_aggregates command, not for requests.
+        """
+        oldest_fresh = timezone.now() - timedelta(seconds=settings.MODULE_OPEN_COUNT_RECOMPUTE_INTERVAL)
+        if cls.objects.filter(course_id=course_id, recomputed__gte=oldest_fresh).exists():
+            cls.count_created(course_id)
+        else:
+            _compute_once(u"module-open-count-recompute-{}".format(course_id), cls._recompute, course_id)
+
+    @classmethod
+    @transaction.commit_on_success
+    def _count_created(cls, course_id, counted_until, count_until):
+        """
+        Adds the StudentModules of the course `course_id` created after `counted_until`,
+        up to `count_until`, to its ModuleOpenCounts.
+        """
+        # Claim those StudentModules first, so that no other process counts them too.
+        claimed = cls.objects.filter(
+            course_id=course_id, counted_until=counted_until
+        ).update(counted_until=count_until)
+        if not claimed:
+            return
+
+        rows = StudentModule.objects.filter(
+            course_id=course_id, created__gt=counted_until, created__lte=count_until
+        ).values('module_state_key', 'module_type').annotate(count=Count('id'))
+        ModuleOpenCount._add_counts(course_id, rows)  # pylint: disable=protected-access
+
+    @classmethod
+    @transaction.commit_on_success
+    def _recompute(cls, course_id):
+        """
+        Replaces the ModuleOpenCounts of the course `course_id` with ones computed from
+        the StudentModule table.
+
+        The read replica may be behind the primary database, so only the StudentModules
+        created up to COUNT_LAG before the newest one it has are counted, and the rest are
+        left to `count_created`.  The counts are locked first, so that they aren't being
+        brought up to date while they're replaced.
+        """
+        recomputed = timezone.now()
+        list(cls.objects.select_for_update().filter(course_id=course_id).values_list('id', flat=True))
+        student_modules = _aggregated_student_modules().filter(course_id=course_id)
+        newest = student_modules.aggregate(newest=Max('created'))['newest']
+        counted_until = min(recomputed, newest or recomputed) - cls.COUNT_LAG
+        rows = student_modules.filter(created__lte=counted_until).values(
+            'module_state_key', 'module_type'
+        ).annotate(count=Count('id'))
+
+        open_counts = [
+            ModuleOpenCount(
+                course_id=course_id,
+                module_state_key=row['module_state_key'],
+                module_type=row['module_type'],
+                count=row['count'],
+            )
+            for row in rows
+        ]
+
+        ModuleOpenCount.objects.filter(course_id=course_id).delete()
+        for index in xrange(0, len(open_counts), cls.CREATE_BATCH_SIZE):
+            ModuleOpenCount.objects.bulk_create(open_counts[index:index + cls.CREATE_BATCH_SIZE])
+        cls.objects.filter(course_id=course_id).delete()
+        cls.objects.create(course_id=course_id, counted_until=counted_until, recomputed=recomputed)
+
+    def __unicode__(self):
+        return u"[ModuleOpenCountRefresh] {}: {}".format(self.course_id, self.counted_until)
+
+
+# Computing the aggregates of a course should take much less time than this.
+COMPUTE_LOCK_EXPIRE = 60 * 10
+
+
+def _compute_once(lock_key, compute, course_id):
+    """
+    Calls `compute(course_id)` to compute aggregates of the course `course_id`,
+    unless another process is already computing them (holding the lock `lock_key`),
+    in which case the aggregates already stored are used as they are.
+    """
+    if not cache.add(lock_key, 'true', COMPUTE_LOCK_EXPIRE):
+        return
+    try:
+        compute(course_id)
+    except IntegrityError:
+        log.info(u"Aggregates of %s were computed concurrently", course_id)
+    finally:
+        cache.delete(lock_key)
+
+
+def _aggregated_student_modules():
+    """
+    The StudentModules to compute aggregates over, from the read replica if there is one.
+    """
+    if "read_replica" in settings.DATABASES:
+        return StudentModule.objects.using("read_replica")
+    return StudentModule.objects
+
+
+@receiver(post_delete, sender=StudentModule)
+def invalidate_persistent_grades(sender, instance, **kwargs):  # pylint: disable=unused-argument
+    """
+    Has the stored grades of the student of a deleted StudentModule (e.g. when a
+    student's state is reset) recomputed. The deleted row can't make the stored
+    subsection grades stale by its modification time, so they're deleted.
+    """
+    PersistentSubsectionGrade.objects.filter(user__id=instance.student_id, course_id=instance.course_id).delete()
+    PersistentCourseGrade.invalidate(instance.student_id, instance.course_id)
+
+
+@receiver(post_save, sender=StudentModule)
+def invalidate_persistent_course_grade(sender, instance, **kwargs):  # pylint: disable=unused-argument
+    """
+    Marks the stored course grade of the student of a saved, scored StudentModule
+    stale, however its score was changed (a grade event, a rescore, a state save).
+    It's only marked once the change has been committed, so that it isn't computed
+    again from the old score meanwhile.
+    """
+    if instance.grade is not None or instance.max_grade is not None:
+        run_after_commit(PersistentCourseGrade.invalidate, instance.student_id, instance.course_id)
+
+
+@receiver(post_delete, sender=StudentModule)
+def remove_grade_count(sender, instance, **kwargs):  # pylint: disable=unused-argument
+    """
+    Takes deleted StudentModules (e.g. when a student's state is reset) out of the
+    ProblemGradeCounts.
+    """
+    if instance.grade is not None:
+        run_after_commit(
+            ProblemGradeCount._move_count, instance, instance.grade, instance.max_grade, None, None  # pylint: disable=protected-access
+        )
+
+
+@receiver(post_delete, sender=StudentModule)
+def remove_open_count(sender, instance, **kwargs):  # pylint: disable=unused-argument
+    """
+    Takes deleted StudentModules out of the ModuleOpenCounts, if they've been counted.
+    """
+    if ModuleOpenCountRefresh.objects.filter(course_id=instance.course_id, counted_until__gte=instance.created).exists():
+        ModuleOpenCount.objects.filter(
+            course_id=instance.course_id, module_state_key=instance.module_state_key, module_type=instance.module_type
+        ).update(count=F('count') - 1)
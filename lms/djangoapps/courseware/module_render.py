@@ -17,10 +17,12 @@ from django.core.urlresolvers import reverse
 from django.http import Http404, HttpResponse
 from django.views.decorators.csrf import csrf_exempt
 
+from capa.safe_exec import SafeExecResultCache
 from capa.xqueue_interface import XQueueInterface
 from courseware.access import has_access, get_user_role
 from courseware.masquerade import setup_masquerade
 from courseware.model_data import FieldDataCache, DjangoKeyValueStore
+from courseware.models import ProblemGradeCount
 from lms.lib.xblock.field_data import LmsFieldData
 from lms.lib.xblock.runtime import LmsModuleSystem, unquote_slashes, quote_slashes
 from edxmako.shortcuts import render_to_string
@@ -60,6 +62,13 @@ XQUEUE_INTERFACE = XQueueInterface(
     REQUESTS_AUTH,
 )
 
+# Results of running sandboxed code, kept in this process in front of the shared cache
+SAFE_EXEC_CACHE = SafeExecResultCache(
+    cache,
+    max_entries=settings.SAFE_EXEC_CACHE_MAX_ENTRIES,
+    max_entry_size=settings.SAFE_EXEC_CACHE_MAX_ENTRY_SIZE,
+)
+
 # TODO: course_id and course_key are used interchangeably in this file, which is wrong.
 # Some brave person should make the variable names consistently someday, but the code's
 # coupled enough that it's kind of tricky--you've been warned!
@@ -321,11 +330,13 @@ def get_module_system_for_user(user, field_data_cache,
         )
 
         student_module = field_data_cache.find_or_create(key)
+        old_grade, old_max_grade = student_module.grade, student_module.max_grade
         # Update the grades
         student_module.grade = event.get('value')
         student_module.max_grade = event.get('max_value')
         # Save all changes to the underlying KeyValueStore
-        student_module.save()
+        field_data_cache.save(student_module)
+        ProblemGradeCount.record_grade_change(student_module, old_grade, old_max_grade)
 
         # Bin score into range and increment stats
         score_bucket = get_score_bucket(student_module.grade, student_module.max_grade)
@@ -484,7 +495,7 @@ def get_module_system_for_user(user, field_data_cache,
         course_id=course_id,
         open_ended_grading_interface=open_ended_grading_interface,
         s3_interface=s3_interface,
-        cache=cache,
+        cache=SAFE_EXEC_CACHE,
         can_execute_unsafe_code=(lambda: can_execute_unsafe_code(course_id)),
         # TODO: When we merge the descriptor and module systems, we can stop reaching into the mixologist (cpennington)
         mixins=descriptor.runtime.mixologist._mixins,  # pylint: disable=protected-access
@@ -711,7 +722,12 @@ def _invoke_xblock_handler(request, course_id, usage_id, handler, suffix, user):
     req = django_to_webob_request(request)
     try:
         with tracker.get_tracker().context(tracking_context_name, tracking_context):
-            resp = instance.handle(handler, req, suffix)
+            if settings.FEATURES.get('ENABLE_DEFERRED_XBLOCK_HANDLER_WRITES'):
+                # Write all the state the handler changes once, when it's done
+                with field_data_cache.deferred_writes():
+                    resp = instance.handle(handler, req, suffix)
+            else:
+                resp = instance.handle(handler, req, suffix)
 
     except NoSuchHandlerError:
         log.exception("XBlock %s attempted to access missing handler %r", instance, handler)
@@ -1,7 +1,7 @@
 import courseware.access as access
 import datetime
 
-from mock import Mock
+from mock import Mock, patch
 
 from django.test import TestCase
 from django.test.utils import override_settings
@@ -10,6 +10,8 @@ from courseware.tests.factories import UserFactory, StaffFactory, InstructorFact
 from student.tests.factories import AnonymousUserFactory, CourseEnrollmentAllowedFactory
 from courseware.tests.tests import TEST_DATA_MIXED_MODULESTORE
 import pytz
+from request_cache.middleware import RequestCache
+from student.roles import CourseStaffRole
 from xmodule.modulestore.locations import SlashSeparatedCourseKey
 
 
@@ -178,3 +180,26 @@ class UserRoleTestCase(TestCase):
             'student',
             access.get_user_role(self.anonymous_user, self.course_key)
         )
+
+    def test_access_remembered_within_request(self):
+        RequestCache().process_request(None)
+        self.addCleanup(RequestCache().process_response, None, None)
+        with patch('courseware.access._has_access_to_course', return_value=True) as check:
+            self.assertTrue(access.has_access(self.course_staff, 'staff', self.course_key))
+            self.assertTrue(access.has_access(self.course_staff, 'staff', self.course_key))
+            self.assertEqual(check.call_count, 1)
+
+            # Other users' checks aren't mixed up with it.
+            access.has_access(self.student, 'staff', self.course_key)
+            self.assertEqual(check.call_count, 2)
+
+            # Changing roles forgets the remembered checks.
+            CourseStaffRole(self.course_key).add_users(self.student)
+            access.has_access(self.course_staff, 'staff', self.course_key)
+            self.assertEqual(check.call_count, 3)
+
+    def test_access_not_remembered_outside_requests(self):
+        with patch('courseware.access._has_access_to_course', return_value=True) as check:
+            access.has_access(self.course_staff, 'staff', self.course_key)
+            access.has_access(self.course_staff, 'staff', self.course_key)
+            self.assertEqual(check.call_count, 2)
@@ -0,0 +1,164 @@
+"""
+Tests for the per-module grade and open counts behind grade histograms and the class dashboard.
+"""
+from datetime import timedelta
+
+from django.test import TestCase
+from django.test.utils import override_settings
+from django.utils import timezone
+
+from courseware.models import (
+    GradeHistogramRefresh, ModuleOpenCount, ModuleOpenCountRefresh, ProblemGradeCount, StudentModule
+)
+from courseware.tests.factories import StudentModuleFactory, location, course_id
+from request_cache.middleware import RequestCache
+from xmodule_modifiers import grade_histogram
+
+
+class ProblemGradeCountTest(TestCase):
+    """
+    Test that grade counts are computed from the StudentModules, and follow their changes.
+    """
+    def setUp(self):
+        self.problem = location('problem')
+        for grade in [None, 0, 1, 1]:
+            StudentModuleFactory.create(
+                course_id=course_id, module_state_key=self.problem, grade=grade, max_grade=1
+            )
+
+    def test_computed_by_refresh(self):
+        # Reading the counts doesn't compute them.
+        self.assertEqual(ProblemGradeCount.get_course_histograms(course_id), {})
+        self.assertFalse(GradeHistogramRefresh.objects.exists())
+
+        GradeHistogramRefresh.refresh_if_needed(course_id)
+        self.assertEqual(
+            ProblemGradeCount.get_course_histograms(course_id),
+            {self.problem: ('problem', [(0, 1, 1), (1, 1, 2)])},
+        )
+        self.assertEqual(grade_histogram(self.problem), [(0, 1), (1, 2)])
+
+    def test_grade_changes(self):
+        GradeHistogramRefresh.refresh_if_needed(course_id)
+
+        student_module = StudentModuleFactory.create(course_id=course_id, module_state_key=self.problem)
+        student_module.grade, student_module.max_grade = 0, 1
+        student_module.save()
+        ProblemGradeCount.record_grade_change(student_module, None, None)
+        self.assertEqual(grade_histogram(self.problem), [(0, 2), (1, 2)])
+
+        student_module.grade = 1
+        student_module.save()
+        ProblemGradeCount.record_grade_change(student_module, 0, 1)
+        self.assertEqual(grade_histogram(self.problem), [(0, 1), (1, 3)])
+
+        student_module.delete()
+        self.assertEqual(grade_histogram(self.problem), [(0, 1), (1, 2)])
+
+    def test_grade_changes_before_refresh(self):
+        # Grades changed before the counts are first computed aren't counted from zero.
+        student_module = StudentModuleFactory.create(course_id=course_id, module_state_key=self.problem)
+        student_module.grade, student_module.max_grade = 0, 1
+        student_module.save()
+        ProblemGradeCount.record_grade_change(student_module, None, None)
+        self.assertFalse(ProblemGradeCount.objects.exists())
+        self.assertEqual(grade_histogram(self.problem), [])
+
+        GradeHistogramRefresh.refresh_if_needed(course_id)
+        self.assertEqual(grade_histogram(self.problem), [(0, 2), (1, 2)])
+
+    def test_grade_changes_recorded_after_commit(self):
+        GradeHistogramRefresh.refresh_if_needed(course_id)
+
+        request_cache = RequestCache()
+        request_cache.process_request(None)
+        student_module = StudentModuleFactory.create(course_id=course_id, module_state_key=self.problem)
+        student_module.grade, student_module.max_grade = 0, 1
+        student_module.save()
+        ProblemGradeCount.record_grade_change(student_module, None, None)
+        self.assertEqual(grade_histogram(self.problem), [(0, 1), (1, 2)])
+
+        # once the request's transaction has been committed
+        request_cache.process_response(None, None)
+        self.assertEqual(grade_histogram(self.problem), [(0, 2), (1, 2)])
+
+    @override_settings(GRADE_HISTOGRAM_REFRESH_INTERVAL=60)
+    def test_recomputed_when_old(self):
+        GradeHistogramRefresh.refresh_if_needed(course_id)
+
+        # Grades changed without being recorded are only counted once the counts are recomputed.
+        StudentModuleFactory.create(course_id=course_id, module_state_key=self.problem, grade=0, max_grade=1)
+        GradeHistogramRefresh.refresh_if_needed(course_id)
+        self.assertEqual(grade_histogram(self.problem), [(0, 1), (1, 2)])
+
+        GradeHistogramRefresh.objects.update(refreshed=timezone.now() - timedelta(seconds=61))
+        self.assertEqual(grade_histogram(self.problem), [(0, 1), (1, 2)])
+        GradeHistogramRefresh.refresh_if_needed(course_id)
+        self.assertEqual(grade_histogram(self.problem), [(0, 2), (1, 2)])
+
+
+class ModuleOpenCountTest(TestCase):
+    """
+    Test that open counts are computed from the StudentModules, and brought up to date with new ones.
+    """
+    def setUp(self):
+        self.sequential = course_id.make_usage_key('sequential', 'sequential')
+        for __ in range(2):
+            self.create_student_module(seconds_ago=900)
+
+    def create_student_module(self, seconds_ago):
+        """Create a StudentModule for the sequential, as if it was created `seconds_ago` seconds ago"""
+        student_module = StudentModuleFactory.create(
+            course_id=course_id, module_state_key=self.sequential, module_type='sequential'
+        )
+        created = timezone.now() - timedelta(seconds=seconds_ago)
+        StudentModule.objects.filter(id=student_module.id).update(created=created, modified=created)
+
+    def test_computed_by_refresh(self):
+        # Reading the counts doesn't compute them.
+        self.assertEqual(ModuleOpenCount.get_course_counts(course_id, 'sequential'), {})
+        self.assertFalse(ModuleOpenCountRefresh.objects.exists())
+
+        ModuleOpenCountRefresh.refresh(course_id)
+        self.assertEqual(ModuleOpenCount.get_course_counts(course_id, 'sequential'), {self.sequential: 2})
+        self.assertEqual(ModuleOpenCount.get_course_counts(course_id, 'problem'), {})
+
+    def test_counts_created(self):
+        ModuleOpenCountRefresh.refresh(course_id)
+        ModuleOpenCountRefresh.objects.update(counted_until=timezone.now() - timedelta(seconds=600))
+
+        # Only StudentModules old enough for their transactions to have been committed are counted.
+        self.create_student_module(seconds_ago=300)
+        self.create_student_module(seconds_ago=0)
+        self.assertEqual(ModuleOpenCount.get_course_counts(course_id, 'sequential'), {self.sequential: 3})
+
+    def test_recompute_leaves_recent_to_count_created(self):
+        # A StudentModule which may not have been committed yet isn't counted by the
+        # recompute, but by bringing the counts up to date once it's old enough.
+        self.create_student_module(seconds_ago=0)
+        ModuleOpenCountRefresh.refresh(course_id)
+        self.assertEqual(ModuleOpenCount.get_course_counts(course_id, 'sequential'), {self.sequential: 2})
+
+        refresh = ModuleOpenCountRefresh.objects.get(course_id=course_id)
+        ModuleOpenCountRefresh.objects.update(counted_until=refresh.counted_until - timedelta(seconds=120))
+        StudentModule.objects.filter(created__gt=refresh.counted_until).update(
+            created=refresh.counted_until - timedelta(seconds=60)
+        )
+        self.assertEqual(ModuleOpenCount.get_course_counts(course_id, 'sequential'), {self.sequential: 3})
+
+    def test_deleted(self):
+        ModuleOpenCountRefresh.refresh(course_id)
+        StudentModule.objects.filter(module_state_key=self.sequential)[0].delete()
+        self.assertEqual(ModuleOpenCount.get_course_counts(course_id, 'sequential'), {self.sequential: 1})
+
+    @override_settings(MODULE_OPEN_COUNT_RECOMPUTE_INTERVAL=60)
+    def test_recomputed_when_old(self):
+        ModuleOpenCountRefresh.refresh(course_id)
+        ModuleOpenCountRefresh.objects.update(recomputed=timezone.now() - timedelta(seconds=61))
+
+        # A StudentModule missed by the counts is only counted once they're recomputed,
+        # which reading them doesn't do.
+        self.create_student_module(seconds_ago=600)
+        self.assertEqual(ModuleOpenCount.get_course_counts(course_id, 'sequential'), {self.sequential: 2})
+        ModuleOpenCountRefresh.refresh(course_id)
+        self.assertEqual(ModuleOpenCount.get_course_counts(course_id, 'sequential'), {self.sequential: 3})
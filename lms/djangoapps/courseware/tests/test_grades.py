@@ -1,20 +1,33 @@
 """
 Test grade calculation.
 """
+from datetime import datetime, timedelta
+
+from django.conf import settings
 from django.http import Http404
+from django.test.client import RequestFactory
 from django.test.utils import override_settings
 from mock import patch
+from pytz import UTC
 
+from capa.tests.response_xml_factory import OptionResponseXMLFactory
+from courseware.model_data import FieldDataCache
+from courseware.models import PersistentCourseGrade, PersistentSubsectionGrade, StudentModule
+from courseware.tests.factories import StudentModuleFactory
 from courseware.tests.modulestore_config import TEST_DATA_MIXED_MODULESTORE
+from instructor.enrollment import reset_student_attempts
 from student.tests.factories import UserFactory
-from xmodule.modulestore.tests.factories import CourseFactory
+from xblock.fields import Scope
+from xblock.runtime import KeyValueStore
+from xmodule.modulestore.django import modulestore
+from xmodule.modulestore.tests.factories import CourseFactory, ItemFactory
 from xmodule.modulestore.tests.django_utils import ModuleStoreTestCase
 from xmodule.modulestore.locations import SlashSeparatedCourseKey
 
-from courseware.grades import grade, iterate_grades_for
+from courseware.grades import grade, iterate_grades_for, StudentModuleScores
 
 
-def _grade_with_errors(student, request, course, keep_raw_scores=False):
+def _grade_with_errors(student, request, course, keep_raw_scores=False, student_module_scores=None):
     """This fake grade method will throw exceptions for student3 and
     student4, but allow any other students to go through normal grading.
 
@@ -25,7 +38,9 @@ def _grade_with_errors(student, request, course, keep_raw_scores=False):
     if student.username in ['student3', 'student4']:
         raise Exception("I don't like {}".format(student.username))
 
-    return grade(student, request, course, keep_raw_scores=keep_raw_scores)
+    return grade(
+        student, request, course, keep_raw_scores=keep_raw_scores, student_module_scores=student_module_scores
+    )
 
 
 @override_settings(MODULESTORE=TEST_DATA_MIXED_MODULESTORE)
@@ -121,3 +136,168 @@ class TestGradeIteration(ModuleStoreTestCase):
                 students_to_errors[student] = err_msg
 
         return students_to_gradesets, students_to_errors
+
+
+@override_settings(MODULESTORE=TEST_DATA_MIXED_MODULESTORE)
+class GradedCourseTestCase(ModuleStoreTestCase):
+    """
+    Base class for tests that need a course with a graded problem and a
+    student who has a score on it.
+    """
+    def setUp(self):
+        """
+        Create a course with one graded homework containing one problem
+        """
+        course = CourseFactory.create(display_name="persistent_grades_course")
+        chapter = ItemFactory.create(parent_location=course.location, category='chapter')
+        section = ItemFactory.create(
+            parent_location=chapter.location,
+            category='sequential',
+            display_name="Homework 1",
+            metadata={'graded': True, 'format': 'Homework'}
+        )
+        self.problem = ItemFactory.create(
+            parent_location=section.location,
+            category='problem',
+            data=OptionResponseXMLFactory().build_xml(
+                question_text='The correct answer is Correct',
+                options=['Correct', 'Incorrect'],
+                correct_option='Correct'
+            ),
+            display_name="Problem 1"
+        )
+        self.course = modulestore().get_course(course.id)
+
+        self.student = UserFactory.create()
+        self.request = RequestFactory().get('/')
+        self.request.user = self.student
+        self.request.session = {}
+
+        self.student_module = StudentModuleFactory.create(
+            student=self.student,
+            course_id=self.course.id,
+            module_state_key=self.problem.location,
+            grade=1,
+            max_grade=2,
+        )
+        # Make sure the state looks older than any grade computed during the test
+        StudentModule.objects.filter(id=self.student_module.id).update(
+            modified=datetime.now(UTC) - timedelta(minutes=1)
+        )
+
+
+@patch.dict(settings.FEATURES, {'ENABLE_PERSISTENT_GRADES': True})
+class TestPersistentGrades(GradedCourseTestCase):
+    """
+    Test that stored subsection and course grades are reused and invalidated.
+    """
+    def test_grades_are_stored(self):
+        gradeset = grade(self.student, self.request, self.course)
+        self.assertTrue(PersistentSubsectionGrade.objects.filter(user=self.student, course_id=self.course.id).exists())
+        self.assertFalse(PersistentCourseGrade.objects.get(user=self.student, course_id=self.course.id).is_stale)
+
+        with patch('courseware.grades.get_score') as mock_get_score:
+            stored_gradeset = grade(self.student, self.request, self.course)
+            self.assertFalse(mock_get_score.called)
+
+        self.assertEqual(stored_gradeset['percent'], gradeset['percent'])
+        self.assertEqual(stored_gradeset['grade'], gradeset['grade'])
+        self.assertEqual(stored_gradeset['totaled_scores'], gradeset['totaled_scores'])
+
+    def test_raw_scores_are_stored(self):
+        gradeset = grade(self.student, self.request, self.course, keep_raw_scores=True)
+
+        stored_gradeset = grade(self.student, self.request, self.course, keep_raw_scores=True)
+        self.assertEqual(stored_gradeset['raw_scores'], gradeset['raw_scores'])
+        self.assertNotIn('raw_scores', grade(self.student, self.request, self.course))
+
+    def test_invalidate(self):
+        grade(self.student, self.request, self.course)
+        PersistentCourseGrade.invalidate(self.student.id, self.course.id)
+        self.assertTrue(PersistentCourseGrade.objects.get(user=self.student, course_id=self.course.id).is_stale)
+
+    def test_reset_student_is_picked_up(self):
+        self.assertEqual(grade(self.student, self.request, self.course)['totaled_scores']['Homework'][0].earned, 1)
+
+        reset_student_attempts(self.course.id, self.student, self.problem.location, delete_module=True)
+
+        self.assertTrue(PersistentCourseGrade.objects.get(user=self.student, course_id=self.course.id).is_stale)
+        self.assertEqual(grade(self.student, self.request, self.course)['totaled_scores']['Homework'][0].earned, 0)
+
+    def test_new_score_is_picked_up(self):
+        self.assertEqual(grade(self.student, self.request, self.course)['totaled_scores']['Homework'][0].earned, 1)
+
+        self.student_module.grade = 2
+        self.student_module.save()
+        PersistentCourseGrade.invalidate(self.student.id, self.course.id)
+
+        self.assertEqual(grade(self.student, self.request, self.course)['totaled_scores']['Homework'][0].earned, 2)
+
+    def test_score_saved_outside_grade_event_is_picked_up(self):
+        # e.g. by a rescore, which saves the StudentModule without publishing a grade event
+        self.assertEqual(grade(self.student, self.request, self.course)['totaled_scores']['Homework'][0].earned, 1)
+
+        self.student_module.grade = 2
+        self.student_module.save()
+
+        self.assertTrue(PersistentCourseGrade.objects.get(user=self.student, course_id=self.course.id).is_stale)
+        self.assertEqual(grade(self.student, self.request, self.course)['totaled_scores']['Homework'][0].earned, 2)
+
+    def test_score_written_by_field_data_cache_is_picked_up(self):
+        # deferred writes update the StudentModule without sending post_save
+        self.assertEqual(grade(self.student, self.request, self.course)['totaled_scores']['Homework'][0].earned, 1)
+
+        field_data_cache = FieldDataCache([self.problem], self.course.id, self.student)
+        with field_data_cache.deferred_writes():
+            student_module = field_data_cache.find_or_create(KeyValueStore.Key(
+                scope=Scope.user_state,
+                user_id=self.student.id,
+                block_scope_id=self.problem.location,
+                field_name='grade'
+            ))
+            student_module.grade = 0
+            field_data_cache.save(student_module)
+            self.assertFalse(PersistentCourseGrade.objects.get(user=self.student, course_id=self.course.id).is_stale)
+
+        self.assertTrue(PersistentCourseGrade.objects.get(user=self.student, course_id=self.course.id).is_stale)
+        self.assertEqual(grade(self.student, self.request, self.course)['totaled_scores']['Homework'][0].earned, 0)
+
+
+class TestBulkGrading(GradedCourseTestCase):
+    """
+    Test grading many students at once with prefetched StudentModule state.
+    """
+    def test_bulk_fetch(self):
+        other_student = UserFactory.create()
+        scores = StudentModuleScores.bulk_fetch(self.course.id, [self.student, other_student])
+
+        self.assertEqual(scores[other_student.id].rows, {})
+        stored_score = scores[self.student.id].rows[self.problem.location.to_deprecated_string()]
+        self.assertEqual((stored_score.grade, stored_score.max_grade), (1, 2))
+
+    def test_prefetched_grade_matches(self):
+        scores = StudentModuleScores.bulk_fetch(self.course.id, [self.student])
+        with patch('courseware.grades.StudentModule.objects') as mock_objects:
+            prefetched_gradeset = grade(
+                self.student, self.request, self.course, student_module_scores=scores[self.student.id]
+            )
+            self.assertFalse(mock_objects.get.called)
+            self.assertFalse(mock_objects.filter.called)
+
+        gradeset = grade(self.student, self.request, self.course)
+        self.assertEqual(prefetched_gradeset['percent'], gradeset['percent'])
+        self.assertEqual(prefetched_gradeset['totaled_scores'], gradeset['totaled_scores'])
+
+    def test_iterate_grades_in_chunks(self):
+        students = [self.student] + [UserFactory.create() for _ in range(4)]
+        with patch('courseware.grades.GRADING_CHUNK_SIZE', 2):
+            bulk_fetch = StudentModuleScores.bulk_fetch
+            with patch('courseware.grades.StudentModuleScores.bulk_fetch', wraps=bulk_fetch) as mock_fetch:
+                results = list(iterate_grades_for(self.course.id, students))
+                self.assertEqual(mock_fetch.call_count, 3)
+
+        self.assertEqual([student for student, _, _ in results], students)
+        self.assertEqual(results[0][1]['totaled_scores']['Homework'][0].earned, 1)
+        for _, gradeset, err_msg in results[1:]:
+            self.assertEqual(err_msg, "")
+            self.assertEqual(gradeset['percent'], 0.0)
@@ -7,9 +7,10 @@ from functools import partial
 
 from courseware.model_data import DjangoKeyValueStore
 from courseware.model_data import InvalidScopeError, FieldDataCache
-from courseware.models import StudentModule
+from courseware.models import StudentModule, StudentModuleHistory
 from courseware.models import XModuleStudentInfoField, XModuleStudentPrefsField
 
+from request_cache.middleware import RequestCache
 from student.tests.factories import UserFactory
 from courseware.tests.factories import StudentModuleFactory as cmfStudentModuleFactory, location, course_id
 from courseware.tests.factories import UserStateSummaryFactory
@@ -339,3 +340,118 @@ class TestStudentInfoStorage(OtherUserFailureTestMixin, StorageTestBase, TestCas
     storage_class = XModuleStudentInfoField
     other_key_factory = partial(DjangoKeyValueStore.Key, Scope.user_info, 2, 'mock_problem')  # user_id=2, not 1
     existing_field_name = "existing_field"
+
+
+class TestAddDescriptorsToCache(TestCase):
+    """Tests for extending an existing FieldDataCache"""
+    def setUp(self):
+        self.user = UserFactory.create(username='user')
+        self.assertEqual(self.user.id, 1)   # check our assumption hard-coded in the key functions above.
+        StudentModuleFactory.create(student=self.user, state=json.dumps({'a_field': 'a_value'}))
+        self.field_data_cache = FieldDataCache([], course_id, self.user)
+        self.kvs = DjangoKeyValueStore(self.field_data_cache)
+
+    def test_add_descriptor(self):
+        descriptor = mock_descriptor([mock_field(Scope.user_state, 'a_field')])
+        with self.assertNumQueries(1):
+            self.field_data_cache.add_descriptors_to_cache([descriptor])
+        self.assertEquals('a_value', self.kvs.get(user_state_key('a_field')))
+
+    def test_add_descriptor_twice(self):
+        descriptor = mock_descriptor([mock_field(Scope.user_state, 'a_field')])
+        self.field_data_cache.add_descriptors_to_cache([descriptor])
+        with self.assertNumQueries(0):
+            self.field_data_cache.add_descriptors_to_cache([descriptor])
+
+    def test_only_missing_descriptors_are_queried(self):
+        descriptor = mock_descriptor([mock_field(Scope.user_state, 'a_field')])
+        self.field_data_cache.add_descriptors_to_cache([descriptor])
+        self.kvs.set(user_state_key('a_field'), 'new_value')
+
+        other_descriptor = mock_descriptor([mock_field(Scope.user_state, 'a_field')])
+        other_descriptor.scope_ids = ScopeIds('user1', 'mock_problem', location('def_id'), location('other_usage_id'))
+        with patch('courseware.model_data.FieldDataCache._chunked_query', return_value=[]) as mock_query:
+            self.field_data_cache.add_descriptors_to_cache([descriptor, other_descriptor])
+            self.assertEquals(
+                [location('other_usage_id')],
+                list(mock_query.call_args[0][2])
+            )
+
+        # The object that was already cached is kept, with its new value
+        self.assertEquals('new_value', self.kvs.get(user_state_key('a_field')))
+
+    def test_for_request(self):
+        RequestCache().clear_request_cache()
+        other_user = UserFactory.create(username='other_user')
+        shared_cache = FieldDataCache.for_request(course_id, self.user)
+        self.assertIs(shared_cache, FieldDataCache.for_request(course_id, self.user))
+        self.assertIsNot(shared_cache, FieldDataCache.for_request(course_id, other_user))
+
+
+class TestDeferredWrites(TestCase):
+    """Tests for deferring writes until the end of a block"""
+    def setUp(self):
+        self.user = UserFactory.create(username='user')
+        self.assertEqual(self.user.id, 1)   # check our assumption hard-coded in the key functions above.
+        StudentModuleFactory.create(student=self.user, state=json.dumps({'a_field': 'a_value'}))
+        self.field_data_cache = FieldDataCache(
+            [mock_descriptor([mock_field(Scope.user_state, 'a_field'), mock_field(Scope.user_state, 'b_field')])],
+            course_id,
+            self.user
+        )
+        self.kvs = DjangoKeyValueStore(self.field_data_cache)
+
+    def stored_state(self):
+        """Return the state of the StudentModule, as stored in the database"""
+        return json.loads(StudentModule.objects.get(student=self.user).state)
+
+    def test_writes_are_deferred(self):
+        history_count = StudentModuleHistory.objects.count()
+        with self.field_data_cache.deferred_writes():
+            self.kvs.set(user_state_key('a_field'), 'new_value')
+            self.kvs.set(user_state_key('b_field'), 'b_value')
+            self.assertEquals({'a_field': 'a_value'}, self.stored_state())
+
+        self.assertEquals({'a_field': 'new_value', 'b_field': 'b_value'}, self.stored_state())
+        # The two saves were written as one, with one history entry
+        self.assertEquals(history_count + 1, StudentModuleHistory.objects.count())
+        self.assertEquals(
+            {'a_field': 'new_value', 'b_field': 'b_value'},
+            json.loads(StudentModuleHistory.objects.latest().state)
+        )
+
+    def test_writes_happen_on_error(self):
+        with self.assertRaises(ValueError):
+            with self.field_data_cache.deferred_writes():
+                self.kvs.set(user_state_key('a_field'), 'new_value')
+                raise ValueError()
+
+        self.assertEquals({'a_field': 'new_value'}, self.stored_state())
+
+    def test_write_error_after_error(self):
+        # The block's error is raised, not the one writing what it saved
+        with patch.object(FieldDataCache, '_write', side_effect=DatabaseError()):
+            with self.assertRaises(ValueError):
+                with self.field_data_cache.deferred_writes():
+                    self.kvs.set(user_state_key('a_field'), 'new_value')
+                    raise ValueError()
+
+    def test_call_after_writes(self):
+        stored_states = []
+        with self.field_data_cache.deferred_writes():
+            self.kvs.set(user_state_key('a_field'), 'new_value')
+            self.field_data_cache.call_after_writes(lambda: stored_states.append(self.stored_state()))
+            self.assertEquals([], stored_states)
+        self.assertEquals([{'a_field': 'new_value'}], stored_states)
+
+        # without deferring, straight away
+        self.field_data_cache.call_after_writes(lambda: stored_states.append(self.stored_state()))
+        self.assertEquals(2, len(stored_states))
+
+    def test_nested_deferred_writes(self):
+        with self.field_data_cache.deferred_writes():
+            with self.field_data_cache.deferred_writes():
+                self.kvs.set(user_state_key('a_field'), 'new_value')
+            self.assertEquals({'a_field': 'a_value'}, self.stored_state())
+
+        self.assertEquals({'a_field': 'new_value'}, self.stored_state())
@@ -255,8 +255,8 @@ def index(request, course_id, chapter=None, section=None,
     masq = setup_masquerade(request, staff_access)
 
     try:
-        field_data_cache = FieldDataCache.cache_for_descriptor_descendents(
-            course_key, user, course, depth=2)
+        field_data_cache = FieldDataCache.for_request(course_key, user)
+        field_data_cache.add_descriptor_descendents(course, depth=2)
 
         course_module = get_module_for_descriptor(user, request, course, field_data_cache, course_key)
         if course_module is None:
@@ -323,15 +323,15 @@ def index(request, course_id, chapter=None, section=None,
             section_descriptor = modulestore().get_item(section_descriptor.location, depth=None)
 
             # Load all descendants of the section, because we're going to display its
-            # html, which in general will need all of its children
-            section_field_data_cache = FieldDataCache.cache_for_descriptor_descendents(
-                course_key, user, section_descriptor, depth=None)
+            # html, which in general will need all of its children. The chapters and
+            # sections fetched above are already in the cache and aren't queried again.
+            field_data_cache.add_descriptor_descendents(section_descriptor, depth=None)
 
             section_module = get_module_for_descriptor(
                 request.user,
                 request,
                 section_descriptor,
-                section_field_data_cache,
+                field_data_cache,
                 course_key,
                 position
             )
@@ -237,17 +237,19 @@ def single_thread(request, course_id, discussion_id, thread_id):
 
     course = get_course_with_access(request.user, 'load_forum', course_id)
     cc_user = cc.User.from_django_user(request.user)
-    user_info = cc_user.to_dict()
 
     # Currently, the front end always loads responses via AJAX, even for this
     # page; it would be a nice optimization to avoid that extra round trip to
     # the comments service.
     try:
-        thread = cc.Thread.find(thread_id).retrieve(
-            recursive=request.is_ajax(),
-            user_id=request.user.id,
-            response_skip=request.GET.get("resp_skip"),
-            response_limit=request.GET.get("resp_limit")
+        user_info, thread = cc.utils.perform_concurrently(
+            cc_user.to_dict,
+            lambda: cc.Thread.find(thread_id).retrieve(
+                recursive=request.is_ajax(),
+                user_id=request.user.id,
+                response_skip=request.GET.get("resp_skip"),
+                response_limit=request.GET.get("resp_limit")
+            )
         )
     except cc.utils.CommentClientRequestError as e:
         if e.status_code == 404:
@@ -319,6 +321,25 @@ def single_thread(request, course_id, discussion_id, thread_id):
 
         return render_to_response('discussion/index.html', context)
 
+
+def _get_profile_data(request, profiled_user, get_threads_page, query_params):
+    """
+    Fetches a page of the profiled user's threads with `get_threads_page`, the
+    requesting user's info and, for the full page, the profiled user's info,
+    from the comments service at the same time.
+    """
+    calls = [
+        lambda: get_threads_page(query_params),
+        cc.User.from_django_user(request.user).to_dict,
+    ]
+    if not request.is_ajax():
+        calls.append(profiled_user.to_dict)
+    results = cc.utils.perform_concurrently(*calls)
+    if request.is_ajax():
+        results.append(None)
+    return results
+
+
 @require_GET
 @login_required
 def user_profile(request, course_id, user_id):
@@ -335,10 +356,11 @@ def user_profile(request, course_id, user_id):
             'per_page': THREADS_PER_PAGE,   # more than threads_per_page to show more activities
         }
 
-        threads, page, num_pages = profiled_user.active_threads(query_params)
+        (threads, page, num_pages), user_info, profiled_user_info = _get_profile_data(
+            request, profiled_user, profiled_user.active_threads, query_params
+        )
         query_params['page'] = page
         query_params['num_pages'] = num_pages
-        user_info = cc.User.from_django_user(request.user).to_dict()
 
         with newrelic.agent.FunctionTrace(nr_transaction, "get_metadata_for_threads"):
             annotated_content_info = utils.get_metadata_for_threads(course_id, threads, request.user, user_info)
@@ -355,7 +377,7 @@ def user_profile(request, course_id, user_id):
                 'course': course,
                 'user': request.user,
                 'django_user': User.objects.get(id=user_id),
-                'profiled_user': profiled_user.to_dict(),
+                'profiled_user': profiled_user_info,
                 'threads': saxutils.escape(json.dumps(threads), escapedict),
                 'user_info': saxutils.escape(json.dumps(user_info), escapedict),
                 'annotated_content_info': saxutils.escape(json.dumps(annotated_content_info), escapedict),
@@ -385,10 +407,11 @@ def followed_threads(request, course_id, user_id):
             'sort_order': request.GET.get('sort_order', 'desc'),
         }
 
-        threads, page, num_pages = profiled_user.subscribed_threads(query_params)
+        (threads, page, num_pages), user_info, profiled_user_info = _get_profile_data(
+            request, profiled_user, profiled_user.subscribed_threads, query_params
+        )
         query_params['page'] = page
         query_params['num_pages'] = num_pages
-        user_info = cc.User.from_django_user(request.user).to_dict()
 
         with newrelic.agent.FunctionTrace(nr_transaction, "get_metadata_for_threads"):
             annotated_content_info = utils.get_metadata_for_threads(course_id, threads, request.user, user_info)
@@ -405,7 +428,7 @@ def followed_threads(request, course_id, user_id):
                 'course': course,
                 'user': request.user,
                 'django_user': User.objects.get(id=user_id),
-                'profiled_user': profiled_user.to_dict(),
+                'profiled_user': profiled_user_info,
                 'threads': saxutils.escape(json.dumps(threads), escapedict),
                 'user_info': saxutils.escape(json.dumps(user_info), escapedict),
                 'annotated_content_info': saxutils.escape(json.dumps(annotated_content_info), escapedict),
@@ -0,0 +1,54 @@
+"""
+Tests for the comments service client's connection handling.
+"""
+from django.test import TestCase
+from django.test.utils import override_settings
+from django.utils.translation import get_language, override
+from mock import patch, Mock
+import requests
+
+from lms.lib.comment_client import utils
+
+
+@override_settings(COMMENTS_SERVICE_MAX_RETRIES=1)
+@patch('lms.lib.comment_client.utils.requests.Session.request')
+class PerformRequestTestCase(TestCase):
+    def test_shared_session(self, mock_request):
+        self.assertIs(utils.get_session(), utils.get_session())
+
+    def test_retries_idempotent_requests(self, mock_request):
+        mock_request.side_effect = [
+            requests.exceptions.ConnectionError(),
+            Mock(status_code=200, json=Mock(return_value={'id': 'dummy'})),
+        ]
+        self.assertEqual(utils.perform_request('get', 'http://localhost:4567/api/v1/threads/dummy'), {'id': 'dummy'})
+        self.assertEqual(mock_request.call_count, 2)
+
+    def test_gives_up_after_max_retries(self, mock_request):
+        mock_request.side_effect = requests.exceptions.ConnectionError()
+        with self.assertRaises(requests.exceptions.ConnectionError):
+            utils.perform_request('delete', 'http://localhost:4567/api/v1/threads/dummy')
+        self.assertEqual(mock_request.call_count, 2)
+
+    def test_doesnt_retry_posts(self, mock_request):
+        mock_request.side_effect = requests.exceptions.ConnectionError()
+        with self.assertRaises(requests.exceptions.ConnectionError):
+            utils.perform_request('post', 'http://localhost:4567/api/v1/threads', {'body': 'dummy'})
+        self.assertEqual(mock_request.call_count, 1)
+
+
+class PerformConcurrentlyTestCase(TestCase):
+    def test_results_in_order(self):
+        self.assertEqual(utils.perform_concurrently(lambda: 1, lambda: 2, lambda: 3), [1, 2, 3])
+
+    def test_reraises_first_exception(self):
+        def fail(message):
+            raise utils.CommentClientRequestError(message, 404)
+
+        with self.assertRaises(utils.CommentClientRequestError) as context:
+            utils.perform_concurrently(lambda: 1, lambda: fail("first"), lambda: fail("second"))
+        self.assertEqual(context.exception.message, "first")
+
+    def test_language_is_passed_on(self):
+        with override('eo'):
+            self.assertEqual(utils.perform_concurrently(get_language, get_language), ['eo', 'eo'])
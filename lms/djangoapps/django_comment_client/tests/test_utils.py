@@ -2,7 +2,7 @@
 
 import json
 import mock
-from datetime import datetime
+from datetime import datetime, timedelta
 from pytz import UTC
 from django.core.urlresolvers import reverse
 from django.test import TestCase
@@ -505,6 +505,41 @@ class CategoryMapTestCase(ModuleStoreTestCase):
             }
         )
 
+    def test_cached_until_published(self):
+        self.create_discussion("Chapter", "Discussion 1")
+        first_map = utils.get_discussion_category_map(self.course)
+        with mock.patch.object(utils, '_get_discussion_modules') as get_modules:
+            self.assertEqual(utils.get_discussion_category_map(self.course), first_map)
+        self.assertFalse(get_modules.called)
+
+        # Adding a discussion publishes the course, so the map is rebuilt.
+        self.create_discussion("Chapter", "Discussion 2")
+        self.assertEqual(
+            utils.get_discussion_category_map(self.course)["subcategories"]["Chapter"]["children"],
+            ["Discussion 1", "Discussion 2"]
+        )
+
+    def test_cached_map_refiltered_when_discussion_starts(self):
+        self.create_discussion("Chapter", "Discussion 1")
+        self.create_discussion("Chapter", "Discussion 2", start=datetime.now(UTC) + timedelta(hours=1))
+        self.assertEqual(
+            utils.get_discussion_category_map(self.course)["subcategories"]["Chapter"]["children"],
+            ["Discussion 1"]
+        )
+
+        class Tomorrow(datetime):
+            @classmethod
+            def now(cls, tz=None):
+                return datetime.now(tz) + timedelta(days=1)
+
+        with mock.patch.object(utils, 'datetime', Tomorrow):
+            with mock.patch.object(utils, '_get_discussion_modules') as get_modules:
+                self.assertEqual(
+                    utils.get_discussion_category_map(self.course)["subcategories"]["Chapter"]["children"],
+                    ["Discussion 1", "Discussion 2"]
+                )
+        self.assertFalse(get_modules.called)
+
 
 class JsonResponseTestCase(TestCase, UnicodeTestMixin):
     def _test_unicode_data(self, text):
@@ -4,11 +4,12 @@ import logging
 from datetime import datetime
 
 from django.contrib.auth.models import User
+from django.core.cache import cache
 from django.core.urlresolvers import reverse
 from django.db import connection
 from django.http import HttpResponse
 from django.utils import simplejson
-from django_comment_common.models import Role, FORUM_ROLE_STUDENT
+from django_comment_common.models import Role, FORUM_ROLE_STUDENT, discussion_category_map_cache_key
 from django_comment_client.permissions import check_permissions_by_view
 
 from edxmako import lookup_template
@@ -21,6 +22,10 @@ import json
 
 log = logging.getLogger(__name__)
 
+# Cached category maps are forgotten when their course is published, but XML
+# courses are never published, so they expire too.
+CATEGORY_MAP_CACHE_TIMEOUT = 60 * 60
+
 
 def extract(dic, keys):
     return {k: dic.get(k) for k in keys}
@@ -128,9 +133,58 @@ def _sort_map_entries(category_map, sort_alpha):
     category_map["children"] = [x[0] for x in sorted(things, key=lambda x: x[1]["sort_key"])]
 
 
+def _next_start_date(category_map, now):
+    """
+    Returns the earliest start date in `category_map` which isn't before
+    `now`, when filtering the map next changes what it returns.
+    """
+    next_start_date = datetime.max.replace(tzinfo=pytz.UTC)
+    queue = [category_map]
+    while queue:
+        node = queue.pop()
+        for child in node["entries"].values() + node["subcategories"].values():
+            if now <= child["start_date"] < next_start_date:
+                next_start_date = child["start_date"]
+        queue.extend(node["subcategories"].values())
+    return next_start_date
+
+
 def get_discussion_category_map(course):
-    course_id = course.id
+    """
+    Returns the course's discussion categories and topics which have started.
 
+    The map of all of them is built once per publish of the course, and
+    cached along with its filtered version, which is used until the next
+    category or topic starts.
+    """
+    cache_key = discussion_category_map_cache_key(course.id)
+    now = datetime.now(UTC())
+    cached = cache.get(cache_key)
+    if cached is not None and now < cached["next_start_date"]:
+        return cached["category_map"]
+
+    if cached is None:
+        unfiltered_category_map = _build_discussion_category_map(course)
+    else:
+        unfiltered_category_map = cached["unfiltered_category_map"]
+    category_map = _filter_unstarted_categories(unfiltered_category_map)
+    cache.set(
+        cache_key,
+        {
+            "unfiltered_category_map": unfiltered_category_map,
+            "category_map": category_map,
+            "next_start_date": _next_start_date(unfiltered_category_map, now),
+        },
+        CATEGORY_MAP_CACHE_TIMEOUT
+    )
+    return category_map
+
+
+def _build_discussion_category_map(course):
+    """
+    Returns the sorted map of all of the course's discussion categories and
+    topics, with their start dates.
+    """
     unexpanded_category_map = defaultdict(list)
 
     modules = _get_discussion_modules(course)
@@ -184,14 +238,15 @@ def get_discussion_category_map(course):
     # TODO.  BUG! : course location is not unique across multiple course runs!
     # (I think Kevin already noticed this)  Need to send course_id with requests, store it
     # in the backend.
+    # Configured topics have always started.
     for topic, entry in course.discussion_topics.items():
         category_map['entries'][topic] = {"id": entry["id"],
                                           "sort_key": entry.get("sort_key", topic),
-                                          "start_date": datetime.now(UTC())}
+                                          "start_date": datetime.min.replace(tzinfo=pytz.UTC)}
 
     _sort_map_entries(category_map, course.discussion_sort_alpha)
 
-    return _filter_unstarted_categories(category_map)
+    return category_map
 
 
 class JsonResponse(HttpResponse):
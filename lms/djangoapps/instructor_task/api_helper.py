@@ -16,6 +16,7 @@ from courseware.module_render import get_xqueue_callback_url_prefix
 from xmodule.modulestore.django import modulestore
 from xmodule.modulestore.locations import Location
 from instructor_task.models import InstructorTask, PROGRESS
+from instructor_task.subtasks import get_subtask_progress
 
 
 log = logging.getLogger(__name__)
@@ -117,10 +118,10 @@ def _update_instructor_task(instructor_task, task_result):
     opportunity to update the InstructorTask entry.
 
     Tasks that are in progress and have subtasks doing the processing do not look
-    to the task's AsyncResult object.  When subtasks are running, the
-    InstructorTask object itself is updated with the subtasks' progress,
-    not any AsyncResult object.  In this case, the InstructorTask is
-    not updated at all.
+    to the task's AsyncResult object.  When subtasks are running, their progress
+    is stored in InstructorSubtask objects, not any AsyncResult object.  In this
+    case, the InstructorTask's task_output is updated with the sum of the progress
+    of its subtasks, but its task_state is not updated at all.
 
     Calculates json to store in "task_output" field of the `instructor_task`,
     as well as updating the task_state.
@@ -150,8 +151,9 @@ def _update_instructor_task(instructor_task, task_result):
         # meaning that the subtasks have successfully been defined.  However, the InstructorTask
         # will be marked as in PROGRESS, until the last subtask completes and marks it as SUCCESS.
         # We want to ignore the parent SUCCESS if subtasks are still running, and just trust the
-        # contents of the InstructorTask.
+        # contents of the InstructorTask and its subtasks.
         entry_needs_updating = False
+        instructor_task.task_output = InstructorTask.create_output_for_success(get_subtask_progress(instructor_task))
     elif result_state in [PROGRESS, SUCCESS]:
         # construct a status message directly from the task result's result:
         # it needs to go back with the entry passed in.
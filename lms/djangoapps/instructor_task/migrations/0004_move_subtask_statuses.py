@@ -0,0 +1,124 @@
+# -*- coding: utf-8 -*-
+import json
+
+from south.v2 import DataMigration
+
+# The states of subtasks which have finished, from celery.states.READY_STATES.
+READY_STATES = ('SUCCESS', 'FAILURE', 'REVOKED')
+SUBTASK_COUNTS = ('attempted', 'succeeded', 'failed', 'skipped', 'retried_nomax', 'retried_withmax')
+
+
+class Migration(DataMigration):
+
+    def forwards(self, orm):
+        """
+        Move the subtask statuses of tasks which are still in progress out of
+        their "subtasks" JSON and into InstructorSubtasks, which is where their
+        subtasks now update them.
+        """
+        for entry in orm.InstructorTask.objects.filter(task_state='PROGRESS').exclude(subtasks=''):
+            subtask_dict = json.loads(entry.subtasks)
+            for subtask_id, subtask_status in subtask_dict.get('status', {}).items():
+                orm.InstructorSubtask.objects.get_or_create(
+                    task_id=subtask_id,
+                    defaults=dict(
+                        instructor_task=entry,
+                        state=subtask_status.get('state', 'QUEUING'),
+                        **{name: subtask_status.get(name, 0) for name in SUBTASK_COUNTS}
+                    ),
+                )
+            entry.subtasks = json.dumps({'total': subtask_dict['total']})
+            entry.save()
+
+    def backwards(self, orm):
+        """
+        Put the subtask statuses of tasks which are still in progress back
+        into their "subtasks" JSON.
+        """
+        for entry in orm.InstructorTask.objects.filter(task_state='PROGRESS').exclude(subtasks=''):
+            subtask_dict = json.loads(entry.subtasks)
+            subtask_dict['status'] = {}
+            subtask_dict['succeeded'] = subtask_dict['failed'] = 0
+            for subtask in orm.InstructorSubtask.objects.filter(instructor_task=entry):
+                subtask_status = {name: getattr(subtask, name) for name in SUBTASK_COUNTS}
+                subtask_status.update(task_id=subtask.task_id, state=subtask.state)
+                subtask_dict['status'][subtask.task_id] = subtask_status
+                if subtask.state == 'SUCCESS':
+                    subtask_dict['succeeded'] += 1
+                elif subtask.state in READY_STATES:
+                    subtask_dict['failed'] += 1
+            entry.subtasks = json.dumps(subtask_dict)
+            entry.save()
+        orm.InstructorSubtask.objects.all().delete()
+
+
+    models = {
+        'auth.group': {
+            'Meta': {'object_name': 'Group'},
+            'id': ('django.db.models.fields.AutoField', [], {'primary_key': 'True'}),
+            'name': ('django.db.models.fields.CharField', [], {'unique': 'True', 'max_length': '80'}),
+            'permissions': ('django.db.models.fields.related.ManyToManyField', [], {'to': "orm['auth.Permission']", 'symmetrical': 'False', 'blank': 'True'})
+        },
+        'auth.permission': {
+            'Meta': {'ordering': "('content_type__app_label', 'content_type__model', 'codename')", 'unique_together': "(('content_type', 'codename'),)", 'object_name': 'Permission'},
+            'codename': ('django.db.models.fields.CharField', [], {'max_length': '100'}),
+            'content_type': ('django.db.models.fields.related.ForeignKey', [], {'to': "orm['contenttypes.ContentType']"}),
+            'id': ('django.db.models.fields.AutoField', [], {'primary_key': 'True'}),
+            'name': ('django.db.models.fields.CharField', [], {'max_length': '50'})
+        },
+        'auth.user': {
+            'Meta': {'object_name': 'User'},
+            'date_joined': ('django.db.models.fields.DateTimeField', [], {'default': 'datetime.datetime.now'}),
+            'email': ('django.db.models.fields.EmailField', [], {'max_length': '75', 'blank': 'True'}),
+            'first_name': ('django.db.models.fields.CharField', [], {'max_length': '30', 'blank': 'True'}),
+            'groups': ('django.db.models.fields.related.ManyToManyField', [], {'to': "orm['auth.Group']", 'symmetrical': 'False', 'blank': 'True'}),
+            'id': ('django.db.models.fields.AutoField', [], {'primary_key': 'True'}),
+            'is_active': ('django.db.models.fields.BooleanField', [], {'default': 'True'}),
+            'is_staff': ('django.db.models.fields.BooleanField', [], {'default': 'False'}),
+            'is_superuser': ('django.db.models.fields.BooleanField', [], {'default': 'False'}),
+            'last_login': ('django.db.models.fields.DateTimeField', [], {'default': 'datetime.datetime.now'}),
+            'last_name': ('django.db.models.fields.CharField', [], {'max_length': '30', 'blank': 'True'}),
+            'password': ('django.db.models.fields.CharField', [], {'max_length': '128'}),
+            'user_permissions': ('django.db.models.fields.related.ManyToManyField', [], {'to': "orm['auth.Permission']", 'symmetrical': 'False', 'blank': 'True'}),
+            'username': ('django.db.models.fields.CharField', [], {'unique': 'True', 'max_length': '30'})
+        },
+        'contenttypes.contenttype': {
+            'Meta': {'ordering': "('name',)", 'unique_together': "(('app_label', 'model'),)", 'object_name': 'ContentType', 'db_table': "'django_content_type'"},
+            'app_label': ('django.db.models.fields.CharField', [], {'max_length': '100'}),
+            'id': ('django.db.models.fields.AutoField', [], {'primary_key': 'True'}),
+            'model': ('django.db.models.fields.CharField', [], {'max_length': '100'}),
+            'name': ('django.db.models.fields.CharField', [], {'max_length': '100'})
+        },
+        'instructor_task.instructorsubtask': {
+            'Meta': {'object_name': 'InstructorSubtask'},
+            'attempted': ('django.db.models.fields.IntegerField', [], {'default': '0'}),
+            'failed': ('django.db.models.fields.IntegerField', [], {'default': '0'}),
+            'id': ('django.db.models.fields.AutoField', [], {'primary_key': 'True'}),
+            'instructor_task': ('django.db.models.fields.related.ForeignKey', [], {'to': "orm['instructor_task.InstructorTask']"}),
+            'retried_nomax': ('django.db.models.fields.IntegerField', [], {'default': '0'}),
+            'retried_withmax': ('django.db.models.fields.IntegerField', [], {'default': '0'}),
+            'skipped': ('django.db.models.fields.IntegerField', [], {'default': '0'}),
+            'state': ('django.db.models.fields.CharField', [], {'max_length': '50', 'db_index': 'True'}),
+            'succeeded': ('django.db.models.fields.IntegerField', [], {'default': '0'}),
+            'task_id': ('django.db.models.fields.CharField', [], {'unique': 'True', 'max_length': '255'}),
+            'updated': ('django.db.models.fields.DateTimeField', [], {'auto_now': 'True', 'blank': 'True'})
+        },
+        'instructor_task.instructortask': {
+            'Meta': {'object_name': 'InstructorTask'},
+            'course_id': ('xmodule_django.models.CourseKeyField', [], {'max_length': '255', 'db_index': 'True'}),
+            'created': ('django.db.models.fields.DateTimeField', [], {'auto_now_add': 'True', 'null': 'True', 'blank': 'True'}),
+            'id': ('django.db.models.fields.AutoField', [], {'primary_key': 'True'}),
+            'requester': ('django.db.models.fields.related.ForeignKey', [], {'to': "orm['auth.User']"}),
+            'subtasks': ('django.db.models.fields.TextField', [], {'blank': 'True'}),
+            'task_id': ('django.db.models.fields.CharField', [], {'max_length': '255', 'db_index': 'True'}),
+            'task_input': ('django.db.models.fields.CharField', [], {'max_length': '255'}),
+            'task_key': ('django.db.models.fields.CharField', [], {'max_length': '255', 'db_index': 'True'}),
+            'task_output': ('django.db.models.fields.CharField', [], {'max_length': '1024', 'null': 'True'}),
+            'task_state': ('django.db.models.fields.CharField', [], {'max_length': '50', 'null': 'True', 'db_index': 'True'}),
+            'task_type': ('django.db.models.fields.CharField', [], {'max_length': '50', 'db_index': 'True'}),
+            'updated': ('django.db.models.fields.DateTimeField', [], {'auto_now': 'True', 'blank': 'True'})
+        }
+    }
+
+    complete_apps = ['instructor_task']
+    symmetrical = True
@@ -14,11 +14,13 @@ ASSUMPTIONS: modules have unique IDs, even across different module_types
 """
 from cStringIO import StringIO
 from gzip import GzipFile
+from tempfile import TemporaryFile
 from uuid import uuid4
 import csv
 import json
 import hashlib
 import os.path
+import shutil
 import urllib
 
 from boto.s3.connection import S3Connection
@@ -190,6 +192,58 @@ class InstructorTask(models.Model):
         return json.dumps({'message': 'Task revoked before running'})
 
 
+class InstructorSubtask(models.Model):
+    """
+    Stores the status of one subtask of an InstructorTask.
+
+    Each subtask updates only its own row, so that subtasks finishing at the
+    same time don't wait for each other on the InstructorTask's row.  The
+    progress of the InstructorTask is the sum of the counts of its subtasks.
+
+    `instructor_task` is the InstructorTask that the subtask was queued for.
+    `task_id` stores the id used by celery for the subtask.
+    `state` stores the last known state of the subtask.
+    The counts are those of the subtask's SubtaskStatus.
+    """
+    instructor_task = models.ForeignKey(InstructorTask, db_index=True)
+    task_id = models.CharField(max_length=255, unique=True)  # max_length from celery_taskmeta
+    state = models.CharField(max_length=50, db_index=True)  # max_length from celery_taskmeta
+    attempted = models.IntegerField(default=0)
+    succeeded = models.IntegerField(default=0)
+    failed = models.IntegerField(default=0)
+    skipped = models.IntegerField(default=0)
+    retried_nomax = models.IntegerField(default=0)
+    retried_withmax = models.IntegerField(default=0)
+    updated = models.DateTimeField(auto_now=True)
+
+    # Subtask rows are created this many at a time.
+    CREATE_BATCH_SIZE = 100
+
+    def __repr__(self):
+        return 'InstructorSubtask<%r>' % ({
+            'instructor_task': self.instructor_task_id,  # pylint: disable=no-member
+            'task_id': self.task_id,
+            'state': self.state,
+        },)
+
+    def __unicode__(self):
+        return unicode(repr(self))
+
+    @classmethod
+    @transaction.autocommit
+    def create_for_task(cls, instructor_task, subtask_id_list, state):
+        """
+        Replaces the subtasks of `instructor_task` with new ones, with ids
+        `subtask_id_list`, in `state`, and commits them.
+        """
+        cls.objects.filter(instructor_task=instructor_task).delete()
+        for index in xrange(0, len(subtask_id_list), cls.CREATE_BATCH_SIZE):
+            cls.objects.bulk_create([
+                cls(instructor_task=instructor_task, task_id=subtask_id, state=state)
+                for subtask_id in subtask_id_list[index:index + cls.CREATE_BATCH_SIZE]
+            ])
+
+
 class ReportStore(object):
     """
     Simple abstraction layer that can fetch and store CSV files for reports
@@ -209,6 +263,60 @@ class ReportStore(object):
         elif storage_type.lower() == "localfs":
             return LocalFSReportStore.from_config()
 
+    def store_part_rows(self, course_id, filename, part_name, rows):
+        """
+        Store `rows` as one part of the file `filename`, to be combined with its
+        other parts by `merge_parts()`. Parts are kept apart from the finished
+        files, so they never show up in `links_for()`.
+        """
+        raise NotImplementedError
+
+    def part_names(self, course_id, filename):
+        """Return the names of the stored parts of `filename`, sorted."""
+        raise NotImplementedError
+
+    def part_rows(self, course_id, filename, part_name):
+        """Return an iterator over the rows of one stored part of `filename`."""
+        raise NotImplementedError
+
+    def delete_parts(self, course_id, filename):
+        """Remove all of the stored parts of `filename`."""
+        raise NotImplementedError
+
+    def merge_parts(self, course_id, filename, header=None, skip_rows=0):
+        """
+        Store the rows of all of the parts of `filename`, in order of their part
+        names, as `filename`, and then remove the parts. Rows are streamed one
+        part at a time, so the whole file is never held in memory as rows.
+
+        `header` is a row to write before the others. The first `skip_rows` rows
+        of each part are left out once a part has contributed rows, which
+        drops the repeated header rows of parts that each start with one.
+        Nothing is stored if there are no parts. Returns whether a file was stored.
+
+        Merging the same parts again stores the same file, so a merge which was
+        interrupted before the parts were removed can just be run again.
+        """
+        part_names = self.part_names(course_id, filename)
+        if not part_names:
+            return False
+
+        def merged_rows():
+            """Generate the rows of the merged file."""
+            if header is not None:
+                yield header
+            any_rows = False
+            for part_name in part_names:
+                rows_to_skip = skip_rows if any_rows else 0
+                for row_number, row in enumerate(self.part_rows(course_id, filename, part_name)):
+                    if row_number < rows_to_skip:
+                        continue
+                    any_rows = True
+                    yield row
+        self.store_rows(course_id, filename, merged_rows())
+        self.delete_parts(course_id, filename)
+        return True
+
 
 class S3ReportStore(ReportStore):
     """
@@ -298,18 +406,76 @@ class S3ReportStore(ReportStore):
     def store_rows(self, course_id, filename, rows):
         """
         Given a `course_id`, `filename`, and `rows` (each row is an iterable of
-        strings), create a buffer that is a gzip'd csv file, and then `store()`
-        that buffer.
+        strings), write them as a gzip'd csv file and store it. The file is
+        written to a temporary file as the rows are generated, and uploaded from
+        there, so that large reports are never held in memory.
 
         Even though we store it in gzip format, browsers will transparently
         download and decompress it. Filenames should end in `.csv`, not `.gz`.
         """
+        key = self.key_for(course_id, filename)
+
+        with TemporaryFile() as output_file:
+            gzip_file = GzipFile(fileobj=output_file, mode="wb")
+            csv.writer(gzip_file).writerows(rows)
+            gzip_file.close()
+
+            output_file.seek(0)
+            key.content_encoding = "gzip"
+            key.content_type = "text/csv"
+            key.set_contents_from_file(
+                output_file,
+                headers={
+                    "Content-Encoding": "gzip",
+                    "Content-Type": "text/csv",
+                }
+            )
+
+    def key_for_part(self, course_id, filename, part_name=''):
+        """Return the S3 key of a part of the given filename. Parts live
+        outside of the course's directory, so `links_for` doesn't list them."""
+        hashed_course_id = hashlib.sha1(course_id.to_deprecated_string())
+
+        key = Key(self.bucket)
+        key.key = "{}/parts/{}/{}/{}".format(
+            self.root_path,
+            hashed_course_id.hexdigest(),
+            filename,
+            part_name
+        )
+
+        return key
+
+    def store_part_rows(self, course_id, filename, part_name, rows):
+        """
+        Store `rows` as a gzip'd csv part of `filename`.
+        """
         output_buffer = StringIO()
         gzip_file = GzipFile(fileobj=output_buffer, mode="wb")
         csv.writer(gzip_file).writerows(rows)
         gzip_file.close()
 
-        self.store(course_id, filename, output_buffer)
+        key = self.key_for_part(course_id, filename, part_name)
+        key.set_contents_from_string(output_buffer.getvalue())
+
+    def part_names(self, course_id, filename):
+        """Return the names of the stored parts of `filename`, sorted."""
+        parts_dir = self.key_for_part(course_id, filename)
+        return sorted(key.key.split("/")[-1] for key in self.bucket.list(prefix=parts_dir.key))
+
+    def part_rows(self, course_id, filename, part_name):
+        """Return an iterator over the rows of one stored part of `filename`."""
+        key = self.key_for_part(course_id, filename, part_name)
+        with TemporaryFile() as part_file:
+            key.get_contents_to_file(part_file)
+            part_file.seek(0)
+            for row in csv.reader(GzipFile(fileobj=part_file, mode="rb")):
+                yield row
+
+    def delete_parts(self, course_id, filename):
+        """Remove all of the stored parts of `filename`."""
+        parts_dir = self.key_for_part(course_id, filename)
+        self.bucket.delete_keys([key.key for key in self.bucket.list(prefix=parts_dir.key)])
 
     def links_for(self, course_id):
         """
@@ -381,11 +547,62 @@ class LocalFSReportStore(ReportStore):
     def store_rows(self, course_id, filename, rows):
         """
         Given a course_id, filename, and rows (each row is an iterable of strings),
-        write this data out.
+        write this data out. Rows are written to the file as they are generated.
         """
-        output_buffer = StringIO()
-        csv.writer(output_buffer).writerows(rows)
-        self.store(course_id, filename, output_buffer)
+        full_path = self.path_to(course_id, filename)
+        directory = os.path.dirname(full_path)
+        if not os.path.exists(directory):
+            os.mkdir(directory)
+
+        with open(full_path, "wb") as f:
+            csv.writer(f).writerows(rows)
+
+    def path_to_part(self, course_id, filename, part_name=''):
+        """Return the full path to a part of the given file. Parts live outside
+        of the course's directory, so `links_for` doesn't list them."""
+        return os.path.join(
+            self.root_path,
+            'parts',
+            urllib.quote(course_id.to_deprecated_string(), safe=''),
+            filename,
+            part_name
+        )
+
+    def store_part_rows(self, course_id, filename, part_name, rows):
+        """
+        Store `rows` as a csv part of `filename`.
+        """
+        full_path = self.path_to_part(course_id, filename, part_name)
+        directory = os.path.dirname(full_path)
+        if not os.path.exists(directory):
+            try:
+                os.makedirs(directory)
+            except OSError:
+                # another part was stored at the same time
+                if not os.path.isdir(directory):
+                    raise
+
+        with open(full_path, "wb") as f:
+            csv.writer(f).writerows(rows)
+
+    def part_names(self, course_id, filename):
+        """Return the names of the stored parts of `filename`, sorted."""
+        parts_dir = self.path_to_part(course_id, filename)
+        if not os.path.exists(parts_dir):
+            return []
+        return sorted(os.listdir(parts_dir))
+
+    def part_rows(self, course_id, filename, part_name):
+        """Return an iterator over the rows of one stored part of `filename`."""
+        with open(self.path_to_part(course_id, filename, part_name), "rb") as f:
+            for row in csv.reader(f):
+                yield row
+
+    def delete_parts(self, course_id, filename):
+        """Remove all of the stored parts of `filename`."""
+        parts_dir = self.path_to_part(course_id, filename)
+        if os.path.exists(parts_dir):
+            shutil.rmtree(parts_dir)
 
     def links_for(self, course_id):
         """
@@ -11,18 +11,24 @@ from celery.states import SUCCESS, READY_STATES, RETRY
 from dogapi import dog_stats_api
 
 from django.db import transaction, DatabaseError
+from django.db.models import Count, Sum
 from django.core.cache import cache
 
-from instructor_task.models import InstructorTask, PROGRESS, QUEUING
+from instructor_task.models import InstructorTask, InstructorSubtask, PROGRESS, QUEUING
 
 TASK_LOG = get_task_logger(__name__)
 
 # Lock expiration should be long enough to allow a subtask to complete.
 SUBTASK_LOCK_EXPIRE = 60 * 10  # Lock expires in 10 minutes
-# Number of times to retry if a subtask update encounters a lock on the InstructorTask.
+# Number of times to retry if a subtask update fails to update the InstructorSubtask.
 # (These are recursive retries, so don't make this number too large.)
 MAX_DATABASE_LOCK_RETRIES = 5
 
+# The counts of a SubtaskStatus, which are stored in its InstructorSubtask.
+SUBTASK_COUNTS = ('attempted', 'succeeded', 'failed', 'skipped', 'retried_nomax', 'retried_withmax')
+# The counts of subtasks which add up to the progress of their InstructorTask.
+PROGRESS_COUNTS = ('attempted', 'succeeded', 'failed', 'skipped')
+
 
 class DuplicateTaskException(Exception):
     """Exception indicating that a task already exists or has already completed."""
@@ -206,15 +212,10 @@ def initialize_subtask_info(entry, action_name, total_num, subtask_id_list):
     done overall.  The `action_name` is also stored, to help with constructing more readable
     task_progress messages.
 
-    The InstructorTask's "subtasks" field is also initialized.  This is also a JSON-serialized dict.
-    Keys include 'total', 'succeeded', 'retried', 'failed', which are counters for the number of
-    subtasks.  'Total' is set here to the total number, while the other three are initialized to zero.
-    Once the counters for 'succeeded' and 'failed' match the 'total', the subtasks are done and
-    the InstructorTask's "status" will be changed to SUCCESS.
-
-    The "subtasks" field also contains a 'status' key, that contains a dict that stores status
-    information for each subtask.  The value for each subtask (keyed by its task_id)
-    is its subtask status, as defined by SubtaskStatus.to_dict().
+    The InstructorTask's "subtasks" field is also initialized.  This is also a JSON-serialized dict,
+    whose 'total' key is set to the total number of subtasks.  An InstructorSubtask is created
+    for each subtask, to store its status, as defined by SubtaskStatus.  Once all of the subtasks
+    are done, the InstructorTask's "status" will be changed to SUCCESS.
 
     This information needs to be set up in the InstructorTask before any of the subtasks start
     running.  If not, there is a chance that the subtasks could complete before the parent task
@@ -222,8 +223,8 @@ def initialize_subtask_info(entry, action_name, total_num, subtask_id_list):
     for locking.
 
     Monitoring code should assume that if an InstructorTask has subtask information, that it should
-    rely on the status stored in the InstructorTask object, rather than status stored in the
-    corresponding AsyncResult.
+    rely on the status stored in the InstructorTask object and its InstructorSubtasks, rather than
+    status stored in the corresponding AsyncResult.
     """
     task_progress = {
         'action_name': action_name,
@@ -238,18 +239,10 @@ def initialize_subtask_info(entry, action_name, total_num, subtask_id_list):
     entry.task_output = InstructorTask.create_output_for_success(task_progress)
     entry.task_state = PROGRESS
 
-    # Write out the subtasks information.
-    num_subtasks = len(subtask_id_list)
-    # Note that may not be necessary to store initial value with all those zeroes!
-    # Write out as a dict, so it will go more smoothly into json.
-    subtask_status = {subtask_id: (SubtaskStatus.create(subtask_id)).to_dict() for subtask_id in subtask_id_list}
-    subtask_dict = {
-        'total': num_subtasks,
-        'succeeded': 0,
-        'failed': 0,
-        'status': subtask_status
-    }
-    entry.subtasks = json.dumps(subtask_dict)
+    # Write out the subtasks' statuses, before the subtasks information that
+    # tells monitoring code to look for them.
+    InstructorSubtask.create_for_task(entry, subtask_id_list, QUEUING)
+    entry.subtasks = json.dumps({'total': len(subtask_id_list)})
 
     # and save the entry immediately, before any subtasks actually start work:
     entry.save_now()
@@ -379,9 +372,9 @@ def check_subtask_is_valid(entry_id, current_task_id, new_subtask_status):
         raise DuplicateTaskException(msg)
 
     # Confirm that the InstructorTask knows about this particular subtask.
-    subtask_dict = json.loads(entry.subtasks)
-    subtask_status_info = subtask_dict['status']
-    if current_task_id not in subtask_status_info:
+    try:
+        subtask = InstructorSubtask.objects.get(instructor_task=entry, task_id=current_task_id)
+    except InstructorSubtask.DoesNotExist:
         format_str = "Unexpected task_id '{}': unable to find status for subtask of instructor task '{}': rejecting task {}"
         msg = format_str.format(current_task_id, entry, new_subtask_status)
         TASK_LOG.warning(msg)
@@ -390,7 +383,9 @@ def check_subtask_is_valid(entry_id, current_task_id, new_subtask_status):
 
     # Confirm that the InstructorTask doesn't think that this subtask has already been
     # performed successfully.
-    subtask_status = SubtaskStatus.from_dict(subtask_status_info[current_task_id])
+    subtask_status = SubtaskStatus.create(
+        current_task_id, state=subtask.state, **{name: getattr(subtask, name) for name in SUBTASK_COUNTS}
+    )
     subtask_state = subtask_status.state
     if subtask_state in READY_STATES:
         format_str = "Unexpected task_id '{}': already completed - status {} for subtask of instructor task '{}': rejecting task {}"
@@ -426,12 +421,12 @@ def check_subtask_is_valid(entry_id, current_task_id, new_subtask_status):
 
 def update_subtask_status(entry_id, current_task_id, new_subtask_status, retry_count=0):
     """
-    Update the status of the subtask in the parent InstructorTask object tracking its progress.
+    Update the status of the subtask in the InstructorSubtask tracking its progress.
 
-    Because select_for_update is used to lock the InstructorTask object while it is being updated,
-    multiple subtasks updating at the same time may time out while waiting for the lock.
-    The actual update operation is surrounded by a try/except/else that permits the update to be
-    retried if the transaction times out.
+    Each subtask only updates its own InstructorSubtask, so subtasks don't wait for each other,
+    but the update operation is surrounded by a try/except/else that permits the update to be
+    retried if the transaction fails nonetheless (e.g. on a deadlock).  Once the update is done,
+    the parent InstructorTask is marked as completed if this was the last subtask to finish.
 
     The subtask lock acquired in the call to check_subtask_is_valid() is released here, only when
     the attempting of retries has concluded.
@@ -451,6 +446,9 @@ def update_subtask_status(entry_id, current_task_id, new_subtask_status, retry_c
                           retry_count, current_task_id, entry_id, new_subtask_status)
             dog_stats_api.increment('instructor_task.subtask.failed_after_update_retries')
             raise
+    else:
+        if new_subtask_status.state in READY_STATES:
+            _update_task_if_completed(entry_id)
     finally:
         # Only release the lock on the subtask when we're done trying to update it.
         # Note that this will be called each time a recursive call to update_subtask_status()
@@ -461,99 +459,95 @@ def update_subtask_status(entry_id, current_task_id, new_subtask_status, retry_c
 @transaction.commit_manually
 def _update_subtask_status(entry_id, current_task_id, new_subtask_status):
     """
-    Update the status of the subtask in the parent InstructorTask object tracking its progress.
+    Update the status of the subtask in the InstructorSubtask tracking its progress.
 
-    Uses select_for_update to lock the InstructorTask object while it is being updated.
     The operation is surrounded by a try/except/else that permit the manual transaction to be
     committed on completion, or rolled back on error.
 
-    The InstructorTask's "task_output" field is updated.  This is a JSON-serialized dict.
-    Accumulates values for 'attempted', 'succeeded', 'failed', 'skipped' from `new_subtask_status`
-    into the corresponding values in the InstructorTask's task_output.  Also updates the 'duration_ms'
-    value with the current interval since the original InstructorTask started.  Note that this
-    value is only approximate, since the subtask may be running on a different server than the
-    original task, so is subject to clock skew.
-
-    The InstructorTask's "subtasks" field is also updated.  This is also a JSON-serialized dict.
-    Keys include 'total', 'succeeded', 'retried', 'failed', which are counters for the number of
-    subtasks.  'Total' is expected to have been set at the time the subtasks were created.
-    The other three counters are incremented depending on the value of `status`.  Once the counters
-    for 'succeeded' and 'failed' match the 'total', the subtasks are done and the InstructorTask's
-    "status" is changed to SUCCESS.
-
-    The "subtasks" field also contains a 'status' key, that contains a dict that stores status
-    information for each subtask.  At the moment, the value for each subtask (keyed by its task_id)
-    is the value of the SubtaskStatus.to_dict(), but could be expanded in future to store information
-    about failure messages, progress made, etc.
+    The InstructorSubtask's state and counts are replaced by those of `new_subtask_status`,
+    which include the results of any earlier attempts of the subtask.  The parent InstructorTask
+    isn't touched (nor locked): its progress is the sum of the counts of its subtasks, which
+    get_subtask_progress() calculates when the progress is asked for.
     """
     TASK_LOG.info("Preparing to update status for subtask %s for instructor task %d with status %s",
                   current_task_id, entry_id, new_subtask_status)
 
     try:
-        entry = InstructorTask.objects.select_for_update().get(pk=entry_id)
-        subtask_dict = json.loads(entry.subtasks)
-        subtask_status_info = subtask_dict['status']
-        if current_task_id not in subtask_status_info:
+        try:
+            subtask = InstructorSubtask.objects.get(instructor_task__id=entry_id, task_id=current_task_id)
+        except InstructorSubtask.DoesNotExist:
             # unexpected error -- raise an exception
             format_str = "Unexpected task_id '{}': unable to update status for subtask of instructor task '{}'"
             msg = format_str.format(current_task_id, entry_id)
             TASK_LOG.warning(msg)
             raise ValueError(msg)
 
-        # Update status:
-        subtask_status_info[current_task_id] = new_subtask_status.to_dict()
-
-        # Update the parent task progress.
-        # Set the estimate of duration, but only if it
-        # increases.  Clock skew between time() returned by different machines
-        # may result in non-monotonic values for duration.
-        task_progress = json.loads(entry.task_output)
-        start_time = task_progress['start_time']
-        prev_duration = task_progress['duration_ms']
-        new_duration = int((time() - start_time) * 1000)
-        task_progress['duration_ms'] = max(prev_duration, new_duration)
-
-        # Update counts only when subtask is done.
-        # In future, we can make this more responsive by updating status
-        # between retries, by comparing counts that change from previous
-        # retry.
-        new_state = new_subtask_status.state
-        if new_subtask_status is not None and new_state in READY_STATES:
-            for statname in ['attempted', 'succeeded', 'failed', 'skipped']:
-                task_progress[statname] += getattr(new_subtask_status, statname)
-
-        # Figure out if we're actually done (i.e. this is the last task to complete).
-        # This is easier if we just maintain a counter, rather than scanning the
-        # entire new_subtask_status dict.
-        if new_state == SUCCESS:
-            subtask_dict['succeeded'] += 1
-        elif new_state in READY_STATES:
-            subtask_dict['failed'] += 1
-        num_remaining = subtask_dict['total'] - subtask_dict['succeeded'] - subtask_dict['failed']
-
-        # If we're done with the last task, update the parent status to indicate that.
-        # At present, we mark the task as having succeeded.  In future, we should see
-        # if there was a catastrophic failure that occurred, and figure out how to
-        # report that here.
-        if num_remaining <= 0:
-            entry.task_state = SUCCESS
-        entry.subtasks = json.dumps(subtask_dict)
-        entry.task_output = InstructorTask.create_output_for_success(task_progress)
-
-        TASK_LOG.debug("about to save....")
-        entry.save()
-        TASK_LOG.info("Task output updated to %s for subtask %s of instructor task %d",
-                      entry.task_output, current_task_id, entry_id)
+        subtask.state = new_subtask_status.state
+        for name in SUBTASK_COUNTS:
+            setattr(subtask, name, getattr(new_subtask_status, name))
+        subtask.save()
     except Exception:
-        TASK_LOG.exception("Unexpected error while updating InstructorTask.")
+        TASK_LOG.exception("Unexpected error while updating InstructorSubtask.")
         transaction.rollback()
         dog_stats_api.increment('instructor_task.subtask.update_exception')
         raise
     else:
-        TASK_LOG.debug("about to commit....")
         transaction.commit()
 
 
+@transaction.commit_on_success
+def _update_task_if_completed(entry_id):
+    """
+    Mark the InstructorTask `entry_id` as having succeeded, storing its final progress, if
+    all of its subtasks are done.
+
+    This is called after the status of a finished subtask has been committed, so that the
+    last subtask to finish is sure to see that all of them are done.  (More than one
+    subtask may see that, but they'll all store the same progress.)
+    At present, we mark the task as having succeeded.  In future, we should see
+    if there was a catastrophic failure that occurred, and figure out how to
+    report that here.
+    """
+    subtasks = InstructorSubtask.objects.filter(instructor_task__id=entry_id)
+    if subtasks.exclude(state__in=list(READY_STATES)).exists():
+        return
+
+    entry = InstructorTask.objects.get(pk=entry_id)
+    entry.task_output = InstructorTask.create_output_for_success(get_subtask_progress(entry))
+    entry.task_state = SUCCESS
+    entry.save()
+    TASK_LOG.info("Task output updated to %s for instructor task %d", entry.task_output, entry_id)
+
+
+def get_subtask_progress(entry):
+    """
+    Returns the progress of InstructorTask `entry`, whose work is done by subtasks.
+
+    The counts for 'attempted', 'succeeded', 'failed' and 'skipped' are the sums of those of
+    its InstructorSubtasks, and the 'duration_ms' is the interval since the InstructorTask
+    started.  Note that this value is only approximate, since the subtasks may be running on
+    different servers than the original task, so are subject to clock skew.  The other values
+    are those stored in the InstructorTask's "task_output" when its subtasks were created.
+
+    If the InstructorTask has no InstructorSubtasks (as for tasks whose subtasks were created
+    before they had them), its stored progress is returned.
+    """
+    task_progress = json.loads(entry.task_output)
+    totals = InstructorSubtask.objects.filter(instructor_task=entry).aggregate(
+        num_subtasks=Count('id'), **{name: Sum(name) for name in PROGRESS_COUNTS}
+    )
+    if totals['num_subtasks'] == 0:
+        return task_progress
+
+    for name in PROGRESS_COUNTS:
+        task_progress[name] = totals[name] or 0
+    # Clock skew between time() returned by different machines
+    # may result in non-monotonic values for duration.
+    new_duration = int((time() - task_progress['start_time']) * 1000)
+    task_progress['duration_ms'] = max(task_progress['duration_ms'], new_duration)
+    return task_progress
+
+
 def _statsd_tag(course_id):
     """
     Calculate the tag we will use for DataDog.
@@ -31,6 +31,8 @@ from instructor_task.tasks_helper import (
     reset_attempts_module_state,
     delete_problem_module_state,
     push_grades_to_s3,
+    push_grades_part_to_s3,
+    merge_grade_report_parts,
 )
 from bulk_email.tasks import perform_delegate_email_batches
 
@@ -137,5 +139,27 @@ def calculate_grades_csv(entry_id, xmodule_instance_args):
     Grade a course and push the results to an S3 bucket for download.
     """
     action_name = ugettext_noop('graded')
-    task_fn = partial(push_grades_to_s3, xmodule_instance_args)
+    task_fn = partial(push_grades_to_s3, xmodule_instance_args, calculate_grades_csv_part)
     return run_main_task(entry_id, task_fn, action_name)
+
+
+@task(routing_key=settings.GRADES_DOWNLOAD_ROUTING_KEY)  # pylint: disable=E1102
+def calculate_grades_csv_part(entry_id, filename_prefix, student_ids, subtask_status_dict):
+    """
+    Grade some of the students in a course as a subtask of `calculate_grades_csv`.
+    """
+    return push_grades_part_to_s3(
+        merge_grades_csv_parts, entry_id, filename_prefix, student_ids, subtask_status_dict
+    )
+
+
+@task(
+    routing_key=settings.GRADES_DOWNLOAD_ROUTING_KEY,
+    default_retry_delay=settings.GRADES_DOWNLOAD_MERGE_RETRY_DELAY,
+    max_retries=settings.GRADES_DOWNLOAD_MERGE_MAX_RETRIES,
+)  # pylint: disable=E1102
+def merge_grades_csv_parts(entry_id, filename_prefix):
+    """
+    Merge the parts of a grade report stored by the subtasks of `calculate_grades_csv`.
+    """
+    merge_grade_report_parts(merge_grades_csv_parts, entry_id, filename_prefix)
@@ -7,11 +7,15 @@ import json
 import urllib
 from datetime import datetime
 from time import time
+from traceback import format_exc
 
 from celery import Task, current_task
+from celery.exceptions import RetryTaskError
 from celery.utils.log import get_task_logger
 from celery.states import SUCCESS, FAILURE
+from django.conf import settings
 from django.contrib.auth.models import User
+from django.core.cache import cache
 from django.db import transaction, reset_queries
 from dogapi import dog_stats_api
 from pytz import UTC
@@ -24,6 +28,12 @@ from courseware.models import StudentModule
 from courseware.model_data import FieldDataCache
 from courseware.module_render import get_module_for_descriptor_internal
 from instructor_task.models import ReportStore, InstructorTask, PROGRESS
+from instructor_task.subtasks import (
+    SubtaskStatus,
+    queue_subtasks_for_query,
+    check_subtask_is_valid,
+    update_subtask_status,
+)
 from student.models import CourseEnrollment
 
 # define different loggers for use within tasks and on client side
@@ -37,6 +47,10 @@ UPDATE_STATUS_SUCCEEDED = 'succeeded'
 UPDATE_STATUS_FAILED = 'failed'
 UPDATE_STATUS_SKIPPED = 'skipped'
 
+# how long the lock taken by the task that merges a grade report's parts can be held, after
+# which another merge can take over (in case the process doing the merge died)
+GRADE_REPORT_MERGE_LOCK_EXPIRE = 10 * 60
+
 
 class BaseInstructorTask(Task):
     """
@@ -469,58 +483,122 @@ def delete_problem_module_state(xmodule_instance_args, _module_descriptor, stude
     return UPDATE_STATUS_SUCCEEDED
 
 
-def push_grades_to_s3(_xmodule_instance_args, _entry_id, course_id, _task_input, action_name):
+def push_grades_to_s3(_xmodule_instance_args, grade_part_task, entry_id, course_id, _task_input, action_name):
     """
     For a given `course_id`, generate a grades CSV file for all students that
     are enrolled, and store using a `ReportStore`. Once created, the files can
     be accessed by instantiating another `ReportStore` (via
-    `ReportStore.from_config()`) and calling `link_for()` on it. Writes are
-    buffered, so we'll never write part of a CSV file to S3 -- i.e. any files
-    that are visible in ReportStore will be complete ones.
-
-    As we start to add more CSV downloads, it will probably be worthwhile to
-    make a more general CSVDoc class instead of building out the rows like we
-    do here.
+    `ReportStore.from_config()`) and calling `link_for()` on it.
+
+    The enrolled students are split up among `grade_part_task` subtasks of no
+    more than settings.GRADES_DOWNLOAD_STUDENTS_PER_TASK students each, which
+    grade their students in parallel and store their rows as parts of the
+    report (see `push_grades_part_to_s3`). The last subtask to finish queues
+    a task which merges the parts into the report, so any files that are
+    visible in ReportStore will be complete ones.
     """
+    entry = InstructorTask.objects.get(pk=entry_id)
+
+    # As with bulk email, the task may be run again after a loss of connection
+    # while it was being queued.  If the subtasks have already been defined,
+    # don't queue up another set of them.
+    if len(entry.subtasks) > 0 and len(entry.task_output) > 0:
+        TASK_LOG.warning(u"Task %s has already queued subtasks for grading course %s", entry.task_id, course_id)
+        return json.loads(entry.task_output)
+
     start_time = datetime.now(UTC)
-    status_interval = 100
 
-    enrolled_students = CourseEnrollment.users_enrolled_in(course_id)
-    num_total = enrolled_students.count()
-    num_attempted = 0
-    num_succeeded = 0
-    num_failed = 0
-    curr_step = "Calculating Grades"
+    # Generate parts of the file name
+    timestamp_str = start_time.strftime("%Y-%m-%d-%H%M")
+    course_id_prefix = urllib.quote(course_id.to_deprecated_string().replace("/", "_"))
+    filename_prefix = u"{}_grade_report_{}".format(course_id_prefix, timestamp_str)
 
-    def update_task_progress():
-        """Return a dict containing info about current task"""
-        current_time = datetime.now(UTC)
-        progress = {
+    enrolled_students = CourseEnrollment.users_enrolled_in(course_id)
+    if not enrolled_students.exists():
+        # There's nothing to split up, so just store the empty report.
+        ReportStore.from_config().store_rows(course_id, filename_prefix + u".csv", [])
+        return {
             'action_name': action_name,
-            'attempted': num_attempted,
-            'succeeded': num_succeeded,
-            'failed': num_failed,
-            'total': num_total,
-            'duration_ms': int((current_time - start_time).total_seconds() * 1000),
-            'step': curr_step,
+            'attempted': 0,
+            'succeeded': 0,
+            'failed': 0,
+            'total': 0,
+            'duration_ms': int((datetime.now(UTC) - start_time).total_seconds() * 1000),
         }
-        _get_current_task().update_state(state=PROGRESS, meta=progress)
 
-        return progress
+    def _create_grade_part_subtask(student_list, initial_subtask_status):
+        """Creates a subtask to grade a given list of students."""
+        subtask_id = initial_subtask_status.task_id
+        return grade_part_task.subtask(
+            (
+                entry_id,
+                filename_prefix,
+                [student['pk'] for student in student_list],
+                initial_subtask_status.to_dict(),
+            ),
+            task_id=subtask_id,
+            routing_key=settings.GRADES_DOWNLOAD_ROUTING_KEY,
+        )
+
+    return queue_subtasks_for_query(
+        entry,
+        action_name,
+        _create_grade_part_subtask,
+        enrolled_students,
+        [],
+        settings.GRADES_DOWNLOAD_STUDENTS_PER_QUERY,
+        settings.GRADES_DOWNLOAD_STUDENTS_PER_TASK
+    )
 
-    # Loop over all our students and build our CSV lists in memory
+
+def push_grades_part_to_s3(merge_task, entry_id, filename_prefix, student_ids, subtask_status_dict):
+    """
+    Grade the students with the given `student_ids`, as one subtask of the
+    grade report task `entry_id`, and store their rows as a part of the report
+    files named by `filename_prefix`. The part is named by the lowest student
+    id, so the parts are merged in the order the students were split up in.
+
+    The subtask which finishes last queues `merge_task` to merge all of the
+    parts into the report (see `merge_grade_report_parts`).
+    """
+    subtask_status = SubtaskStatus.from_dict(subtask_status_dict)
+    current_task_id = subtask_status.task_id
+    check_subtask_is_valid(entry_id, current_task_id, subtask_status)
+
+    course_id = InstructorTask.objects.get(pk=entry_id).course_id
+    part_name = "{:012d}.csv".format(min(student_ids))
+    students = User.objects.filter(id__in=student_ids).order_by('id')
+
+    try:
+        num_succeeded, num_failed = _store_grade_report_part(course_id, filename_prefix, part_name, students)
+    except Exception:
+        # We don't know how far the grading got, so count all of the students as failed.
+        TASK_LOG.exception(u"Grade report subtask %s for course %s: failed unexpectedly!", current_task_id, course_id)
+        subtask_status.increment(failed=len(student_ids), state=FAILURE)
+        update_subtask_status(entry_id, current_task_id, subtask_status)
+        _queue_grade_report_merge(merge_task, entry_id, filename_prefix)
+        raise
+
+    subtask_status.increment(succeeded=num_succeeded, failed=num_failed, state=SUCCESS)
+    update_subtask_status(entry_id, current_task_id, subtask_status)
+    _queue_grade_report_merge(merge_task, entry_id, filename_prefix)
+    return subtask_status.to_dict()
+
+
+def _store_grade_report_part(course_id, filename_prefix, part_name, students):
+    """
+    Grade `students`, storing the rows for those who could be graded, preceded
+    by a header row, as part `part_name` of the report, and the rows for those
+    who couldn't as the same part of the errors report.
+
+    Returns the numbers of students who were and weren't graded.
+    """
     header = None
     rows = []
-    err_rows = [["id", "username", "error_msg"]]
-    for student, gradeset, err_msg in iterate_grades_for(course_id, enrolled_students):
-        # Periodically update task status (this is a cache write)
-        if num_attempted % status_interval == 0:
-            update_task_progress()
-        num_attempted += 1
-
+    err_rows = []
+    for student, gradeset, err_msg in iterate_grades_for(course_id, students):
         if gradeset:
             # We were able to successfully grade this student for this course.
-            num_succeeded += 1
             if not header:
                 # Encode the header row in utf-8 encoding in case there are unicode characters
                 header = [section['label'].encode('utf-8') for section in gradeset[u'section_breakdown']]
@@ -542,32 +620,82 @@ def push_grades_to_s3(_xmodule_instance_args, _entry_id, course_id, _task_input,
             rows.append([student.id, student.email, student.username, gradeset['percent']] + row_percents)
         else:
             # An empty gradeset means we failed to grade a student.
-            num_failed += 1
             err_rows.append([student.id, student.username, err_msg])
 
-    # By this point, we've got the rows we're going to stuff into our CSV files.
-    curr_step = "Uploading CSVs"
-    update_task_progress()
+    report_store = ReportStore.from_config()
+    report_store.store_part_rows(course_id, filename_prefix + u".csv", part_name, rows)
+    if err_rows:
+        report_store.store_part_rows(course_id, filename_prefix + u"_err.csv", part_name, err_rows)
 
-    # Generate parts of the file name
-    timestamp_str = start_time.strftime("%Y-%m-%d-%H%M")
-    course_id_prefix = urllib.quote(course_id.to_deprecated_string().replace("/", "_"))
+    return len(rows) - 1 if rows else 0, len(err_rows)
 
-    # Perform the actual upload
-    report_store = ReportStore.from_config()
-    report_store.store_rows(
-        course_id,
-        u"{}_grade_report_{}.csv".format(course_id_prefix, timestamp_str),
-        rows
-    )
 
-    # If there are any error rows (don't count the header), write them out as well
-    if len(err_rows) > 1:
-        report_store.store_rows(
-            course_id,
-            u"{}_grade_report_{}_err.csv".format(course_id_prefix, timestamp_str),
-            err_rows
-        )
+def _queue_grade_report_merge(merge_task, entry_id, filename_prefix):
+    """
+    If all of the subtasks of grade report task `entry_id` have finished,
+    queue `merge_task` to merge the parts they stored into the report files.
+    Subtasks which finish at the same time may each queue it; the merge makes
+    sure that it's only done once.
+    """
+    if InstructorTask.objects.get(pk=entry_id).task_state == SUCCESS:
+        merge_task.apply_async((entry_id, filename_prefix), routing_key=settings.GRADES_DOWNLOAD_ROUTING_KEY)
+
 
-    # One last update before we close out...
-    return update_task_progress()
+def merge_grade_report_parts(merge_task, entry_id, filename_prefix):
+    """
+    Merge the parts stored by the subtasks of grade report task `entry_id`
+    into the report files named by `filename_prefix`, as the task `merge_task`.
+
+    A lock makes sure that only one merge runs at a time. A merge which finds
+    the lock taken checks back once the lock would have expired, in case the
+    merge holding it never finishes. A merge which fails is retried, and once
+    it's out of retries the grade report task is marked as failed. Merging
+    again after the report has been merged leaves it as it is.
+    """
+    entry = InstructorTask.objects.get(pk=entry_id)
+    lock_key = "grade-report-merge-{}".format(entry_id)
+    if not cache.add(lock_key, 'true', GRADE_REPORT_MERGE_LOCK_EXPIRE):
+        try:
+            merge_task.retry(countdown=GRADE_REPORT_MERGE_LOCK_EXPIRE)
+        except merge_task.MaxRetriesExceededError:
+            TASK_LOG.warning(u"Grade report %s: gave up waiting for another merge to finish", entry.task_id)
+        return
+
+    try:
+        with dog_stats_api.timer('instructor_tasks.time.merge_grade_report'):
+            _merge_grade_report_files(entry.course_id, filename_prefix)
+        return
+    except Exception as exc:  # pylint: disable=broad-except
+        TASK_LOG.exception(u"Grade report %s: failed to merge the report's parts", entry.task_id)
+        error, traceback_string = exc, format_exc()
+    finally:
+        # Released before retrying, since an eager retry runs the merge again right away.
+        cache.delete(lock_key)
+
+    try:
+        merge_task.retry(exc=error)
+    except RetryTaskError:
+        raise
+    except Exception:
+        entry.task_state = FAILURE
+        entry.task_output = InstructorTask.create_output_for_failure(error, traceback_string)
+        entry.save_now()
+        raise
+
+
+def _merge_grade_report_files(course_id, filename_prefix):
+    """
+    Merge the stored parts of the report files named by `filename_prefix`
+    into the report files. The parts are removed once they're merged, so a
+    report without parts has already been merged.
+    """
+    report_store = ReportStore.from_config()
+    report_name = filename_prefix + u".csv"
+    # Each part starts with its own header row; only the first is kept.
+    if not report_store.merge_parts(course_id, report_name, skip_rows=1):
+        if report_name not in [name for name, __ in report_store.links_for(course_id)]:
+            # None of the subtasks graded anyone, but there should still be a report.
+            report_store.store_rows(course_id, report_name, [])
+    report_store.merge_parts(
+        course_id, filename_prefix + u"_err.csv", header=["id", "username", "error_msg"]
+    )
@@ -0,0 +1,59 @@
+"""
+Tests for the ReportStore that grade reports are stored in.
+"""
+import csv
+import os
+import shutil
+import tempfile
+
+from django.test import TestCase
+
+from xmodule.modulestore.locations import SlashSeparatedCourseKey
+
+from instructor_task.models import LocalFSReportStore
+
+
+class TestLocalFSReportStoreParts(TestCase):
+    """
+    Test storing reports in parts and merging them.
+    """
+    def setUp(self):
+        self.root_path = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.root_path)
+        self.report_store = LocalFSReportStore(self.root_path)
+        self.course_id = SlashSeparatedCourseKey("MITx", "999", "Robot_Super_Course")
+
+    def _read_report(self, filename):
+        """Return the rows of the stored report `filename`."""
+        with open(self.report_store.path_to(self.course_id, filename), "rb") as report:
+            return list(csv.reader(report))
+
+    def test_merge_parts(self):
+        filename = "grade_report.csv"
+        # stored out of order, and with an empty part first
+        self.report_store.store_part_rows(self.course_id, filename, "000000000003.csv", [["id"], ["3"], ["4"]])
+        self.report_store.store_part_rows(self.course_id, filename, "000000000000.csv", [])
+        self.report_store.store_part_rows(self.course_id, filename, "000000000001.csv", [["id"], ["1"], ["2"]])
+
+        # parts aren't listed as reports
+        self.assertEqual(self.report_store.links_for(self.course_id), [])
+
+        self.assertTrue(self.report_store.merge_parts(self.course_id, filename, skip_rows=1))
+        self.assertEqual(self._read_report(filename), [["id"], ["1"], ["2"], ["3"], ["4"]])
+        self.assertEqual(self.report_store.part_names(self.course_id, filename), [])
+        self.assertEqual([name for name, __ in self.report_store.links_for(self.course_id)], [filename])
+
+    def test_merge_parts_with_header(self):
+        filename = "grade_report_err.csv"
+        self.report_store.store_part_rows(self.course_id, filename, "000000000002.csv", [["2", "bob", "oops"]])
+        self.report_store.store_part_rows(self.course_id, filename, "000000000001.csv", [["1", "amy", "oops"]])
+
+        self.report_store.merge_parts(self.course_id, filename, header=["id", "username", "error_msg"])
+        self.assertEqual(
+            self._read_report(filename),
+            [["id", "username", "error_msg"], ["1", "amy", "oops"], ["2", "bob", "oops"]]
+        )
+
+    def test_merge_no_parts(self):
+        self.assertFalse(self.report_store.merge_parts(self.course_id, "grade_report_err.csv"))
+        self.assertFalse(os.path.exists(self.report_store.path_to(self.course_id, "grade_report_err.csv")))
@@ -1,13 +1,22 @@
 """
 Unit tests for instructor_task subtasks.
 """
+import json
 from uuid import uuid4
 
+from celery.states import SUCCESS, FAILURE, RETRY
 from mock import Mock, patch
 
 from student.models import CourseEnrollment
 
-from instructor_task.subtasks import queue_subtasks_for_query
+from instructor_task.api_helper import get_updated_instructor_task
+from instructor_task.models import InstructorTask, PROGRESS
+from instructor_task.subtasks import (
+    queue_subtasks_for_query,
+    initialize_subtask_info,
+    update_subtask_status,
+    SubtaskStatus,
+)
 from instructor_task.tests.factories import InstructorTaskFactory
 from instructor_task.tests.test_base import InstructorTaskCourseTestCase
 
@@ -93,3 +102,72 @@ class TestSubtasks(InstructorTaskCourseTestCase):
         self.assertEqual(len(mock_create_subtask_fcn_args[1][0][0]), 3)
         self.assertEqual(len(mock_create_subtask_fcn_args[2][0][0]), 4)
         self.assertEqual(len(mock_create_subtask_fcn_args[3][0][0]), 4)
+
+
+class TestSubtaskProgress(InstructorTaskCourseTestCase):
+    """Tests for the progress of tasks whose work is done by subtasks."""
+
+    def setUp(self):
+        super(TestSubtaskProgress, self).setUp()
+        self.initialize_course()
+        self.subtask_ids = ['subtask-1', 'subtask-2']
+        self.entry = InstructorTaskFactory.create(
+            course_id=self.course.id,
+            task_id=str(uuid4()),
+            task_key='dummy_task_key',
+            task_type='bulk_course_email',
+        )
+        initialize_subtask_info(self.entry, 'emailed', 10, self.subtask_ids)
+
+    def _get_progress(self):
+        """Returns the InstructorTask's state and progress, as they are polled."""
+        with patch('instructor_task.api_helper.AsyncResult') as mock_result:
+            mock_result.return_value = Mock(state=SUCCESS, result=None, traceback=None)
+            entry = get_updated_instructor_task(self.entry.task_id)
+        return entry.task_state, json.loads(entry.task_output)
+
+    def test_progress_is_sum_of_subtasks(self):
+        update_subtask_status(
+            self.entry.id, 'subtask-1', SubtaskStatus.create('subtask-1', succeeded=4, skipped=1, state=SUCCESS)
+        )
+        # The InstructorTask itself isn't updated until the last subtask is done...
+        self.assertEquals(json.loads(InstructorTask.objects.get(pk=self.entry.id).task_output)['succeeded'], 0)
+        # ...but polling shows the progress so far.
+        state, progress = self._get_progress()
+        self.assertEquals(state, PROGRESS)
+        self.assertEquals(progress['attempted'], 4)
+        self.assertEquals(progress['succeeded'], 4)
+        self.assertEquals(progress['skipped'], 1)
+        self.assertEquals(progress['total'], 10)
+        self.assertEquals(progress['action_name'], 'emailed')
+
+        # Counts of subtasks being retried are included too.
+        update_subtask_status(
+            self.entry.id, 'subtask-2', SubtaskStatus.create('subtask-2', succeeded=2, retried_nomax=1, state=RETRY)
+        )
+        state, progress = self._get_progress()
+        self.assertEquals(state, PROGRESS)
+        self.assertEquals(progress['succeeded'], 6)
+
+    def test_last_subtask_completes_task(self):
+        update_subtask_status(
+            self.entry.id, 'subtask-1', SubtaskStatus.create('subtask-1', succeeded=5, state=SUCCESS)
+        )
+        update_subtask_status(
+            self.entry.id, 'subtask-2', SubtaskStatus.create('subtask-2', succeeded=3, failed=2, state=FAILURE)
+        )
+        # A duplicate update of a finished subtask doesn't count twice.
+        update_subtask_status(
+            self.entry.id, 'subtask-2', SubtaskStatus.create('subtask-2', succeeded=3, failed=2, state=FAILURE)
+        )
+        entry = InstructorTask.objects.get(pk=self.entry.id)
+        self.assertEquals(entry.task_state, SUCCESS)
+        progress = json.loads(entry.task_output)
+        self.assertEquals(progress['attempted'], 10)
+        self.assertEquals(progress['succeeded'], 8)
+        self.assertEquals(progress['failed'], 2)
+        self.assertEquals(self._get_progress(), (SUCCESS, progress))
+
+    def test_unknown_subtask(self):
+        with self.assertRaises(ValueError):
+            update_subtask_status(self.entry.id, 'bogus', SubtaskStatus.create('bogus', succeeded=1, state=SUCCESS))
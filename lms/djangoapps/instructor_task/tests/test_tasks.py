@@ -5,24 +5,37 @@ Runs tasks on answers to course problems to validate that code
 paths actually work.
 
 """
+import csv
 import json
+import os
+import shutil
+import tempfile
 from uuid import uuid4
 
 from mock import Mock, MagicMock, patch
 
 from celery.states import SUCCESS, FAILURE
+from django.core.cache import cache
+from django.test.utils import override_settings
 
 from xmodule.modulestore.exceptions import ItemNotFoundError
 from xmodule.modulestore.locations import i4xEncoder
 
+from courseware.grades import iterate_grades_for
 from courseware.models import StudentModule
 from courseware.tests.factories import StudentModuleFactory
 from student.tests.factories import UserFactory, CourseEnrollmentFactory
 
-from instructor_task.models import InstructorTask
+from instructor_task.models import InstructorTask, ReportStore
 from instructor_task.tests.test_base import InstructorTaskModuleTestCase
 from instructor_task.tests.factories import InstructorTaskFactory
-from instructor_task.tasks import rescore_problem, reset_problem_attempts, delete_problem_state
+from instructor_task.tasks import (
+    rescore_problem,
+    reset_problem_attempts,
+    delete_problem_state,
+    calculate_grades_csv,
+    merge_grades_csv_parts,
+)
 from instructor_task.tasks_helper import UpdateProblemModuleStateError
 
 PROBLEM_URL_NAME = "test_urlname"
@@ -438,3 +451,116 @@ class TestDeleteStateInstructorTask(TestInstructorTasks):
                 StudentModule.objects.get(course_id=self.course.id,
                                           student=student,
                                           module_state_key=self.location)
+
+
+class TestGradeReportInstructorTask(TestInstructorTasks):
+    """
+    Tests grade reports, which are graded by subtasks that each store a part
+    of the report, and merged by another task once the subtasks are done.
+    """
+
+    def setUp(self):
+        super(TestGradeReportInstructorTask, self).setUp()
+        self.students = [self.create_student(username) for username in ('student_a', 'student_b', 'student_c')]
+        root_path = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, root_path)
+        # grade each student in a subtask of their own
+        settings_override = override_settings(
+            GRADES_DOWNLOAD={'STORAGE_TYPE': 'localfs', 'ROOT_PATH': root_path},
+            GRADES_DOWNLOAD_STUDENTS_PER_TASK=1,
+        )
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+    def _run_grade_report(self):
+        """Run the grade report task, and return its InstructorTask."""
+        task_entry = self._create_input_entry()
+        self._run_task_with_mock_celery(calculate_grades_csv, task_entry.id, task_entry.task_id)
+        return InstructorTask.objects.get(id=task_entry.id)
+
+    def _reports(self):
+        """Return the names of the reports stored for the course."""
+        return sorted(name for name, __ in ReportStore.from_config().links_for(self.course.id))
+
+    def _report_usernames(self, filename):
+        """Return the usernames in the rows of the stored report `filename`."""
+        report_store = ReportStore.from_config()
+        with open(report_store.path_to(self.course.id, filename), 'rb') as report:
+            rows = list(csv.DictReader(report))
+        return sorted(row['username'] for row in rows)
+
+    def _unmerged_reports(self):
+        """Return the names of the reports which have parts waiting to be merged."""
+        parts_dir = ReportStore.from_config().path_to_part(self.course.id, '')
+        return sorted(os.listdir(parts_dir)) if os.path.exists(parts_dir) else []
+
+    def test_grade_report(self):
+        entry = self._run_grade_report()
+        self.assertEquals(entry.task_state, SUCCESS)
+        [report] = self._reports()
+        self.assertEquals(
+            self._report_usernames(report),
+            sorted(['instructor', 'student_a', 'student_b', 'student_c'])
+        )
+        self.assertEquals(self._unmerged_reports(), [])
+
+    def test_grade_report_with_failed_part(self):
+        def grade_unless_student_b(course_id, students):
+            """Grade `students`, failing on the subtask which grades student_b."""
+            if self.students[1] in students:
+                raise TestTaskFailure("We expected this to fail")
+            return iterate_grades_for(course_id, students)
+
+        with patch('instructor_task.tasks_helper.iterate_grades_for') as mock_iterate_grades_for:
+            mock_iterate_grades_for.side_effect = grade_unless_student_b
+            entry = self._run_grade_report()
+
+        # the report is still merged, from the parts of the subtasks which succeeded
+        self.assertEquals(entry.task_state, SUCCESS)
+        [report] = self._reports()
+        self.assertEquals(self._report_usernames(report), sorted(['instructor', 'student_a', 'student_c']))
+        self.assertEquals(self._unmerged_reports(), [])
+
+    def test_grade_report_merged_concurrently(self):
+        # Another merge holds the lock, so the merges queued by the subtasks
+        # wait for it (which they give up on, running eagerly), and leave the
+        # parts to be merged by the merge holding the lock.
+        task_entry = self._create_input_entry()
+        lock_key = "grade-report-merge-{}".format(task_entry.id)
+        cache.add(lock_key, 'true')
+        self.addCleanup(cache.delete, lock_key)
+        self._run_task_with_mock_celery(calculate_grades_csv, task_entry.id, task_entry.task_id)
+        self.assertEquals(self._reports(), [])
+        [report] = self._unmerged_reports()
+
+        # once the lock is released, the merge can be run again
+        cache.delete(lock_key)
+        merge_grades_csv_parts.apply((task_entry.id, report[:-len('.csv')]))
+        self.assertEquals(self._reports(), [report])
+        self.assertEquals(len(self._report_usernames(report)), 4)
+        self.assertEquals(self._unmerged_reports(), [])
+        self.assertEquals(InstructorTask.objects.get(id=task_entry.id).task_state, SUCCESS)
+
+    def test_grade_report_merged_again(self):
+        entry = self._run_grade_report()
+        [report] = self._reports()
+        merge_grades_csv_parts.apply((entry.id, report[:-len('.csv')]))
+        self.assertEquals(self._reports(), [report])
+        self.assertEquals(len(self._report_usernames(report)), 4)
+
+    def test_grade_report_merge_failure(self):
+        with patch('instructor_task.tasks_helper._merge_grade_report_files') as mock_merge:
+            mock_merge.side_effect = TestTaskFailure("We expected this to fail")
+            entry = self._run_grade_report()
+        # the merge was retried before the report was marked as failed
+        self.assertGreater(mock_merge.call_count, 1)
+        self.assertEquals(entry.task_state, FAILURE)
+        output = json.loads(entry.task_output)
+        self.assertEquals(output['exception'], 'TestTaskFailure')
+        self.assertEquals(output['message'], 'We expected this to fail')
+        self.assertEquals(self._reports(), [])
+
+        # the lock was released, so the merge can be run again
+        [report] = self._unmerged_reports()
+        merge_grades_csv_parts.apply((entry.id, report[:-len('.csv')]))
+        self.assertEquals(self._reports(), [report])
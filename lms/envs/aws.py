@@ -136,6 +136,7 @@ EMAIL_USE_TLS = ENV_TOKENS.get('EMAIL_USE_TLS', False)  # django default is Fals
 SITE_NAME = ENV_TOKENS['SITE_NAME']
 HTTPS = ENV_TOKENS.get('HTTPS', HTTPS)
 SESSION_ENGINE = ENV_TOKENS.get('SESSION_ENGINE', SESSION_ENGINE)
+COURSE_ACCESS_ROLE_CACHE_TIMEOUT = ENV_TOKENS.get('COURSE_ACCESS_ROLE_CACHE_TIMEOUT', COURSE_ACCESS_ROLE_CACHE_TIMEOUT)
 SESSION_COOKIE_DOMAIN = ENV_TOKENS.get('SESSION_COOKIE_DOMAIN')
 REGISTRATION_EXTRA_FIELDS = ENV_TOKENS.get('REGISTRATION_EXTRA_FIELDS', REGISTRATION_EXTRA_FIELDS)
 
@@ -160,6 +161,10 @@ if 'loc_cache' not in CACHES:
         'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
         'LOCATION': 'edx_location_mem_cache',
     }
+# Cache shared between processes for split modulestore course structures, behind
+# each process's own cache of them. Defaults to the default cache (memcached).
+if 'course_structure_cache' not in CACHES:
+    CACHES['course_structure_cache'] = dict(CACHES['default'], KEY_PREFIX='course_structure')
 
 # Email overrides
 DEFAULT_FROM_EMAIL = ENV_TOKENS.get('DEFAULT_FROM_EMAIL', DEFAULT_FROM_EMAIL)
@@ -185,6 +190,8 @@ BULK_EMAIL_MAX_RETRIES = ENV_TOKENS.get('BULK_EMAIL_MAX_RETRIES', BULK_EMAIL_MAX
 BULK_EMAIL_INFINITE_RETRY_CAP = ENV_TOKENS.get('BULK_EMAIL_INFINITE_RETRY_CAP', BULK_EMAIL_INFINITE_RETRY_CAP)
 BULK_EMAIL_LOG_SENT_EMAILS = ENV_TOKENS.get('BULK_EMAIL_LOG_SENT_EMAILS', BULK_EMAIL_LOG_SENT_EMAILS)
 BULK_EMAIL_RETRY_DELAY_BETWEEN_SENDS = ENV_TOKENS.get('BULK_EMAIL_RETRY_DELAY_BETWEEN_SENDS', BULK_EMAIL_RETRY_DELAY_BETWEEN_SENDS)
+BULK_EMAIL_CONNECTIONS_PER_TASK = ENV_TOKENS.get('BULK_EMAIL_CONNECTIONS_PER_TASK', BULK_EMAIL_CONNECTIONS_PER_TASK)
+BULK_EMAIL_MAX_SEND_RATE_PER_CONNECTION = ENV_TOKENS.get('BULK_EMAIL_MAX_SEND_RATE_PER_CONNECTION', BULK_EMAIL_MAX_SEND_RATE_PER_CONNECTION)
 # We want Bulk Email running on the high-priority queue, so we define the
 # routing key that points to it.  At the moment, the name is the same.
 # We have to reset the value here, since we have changed the value of the queue name.
@@ -228,6 +235,9 @@ VIRTUAL_UNIVERSITIES = ENV_TOKENS.get('VIRTUAL_UNIVERSITIES', [])
 META_UNIVERSITIES = ENV_TOKENS.get('META_UNIVERSITIES', {})
 COMMENTS_SERVICE_URL = ENV_TOKENS.get("COMMENTS_SERVICE_URL", '')
 COMMENTS_SERVICE_KEY = ENV_TOKENS.get("COMMENTS_SERVICE_KEY", '')
+COMMENTS_SERVICE_POOL_SIZE = ENV_TOKENS.get("COMMENTS_SERVICE_POOL_SIZE", COMMENTS_SERVICE_POOL_SIZE)
+COMMENTS_SERVICE_MAX_RETRIES = ENV_TOKENS.get("COMMENTS_SERVICE_MAX_RETRIES", COMMENTS_SERVICE_MAX_RETRIES)
+COMMENTS_SERVICE_TIMEOUT = ENV_TOKENS.get("COMMENTS_SERVICE_TIMEOUT", COMMENTS_SERVICE_TIMEOUT)
 CERT_QUEUE = ENV_TOKENS.get("CERT_QUEUE", 'test-pull')
 ZENDESK_URL = ENV_TOKENS.get("ZENDESK_URL")
 FEEDBACK_SUBMISSION_EMAIL = ENV_TOKENS.get("FEEDBACK_SUBMISSION_EMAIL")
@@ -246,6 +256,8 @@ for name, value in ENV_TOKENS.get("CODE_JAIL", {}).items():
         CODE_JAIL[name] = value
 
 COURSES_WITH_UNSAFE_CODE = ENV_TOKENS.get("COURSES_WITH_UNSAFE_CODE", [])
+SAFE_EXEC_CACHE_MAX_ENTRIES = ENV_TOKENS.get("SAFE_EXEC_CACHE_MAX_ENTRIES", SAFE_EXEC_CACHE_MAX_ENTRIES)
+SAFE_EXEC_CACHE_MAX_ENTRY_SIZE = ENV_TOKENS.get("SAFE_EXEC_CACHE_MAX_ENTRY_SIZE", SAFE_EXEC_CACHE_MAX_ENTRY_SIZE)
 
 # Event Tracking
 if "TRACKING_IGNORE_URL_PATTERNS" in ENV_TOKENS:
@@ -368,6 +380,12 @@ VERIFY_STUDENT = AUTH_TOKENS.get("VERIFY_STUDENT", VERIFY_STUDENT)
 GRADES_DOWNLOAD_ROUTING_KEY = HIGH_MEM_QUEUE
 
 GRADES_DOWNLOAD = ENV_TOKENS.get("GRADES_DOWNLOAD", GRADES_DOWNLOAD)
+GRADES_DOWNLOAD_STUDENTS_PER_TASK = ENV_TOKENS.get('GRADES_DOWNLOAD_STUDENTS_PER_TASK', GRADES_DOWNLOAD_STUDENTS_PER_TASK)
+GRADES_DOWNLOAD_STUDENTS_PER_QUERY = ENV_TOKENS.get('GRADES_DOWNLOAD_STUDENTS_PER_QUERY', GRADES_DOWNLOAD_STUDENTS_PER_QUERY)
+GRADES_DOWNLOAD_MERGE_MAX_RETRIES = ENV_TOKENS.get('GRADES_DOWNLOAD_MERGE_MAX_RETRIES', GRADES_DOWNLOAD_MERGE_MAX_RETRIES)
+GRADES_DOWNLOAD_MERGE_RETRY_DELAY = ENV_TOKENS.get('GRADES_DOWNLOAD_MERGE_RETRY_DELAY', GRADES_DOWNLOAD_MERGE_RETRY_DELAY)
+GRADE_HISTOGRAM_REFRESH_INTERVAL = ENV_TOKENS.get('GRADE_HISTOGRAM_REFRESH_INTERVAL', GRADE_HISTOGRAM_REFRESH_INTERVAL)
+MODULE_OPEN_COUNT_RECOMPUTE_INTERVAL = ENV_TOKENS.get('MODULE_OPEN_COUNT_RECOMPUTE_INTERVAL', MODULE_OPEN_COUNT_RECOMPUTE_INTERVAL)
 
 ##### ACCOUNT LOCKOUT DEFAULT PARAMETERS #####
 MAX_FAILED_LOGIN_ATTEMPTS_ALLOWED = ENV_TOKENS.get("MAX_FAILED_LOGIN_ATTEMPTS_ALLOWED", 5)
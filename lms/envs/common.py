@@ -47,6 +47,13 @@ DISCUSSION_SETTINGS = {
     'MAX_COMMENT_DEPTH': 2,
 }
 
+# The comments service client keeps up to COMMENTS_SERVICE_POOL_SIZE connections
+# to the service open, and retries idempotent requests which fail to connect
+# COMMENTS_SERVICE_MAX_RETRIES times.
+COMMENTS_SERVICE_POOL_SIZE = 10
+COMMENTS_SERVICE_MAX_RETRIES = 1
+COMMENTS_SERVICE_TIMEOUT = 5
+
 
 # Features
 FEATURES = {
@@ -255,6 +262,14 @@ FEATURES = {
     # Show a "Download your certificate" on the Progress page if the lowest
     # nonzero grade cutoff is met
     'SHOW_PROGRESS_SUCCESS_BUTTON': False,
+
+    # Store subsection and course grades as they are computed, and reuse them
+    # until the student's state or the course's graded content changes
+    'ENABLE_PERSISTENT_GRADES': False,
+
+    # Write the student state changed by an XBlock handler once, at the end of
+    # the handler, rather than every time the handler saves it
+    'ENABLE_DEFERRED_XBLOCK_HANDLER_WRITES': False,
 }
 
 # Used for A/B testing
@@ -500,6 +515,20 @@ CODE_JAIL = {
         # How many CPU seconds can jailed code use?
         'CPU': 1,
     },
+
+    # A pool of warm sandboxed processes to run code in, rather than starting
+    # one for each execution.  Needs a python_bin.  A size of 0 means no pool.
+    'pool': {
+        # How many processes each LMS process keeps.
+        'size': 0,
+        # How many executions a process forks before it's replaced.
+        'max_executions': 100,
+        # How much memory, in bytes, each execution can use, unless 'limits'
+        # has a 'VMEM'.  It has to leave room for numpy and scipy.
+        'max_memory': 512 * 1024 * 1024,
+        # How many seconds an execution can take before it's killed.
+        'timeout': 10,
+    },
 }
 
 # Some courses are allowed to run unsafe code. This is a list of regexes, one
@@ -512,6 +541,11 @@ CODE_JAIL = {
 #   ]
 COURSES_WITH_UNSAFE_CODE = []
 
+# Results of running sandboxed code are cached in each process, in front of the
+# shared cache: at most this many results, of at most this many bytes each.
+SAFE_EXEC_CACHE_MAX_ENTRIES = 2000
+SAFE_EXEC_CACHE_MAX_ENTRY_SIZE = 64 * 1024
+
 ############################### DJANGO BUILT-INS ###############################
 # Change DEBUG/TEMPLATE_DEBUG in your environment settings files, not here
 DEBUG = False
@@ -810,6 +844,10 @@ MIDDLEWARE_CLASSES = (
 # Clickjacking protection can be enabled by setting this to 'DENY'
 X_FRAME_OPTIONS = 'ALLOW'
 
+# Users' course access roles are loaded once per request. Set this to a number
+# of seconds to also keep them in the shared cache between requests.
+COURSE_ACCESS_ROLE_CACHE_TIMEOUT = None
+
 ############################### Pipeline #######################################
 
 STATICFILES_STORAGE = 'pipeline.storage.PipelineCachedStorage'
@@ -1118,12 +1156,23 @@ BULK_EMAIL_ROUTING_KEY = HIGH_PRIORITY_QUEUE
 # a bulk email message.
 BULK_EMAIL_LOG_SENT_EMAILS = False
 
-# Delay in seconds to sleep between individual mail messages being sent,
+# Delay in seconds between individual mail messages being sent by a task,
 # when a bulk email task is retried for rate-related reasons.  Choose this
 # value depending on the number of workers that might be sending email in
 # parallel, and what the SES rate is.
 BULK_EMAIL_RETRY_DELAY_BETWEEN_SENDS = 0.02
 
+# Number of connections to the mail server over which each bulk email task
+# sends its messages at the same time. Each connection sends as fast as it can
+# unless BULK_EMAIL_MAX_SEND_RATE_PER_CONNECTION is set, so raising this raises
+# the rate at which each task sends: set the two together, keeping the total
+# under the mail server's (e.g. SES's) sending limit.
+BULK_EMAIL_CONNECTIONS_PER_TASK = 1
+
+# Maximum number of messages per second sent over each of those connections,
+# or None for no limit.
+BULK_EMAIL_MAX_SEND_RATE_PER_CONNECTION = None
+
 
 ############################## Video ##########################################
 
@@ -1254,6 +1303,9 @@ INSTALLED_APPS = (
 
     # Monitoring functionality
     'monitoring',
+
+    # Cached overviews of courses, for the pages that list them
+    'course_overviews',
 )
 
 ######################### MARKETING SITE ###############################
@@ -1322,12 +1374,39 @@ CERT_NAME_LONG = "Certificate of Achievement"
 ###################### Grade Downloads ######################
 GRADES_DOWNLOAD_ROUTING_KEY = HIGH_MEM_QUEUE
 
+# Grade reports are generated by subtasks which each grade this many students,
+# and write their part of the report to be merged when the last one finishes.
+GRADES_DOWNLOAD_STUDENTS_PER_TASK = 500
+GRADES_DOWNLOAD_STUDENTS_PER_QUERY = 5000
+# Merging the parts is retried this many times, this many seconds apart, before
+# the report is marked as failed.
+GRADES_DOWNLOAD_MERGE_MAX_RETRIES = 3
+GRADES_DOWNLOAD_MERGE_RETRY_DELAY = 60
+
 GRADES_DOWNLOAD = {
     'STORAGE_TYPE': 'localfs',
     'BUCKET': 'edx-grades',
     'ROOT_PATH': '/tmp/edx-s3/grades',
 }
 
+###################### Course Aggregates ######################
+# The per-problem grade counts of a course (in staff debug info and the class
+# dashboard) are kept up to date as grades change, and recomputed from the
+# courseware_studentmodule table by the refresh_course_aggregates command
+# (which should be run periodically) when they're older than this many seconds.
+GRADE_HISTOGRAM_REFRESH_INTERVAL = 24 * 60 * 60
+
+# The numbers of students who opened each module of a course (in the class
+# dashboard) are brought up to date with the modules opened since whenever
+# they're read, and recomputed by the refresh_course_aggregates command when
+# they're older than this many seconds.
+#
+# Neither is computed until refresh_course_aggregates has been run for the
+# course, and nothing schedules it, so it should be run from cron (e.g. hourly,
+# as `refresh_course_aggregates --hours 2`); until then the class dashboard
+# shows no "opened subsection" counts or grade distributions.
+MODULE_OPEN_COUNT_RECOMPUTE_INTERVAL = 24 * 60 * 60
+
 ######################## PROGRESS SUCCESS BUTTON ##############################
 # The following fields are available in the URL: {course_id} {student_id}
 PROGRESS_SUCCESS_BUTTON_URL = 'http://<domain>/<path>/{course_id}'
@@ -1,14 +1,27 @@
 from contextlib import contextmanager
+import cookielib
 from dogapi import dog_stats_api
 import logging
+import os
 import requests
+from requests.adapters import HTTPAdapter
+import sys
+import threading
 from django.conf import settings
 from time import time
 from uuid import uuid4
+from django.utils import translation
 from django.utils.translation import get_language
 
 log = logging.getLogger(__name__)
 
+# Requests with these methods can safely be sent again if they fail to connect.
+IDEMPOTENT_METHODS = ('get', 'put', 'delete')
+
+_session = None
+_session_pid = None
+_session_lock = threading.Lock()
+
 
 def strip_none(dic):
     return dict([(k, v) for k, v in dic.iteritems() if v is not None])
@@ -50,6 +63,78 @@ def request_timer(request_id, method, url, tags=None):
     )
 
 
+class _NoCookiesPolicy(cookielib.DefaultCookiePolicy):
+    """
+    Keeps the comments service's cookies out of the shared session, which
+    makes requests for every user.
+    """
+    def set_ok(self, cookie, request):
+        return False
+
+
+def get_session():
+    """
+    Returns the requests Session which this process uses to talk to the
+    comments service, which keeps up to COMMENTS_SERVICE_POOL_SIZE connections
+    alive between requests.
+    """
+    global _session, _session_pid  # pylint: disable=global-statement
+    with _session_lock:
+        if _session is None or _session_pid != os.getpid():
+            # Each process gets its own session, so that forked processes
+            # don't share connections.
+            pool_size = getattr(settings, "COMMENTS_SERVICE_POOL_SIZE", 10)
+            session = requests.Session()
+            session.cookies.set_policy(_NoCookiesPolicy())
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+            session.mount('http://', adapter)
+            session.mount('https://', adapter)
+            _session = session
+            _session_pid = os.getpid()
+        return _session
+
+
+def perform_concurrently(*functions):
+    """
+    Calls each of `functions` (with no arguments) in its own thread, and
+    returns the list of their results once they have all returned. If any of
+    them raise an exception, the first of them is re-raised.
+
+    This is for making independent comments service requests at the same time,
+    so the functions mustn't use the database, whose connections belong to the
+    calling thread. They run with the caller's language active.
+    """
+    if len(functions) == 1:
+        return [functions[0]()]
+
+    language = get_language()
+    results = [None] * len(functions)
+    errors = [None] * len(functions)
+
+    def run(index, function):
+        translation.activate(language)
+        try:
+            results[index] = function()
+        except Exception:  # pylint: disable=broad-except
+            errors[index] = sys.exc_info()
+        finally:
+            translation.deactivate()
+
+    threads = [
+        threading.Thread(target=run, args=(index, function))
+        for index, function in enumerate(functions)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    for error in errors:
+        if error is not None:
+            raise error[0], error[1], error[2]
+    return results
+
+
 def perform_request(method, url, data_or_params=None, raw=False,
                     metric_action=None, metric_tags=None, paged_results=False):
 
@@ -75,15 +160,28 @@ def perform_request(method, url, data_or_params=None, raw=False,
     else:
         data = None
         params = merge_dict(data_or_params, request_id_dict)
+    max_retries = getattr(settings, "COMMENTS_SERVICE_MAX_RETRIES", 1) if method in IDEMPOTENT_METHODS else 0
     with request_timer(request_id, method, url, metric_tags):
-        response = requests.request(
-            method,
-            url,
-            data=data,
-            params=params,
-            headers=headers,
-            timeout=5
-        )
+        for attempt in range(max_retries + 1):
+            try:
+                response = get_session().request(
+                    method,
+                    url,
+                    data=data,
+                    params=params,
+                    headers=headers,
+                    timeout=getattr(settings, "COMMENTS_SERVICE_TIMEOUT", 5)
+                )
+                break
+            except requests.exceptions.ConnectionError:
+                if attempt == max_retries:
+                    raise
+                log.warning(
+                    "comment_client_request_retry: request_id={request_id}, method={method}, url={url}".format(
+                        request_id=request_id, method=method, url=url
+                    )
+                )
+                dog_stats_api.increment('comment_client.request.retry', tags=metric_tags)
 
     metric_tags.append(u'status_code:{}'.format(response.status_code))
     if response.status_code > 200:
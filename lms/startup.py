@@ -29,6 +29,9 @@ def run():
     if settings.FEATURES.get('ENABLE_THIRD_PARTY_AUTH', False):
         enable_third_party_auth()
 
+    if settings.CODE_JAIL.get('pool', {}).get('size') and settings.CODE_JAIL.get('python_bin'):
+        enable_safe_exec_worker_pool()
+
 
 def enable_theme():
     """
@@ -111,3 +114,22 @@ def enable_third_party_auth():
 
     from third_party_auth import settings as auth_settings
     auth_settings.apply_settings(settings.THIRD_PARTY_AUTH, settings)
+
+
+def enable_safe_exec_worker_pool():
+    """
+    Run sandboxed code in a pool of warm sandboxed processes, configured by
+    CODE_JAIL['pool'], instead of starting a new one for each execution.
+    """
+    from capa.safe_exec import configure_worker_pool, WorkerPool
+
+    pool_config = settings.CODE_JAIL['pool']
+    configure_worker_pool(WorkerPool(
+        python_bin=settings.CODE_JAIL['python_bin'],
+        user=settings.CODE_JAIL.get('user'),
+        size=pool_config['size'],
+        max_executions=pool_config.get('max_executions', 100),
+        max_memory=pool_config.get('max_memory'),
+        timeout=pool_config.get('timeout', 10),
+        limits=settings.CODE_JAIL.get('limits'),
+    ))